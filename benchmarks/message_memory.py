@@ -0,0 +1,105 @@
+"""
+Message 与 CompactMessage 的内存占用对比
+
+用法（在项目根目录下运行）:
+    python -m benchmarks.message_memory
+    python -m benchmarks.message_memory -n 100000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, List
+
+from models.message import Message, CompactMessage
+
+
+class _RawMessage:
+    """模拟平台原始消息对象及其关联的对象图"""
+
+    def __init__(self, index: int):
+        self.id = index
+        self.guild = {"id": 1, "name": "guild", "members": list(range(20))}
+        self.channel = {"id": 2, "name": "channel"}
+        self.author = {"id": index % 1000, "name": f"user{index % 1000}"}
+
+
+def _build_message(index: int) -> Message:
+    return Message(
+        id=str(1100000000000000000 + index),
+        content=f"message content {index}",
+        platform="discord",
+        author_id=str(index % 1000),
+        author_name=f"user{index % 1000}",
+        timestamp=datetime.now(timezone.utc),
+        raw_message=_RawMessage(index),
+        metadata={"channel_id": "2", "guild_id": "1"},
+    )
+
+
+def _build_compact(index: int) -> CompactMessage:
+    return CompactMessage(
+        id=str(1100000000000000000 + index),
+        content=f"message content {index}",
+        platform="discord",
+        author_id=str(index % 1000),
+        author_name=f"user{index % 1000}",
+        timestamp=datetime.now(timezone.utc),
+        raw_message=_RawMessage(index),
+        metadata={"channel_id": "2", "guild_id": "1"},
+    )
+
+
+def measure(name: str, factory: Callable[[int], object], count: int) -> None:
+    """创建count条消息并保持引用，统计内存占用和耗时"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    messages: List[object] = [factory(i) for i in range(count)]
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<16} 数量: {count:>9}  常驻: {current / 1024 / 1024:>8.1f} MiB  "
+          f"峰值: {peak / 1024 / 1024:>8.1f} MiB  每条: {current / count:>6.0f} B  耗时: {elapsed:.2f}s")
+    del messages
+    gc.collect()
+
+
+def measure_serialization(count: int) -> None:
+    """对比to_dict与二进制序列化的耗时和大小"""
+    messages = [_build_compact(i) for i in range(count)]
+
+    start = time.perf_counter()
+    for message in messages:
+        message.to_dict()
+    to_dict_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    payloads = [message.to_bytes() for message in messages]
+    to_bytes_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for payload in payloads:
+        CompactMessage.from_bytes(payload)
+    from_bytes_elapsed = time.perf_counter() - start
+
+    average_size = sum(len(payload) for payload in payloads) / count
+    print(f"序列化 {count} 条: to_dict {to_dict_elapsed:.2f}s, to_bytes {to_bytes_elapsed:.2f}s, "
+          f"from_bytes {from_bytes_elapsed:.2f}s, 平均大小 {average_size:.0f} B")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="消息模型内存占用对比")
+    parser.add_argument("-n", "--count", type=int, default=1000000, help="创建的消息数量")
+    args = parser.parse_args()
+
+    # Message强引用原始对象，CompactMessage不持有（原始对象不支持弱引用时直接丢弃）
+    measure("Message", _build_message, args.count)
+    measure("CompactMessage", _build_compact, args.count)
+    measure_serialization(min(args.count, 200000))
+
+
+if __name__ == "__main__":
+    main()
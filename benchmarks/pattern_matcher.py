@@ -0,0 +1,116 @@
+"""
+共享匹配引擎与逐条匹配的性能对比
+
+用法（在项目根目录下运行）:
+    python -m benchmarks.pattern_matcher
+    python -m benchmarks.pattern_matcher --literals 5000 --regexes 50 --messages 20000
+"""
+import argparse
+import random
+import re
+import string
+import sys
+import time
+from typing import List, Set
+
+from handlers.pattern_matcher import PatternMatcher, PatternSpec
+
+
+def _random_word(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def build_specs(rng: random.Random, literal_count: int, regex_count: int) -> List[PatternSpec]:
+    """生成代币名称、合约地址等字面量规则和一些正则规则，部分正则之间、正则与字面量之间会重叠命中"""
+    specs = []
+    for i in range(literal_count):
+        if i % 4 == 0:
+            pattern = "0x" + "".join(rng.choice("0123456789abcdef") for _ in range(40))
+        else:
+            pattern = _random_word(rng, rng.randint(4, 10))
+        specs.append(PatternSpec(f"literal{i}", pattern))
+    for i in range(regex_count):
+        specs.append(PatternSpec(f"regex{i}", rf"\${_random_word(rng, 3)}\w*", regex=True))
+    # 合约地址同时命中字面量和这两条正则，同一位置多条正则都能匹配
+    specs.append(PatternSpec("address", r"0x[0-9a-f]{40}", regex=True))
+    specs.append(PatternSpec("hex", r"[0-9a-f]{8}", regex=True))
+    return specs
+
+
+def build_messages(rng: random.Random, specs: List[PatternSpec], count: int) -> List[str]:
+    """生成消息，约十分之一的消息包含规则中的字面量"""
+    literals = [spec.pattern for spec in specs if not spec.regex]
+    # 正则规则的固定前缀，例如 "$abc"
+    prefixes = [spec.pattern[:4].replace("\\", "") for spec in specs if spec.regex and spec.pattern.startswith("\\$")]
+    messages = []
+    for i in range(count):
+        words = [_random_word(rng, rng.randint(2, 9)) for _ in range(rng.randint(10, 40))]
+        if literals and i % 10 == 0:
+            words.insert(rng.randrange(len(words)), rng.choice(literals).upper())
+        if prefixes and i % 10 == 5:
+            words.insert(rng.randrange(len(words)), rng.choice(prefixes) + _random_word(rng, 3))
+        messages.append(" ".join(words))
+    return messages
+
+
+def naive_scan(specs: List[PatternSpec], compiled: List, text: str) -> Set[str]:
+    """逐条规则匹配，返回命中的规则名称集合"""
+    lowered = text.lower()
+    names = set()
+    for spec, regex in zip(specs, compiled):
+        if regex is None:
+            if (spec.pattern.lower() in lowered) if spec.ignore_case else (spec.pattern in text):
+                names.add(spec.name)
+        elif any(match.end() > match.start() for match in regex.finditer(text)):
+            names.add(spec.name)
+    return names
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="多规则匹配性能对比")
+    parser.add_argument("--literals", type=int, default=2000, help="字面量规则数量")
+    parser.add_argument("--regexes", type=int, default=20, help="正则规则数量")
+    parser.add_argument("--messages", type=int, default=10000, help="消息数量")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    specs = build_specs(rng, args.literals, args.regexes)
+    messages = build_messages(rng, specs, args.messages)
+
+    start = time.perf_counter()
+    matcher = PatternMatcher(specs)
+    build_elapsed = time.perf_counter() - start
+
+    naive_compiled = [re.compile(spec.pattern, re.IGNORECASE if spec.ignore_case else 0) if spec.regex else None
+                      for spec in specs]
+
+    start = time.perf_counter()
+    naive_results = [naive_scan(specs, naive_compiled, text) for text in messages]
+    naive_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine_results = [matcher.matched_names(text) for text in messages]
+    engine_elapsed = time.perf_counter() - start
+
+    naive_hits = sum(len(names) for names in naive_results)
+    engine_hits = sum(len(names) for names in engine_results)
+    mismatches = [index for index, (naive, engine) in enumerate(zip(naive_results, engine_results)) if naive != engine]
+
+    print(f"规则: {len(specs)} 条 (字面量 {args.literals}, 正则 {len(specs) - args.literals})，消息: {args.messages} 条")
+    print(f"编译耗时: {build_elapsed * 1000:.1f} ms")
+    print(f"逐条匹配: {naive_elapsed:.3f}s ({args.messages / naive_elapsed:,.0f} 条/秒)，命中规则 {naive_hits} 次")
+    print(f"匹配引擎: {engine_elapsed:.3f}s ({args.messages / engine_elapsed:,.0f} 条/秒)，命中规则 {engine_hits} 次")
+    print(f"加速比: {naive_elapsed / engine_elapsed:.1f}x")
+    # 逐条消息比较命中的规则名称，数量相同但规则不同也算不一致
+    for index in mismatches[:5]:
+        print(f"结果不一致: {messages[index][:60]!r} 逐条匹配 {sorted(naive_results[index])}，"
+              f"匹配引擎 {sorted(engine_results[index])}", file=sys.stderr)
+    if mismatches:
+        print(f"共 {len(mismatches)} 条消息的命中结果不一致", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
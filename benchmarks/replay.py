@@ -0,0 +1,327 @@
+"""
+离线回放与吞吐量基准测试
+
+不需要真实的Discord账号，把录制的或合成的消息送入真实的处理链路:
+    监听器(_ingest/_handle_message) -> 分发队列 -> MessageHandler -> DiscordMessageHandler 策略
+
+录制文件为JSONL，每行是Message.to_dict()的结构（timestamp为ISO格式字符串或Unix时间戳）。
+使用 --fake-discord 时会先把消息包装成模拟的discord.py消息对象，再经过DiscordListener.process_message。
+
+用法（在项目根目录下运行）:
+    python -m benchmarks.replay -n 50000
+    python -m benchmarks.replay --input recording.jsonl --rate 2000 --profile burst
+    python -m benchmarks.replay --fake-discord --concurrency 8 --save-baseline baseline.json
+    python -m benchmarks.replay --baseline baseline.json --threshold 0.1
+
+与基线相比吞吐量下降、p99延迟或峰值内存上升超过阈值时，以非0状态码退出。
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+from core.base_listener import BaseListener
+from core.discord.filters import DiscordMessageFilter
+from core.discord.listener import DiscordListener
+from core.plugins import get_plugin_registry
+from core.dispatcher import MessageDispatcher, OVERFLOW_BLOCK
+from handlers.message_handler import MessageHandler
+from models.message import Message
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILES = ("steady", "burst", "ramp")
+
+
+def _parse_timestamp(value: Any) -> datetime:
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, timezone.utc)
+    if value:
+        return datetime.fromisoformat(value)
+    return datetime.now(timezone.utc)
+
+
+def message_from_dict(data: Dict[str, Any]) -> Message:
+    """从Message.to_dict()结构还原消息"""
+    return Message(
+        id=str(data["id"]),
+        content=data.get("content", ""),
+        platform=data.get("platform", "discord"),
+        author_id=str(data.get("author_id", "")),
+        author_name=data.get("author_name", ""),
+        timestamp=_parse_timestamp(data.get("timestamp")),
+        attachments=list(data.get("attachments") or []),
+        metadata=dict(data.get("metadata") or {}),
+    )
+
+
+def load_recording(path: str) -> List[Message]:
+    """读取JSONL录制文件"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [message_from_dict(json.loads(line)) for line in f if line.strip()]
+
+
+def synthetic_messages(count: int, channels: int = 20, authors: int = 500) -> Iterator[Message]:
+    """生成合成消息，包含一定比例的指令消息和带附件的消息"""
+    now = datetime.now(timezone.utc)
+    for index in range(count):
+        content = f"!price token{index % 50}" if index % 10 == 0 else f"synthetic message {index} lorem ipsum"
+        yield Message(
+            id=str(1200000000000000000 + index),
+            content=content,
+            platform="discord",
+            author_id=str(index % authors),
+            author_name=f"user{index % authors}",
+            timestamp=now,
+            attachments=[f"https://cdn.example.com/{index}.png"] if index % 25 == 0 else [],
+            metadata={"channel_id": str(index % channels), "guild_id": "1"},
+        )
+
+
+def to_fake_discord(message: Message) -> SimpleNamespace:
+    """把统一消息包装成DiscordListener.process_message可以处理的模拟discord.py消息对象"""
+    guild_id = message.metadata.get("guild_id")
+    return SimpleNamespace(
+        id=int(message.id),
+        content=message.content,
+        author=SimpleNamespace(id=int(message.author_id or 0), name=message.author_name, discriminator="0",
+                               bot=False),
+        channel=SimpleNamespace(id=int(message.metadata.get("channel_id") or 0)),
+        guild=SimpleNamespace(id=int(guild_id)) if guild_id else None,
+        attachments=[SimpleNamespace(url=url) for url in message.attachments],
+        created_at=message.timestamp,
+    )
+
+
+class ReplayListener(BaseListener):
+    """直接回放统一消息的监听器"""
+
+    def __init__(self):
+        super().__init__(platform_name="discord")
+
+    async def start(self) -> None:
+        self.running = True
+
+    async def stop(self) -> None:
+        self.running = False
+
+    async def process_message(self, raw_message: Any) -> Optional[Message]:
+        return raw_message
+
+
+class ReplayDiscordListener(DiscordListener):
+    """
+    不连接网关的DiscordListener，复用其process_message把模拟消息转换为统一模型
+
+    默认使用不限制频道和用户的过滤规则，use_settings_filter为True时使用配置中的规则
+    """
+
+    def __init__(self, use_settings_filter: bool = False):
+        BaseListener.__init__(self, platform_name="discord")
+        self.message_filter = DiscordMessageFilter.from_settings() if use_settings_filter else DiscordMessageFilter()
+        self.backfill = None
+        # 紧凑模型会从客户端缓存查找原始消息，回放时没有缓存
+        self.client = SimpleNamespace(_connection=SimpleNamespace(_get_message=lambda message_id: None))
+
+    async def start(self) -> None:
+        self.running = True
+
+    async def stop(self) -> None:
+        self.running = False
+
+
+def build_handler() -> MessageHandler:
+    """创建与main.py相同的处理链路"""
+    handler = MessageHandler()
+    try:
+        discord_handler = get_plugin_registry().get("discord").create_handler()
+    except ImportError as e:
+        print(f"警告: 无法加载DiscordMessageHandler，只回放到MessageHandler: {e}", file=sys.stderr)
+    else:
+        handler.register_platform_handler("discord", discord_handler.handle_message)
+    return handler
+
+
+def _schedule(count: int, rate: float, profile: str, burst_size: int) -> Iterator[float]:
+    """返回每条消息相对开始时间的计划发送时刻，rate为0时不限速"""
+    if rate <= 0:
+        for _ in range(count):
+            yield 0.0
+        return
+    if profile == "steady":
+        for index in range(count):
+            yield index / rate
+    elif profile == "burst":
+        # 每个周期开始时一次性发送burst_size条，平均速率仍为rate
+        period = burst_size / rate
+        for index in range(count):
+            yield (index // burst_size) * period
+    elif profile == "ramp":
+        # 速率从rate的10%线性增加到rate的190%，平均速率为rate
+        duration = count / rate
+        low, high = 0.1 * rate, 1.9 * rate
+        slope = (high - low) / duration
+        for index in range(count):
+            # 求解 low*t + slope*t^2/2 = index
+            yield (-low + (low * low + 2 * slope * index) ** 0.5) / slope
+
+
+async def _paced(items: List[Any], rate: float, profile: str, burst_size: int) -> AsyncIterator[Any]:
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for item, due in zip(items, _schedule(len(items), rate, profile, burst_size)):
+        delay = start + due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        yield item
+
+
+def _peak_rss_mib() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KiB，macOS为字节
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def replay(messages: List[Message], fake_discord: bool = False, rate: float = 0, profile: str = "steady",
+                 burst_size: int = 100, concurrency: int = 1, workers: int = 4,
+                 use_settings_filter: bool = False) -> Dict[str, float]:
+    """
+    回放消息并统计吞吐量和端到端延迟
+
+    Args:
+        messages: 待回放的消息
+        fake_discord: 是否经过DiscordListener.process_message
+        rate: 目标速率（条/秒），0表示不限速
+        profile: 发送节奏 (steady、burst、ramp)
+        burst_size: burst节奏下每次突发的消息数量
+        concurrency: 并发发送消息的协程数量
+        workers: 分发队列的工作协程数量
+        use_settings_filter: 是否使用配置中的Discord过滤规则
+
+    Returns:
+        Dict[str, float]: 统计结果
+    """
+    handler = build_handler()
+    started: Dict[str, float] = {}
+    latencies: List[float] = []
+    process = handler.process
+
+    async def process_and_record(message: Message) -> None:
+        # handle_message在消息进入执行器队列后就返回，延迟要在所有处理器执行完后记录
+        await process(message)
+        begin = started.pop(message.id, None)
+        if begin is not None:
+            latencies.append(time.perf_counter() - begin)
+
+    handler.process = process_and_record
+    dispatcher = MessageDispatcher(handler.handle_message, maxsize=10000, workers=workers,
+                                   overflow_policy=OVERFLOW_BLOCK)
+    listener = ReplayDiscordListener(use_settings_filter) if fake_discord else ReplayListener()
+    listener.register_callback(dispatcher.put)
+    await dispatcher.start()
+    await listener.start()
+
+    items = [to_fake_discord(m) for m in messages] if fake_discord else messages
+    source = _paced(items, rate, profile, burst_size)
+    lock = asyncio.Lock()
+
+    async def producer() -> None:
+        # 多个发送协程共享同一个节奏源，按计划时刻依次取出消息
+        while True:
+            async with lock:
+                try:
+                    item = await source.__anext__()
+                except StopAsyncIteration:
+                    return
+            started[str(item.id)] = time.perf_counter()
+            await listener._ingest(item)
+
+    begin = time.perf_counter()
+    await asyncio.gather(*(producer() for _ in range(max(1, concurrency))))
+    await dispatcher.stop()
+    # 等待执行器中排队的消息处理完
+    await handler.close()
+    elapsed = time.perf_counter() - begin
+    await listener.stop()
+
+    return {
+        "messages": len(latencies),
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "peak_rss_mib": _peak_rss_mib(),
+    }
+
+
+def check_regression(result: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """与基线比较，返回超过阈值的指标说明"""
+    failures = []
+    if baseline.get("throughput") and result["throughput"] < baseline["throughput"] * (1 - threshold):
+        failures.append(f"吞吐量 {result['throughput']:.0f} 低于基线 {baseline['throughput']:.0f}")
+    for key in ("p99_ms", "peak_rss_mib"):
+        if baseline.get(key) and result[key] > baseline[key] * (1 + threshold):
+            failures.append(f"{key} {result[key]:.2f} 高于基线 {baseline[key]:.2f}")
+    return failures
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="离线回放与吞吐量基准测试")
+    parser.add_argument("--input", help="JSONL录制文件，不指定时使用合成消息")
+    parser.add_argument("-n", "--count", type=int, default=20000, help="合成消息数量，或录制消息的最大回放数量")
+    parser.add_argument("--fake-discord", action="store_true", help="经过DiscordListener.process_message")
+    parser.add_argument("--use-settings-filter", action="store_true", help="使用配置中的Discord过滤规则")
+    parser.add_argument("--rate", type=float, default=0, help="目标速率（条/秒），0表示不限速")
+    parser.add_argument("--profile", choices=PROFILES, default="steady", help="发送节奏")
+    parser.add_argument("--burst-size", type=int, default=100, help="burst节奏下每次突发的消息数量")
+    parser.add_argument("--concurrency", type=int, default=1, help="并发发送消息的协程数量")
+    parser.add_argument("--workers", type=int, default=4, help="分发队列的工作协程数量")
+    parser.add_argument("--baseline", help="基线结果文件，超过阈值时返回非0状态码")
+    parser.add_argument("--threshold", type=float, default=0.1, help="允许的回退比例")
+    parser.add_argument("--save-baseline", help="把本次结果保存为基线文件")
+    args = parser.parse_args(argv)
+
+    if args.input:
+        messages = load_recording(args.input)[:args.count]
+    else:
+        messages = list(synthetic_messages(args.count))
+
+    result = asyncio.run(replay(messages, fake_discord=args.fake_discord, rate=args.rate, profile=args.profile,
+                                burst_size=args.burst_size, concurrency=args.concurrency, workers=args.workers,
+                                use_settings_filter=args.use_settings_filter))
+
+    print(f"消息: {result['messages']}  耗时: {result['elapsed']:.2f}s  吞吐量: {result['throughput']:.0f} 条/秒  "
+          f"p50: {result['p50_ms']:.2f}ms  p99: {result['p99_ms']:.2f}ms  峰值RSS: {result['peak_rss_mib']:.1f} MiB")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            failures = check_regression(result, json.load(f), args.threshold)
+        for failure in failures:
+            print(f"回退: {failure}", file=sys.stderr)
+        if failures:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
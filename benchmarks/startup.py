@@ -0,0 +1,221 @@
+"""
+启动耗时基准测试
+
+导入耗时：在子进程中用 -X importtime 导入main并创建已启用平台的监听器和处理器，按顶层包汇总耗时，
+检查未启用平台的依赖（discord.py、protobuf）是否被导入:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --platforms telegram discord,telegram,twitter --top 15
+
+冷启动到第一条消息：启动本地替身服务，在子进程中运行完整的机器人（ScraperBot.start），
+测量从创建进程到处理器收到第一条消息的时间:
+    python -m benchmarks.startup --first-message --platforms telegram discord --repeat 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+# 子进程只导入main并创建已启用平台的组件，不连接任何服务
+_SETUP_CODE = """
+import main
+bot = main.ScraperBot()
+bot.setup_handlers()
+bot.setup_listeners()
+"""
+
+# 子进程运行完整的机器人，第一条消息到达处理器时输出标记并立即退出
+_RUN_CODE = """
+import asyncio, os
+import main
+
+def first_message(message):
+    print("FIRST_MESSAGE", flush=True)
+    os._exit(0)
+
+register_handlers = main.register_handlers
+
+def register_with_probe(handler):
+    register_handlers(handler)
+    handler.register_global_handler(first_message)
+
+main.register_handlers = register_with_probe
+
+async def run():
+    bot = main.ScraperBot()
+    await bot.start()
+    await asyncio.Event().wait()
+
+asyncio.run(run())
+"""
+
+# 即使未启用也值得关注的重量级依赖
+_HEAVY_PACKAGES = ("discord", "google", "aiohttp")
+
+
+def _child_env(platforms: str, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """子进程的环境变量：只启用指定平台，日志写入临时文件，关闭所有持久化"""
+    log_dir = tempfile.mkdtemp(prefix="startup-bench-")
+    env = dict(os.environ)
+    env.update({
+        "ENABLED_PLATFORMS": platforms,
+        "LOG_FILE": os.path.join(log_dir, "bot.log"),
+        "LOG_LEVEL": "WARNING",
+        "OPEN_PROXY": "False",
+        "PIPELINE_MODE": "single",
+        "METRICS_ENABLED": "False",
+        "DEDUP_STATE_FILE": "",
+        "DISCORD_TOKEN": "fake-token",
+        "DISCORD_TOKENS": "",
+        "DISCORD_BACKFILL_ENABLED": "False",
+        "TELEGRAM_BOT_TOKEN": "fake-token",
+        "TELEGRAM_OFFSET_FILE": "",
+        "TWITTER_BEARER_TOKEN": "fake-token",
+        "TWITTER_CURSOR_FILE": "",
+    })
+    env.update(extra or {})
+    return env
+
+
+def parse_importtime(output: str) -> List[Tuple[str, int, int, int]]:
+    """解析 -X importtime 的输出，返回 (模块, 自身耗时us, 累计耗时us, 嵌套层级)"""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+def _measure_imports(platforms: str, top: int) -> None:
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", _SETUP_CODE], env=_child_env(platforms),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        print(f"[{platforms}] 子进程失败:\n{result.stderr[-2000:]}")
+        return
+
+    modules = parse_importtime(result.stderr)
+    total = sum(cumulative for _, _, cumulative, depth in modules if depth == 0)
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, self_us, _, _ in modules:
+        by_package[name.split(".")[0]] += self_us
+    loaded = {name.split(".")[0] for name, _, _, _ in modules}
+
+    heavy = ", ".join(f"{package}={'是' if package in loaded else '否'}" for package in _HEAVY_PACKAGES)
+    print(f"[{platforms}] 进程总耗时 {wall * 1000:.0f} ms，导入 {len(modules)} 个模块共 {total / 1000:.0f} ms  "
+          f"已导入: {heavy}")
+    for package, self_us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"    {package:<28} {self_us / 1000:7.1f} ms")
+
+
+async def _start_fake_service(platform: str) -> Tuple[object, Dict[str, str]]:
+    """启动平台的本地替身服务，返回 (服务, 子进程需要的环境变量)"""
+    if platform == "telegram":
+        from tools.fake_telegram_api import FakeTelegramApi
+        service = FakeTelegramApi(port=_free_port())
+        await service.start()
+        return service, {"TELEGRAM_API_BASE": service.base_url, "TELEGRAM_POLL_TIMEOUT": "5"}
+    if platform == "discord":
+        from tools.fake_discord_gateway import FakeDiscordGateway
+        service = FakeDiscordGateway(port=_free_port(), channels=1)
+        await service.start()
+        return service, {"DISCORD_API_BASE": service.api_base, "DISCORD_GATEWAY_URL": service.gateway_url,
+                         "DISCORD_CHANNEL_IDS": ",".join(service.channel_ids)}
+    raise ValueError(f"没有 {platform} 的替身服务，可选: telegram、discord")
+
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _publish(service: object, index: int) -> None:
+    if hasattr(service, "update_payload"):
+        service.publish(index)
+    else:
+        service.publish(service.message_payload(index))
+
+
+async def _first_message_once(platform: str, timeout: float) -> Optional[float]:
+    """运行一次子进程，返回从创建进程到收到第一条消息的秒数，超时返回None"""
+    service, extra = await _start_fake_service(platform)
+    try:
+        start = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-c", _RUN_CODE, env=_child_env(platform, extra),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+
+        async def wait_for_marker() -> float:
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    raise RuntimeError("子进程在收到消息前退出")
+                if line.strip() == b"FIRST_MESSAGE":
+                    return time.perf_counter() - start
+
+        # 持续发布消息：Telegram的消息在服务端排队，Discord只推送给已连接的会话
+        async def keep_publishing() -> None:
+            index = 0
+            while True:
+                _publish(service, index)
+                index += 1
+                await asyncio.sleep(0.005)
+
+        publisher = asyncio.create_task(keep_publishing())
+        try:
+            return await asyncio.wait_for(wait_for_marker(), timeout)
+        except (asyncio.TimeoutError, RuntimeError) as e:
+            print(f"[{platform}] 未收到消息: {e!r}")
+            return None
+        finally:
+            publisher.cancel()
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+    finally:
+        await service.stop()
+
+
+async def _measure_first_message(platforms: List[str], repeat: int, timeout: float) -> None:
+    for platform in platforms:
+        timings = []
+        for _ in range(repeat):
+            elapsed = await _first_message_once(platform, timeout)
+            if elapsed is not None:
+                timings.append(elapsed * 1000)
+        if timings:
+            print(f"[{platform}] 冷启动到第一条消息: 中位数 {statistics.median(timings):.0f} ms  "
+                  f"最小 {min(timings):.0f} ms  最大 {max(timings):.0f} ms  ({len(timings)}/{repeat} 次成功)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument("--platforms", nargs="+", default=None,
+                        help="要测量的ENABLED_PLATFORMS取值，默认分别测量每个内置平台和全部平台")
+    parser.add_argument("--top", type=int, default=10, help="列出自身导入耗时最多的顶层包数量")
+    parser.add_argument("--first-message", action="store_true", help="测量冷启动到第一条消息的时间")
+    parser.add_argument("--repeat", type=int, default=3, help="--first-message模式下每个平台的测量次数")
+    parser.add_argument("--timeout", type=float, default=30, help="--first-message模式下等待第一条消息的最长时间")
+    args = parser.parse_args()
+
+    if args.first_message:
+        asyncio.run(_measure_first_message(args.platforms or ["telegram", "discord"], args.repeat, args.timeout))
+        return 0
+    for platforms in args.platforms or ["discord", "telegram", "twitter", "discord,telegram,twitter"]:
+        _measure_imports(platforms, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
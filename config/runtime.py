@@ -0,0 +1,229 @@
+import asyncio
+import os
+import time
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from dotenv import dotenv_values
+
+from config.settings import ENV_FILE, PROCESS_ENV, DEFAULT_DISCORD_STRATEGIES
+from utils.exceptions import ConfigError
+from utils.logger import setup_logger
+from utils.metrics import REGISTRY
+
+CONFIG_VERSION = REGISTRY.gauge("scraper_config_version", "当前使用的配置快照版本")
+CONFIG_RELOADS = REGISTRY.counter("scraper_config_reloads_total", "配置热加载次数", ["result"])
+
+# 可以热加载的配置项，其余配置只在启动时读取，修改后需要重启
+RELOADABLE_SETTINGS = (
+    "DISCORD_CHANNEL_IDS", "DISCORD_CHANNEL_ID", "DISCORD_TARGET_USER_IDS", "DISCORD_GUILD_IDS",
+    "DISCORD_IGNORED_GUILD_IDS", "DISCORD_CHANNEL_USER_IDS", "DISCORD_STRATEGIES",
+    "TELEGRAM_CHAT_ID", "TELEGRAM_TARGET_USER_ID",
+    "FORWARD_DESTINATIONS",
+)
+
+
+def _split(value: Optional[str]) -> Tuple[str, ...]:
+    return tuple(item.strip() for item in (value or "").split(",") if item.strip())
+
+
+class RuntimeConfig(NamedTuple):
+    """
+    可热加载配置的一份不可变快照
+
+    只保存原始配置值，各组件在订阅回调中把它转换为自己使用的结构（过滤器、策略列表、转发目标），
+    再整体替换引用；处理消息时只读取组件当前持有的引用，不需要加锁
+    """
+    # 快照版本，每次成功加载后加一
+    version: int
+    # 监听的频道ID，兼容旧的单一频道配置DISCORD_CHANNEL_ID
+    discord_channel_ids: Tuple[str, ...]
+    discord_target_user_ids: Tuple[str, ...]
+    discord_guild_ids: Tuple[str, ...]
+    discord_ignored_guild_ids: Tuple[str, ...]
+    discord_channel_user_ids: str
+    # 策略的 "模块:类名"
+    discord_strategies: Tuple[str, ...]
+    telegram_chat_id: str
+    telegram_target_user_id: str
+    forward_destinations: str
+
+    @classmethod
+    def from_env(cls, env: Mapping[str, str], version: int = 1) -> "RuntimeConfig":
+        """从环境变量（或合并后的配置文件内容）创建快照，默认值与config.settings一致"""
+        channel_ids = _split(env.get("DISCORD_CHANNEL_IDS"))
+        if not channel_ids and env.get("DISCORD_CHANNEL_ID"):
+            channel_ids = (env["DISCORD_CHANNEL_ID"].strip(),)
+        return cls(
+            version=version,
+            discord_channel_ids=channel_ids,
+            discord_target_user_ids=_split(env.get("DISCORD_TARGET_USER_IDS")),
+            discord_guild_ids=_split(env.get("DISCORD_GUILD_IDS")),
+            discord_ignored_guild_ids=_split(env.get("DISCORD_IGNORED_GUILD_IDS")),
+            discord_channel_user_ids=env.get("DISCORD_CHANNEL_USER_IDS", ""),
+            discord_strategies=_split(env.get("DISCORD_STRATEGIES", DEFAULT_DISCORD_STRATEGIES)),
+            telegram_chat_id=env.get("TELEGRAM_CHAT_ID", ""),
+            telegram_target_user_id=env.get("TELEGRAM_TARGET_USER_ID", ""),
+            forward_destinations=env.get("FORWARD_DESTINATIONS", ""),
+        )
+
+    def same_values(self, other: "RuntimeConfig") -> bool:
+        """除版本外的配置值是否相同"""
+        return self[1:] == other[1:]
+
+
+# 订阅回调: (新快照, 旧快照) -> 提交函数。回调只做准备工作（解析、校验、创建新对象），
+# 配置有误时抛出异常，所有回调都准备成功后才依次调用提交函数替换引用；与自己无关的变化返回None
+ConfigPreparer = Callable[[RuntimeConfig, RuntimeConfig], Optional[Callable[[], None]]]
+
+
+class RuntimeConfigManager:
+    """
+    可热加载配置的管理器
+
+    - 重新读取ENV_FILE，与进程自身的环境变量合并（环境变量优先，与启动时load_dotenv的行为一致）得到新快照
+    - 两阶段切换: 先让所有订阅者根据新快照准备好新对象，任何一个失败则整次加载作废，继续使用旧配置；
+      全部成功后在事件循环中依次提交（只是替换引用，中间没有await），之后到达的消息使用新配置
+    - 正在处理的消息继续使用处理开始时取得的旧对象，监听器不需要重新连接
+    """
+
+    def __init__(self, env_file: Optional[str] = ENV_FILE, process_env: Optional[Mapping[str, str]] = None,
+                 initial: Optional[RuntimeConfig] = None):
+        """
+        初始化配置管理器
+
+        Args:
+            env_file: 重新加载时读取的配置文件，为空时只使用环境变量
+            process_env: 优先于配置文件的环境变量，默认为启动时进程自身的环境变量
+            initial: 初始快照，默认根据当前环境变量创建
+        """
+        self.logger = setup_logger("RuntimeConfig")
+        self.env_file = env_file
+        self.process_env = dict(PROCESS_ENV if process_env is None else process_env)
+        self._current = initial or RuntimeConfig.from_env(os.environ)
+        self._subscribers: List[ConfigPreparer] = []
+        self._source_mtime = self._mtime()
+        self.last_reload: Optional[float] = None
+        CONFIG_VERSION.set(self._current.version)
+
+    @property
+    def current(self) -> RuntimeConfig:
+        """当前使用的配置快照"""
+        return self._current
+
+    @property
+    def version(self) -> int:
+        return self._current.version
+
+    def subscribe(self, preparer: ConfigPreparer) -> None:
+        """订阅配置变化，见ConfigPreparer"""
+        self._subscribers.append(preparer)
+
+    def unsubscribe(self, preparer: ConfigPreparer) -> None:
+        if preparer in self._subscribers:
+            self._subscribers.remove(preparer)
+
+    def _mtime(self) -> Optional[float]:
+        if not self.env_file:
+            return None
+        try:
+            return os.path.getmtime(self.env_file)
+        except OSError:
+            return None
+
+    def read_env(self) -> Dict[str, str]:
+        """读取配置文件并与进程环境变量合并"""
+        env: Dict[str, str] = {}
+        if self.env_file and os.path.exists(self.env_file):
+            env.update((key, value) for key, value in dotenv_values(self.env_file).items() if value is not None)
+        env.update(self.process_env)
+        return env
+
+    def reload(self, env: Optional[Mapping[str, str]] = None) -> bool:
+        """
+        重新加载配置
+
+        Args:
+            env: 配置来源，默认重新读取配置文件并与进程环境变量合并
+
+        Returns:
+            bool: 配置是否有变化并已切换到新快照
+
+        Raises:
+            ConfigError: 新配置无效，继续使用旧配置
+        """
+        old = self._current
+        if env is None:
+            self._source_mtime = self._mtime()
+            env = self.read_env()
+        config = RuntimeConfig.from_env(env, version=old.version + 1)
+        if config.same_values(old):
+            return False
+
+        # 第一阶段: 所有订阅者准备新对象，任何一个失败都不提交
+        commits = []
+        try:
+            for preparer in list(self._subscribers):
+                commit = preparer(config, old)
+                if commit is not None:
+                    commits.append(commit)
+        except Exception as e:
+            CONFIG_RELOADS.inc("error")
+            raise ConfigError(f"新配置无效，继续使用版本 {old.version}: {e}") from e
+
+        # 第二阶段: 依次替换引用
+        for commit in commits:
+            commit()
+        self._current = config
+        self._update_environ(env)
+        self.last_reload = time.time()
+        CONFIG_VERSION.set(config.version)
+        CONFIG_RELOADS.inc("ok")
+        changed = [name for name, new, previous in zip(config._fields[1:], config[1:], old[1:]) if new != previous]
+        self.logger.info(f"配置已更新到版本 {config.version}，变化的配置: {', '.join(changed)}")
+        return True
+
+    def _update_environ(self, env: Mapping[str, str]) -> None:
+        """同步os.environ中可热加载的配置，之后启动（或重启）的处理进程继承新的值"""
+        for key in RELOADABLE_SETTINGS:
+            if key in self.process_env:
+                continue
+            if key in env:
+                os.environ[key] = env[key]
+            else:
+                os.environ.pop(key, None)
+
+    def reload_safely(self) -> bool:
+        """重新加载配置，出错时记录日志并继续使用旧配置"""
+        try:
+            return self.reload()
+        except Exception as e:
+            self.logger.error(f"重新加载配置失败: {e}", exc_info=not isinstance(e, ConfigError))
+            return False
+
+    def reload_if_changed(self) -> bool:
+        """配置文件有变化时重新加载"""
+        if self._mtime() == self._source_mtime:
+            return False
+        return self.reload_safely()
+
+    async def watch_file(self, interval: float = 5.0) -> None:
+        """定期检查配置文件，有变化时自动重新加载，直到任务被取消"""
+        while True:
+            await asyncio.sleep(interval)
+            self.reload_if_changed()
+
+
+_manager: Optional[RuntimeConfigManager] = None
+
+
+def get_config_manager() -> RuntimeConfigManager:
+    """获取进程内共享的配置管理器"""
+    global _manager
+    if _manager is None:
+        _manager = RuntimeConfigManager()
+    return _manager
+
+
+def get_runtime_config() -> RuntimeConfig:
+    """当前的可热加载配置快照"""
+    return get_config_manager().current
@@ -1,36 +1,231 @@
 import os
-from dotenv import load_dotenv
+from dotenv import dotenv_values, find_dotenv, load_dotenv
 
-# 加载.env文件中的环境变量
-load_dotenv()
+# 配置文件路径，默认从项目目录向上查找.env，热加载时重新读取这个文件
+ENV_FILE = os.getenv('ENV_FILE') or find_dotenv()
+# 加载.env文件中的环境变量，已经存在的环境变量不会被覆盖
+_ENV_FILE_VALUES = dotenv_values(ENV_FILE) if ENV_FILE else {}
+# 进程自身的环境变量（不来自.env文件），热加载时同样优先于.env文件中的值；
+# 处理进程继承的环境变量与.env文件中的值相同，仍视为来自文件
+PROCESS_ENV = {key: value for key, value in os.environ.items() if _ENV_FILE_VALUES.get(key) != value}
+if ENV_FILE:
+    load_dotenv(ENV_FILE)
 
 # 日志配置
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 LOG_FILE = os.getenv('LOG_FILE', 'scraper-bot.log')
+# 是否输出JSON格式的结构化日志
+LOG_JSON = os.getenv('LOG_JSON') == 'True'
+# 日志队列容量，队列满时丢弃新日志而不是阻塞
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+# 逐条消息日志的采样比例，格式: logger名称=比例,logger名称=比例 (例如 MessageHandler=0.1)
+LOG_SAMPLING = os.getenv('LOG_SAMPLING', '')
+# 逐条消息日志的限速（每秒条数），格式同上 (例如 MessageHandler=50)
+LOG_RATE_LIMIT = os.getenv('LOG_RATE_LIMIT', '')
 
 # Discord配置
 DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
+# 多个账号的token（逗号分隔），配置了多个时由连接池把DISCORD_CHANNEL_IDS分配给各账号，为空时只使用DISCORD_TOKEN
+DISCORD_TOKENS = [token for token in os.getenv('DISCORD_TOKENS', '').split(',') if token.strip()]
+# 多账号时，账号断开超过多少秒后把它负责的频道转给其他账号
+DISCORD_POOL_FAILOVER_AFTER = float(os.getenv('DISCORD_POOL_FAILOVER_AFTER', '30'))
 DISCORD_CHANNEL_IDS = os.getenv('DISCORD_CHANNEL_IDS', '').split(',') if os.getenv('DISCORD_CHANNEL_IDS') else []
 DISCORD_CHANNEL_ID = os.getenv('DISCORD_CHANNEL_ID')
 DISCORD_TARGET_USER_IDS = os.getenv('DISCORD_TARGET_USER_IDS', '').split(',') if os.getenv(
     'DISCORD_TARGET_USER_IDS') else []
+# 监听其下所有频道的服务器ID（逗号分隔）
+DISCORD_GUILD_IDS = os.getenv('DISCORD_GUILD_IDS', '').split(',') if os.getenv('DISCORD_GUILD_IDS') else []
+# 忽略的服务器ID（逗号分隔）
+DISCORD_IGNORED_GUILD_IDS = os.getenv('DISCORD_IGNORED_GUILD_IDS', '').split(',') if os.getenv(
+    'DISCORD_IGNORED_GUILD_IDS') else []
+# 按频道配置的用户白名单，格式: 频道ID:用户ID|用户ID;频道ID:用户ID
+DISCORD_CHANNEL_USER_IDS = os.getenv('DISCORD_CHANNEL_USER_IDS', '')
+# 覆盖Discord的REST和网关地址，用于连接本地替身服务 (tools/fake_discord_gateway.py)，为空时使用官方地址
+DISCORD_API_BASE = os.getenv('DISCORD_API_BASE', '')
+DISCORD_GATEWAY_URL = os.getenv('DISCORD_GATEWAY_URL', '')
+# 断线补拉: 重新连接后按频道游标拉取断线期间的历史消息
+DISCORD_BACKFILL_ENABLED = os.getenv('DISCORD_BACKFILL_ENABLED', 'True') == 'True'
+# 各频道最后收到的消息ID保存位置
+DISCORD_BACKFILL_STATE_FILE = os.getenv('DISCORD_BACKFILL_STATE_FILE', 'data/discord_cursors.json')
+# 每秒最多发出的历史消息请求数
+DISCORD_BACKFILL_RATE = float(os.getenv('DISCORD_BACKFILL_RATE', '5'))
+DISCORD_BACKFILL_CONCURRENCY = int(os.getenv('DISCORD_BACKFILL_CONCURRENCY', '4'))
+# 每个频道单次最多补拉的消息数量
+DISCORD_BACKFILL_MAX_MESSAGES = int(os.getenv('DISCORD_BACKFILL_MAX_MESSAGES', '1000'))
+# Discord消息处理策略，格式: 模块:类名（逗号分隔），启用discord平台时才导入，无法导入的策略跳过。
+# 仓库中没有自带策略，默认不启用
+DEFAULT_DISCORD_STRATEGIES = ''
+DISCORD_STRATEGIES = [item.strip() for item in os.getenv('DISCORD_STRATEGIES', DEFAULT_DISCORD_STRATEGIES).split(',')
+                      if item.strip()]
 
 # Twitter配置 (预留)
 TWITTER_API_KEY = os.getenv('TWITTER_API_KEY')
 TWITTER_API_SECRET = os.getenv('TWITTER_API_SECRET')
 TWITTER_ACCESS_TOKEN = os.getenv('TWITTER_ACCESS_TOKEN')
 TWITTER_ACCESS_SECRET = os.getenv('TWITTER_ACCESS_SECRET')
+# 关注的账号ID，逗号分隔
 TWITTER_TARGET_USER_ID = os.getenv('TWITTER_TARGET_USER_ID')
+# 应用的Bearer Token，未设置时用TWITTER_API_KEY和TWITTER_API_SECRET换取
+TWITTER_BEARER_TOKEN = os.getenv('TWITTER_BEARER_TOKEN')
+TWITTER_API_BASE = os.getenv('TWITTER_API_BASE', 'https://api.twitter.com')
+# 用户推文接口的配额: 每个窗口（秒）内所有账号共享的请求数
+TWITTER_REQUESTS_PER_WINDOW = int(os.getenv('TWITTER_REQUESTS_PER_WINDOW', '1500'))
+TWITTER_RATE_WINDOW = float(os.getenv('TWITTER_RATE_WINDOW', '900'))
+# 单个账号的最短和最长轮询间隔（秒），活跃账号接近最短间隔，安静账号接近最长间隔
+TWITTER_MIN_INTERVAL = float(os.getenv('TWITTER_MIN_INTERVAL', '5'))
+TWITTER_MAX_INTERVAL = float(os.getenv('TWITTER_MAX_INTERVAL', '300'))
+# 同时进行的轮询请求数量
+TWITTER_POLL_CONCURRENCY = int(os.getenv('TWITTER_POLL_CONCURRENCY', '8'))
+# 各账号的since_id和活跃程度，为空时不持久化
+TWITTER_CURSOR_FILE = os.getenv('TWITTER_CURSOR_FILE', 'data/twitter_cursors.json')
 
 # Telegram配置 (预留)
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 TELEGRAM_TARGET_USER_ID = os.getenv('TELEGRAM_TARGET_USER_ID')
+# getUpdates长轮询等待时间（秒）和单次最多返回的更新数量（Bot API上限100）
+TELEGRAM_POLL_TIMEOUT = int(os.getenv('TELEGRAM_POLL_TIMEOUT', '30'))
+TELEGRAM_POLL_LIMIT = int(os.getenv('TELEGRAM_POLL_LIMIT', '100'))
+# 接收的更新类型，逗号分隔
+TELEGRAM_ALLOWED_UPDATES = [item.strip() for item in
+                            os.getenv('TELEGRAM_ALLOWED_UPDATES', 'message,channel_post').split(',') if item.strip()]
+# 已处理的更新偏移量文件，重启后从这里继续，为空时不持久化
+TELEGRAM_OFFSET_FILE = os.getenv('TELEGRAM_OFFSET_FILE', 'data/telegram_offset.json')
 
 # 服务配置
-ENABLED_PLATFORMS = os.getenv('ENABLED_PLATFORMS', 'discord').split(',')
+# 启用的平台（逗号分隔），只导入启用平台的监听器、处理器和策略，内置discord、telegram、twitter，
+# 其他平台由已安装包的scraper_bot.platforms入口点提供
+ENABLED_PLATFORMS = [item.strip() for item in os.getenv('ENABLED_PLATFORMS', 'discord').split(',') if item.strip()]
+
+# 消息分发队列配置
+DISPATCH_QUEUE_SIZE = int(os.getenv('DISPATCH_QUEUE_SIZE', '10000'))
+DISPATCH_WORKERS = int(os.getenv('DISPATCH_WORKERS', '4'))
+# 队列满时的策略: block(阻塞等待)、drop_oldest(丢弃最旧消息)、drop_newest(丢弃新消息)
+DISPATCH_OVERFLOW_POLICY = os.getenv('DISPATCH_OVERFLOW_POLICY', 'block')
+# 停止时等待队列排空的最长时间（秒）
+DISPATCH_DRAIN_TIMEOUT = float(os.getenv('DISPATCH_DRAIN_TIMEOUT', '10'))
+
+# 运行模式: single(单进程)、multiprocess(监听器在主进程接入，消息按频道分片交给多个处理进程)
+PIPELINE_MODE = os.getenv('PIPELINE_MODE', 'single')
+# 处理进程数量，每个进程的发送缓冲容量为DISPATCH_QUEUE_SIZE / PIPELINE_WORKERS
+PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', '2'))
+# 一次写入管道的最大消息数量
+PIPELINE_BATCH_SIZE = int(os.getenv('PIPELINE_BATCH_SIZE', '256'))
+
+# 监听器守护配置: 监听器退出或出错后无限重试，重试间隔按指数退避增长并加入随机抖动
+SUPERVISOR_BACKOFF_BASE = float(os.getenv('SUPERVISOR_BACKOFF_BASE', '1'))
+SUPERVISOR_BACKOFF_MAX = float(os.getenv('SUPERVISOR_BACKOFF_MAX', '300'))
+# 连续运行多少秒后重置退避
+SUPERVISOR_STABLE_AFTER = float(os.getenv('SUPERVISOR_STABLE_AFTER', '60'))
+
+# 共享匹配引擎的规则文件（每行一条规则或JSON），为空时不加载
+PATTERN_FILE = os.getenv('PATTERN_FILE', '')
+# 检查规则文件变化的间隔（秒），文件变化后自动热加载
+PATTERN_RELOAD_INTERVAL = float(os.getenv('PATTERN_RELOAD_INTERVAL', '5'))
+
+# 配置热加载: 收到SIGHUP或ENV_FILE变化后重新读取可热加载的配置（见config/runtime.py），其余配置仍需重启
+# 检查配置文件变化的间隔（秒），为0时只在收到SIGHUP时重新加载
+CONFIG_RELOAD_INTERVAL = float(os.getenv('CONFIG_RELOAD_INTERVAL', '5'))
+
+# 是否使用紧凑消息模型（不持有原始平台消息对象，内存占用更小）
+COMPACT_MESSAGES = os.getenv('COMPACT_MESSAGES') == 'True'
+
+# 消息去重配置
+DEDUP_ENABLED = os.getenv('DEDUP_ENABLED', 'True') == 'True'
+DEDUP_TTL = float(os.getenv('DEDUP_TTL', '600'))
+DEDUP_MAX_ENTRIES = int(os.getenv('DEDUP_MAX_ENTRIES', '100000'))
+# 布隆过滤器每一代的容量，为0时不启用
+DEDUP_BLOOM_CAPACITY = int(os.getenv('DEDUP_BLOOM_CAPACITY', '0'))
+DEDUP_BLOOM_ERROR_RATE = float(os.getenv('DEDUP_BLOOM_ERROR_RATE', '0.001'))
+# 去重状态文件，为空时不持久化
+DEDUP_STATE_FILE = os.getenv('DEDUP_STATE_FILE', '')
+
+# 阻塞型处理器的执行器配置: thread(线程池)、process(进程池)
+HANDLER_EXECUTOR = os.getenv('HANDLER_EXECUTOR', 'thread')
+HANDLER_EXECUTOR_WORKERS = int(os.getenv('HANDLER_EXECUTOR_WORKERS', '4'))
+# 同时处理的消息数量上限，同一频道（没有频道时同一作者）的消息按到达顺序逐条处理，为0时不限制也不保证顺序
+HANDLER_CONCURRENCY = int(os.getenv('HANDLER_CONCURRENCY', '8'))
+# 已接收但尚未处理完的消息数量上限，达到上限后handle_message等待，为0时不限制
+HANDLER_MAX_PENDING = int(os.getenv('HANDLER_MAX_PENDING', '10000'))
+
+# 消息存储配置
+# 存储后端: jsonl(追加写入的分段文件)、sqlite、json(每条消息一个文件，旧版行为)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'jsonl')
+STORAGE_DIR = os.getenv('STORAGE_DIR', 'data')
+STORAGE_BATCH_SIZE = int(os.getenv('STORAGE_BATCH_SIZE', '500'))
+STORAGE_FLUSH_INTERVAL = float(os.getenv('STORAGE_FLUSH_INTERVAL', '1.0'))
+# fsync策略: always(每批写入后)、interval(按间隔)、never(交给操作系统)
+STORAGE_FSYNC = os.getenv('STORAGE_FSYNC', 'interval')
+STORAGE_FSYNC_INTERVAL = float(os.getenv('STORAGE_FSYNC_INTERVAL', '1.0'))
+STORAGE_MAX_PENDING = int(os.getenv('STORAGE_MAX_PENDING', '100000'))
+STORAGE_SEGMENT_MAX_BYTES = int(os.getenv('STORAGE_SEGMENT_MAX_BYTES', str(64 * 1024 * 1024)))
+STORAGE_SEGMENT_MAX_AGE = float(os.getenv('STORAGE_SEGMENT_MAX_AGE', '3600'))
+STORAGE_COMPRESS = os.getenv('STORAGE_COMPRESS') == 'True'
+STORAGE_SQLITE_PATH = os.getenv('STORAGE_SQLITE_PATH')
+
+# 全文检索归档配置
+# 是否把收到的消息同时写入带全文索引的SQLite归档，可用python -m tools.archive_query查询
+ARCHIVE_ENABLED = os.getenv('ARCHIVE_ENABLED') == 'True'
+ARCHIVE_PATH = os.getenv('ARCHIVE_PATH', 'data/archive.db')
+# 全文索引的分词器: unicode61(按空格和标点分词)、trigram(按三字切分，支持中文和子串检索，索引更大)，只在创建归档时生效
+ARCHIVE_TOKENIZER = os.getenv('ARCHIVE_TOKENIZER', 'unicode61')
+
+# 附件下载配置
+# 消息进入处理器时是否预先下载附件，处理器通过get_attachment_fetcher()取得本地文件
+ATTACHMENT_PREFETCH = os.getenv('ATTACHMENT_PREFETCH') == 'True'
+# 按内容SHA-256寻址的附件缓存目录和容量上限（MB），超出时淘汰最久未使用的文件
+ATTACHMENT_CACHE_DIR = os.getenv('ATTACHMENT_CACHE_DIR', 'data/attachments')
+ATTACHMENT_CACHE_MAX_MB = float(os.getenv('ATTACHMENT_CACHE_MAX_MB', '1024'))
+# 单个附件的大小上限（MB），超出时放弃下载
+ATTACHMENT_MAX_MB = float(os.getenv('ATTACHMENT_MAX_MB', '25'))
+# 允许下载的内容类型前缀，逗号分隔，为空时不限制
+ATTACHMENT_ALLOWED_TYPES = [item.strip() for item in
+                            os.getenv('ATTACHMENT_ALLOWED_TYPES', 'image/,video/,application/pdf').split(',')
+                            if item.strip()]
+# 同时下载的附件数量
+ATTACHMENT_CONCURRENCY = int(os.getenv('ATTACHMENT_CONCURRENCY', '4'))
+
+# 指标配置
+# 是否启用本地HTTP指标接口 (GET /metrics，Prometheus文本格式)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED') == 'True'
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+# 指标快照写入日志的间隔（秒），为0时不输出
+METRICS_LOG_INTERVAL = float(os.getenv('METRICS_LOG_INTERVAL', '60'))
 
 # 代理设置
 OPEN_PROXY = os.getenv('OPEN_PROXY') == 'True'
 HTTP_PROXY = os.getenv('HTTP_PROXY')
+
+# 出站HTTP连接池配置（Discord客户端、策略和转发器共用）
+HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', '100'))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '20'))
+# 空闲连接保留时间（秒）
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '30'))
+# DNS缓存时间（秒）
+HTTP_DNS_CACHE_TTL = int(os.getenv('HTTP_DNS_CACHE_TTL', '300'))
+# 超时（秒），0表示不限制
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '10'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+HTTP_TOTAL_TIMEOUT = float(os.getenv('HTTP_TOTAL_TIMEOUT', '60'))
+# 是否校验证书，默认与之前的行为一致（不校验）
+HTTP_VERIFY_SSL = os.getenv('HTTP_VERIFY_SSL') == 'True'
+
+# 通知转发配置
+# 转发目标，逗号分隔的 名称=地址，地址为webhook URL（Discord/Slack等），或 telegram:<chat_id>（使用TELEGRAM_BOT_TOKEN）
+FORWARD_DESTINATIONS = os.getenv('FORWARD_DESTINATIONS', '')
+TELEGRAM_API_BASE = os.getenv('TELEGRAM_API_BASE', 'https://api.telegram.org')
+# 每个目标每秒最多发送的请求数和允许的突发数量
+FORWARD_RATE = float(os.getenv('FORWARD_RATE', '1'))
+FORWARD_BURST = float(os.getenv('FORWARD_BURST', '5'))
+# 合并窗口（秒），窗口内的多条普通通知合并为一次请求发送，为0时不等待
+FORWARD_COALESCE_WINDOW = float(os.getenv('FORWARD_COALESCE_WINDOW', '0.5'))
+# 单次请求最多合并的通知数量
+FORWARD_MAX_BATCH = int(os.getenv('FORWARD_MAX_BATCH', '20'))
+# 每个目标最多排队的通知数量，超出时丢弃最旧的普通通知
+FORWARD_QUEUE_SIZE = int(os.getenv('FORWARD_QUEUE_SIZE', '1000'))
+# 网络错误或服务端错误时的最大重试次数
+FORWARD_MAX_RETRIES = int(os.getenv('FORWARD_MAX_RETRIES', '3'))
+# 停止时等待队列发送完毕的最长时间（秒）
+FORWARD_DRAIN_TIMEOUT = float(os.getenv('FORWARD_DRAIN_TIMEOUT', '10'))
@@ -1,8 +1,13 @@
+import asyncio
+import time
 from abc import ABC, abstractmethod
-from typing import Callable, Any, Optional
+from typing import Callable, Any, Optional, Union, Awaitable
 
+from core.dedup import DedupCache
 from models.message import Message
 from utils.logger import setup_logger
+from utils.metrics import (MESSAGES_SEEN, MESSAGES_FILTERED, MESSAGES_DUPLICATE, MESSAGES_DISPATCHED,
+                           PROCESS_MESSAGE_SECONDS)
 
 
 class BaseListener(ABC):
@@ -20,21 +25,35 @@ class BaseListener(ABC):
         self.platform_name = platform_name
         self.logger = setup_logger(f"{self.__class__.__name__}")
         self.message_callback = None
+        self.dedup_cache: Optional[DedupCache] = None
         self.running = False
     
-    def register_callback(self, callback: Callable[[Message], None]) -> None:
+    def register_callback(self, callback: Callable[[Message], Union[None, Awaitable[Any]]]) -> None:
         """
         注册消息处理回调函数
         
         Args:
-            callback: 处理接收到消息的回调函数
+            callback: 处理接收到消息的回调函数，可以是普通函数或协程函数
         """
         self.message_callback = callback
         self.logger.info(f"已注册消息处理回调函数")
     
+    def set_dedup_cache(self, dedup_cache: DedupCache) -> None:
+        """
+        设置去重缓存，重复投递的消息不会再交给回调函数
+        
+        Args:
+            dedup_cache: 去重缓存，可以在多个监听器之间共享
+        """
+        self.dedup_cache = dedup_cache
+    
     @abstractmethod
     async def start(self) -> None:
-        """启动监听器"""
+        """
+        启动监听器，应当一直运行到连接终止或stop()被调用为止
+        
+        连接无法恢复时抛出异常或直接返回，由ListenerSupervisor按退避策略再次调用start()
+        """
         pass
     
     @abstractmethod
@@ -55,17 +74,54 @@ class BaseListener(ABC):
         """
         pass
     
-    def _handle_message(self, message: Message) -> None:
+    async def _ingest(self, raw_message: Any) -> None:
+        """
+        接收一条平台原始消息：转换为统一模型后交给_handle_message，并记录接收、过滤和转换耗时指标
+        
+        Args:
+            raw_message: 平台特定的原始消息对象
+        """
+        platform = self.platform_name
+        MESSAGES_SEEN.inc(platform)
+        start = time.perf_counter()
+        message = await self.process_message(raw_message)
+        PROCESS_MESSAGE_SECONDS.observe(time.perf_counter() - start, platform)
+        if message is None:
+            MESSAGES_FILTERED.inc(platform)
+            return
+        await self._handle_message(message)
+    
+    async def _handle_message(self, message: Message) -> None:
         """
         内部消息处理方法，调用注册的回调函数
         
+        回调通常是分发队列的入队方法，这里只负责把消息交出去，不在监听器的事件循环中执行处理逻辑
+        
         Args:
             message: 统一的消息模型
         """
+        # 重连、编辑或轮询导致的重复消息在这里丢弃。入队前先记录，入队等待期间到达的重复消息同样会被丢弃，
+        # 没有进入分发队列的消息再撤销记录
+        if self.dedup_cache is not None and self.dedup_cache.seen(message.platform, message.id):
+            MESSAGES_DUPLICATE.inc(message.platform)
+            return
+        
         if self.message_callback:
+            accepted = False
             try:
-                self.message_callback(message)
+                result = self.message_callback(message)
+                if asyncio.iscoroutine(result):
+                    result = await result
+                accepted = result is not False
+                if accepted:
+                    # 只统计进入分发队列的消息，被拒绝、出错或取消的不计入
+                    MESSAGES_DISPATCHED.inc(message.platform, message.metadata.get("channel_id") or "")
             except Exception as e:
-                self.logger.error(f"处理消息时发生错误: {e}", exc_info=True)
+                self.logger.error("处理消息时发生错误: %s", e, exc_info=True)
+            finally:
+                # 回调返回False（例如分发队列已满丢弃了这条消息）或出错时撤销去重记录，重新投递时可以再次处理；
+                # 被取消时同样没有入队
+                if not accepted and self.dedup_cache is not None:
+                    self.dedup_cache.forget(message.platform, message.id)
         else:
             self.logger.warning("未注册消息处理回调函数，消息将被忽略") 
\ No newline at end of file
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from utils.logger import setup_logger
+
+
+class BloomFilter:
+    """
+    固定内存的布隆过滤器，用于在很长的时间窗口内判断消息是否出现过
+
+    存在误判（把没见过的消息当成见过），但不会漏判
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        """
+        初始化布隆过滤器
+
+        Args:
+            capacity: 预计容纳的元素数量
+            error_rate: 达到容量时的期望误判率
+        """
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / self.capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # 双重哈希：用一次blake2b的结果生成k个位置
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class DedupCache:
+    """
+    消息去重缓存，键为 (平台, 消息ID)
+
+    使用按过期时间排序的OrderedDict实现LRU+TTL，查找和插入都是O(1)，条目数量有硬上限。
+    可选的布隆过滤器（新旧两代轮换）用于覆盖比LRU更长的时间窗口。
+    缓存独立于存储后端，存储重启不影响去重；可选地在停止时保存状态并在启动时恢复。
+    """
+
+    def __init__(self, ttl: float = 600, max_entries: int = 100000, bloom_capacity: int = 0,
+                 bloom_error_rate: float = 0.001, state_file: Optional[str] = None):
+        """
+        初始化去重缓存
+
+        Args:
+            ttl: 条目在LRU中的存活时间（秒）
+            max_entries: LRU中的最大条目数量
+            bloom_capacity: 每一代布隆过滤器的容量，为0时不启用布隆过滤器
+            bloom_error_rate: 布隆过滤器的期望误判率
+            state_file: 保存和恢复LRU状态的文件路径，为None时不持久化
+        """
+        self.logger = setup_logger("DedupCache")
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.state_file = state_file
+
+        self._entries: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._bloom_capacity = bloom_capacity
+        self._bloom_error_rate = bloom_error_rate
+        self._bloom: Optional[BloomFilter] = BloomFilter(bloom_capacity, bloom_error_rate) if bloom_capacity else None
+        self._previous_bloom: Optional[BloomFilter] = None
+        # 被forget撤销、但布隆过滤器中无法删除的键
+        self._forgotten: "OrderedDict[Hashable, None]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def seen(self, platform: str, message_id: str) -> bool:
+        """
+        检查消息是否已经出现过，没出现过则记录下来
+
+        Args:
+            platform: 平台名称
+            message_id: 消息ID
+
+        Returns:
+            bool: 消息是否重复
+        """
+        key = (platform, message_id)
+        now = time.monotonic()
+        self._expire(now)
+
+        if key in self._entries:
+            # 刷新过期时间并移到队尾，保持OrderedDict按过期时间有序
+            self._entries[key] = now + self.ttl
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+
+        bloom_key = None
+        if self._bloom is not None:
+            bloom_key = f"{platform}:{message_id}"
+            in_bloom = bloom_key in self._bloom or (
+                self._previous_bloom is not None and bloom_key in self._previous_bloom)
+            if in_bloom and key not in self._forgotten:
+                self.hits += 1
+                return True
+            self._forgotten.pop(key, None)
+
+        self._insert(key, now)
+        if bloom_key is not None:
+            self._add_to_bloom(bloom_key)
+        self.misses += 1
+        return False
+
+    def forget(self, platform: str, message_id: str) -> None:
+        """
+        撤销seen记录下的消息，用于消息没有被处理（例如分发队列已满被丢弃）的情况，
+        之后重新投递的同一条消息不会被当作重复
+
+        Args:
+            platform: 平台名称
+            message_id: 消息ID
+        """
+        key = (platform, message_id)
+        self._entries.pop(key, None)
+        if self._bloom is not None:
+            # 布隆过滤器无法删除，记录下来在检查时跳过
+            self._forgotten[key] = None
+            while len(self._forgotten) > self.max_entries:
+                self._forgotten.popitem(last=False)
+
+    def _insert(self, key: Hashable, now: float) -> None:
+        self._entries[key] = now + self.ttl
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _expire(self, now: float) -> None:
+        """从队首移除已过期的条目"""
+        entries = self._entries
+        while entries:
+            key, expires_at = next(iter(entries.items()))
+            if expires_at > now:
+                break
+            del entries[key]
+
+    def _add_to_bloom(self, key: str) -> None:
+        if self._bloom.count >= self._bloom.capacity:
+            # 当前一代已满，轮换为上一代，误判率保持在设定范围内
+            self._previous_bloom = self._bloom
+            self._bloom = BloomFilter(self._bloom_capacity, self._bloom_error_rate)
+        self._bloom.add(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中、未命中等统计信息"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def load(self) -> None:
+        """从状态文件恢复未过期的条目"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"读取去重状态文件失败: {e}")
+            return
+
+        # 文件中保存的是墙上时间，转换回单调时钟
+        offset = time.monotonic() - time.time()
+        now = time.monotonic()
+        for platform, message_id, expires_at in state.get("entries", []):
+            expires_at += offset
+            if expires_at > now:
+                self._entries[(platform, message_id)] = expires_at
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self.logger.info(f"已恢复 {len(self._entries)} 条去重记录")
+
+    def save(self) -> None:
+        """将未过期的条目保存到状态文件"""
+        if not self.state_file:
+            return
+        self._expire(time.monotonic())
+        offset = time.time() - time.monotonic()
+        state = {"entries": [[key[0], key[1], expires_at + offset] for key, expires_at in self._entries.items()]}
+
+        directory = os.path.dirname(self.state_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_file = f"{self.state_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_file, self.state_file)
+        self.logger.info(f"已保存 {len(self._entries)} 条去重记录")
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+
+import discord
+
+from utils.logger import setup_logger
+from utils.metrics import REGISTRY
+from utils.rate_limiter import TokenBucket
+
+BACKFILL_MESSAGES = REGISTRY.counter("scraper_backfill_messages_total", "补拉到的历史消息数量", ["platform"])
+BACKFILL_REQUESTS = REGISTRY.counter("scraper_backfill_requests_total", "补拉历史消息发出的请求数量", ["platform"])
+
+# Discord单次历史消息接口最多返回的数量
+PAGE_SIZE = 100
+# 游标定期写入文件的间隔（秒），进程异常退出时最多丢失这段时间的游标
+SAVE_INTERVAL = 30.0
+
+
+class ChannelCursorStore:
+    """
+    记录每个频道最后收到的消息ID，保存到JSON文件，重启后据此补拉断线期间的消息
+
+    Discord消息ID是雪花ID，数值越大消息越新，只保留最大值
+    """
+
+    def __init__(self, state_file: Optional[str] = None):
+        self.state_file = state_file
+        self.logger = setup_logger("ChannelCursorStore")
+        self._cursors: Dict[int, int] = {}
+        self._dirty = False
+
+    def get(self, channel_id: int) -> Optional[int]:
+        return self._cursors.get(channel_id)
+
+    def channels(self) -> Iterable[int]:
+        return list(self._cursors)
+
+    def update(self, channel_id: int, message_id: int) -> None:
+        if message_id > self._cursors.get(channel_id, 0):
+            self._cursors[channel_id] = message_id
+            self._dirty = True
+
+    def load(self) -> None:
+        """从状态文件恢复游标"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"读取频道游标文件失败: {e}")
+            return
+        for channel_id, message_id in state.get("channels", {}).items():
+            self.update(int(channel_id), int(message_id))
+        self._dirty = False
+        self.logger.info(f"已恢复 {len(self._cursors)} 个频道的游标")
+
+    def save(self) -> None:
+        """游标有变化时写入状态文件"""
+        if not self.state_file or not self._dirty:
+            return
+        state = {"channels": {str(channel_id): str(message_id) for channel_id, message_id in self._cursors.items()}}
+
+        directory = os.path.dirname(self.state_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_file = f"{self.state_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_file, self.state_file)
+        self._dirty = False
+
+
+class DiscordBackfill:
+    """
+    断线补拉：重新连接后按频道游标分页拉取历史消息，交给正常的处理链路（包括去重）
+
+    - 多个频道并发拉取，总请求速率受令牌桶限制，避免触发Discord的限流
+    - 每个频道从游标之后按时间正序拉取，每页最多100条，单次补拉设有上限
+    - 没有游标的频道（从未收到过消息）不补拉
+    """
+
+    def __init__(self, client_getter: Callable[[], discord.Client], ingest: Callable[[Any], Awaitable[None]],
+                 cursors: ChannelCursorStore, rate: float = 5.0, concurrency: int = 4,
+                 max_messages: int = 1000):
+        """
+        初始化补拉组件
+
+        Args:
+            client_getter: 返回当前Discord客户端的函数（客户端重启后会被替换）
+            ingest: 处理原始消息的协程函数，通常是DiscordListener._ingest
+            cursors: 频道游标
+            rate: 每秒最多发出的历史消息请求数
+            concurrency: 同时补拉的频道数量
+            max_messages: 每个频道单次最多补拉的消息数量
+        """
+        self.client_getter = client_getter
+        self.ingest = ingest
+        self.cursors = cursors
+        self.limiter = TokenBucket(rate)
+        self.concurrency = max(1, concurrency)
+        self.max_messages = max_messages
+        self.logger = setup_logger("DiscordBackfill")
+        self._task: Optional[asyncio.Task] = None
+        # 已安排补拉但尚未完成的频道
+        self._pending: Set[int] = set()
+        self._last_save = time.monotonic()
+
+    def record(self, raw_message: Any) -> None:
+        """记录收到的消息，更新所在频道的游标"""
+        self.cursors.update(raw_message.channel.id, raw_message.id)
+        now = time.monotonic()
+        if now - self._last_save >= SAVE_INTERVAL:
+            self._last_save = now
+            self.cursors.save()
+
+    def schedule(self, channel_ids: Iterable[int]) -> None:
+        """在后台补拉指定频道，已在补拉中的频道会被跳过，其余频道排在正在进行的补拉之后"""
+        # 立即记录游标快照，之后收到的实时消息会推进游标，但不能影响这次补拉的起点
+        snapshot = {c: after for c, after in self._snapshot(channel_ids).items() if c not in self._pending}
+        if not snapshot:
+            return
+        self._pending.update(snapshot)
+        self._task = asyncio.create_task(self._run_after(self._task, snapshot), name="discord-backfill")
+
+    async def cancel(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def _snapshot(self, channel_ids: Iterable[int]) -> Dict[int, int]:
+        channel_ids = list(channel_ids) or self.cursors.channels()
+        return {c: self.cursors.get(c) for c in channel_ids if self.cursors.get(c)}
+
+    async def run(self, channel_ids: Iterable[int]) -> int:
+        """
+        补拉指定频道，返回补拉到的消息数量
+
+        Args:
+            channel_ids: 需要补拉的频道，为空时补拉所有有游标的频道
+        """
+        return await self._run(self._snapshot(channel_ids))
+
+    async def _run_after(self, previous: Optional[asyncio.Task], snapshot: Dict[int, int]) -> int:
+        try:
+            if previous is not None and not previous.done():
+                # 取消当前任务时会一并取消正在等待的上一次补拉
+                await asyncio.gather(previous, return_exceptions=True)
+            return await self._run(snapshot)
+        finally:
+            self._pending.difference_update(snapshot)
+
+    async def _run(self, snapshot: Dict[int, int]) -> int:
+        targets = list(snapshot)
+        if not targets:
+            return 0
+
+        start = time.monotonic()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def limited(channel_id: int) -> int:
+            async with semaphore:
+                return await self._backfill_channel(channel_id, snapshot[channel_id])
+
+        results = await asyncio.gather(*(limited(c) for c in targets), return_exceptions=True)
+        total = 0
+        for channel_id, result in zip(targets, results):
+            if isinstance(result, Exception):
+                self.logger.warning(f"补拉频道 {channel_id} 失败: {result}")
+            else:
+                total += result
+        self.cursors.save()
+        self.logger.info(f"补拉完成: {len(targets)} 个频道，{total} 条消息，耗时 {time.monotonic() - start:.1f}s")
+        return total
+
+    async def _backfill_channel(self, channel_id: int, after: int) -> int:
+        channel = self.client_getter().get_partial_messageable(channel_id)
+        count = 0
+        while count < self.max_messages:
+            limit = min(PAGE_SIZE, self.max_messages - count)
+            await self.limiter.acquire()
+            BACKFILL_REQUESTS.inc("discord")
+            page = [message async for message in channel.history(limit=limit, after=discord.Object(id=after),
+                                                                 oldest_first=True)]
+            for message in page:
+                # 与实时消息走同一条链路，重复的消息由去重缓存丢弃
+                await self.ingest(message)
+                self.record(message)
+            count += len(page)
+            BACKFILL_MESSAGES.inc("discord", amount=len(page))
+            if len(page) < limit:
+                break
+            after = page[-1].id
+        if count >= self.max_messages:
+            self.logger.warning(f"频道 {channel_id} 补拉达到上限 {self.max_messages} 条，仍有消息未补齐")
+        return count
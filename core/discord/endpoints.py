@@ -0,0 +1,49 @@
+from base64 import b64encode
+from typing import Any, Dict, Optional, Tuple
+
+import discord.gateway
+import discord.http
+import discord.utils
+import yarl
+
+# 使用本地替身服务时提交的客户端属性，避免启动时访问外部接口获取浏览器版本和构建号
+_LOCAL_SUPER_PROPERTIES: Dict[str, Any] = {
+    'os': 'Windows',
+    'browser': 'Chrome',
+    'device': '',
+    'browser_user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                          'Chrome/120.0.0.0 Safari/537.36',
+    'browser_version': '120.0.0.0',
+    'os_version': '10',
+    'referrer': '',
+    'referring_domain': '',
+    'referrer_current': '',
+    'referring_domain_current': '',
+    'release_channel': 'stable',
+    'system_locale': 'en-US',
+    'client_build_number': 9999,
+    'client_event_source': None,
+    'design_id': 0,
+}
+
+
+async def _get_local_info(session: Any) -> Tuple[Dict[str, Any], str]:
+    encoded = b64encode(discord.utils._to_json(_LOCAL_SUPER_PROPERTIES).encode()).decode('utf-8')
+    return dict(_LOCAL_SUPER_PROPERTIES), encoded
+
+
+def apply_endpoint_overrides(api_base: Optional[str] = None, gateway_url: Optional[str] = None) -> None:
+    """
+    把discord.py-self的REST和网关地址指向其他服务（例如tools/fake_discord_gateway.py）
+
+    discord.py-self的地址是类属性，修改后对进程内所有客户端生效
+
+    Args:
+        api_base: REST接口前缀，例如 http://127.0.0.1:8765/api/v9
+        gateway_url: 网关地址，例如 ws://127.0.0.1:8765/gateway
+    """
+    if api_base:
+        discord.http.Route.BASE = api_base.rstrip('/')
+        discord.utils._get_info = _get_local_info
+    if gateway_url:
+        discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(gateway_url)
@@ -0,0 +1,165 @@
+from typing import Any, Dict, FrozenSet, Iterable, Optional
+
+from config.runtime import RuntimeConfig, get_runtime_config
+from utils.exceptions import ConfigError
+
+
+def parse_ids(values: Iterable[str], name: str) -> FrozenSet[int]:
+    """
+    将字符串ID列表解析为整数集合
+
+    Args:
+        values: 字符串形式的ID列表
+        name: 配置项名称，用于错误提示
+
+    Returns:
+        FrozenSet[int]: 整数ID集合
+    """
+    ids = set()
+    for value in values:
+        value = value.strip()
+        if not value:
+            continue
+        try:
+            ids.add(int(value))
+        except ValueError:
+            raise ConfigError(f"{name} 中包含无效的ID: {value}") from None
+    return frozenset(ids)
+
+
+def parse_channel_user_ids(value: str) -> Dict[int, FrozenSet[int]]:
+    """
+    解析按频道配置的用户白名单
+
+    格式: 频道ID:用户ID|用户ID;频道ID:用户ID
+
+    Args:
+        value: 配置字符串
+
+    Returns:
+        Dict[int, FrozenSet[int]]: 频道ID到用户ID集合的映射
+    """
+    rules: Dict[int, FrozenSet[int]] = {}
+    for item in value.split(';'):
+        item = item.strip()
+        if not item:
+            continue
+        channel, sep, users = item.partition(':')
+        if not sep:
+            raise ConfigError(f"DISCORD_CHANNEL_USER_IDS 格式错误: {item}，应为 频道ID:用户ID|用户ID")
+        channel_ids = parse_ids([channel], "DISCORD_CHANNEL_USER_IDS")
+        for channel_id in channel_ids:
+            rules[channel_id] = parse_ids(users.split('|'), "DISCORD_CHANNEL_USER_IDS")
+    return rules
+
+
+class DiscordMessageFilter:
+    """
+    预编译的Discord消息过滤器
+
+    所有ID在创建时转换为整数并放入frozenset，过滤时直接使用原始消息上的整数ID做O(1)查找，
+    在构建Message对象和附件列表之前就丢弃不需要的消息。
+
+    过滤规则:
+    - 忽略机器人消息和被忽略服务器中的消息
+    - 配置了频道或服务器时，只接收这些频道或这些服务器下任意频道的消息
+    - 频道配置了用户白名单时，该频道只接收白名单用户的消息，否则使用全局用户白名单
+    """
+
+    __slots__ = ("channel_ids", "user_ids", "guild_ids", "ignored_guild_ids", "channel_user_ids",
+                 "_restrict_channels")
+
+    def __init__(self, channel_ids: Iterable[int] = (), user_ids: Iterable[int] = (), guild_ids: Iterable[int] = (),
+                 ignored_guild_ids: Iterable[int] = (), channel_user_ids: Optional[Dict[int, Iterable[int]]] = None):
+        """
+        初始化过滤器
+
+        Args:
+            channel_ids: 监听的频道ID
+            user_ids: 全局用户白名单
+            guild_ids: 监听其下所有频道的服务器ID
+            ignored_guild_ids: 忽略的服务器ID
+            channel_user_ids: 按频道配置的用户白名单
+        """
+        self.channel_ids: FrozenSet[int] = frozenset(channel_ids)
+        self.user_ids: FrozenSet[int] = frozenset(user_ids)
+        self.guild_ids: FrozenSet[int] = frozenset(guild_ids)
+        self.ignored_guild_ids: FrozenSet[int] = frozenset(ignored_guild_ids)
+        self.channel_user_ids: Dict[int, FrozenSet[int]] = {
+            channel_id: frozenset(users) for channel_id, users in (channel_user_ids or {}).items()
+        }
+        self._restrict_channels = bool(self.channel_ids or self.guild_ids)
+
+    @classmethod
+    def from_settings(cls, config: Optional[RuntimeConfig] = None) -> "DiscordMessageFilter":
+        """
+        根据配置创建过滤器
+
+        Args:
+            config: 可热加载配置的快照，默认使用当前快照
+
+        Raises:
+            ConfigError: 配置中包含无效的ID
+        """
+        config = config or get_runtime_config()
+        return cls(
+            channel_ids=parse_ids(config.discord_channel_ids, "DISCORD_CHANNEL_IDS"),
+            user_ids=parse_ids(config.discord_target_user_ids, "DISCORD_TARGET_USER_IDS"),
+            guild_ids=parse_ids(config.discord_guild_ids, "DISCORD_GUILD_IDS"),
+            ignored_guild_ids=parse_ids(config.discord_ignored_guild_ids, "DISCORD_IGNORED_GUILD_IDS"),
+            channel_user_ids=parse_channel_user_ids(config.discord_channel_user_ids),
+        )
+
+    @staticmethod
+    def rules_changed(config: RuntimeConfig, old: RuntimeConfig) -> bool:
+        """两份配置快照中的Discord过滤规则是否不同"""
+        return (config.discord_channel_ids, config.discord_target_user_ids, config.discord_guild_ids,
+                config.discord_ignored_guild_ids, config.discord_channel_user_ids) != \
+            (old.discord_channel_ids, old.discord_target_user_ids, old.discord_guild_ids,
+             old.discord_ignored_guild_ids, old.discord_channel_user_ids)
+
+    def with_channels(self, channel_ids: Iterable[int]) -> "DiscordMessageFilter":
+        """
+        返回只监听指定频道的副本，其他规则不变，用于在多个账号之间分配频道
+
+        原过滤器限制了频道时，分配到空集合的副本不接收任何频道的消息（按服务器监听的规则仍然生效）
+        """
+        message_filter = DiscordMessageFilter(channel_ids, self.user_ids, self.guild_ids, self.ignored_guild_ids,
+                                              self.channel_user_ids)
+        message_filter._restrict_channels = self._restrict_channels
+        return message_filter
+
+    @property
+    def target_channel_ids(self) -> FrozenSet[int]:
+        """明确配置的监听频道，只按服务器监听时为空"""
+        return self.channel_ids
+
+    def accepts(self, raw_message: Any) -> bool:
+        """
+        判断原始Discord消息是否需要处理
+
+        Args:
+            raw_message: discord.py的消息对象
+
+        Returns:
+            bool: 是否需要处理此消息
+        """
+        author = raw_message.author
+        # 忽略机器人消息
+        if author.bot:
+            return False
+
+        guild = getattr(raw_message, "guild", None)
+        guild_id = guild.id if guild is not None else None
+        if guild_id in self.ignored_guild_ids:
+            return False
+
+        channel_id = raw_message.channel.id
+        if self._restrict_channels and channel_id not in self.channel_ids and guild_id not in self.guild_ids:
+            return False
+
+        channel_users = self.channel_user_ids.get(channel_id)
+        if channel_users is not None:
+            return author.id in channel_users
+
+        return not self.user_ids or author.id in self.user_ids
@@ -1,15 +1,28 @@
 import discord
 from datetime import datetime
-from typing import Optional, Any
-import asyncio
-import aiohttp
-import ssl
+from functools import partial
+from typing import Optional, Any, Union, Iterable, Callable
 
-from config.settings import DISCORD_TOKEN, DISCORD_CHANNEL_ID, DISCORD_TARGET_USER_IDS, HTTP_PROXY, DISCORD_CHANNEL_IDS, \
-    OPEN_PROXY
+from config.settings import DISCORD_TOKEN, COMPACT_MESSAGES, DISCORD_API_BASE, \
+    DISCORD_GATEWAY_URL, DISCORD_BACKFILL_ENABLED, DISCORD_BACKFILL_STATE_FILE, DISCORD_BACKFILL_RATE, \
+    DISCORD_BACKFILL_CONCURRENCY, DISCORD_BACKFILL_MAX_MESSAGES
+from config.runtime import RuntimeConfig, get_config_manager
 from core.base_listener import BaseListener
-from models.message import Message
+from core.discord.backfill import ChannelCursorStore, DiscordBackfill
+from core.discord.endpoints import apply_endpoint_overrides
+from core.discord.filters import DiscordMessageFilter
+from models.message import Message, CompactMessage
 from utils.exceptions import DiscordListenerError
+from utils.http_client import get_http_client
+from utils.logger import setup_logger
+
+
+def clean_token(token: str) -> str:
+    """去除token两端可能存在的空格和引号"""
+    token = token.strip()
+    if token.startswith('"') and token.endswith('"'):
+        token = token[1:-1]
+    return token
 
 
 class DiscordListener(BaseListener):
@@ -17,99 +30,185 @@ class DiscordListener(BaseListener):
     Discord平台的消息监听器
     """
 
-    def __init__(self):
+    def __init__(self, token: Optional[str] = None, name: Optional[str] = None,
+                 message_filter: Optional[DiscordMessageFilter] = None, cursors: Optional[ChannelCursorStore] = None):
+        """
+        初始化Discord监听器
+
+        Args:
+            token: 账号token，默认使用DISCORD_TOKEN
+            name: 账号名称，多账号时用于区分日志
+            message_filter: 消息过滤器，默认根据配置创建，并在配置热加载后自动替换
+            cursors: 频道游标，多账号时共享同一份，默认根据配置创建
+        """
         super().__init__(platform_name="discord")
+        self.name = name or "discord"
+        if name:
+            self.logger = setup_logger(f"DiscordListener[{name}]")
 
         # 检查配置
-        if not DISCORD_TOKEN:
+        self.token = clean_token(token or DISCORD_TOKEN or "")
+        if not self.token:
             raise DiscordListenerError("Discord token未配置")
 
-        # 创建Discord客户端 (用户端)
-        # 用户端不需要intents设置，简化初始化
-
-        # 创建SSL上下文但禁用证书验证
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-
-        if OPEN_PROXY:
-            # 设置代理
-            proxy = HTTP_PROXY
-            # 初始化用户客户端
-            self.client = discord.Client(
-                proxy=proxy,
-                http_timeout=60.0
-            )
-        else:
-            self.client = discord.Client(
-                http_timeout=60.0
+        # 配置了本地替身服务时改写REST和网关地址
+        if DISCORD_API_BASE or DISCORD_GATEWAY_URL:
+            apply_endpoint_overrides(DISCORD_API_BASE, DISCORD_GATEWAY_URL)
+            self.logger.info(f"使用自定义Discord地址: {DISCORD_API_BASE or '-'} {DISCORD_GATEWAY_URL or '-'}")
+
+        # 预编译的频道、用户、服务器过滤规则，由调用方（连接池）提供时由调用方负责更新
+        if message_filter is None:
+            message_filter = DiscordMessageFilter.from_settings()
+            get_config_manager().subscribe(self._prepare_filter)
+        self.message_filter = message_filter
+        # 是否由连接池分配频道，分配到的频道为空时不补拉
+        self.sharded = False
+
+        # 断线补拉，记录各频道最后收到的消息ID
+        self.backfill: Optional[DiscordBackfill] = None
+        if DISCORD_BACKFILL_ENABLED:
+            if cursors is None:
+                cursors = ChannelCursorStore(DISCORD_BACKFILL_STATE_FILE or None)
+                cursors.load()
+            self.backfill = DiscordBackfill(
+                lambda: self.client,
+                self._ingest,
+                cursors,
+                rate=DISCORD_BACKFILL_RATE,
+                concurrency=DISCORD_BACKFILL_CONCURRENCY,
+                max_messages=DISCORD_BACKFILL_MAX_MESSAGES,
             )
 
-        # 设置SSL上下文
-        if hasattr(self.client, 'http') and hasattr(self.client.http, 'connector'):
-            self.client.http.connector = aiohttp.TCPConnector(ssl=ssl_context)
+        self.client = self._create_client()
 
-        # 支持多频道监听
-        self.target_channel_ids = DISCORD_CHANNEL_IDS
-        # 向后兼容：如果设置了单一频道ID且多频道列表为空，添加到列表中
-        if DISCORD_CHANNEL_ID and not self.target_channel_ids:
-            self.target_channel_ids.append(DISCORD_CHANNEL_ID)
+    def _create_client(self) -> discord.Client:
+        """创建Discord客户端并注册事件处理器，关闭后的客户端不能再次连接，重启时需要重新创建"""
+        # 创建Discord客户端 (用户端)
+        # 用户端不需要intents设置，简化初始化
 
-        self.target_user_ids = DISCORD_TARGET_USER_IDS
+        http_client = get_http_client()
+        client = discord.Client(
+            proxy=http_client.default_proxy(),
+            http_timeout=60.0,
+            # 统计Discord REST请求的连接复用情况
+            http_trace=http_client.trace_config("discord"),
+        )
+
+        # 客户端关闭时会一并关闭其连接池，所以不与共享会话共用同一个连接池，
+        # 但使用相同的连接数、keepalive、DNS缓存和证书校验配置
+        client.http.connector = http_client.create_connector()
 
         # 设置事件处理器
-        @self.client.event
+        @client.event
         async def on_ready():
-            self.logger.info(f"已登录为 {self.client.user}")
+            self.logger.info(f"已登录为 {client.user}")
+            self.running = True
+            # 重新IDENTIFY后网关不会补发断线期间的消息，从频道历史中补拉；RESUME由网关补发，不需要补拉
+            channel_ids = self.message_filter.target_channel_ids
+            if self.backfill is not None and (channel_ids or not self.sharded):
+                self.backfill.schedule(channel_ids)
+
+        @client.event
+        async def on_disconnect():
+            if self.running:
+                self.logger.warning("与Discord网关的连接已断开，等待客户端重连")
+            self.running = False
+
+        @client.event
+        async def on_resumed():
+            self.logger.info("已恢复Discord网关会话")
             self.running = True
 
-        @self.client.event
+        @client.event
         async def on_message(message):
             try:
                 # 处理消息
-                processed_message = await self.process_message(message)
-                if processed_message:
-                    self._handle_message(processed_message)
+                await self._ingest(message)
             except Exception as e:
-                self.logger.error(f"处理Discord消息时发生错误: {e}", exc_info=True)
+                self.logger.error("处理Discord消息时发生错误: %s", e, exc_info=True)
+
+        return client
 
     async def start(self) -> None:
-        """启动Discord监听器"""
-        max_retries = 3
-        retry_delay = 5  # 秒
+        """
+        启动Discord监听器，一直运行到连接终止
 
-        for attempt in range(max_retries):
-            try:
-                self.logger.info("正在启动Discord监听器...")
-                # 确保每次尝试使用正确格式的令牌
-                token = DISCORD_TOKEN.strip()  # 去除可能的空格
-                if token.startswith('"') and token.endswith('"'):
-                    token = token[1:-1]  # 去除可能的引号
-
-                await self.client.start(token)
-                break  # 如果成功连接，跳出循环
-            except Exception as e:
-                if attempt < max_retries - 1:  # 如果不是最后一次尝试
-                    self.logger.warning(f"连接Discord失败，{retry_delay}秒后重试 ({attempt + 1}/{max_retries}): {e}")
-                    await asyncio.sleep(retry_delay)
-                    retry_delay *= 2  # 增加重试延迟
-                else:
-                    raise DiscordListenerError(f"启动Discord监听器失败: {e}") from e
+        网络断开等临时错误由客户端内部重连，能恢复会话时发送RESUME而不是重新IDENTIFY，避免重放积压的消息；
+        客户端放弃重连或登录失败时抛出异常，由监听器守护按退避策略重新启动
+        """
+        if self.client.is_closed():
+            self.client = self._create_client()
+
+        self.logger.info("正在启动Discord监听器...")
+        try:
+            await self.client.login(self.token)
+            await self.client.connect(reconnect=True)
+        except discord.LoginFailure as e:
+            raise DiscordListenerError(f"Discord登录失败，请检查token: {e}") from e
+        except Exception as e:
+            raise DiscordListenerError(f"Discord连接已终止: {e}") from e
+        finally:
+            self.running = False
+
+    def assign_channels(self, channel_ids: Iterable[int]) -> None:
+        """
+        更换监听的频道，多账号时由连接池分配
 
-    async def stop(self) -> None:
-        """停止Discord监听器"""
-        if self.running:
-            self.logger.info("正在停止Discord监听器...")
+        已连接时立即从游标补拉新分配的频道，补上原负责账号断开期间的消息；未连接时在连接成功后补拉
 
-            try:
-                # 关闭Discord客户端
-                await self.client.close()
-                self.running = False
-                self.logger.info("Discord监听器已停止")
-            except Exception as e:
-                self.logger.error(f"停止Discord监听器时出错: {e}", exc_info=True)
+        Args:
+            channel_ids: 该账号负责的频道ID
+        """
+        self.sharded = True
+        self.replace_filter(self.message_filter.with_channels(channel_ids))
+
+    def _prepare_filter(self, config: RuntimeConfig, old: RuntimeConfig) -> Optional[Callable[[], None]]:
+        """配置热加载: 根据新配置创建过滤器，提交时替换，不需要重新连接网关"""
+        if not DiscordMessageFilter.rules_changed(config, old):
+            return None
+        message_filter = DiscordMessageFilter.from_settings(config)
 
-    async def process_message(self, raw_message: Any) -> Optional[Message]:
+        def commit() -> None:
+            self.replace_filter(message_filter)
+            self.logger.info(f"消息过滤规则已更新到配置版本 {config.version}，监听 {len(message_filter.channel_ids)} 个频道")
+
+        return commit
+
+    def replace_filter(self, message_filter: DiscordMessageFilter) -> None:
+        """
+        替换消息过滤器，之后收到的消息按新规则过滤
+
+        已连接时立即从游标补拉新增的频道
+
+        Args:
+            message_filter: 新的过滤器
+        """
+        added = message_filter.channel_ids - self.message_filter.channel_ids
+        self.message_filter = message_filter
+        if added and self.running and self.backfill is not None:
+            self.backfill.schedule(added)
+
+    async def stop(self) -> None:
+        """停止Discord监听器"""
+        if self.backfill is not None:
+            await self.backfill.cancel()
+            self.backfill.cursors.save()
+
+        if self.client.is_closed():
+            self.running = False
+            return
+
+        self.logger.info("正在停止Discord监听器...")
+        try:
+            # 关闭Discord客户端
+            await self.client.close()
+            self.logger.info("Discord监听器已停止")
+        except Exception as e:
+            self.logger.error(f"停止Discord监听器时出错: {e}", exc_info=True)
+        finally:
+            self.running = False
+
+    async def process_message(self, raw_message: Any) -> Optional[Union[Message, CompactMessage]]:
         """
         处理Discord消息
         
@@ -117,37 +216,38 @@ class DiscordListener(BaseListener):
             raw_message: Discord消息对象
             
         Returns:
-            Optional[Message]: 处理后的统一消息对象，如果消息应该被忽略则返回None
+            Optional[Union[Message, CompactMessage]]: 处理后的统一消息对象，如果消息应该被忽略则返回None
         """
-        # 如果指定了目标频道，则只处理这些频道的消息
-        if self.target_channel_ids and str(raw_message.channel.id) not in self.target_channel_ids:
+        # 在构建消息对象之前过滤掉不需要的消息（频道、用户、服务器规则及机器人消息）
+        if not self.message_filter.accepts(raw_message):
             return None
 
-        # 修改为支持多个用户
-        # 如果指定了目标用户列表且不为空，则只处理这些用户的消息
-        if self.target_user_ids and str(raw_message.author.id) not in self.target_user_ids:
-            return None
-
-        # 忽略机器人消息
-        if raw_message.author.bot:
-            return None
+        if self.backfill is not None:
+            self.backfill.record(raw_message)
 
         # 提取附件URL
         attachments = [attachment.url for attachment in raw_message.attachments]
 
-        # 创建统一消息模型
-        return Message(
+        author = raw_message.author
+        channel_id = str(raw_message.channel.id)
+        message_kwargs = dict(
             id=str(raw_message.id),
             content=raw_message.content,
             platform="discord",
-            author_id=str(raw_message.author.id),
-            author_name=f"{raw_message.author.name}#{raw_message.author.discriminator}" if hasattr(raw_message.author,
-                                                                                                   "discriminator") else raw_message.author.name,
+            author_id=str(author.id),
+            author_name=f"{author.name}#{author.discriminator}" if hasattr(author, "discriminator") else author.name,
             timestamp=raw_message.created_at if hasattr(raw_message, "created_at") else datetime.now(),
             attachments=attachments,
-            raw_message=raw_message,
             metadata={
-                "channel_id": str(raw_message.channel.id),
+                "channel_id": channel_id,
                 "guild_id": str(raw_message.guild.id) if hasattr(raw_message, "guild") and raw_message.guild else None,
             }
         )
+
+        if COMPACT_MESSAGES:
+            # 紧凑模型不持有原始消息对象，需要时从客户端的消息缓存中查找
+            return CompactMessage(raw_loader=partial(self.client._connection._get_message, raw_message.id),
+                                  **message_kwargs)
+
+        # 创建统一消息模型
+        return Message(raw_message=raw_message, **message_kwargs)
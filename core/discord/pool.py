@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import time
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Union
+
+from config.runtime import RuntimeConfig, get_config_manager
+from config.settings import DISCORD_BACKFILL_ENABLED, DISCORD_BACKFILL_STATE_FILE, DISCORD_POOL_FAILOVER_AFTER, \
+    DISCORD_TOKENS, SUPERVISOR_BACKOFF_BASE, SUPERVISOR_BACKOFF_MAX, SUPERVISOR_STABLE_AFTER
+from core.base_listener import BaseListener
+from core.dedup import DedupCache
+from core.discord.backfill import ChannelCursorStore
+from core.discord.filters import DiscordMessageFilter
+from core.discord.listener import DiscordListener
+from core.supervisor import ListenerSupervisor
+from models.message import Message
+from utils.exceptions import DiscordListenerError
+from utils.metrics import REGISTRY
+
+POOL_ASSIGNED_CHANNELS = REGISTRY.gauge("scraper_discord_pool_channels", "连接池中各账号负责的频道数量", ["account"])
+POOL_REBALANCES = REGISTRY.counter("scraper_discord_pool_rebalances_total", "连接池重新分配频道的次数")
+
+# 检查账号状态的间隔（秒）
+CHECK_INTERVAL = 1.0
+
+
+def _weight(channel_id: int, account: str) -> int:
+    digest = hashlib.blake2b(f"{account}:{channel_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def assign_channels(channel_ids: Iterable[int], accounts: Sequence[str]) -> Dict[str, FrozenSet[int]]:
+    """
+    把频道分配给账号
+
+    使用带容量上限的最高随机权重哈希（rendezvous hashing）：每个频道优先分给权重最高且未满的账号，
+    各账号的频道数最多相差1；账号增减时大部分频道保持原来的归属，需要补拉的频道尽量少
+
+    Args:
+        channel_ids: 需要分配的频道ID
+        accounts: 可用的账号名称
+
+    Returns:
+        Dict[str, FrozenSet[int]]: 账号名称到频道ID集合的映射
+    """
+    channel_ids = sorted(set(channel_ids))
+    result: Dict[str, Set[int]] = {account: set() for account in accounts}
+    if not accounts:
+        return {}
+    # 每个账号至少base个频道，其中extra个账号多分一个
+    base, extra = divmod(len(channel_ids), len(accounts))
+    for channel_id in channel_ids:
+        for account in sorted(accounts, key=lambda a: _weight(channel_id, a), reverse=True):
+            count = len(result[account])
+            if count < base or (count == base and extra > 0):
+                if count == base:
+                    extra -= 1
+                result[account].add(channel_id)
+                break
+    return {account: frozenset(channels) for account, channels in result.items()}
+
+
+class DiscordListenerPool(BaseListener):
+    """
+    多账号Discord监听器连接池
+
+    - 每个账号是一个独立的DiscordListener，由各自的守护启动和按退避重启，互不影响
+    - DISCORD_CHANNEL_IDS按账号分片，每个账号只接收分配给它的频道，按服务器监听的规则对所有账号生效
+    - 所有账号的消息进入同一个回调和同一个去重缓存，多个账号收到同一条消息时只处理一次
+    - 账号断开超过failover_after秒后，它负责的频道转给其他在线账号，并从共享的频道游标补拉；账号恢复后频道迁回
+    - 配置热加载后按新的频道列表重新分配，其他过滤规则同时对所有账号生效，账号不需要重新连接
+
+    连接池本身作为一个监听器交给ListenerSupervisor，start()一直运行到stop()被调用
+    """
+
+    def __init__(self, tokens: Sequence[str], failover_after: float = DISCORD_POOL_FAILOVER_AFTER,
+                 listener_factory: Optional[Callable[..., DiscordListener]] = None):
+        """
+        初始化连接池
+
+        Args:
+            tokens: 各账号的token
+            failover_after: 账号断开多少秒后把它负责的频道转给其他账号
+            listener_factory: 创建账号监听器的函数，参数与DiscordListener相同，默认为DiscordListener
+        """
+        super().__init__(platform_name="discord")
+        if not tokens:
+            raise DiscordListenerError("Discord token未配置")
+        self.failover_after = failover_after
+        self.base_filter = DiscordMessageFilter.from_settings()
+        self.channel_ids = self.base_filter.target_channel_ids
+
+        # 所有账号共享频道游标，频道转给其他账号后从同一个游标继续补拉
+        self.cursors: Optional[ChannelCursorStore] = None
+        if DISCORD_BACKFILL_ENABLED:
+            self.cursors = ChannelCursorStore(DISCORD_BACKFILL_STATE_FILE or None)
+            self.cursors.load()
+
+        factory = listener_factory or DiscordListener
+        self.members: Dict[str, DiscordListener] = {}
+        for index, token in enumerate(tokens, start=1):
+            name = f"discord#{index}"
+            self.members[name] = factory(token=token, name=name, message_filter=self.base_filter.with_channels(()),
+                                         cursors=self.cursors)
+        self.supervisors: Dict[str, ListenerSupervisor] = {}
+        self.assignments: Dict[str, FrozenSet[int]] = {}
+
+        self._down_since: Dict[str, Optional[float]] = {}
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+
+        if not self.channel_ids:
+            self.logger.warning("未配置DISCORD_CHANNEL_IDS，各账号监听相同的消息，只起冗余作用")
+        self.logger.info(f"Discord连接池: {len(self.members)} 个账号，{len(self.channel_ids)} 个频道")
+        get_config_manager().subscribe(self._prepare_filter)
+
+    def register_callback(self, callback: Callable[[Message], Union[None, Awaitable[Any]]]) -> None:
+        super().register_callback(callback)
+        for listener in self.members.values():
+            listener.register_callback(callback)
+
+    def set_dedup_cache(self, dedup_cache: DedupCache) -> None:
+        super().set_dedup_cache(dedup_cache)
+        for listener in self.members.values():
+            listener.set_dedup_cache(dedup_cache)
+
+    def _prepare_filter(self, config: RuntimeConfig, old: RuntimeConfig) -> Optional[Callable[[], None]]:
+        """配置热加载: 创建新的基础过滤器，提交时更新各账号的规则并按新的频道列表重新分配"""
+        if not DiscordMessageFilter.rules_changed(config, old):
+            return None
+        base_filter = DiscordMessageFilter.from_settings(config)
+
+        def commit() -> None:
+            self.base_filter = base_filter
+            self.channel_ids = base_filter.target_channel_ids
+            # 先替换各账号的规则（保留已分配的频道），再按新的频道列表分配，新分配到的频道从游标补拉
+            for listener in self.members.values():
+                listener.message_filter = base_filter.with_channels(listener.message_filter.channel_ids)
+            if self.assignments:
+                self.rebalance()
+            self.logger.info(f"消息过滤规则已更新到配置版本 {config.version}，{len(self.channel_ids)} 个频道")
+
+        return commit
+
+    def healthy_accounts(self) -> List[str]:
+        """在线或断开时间未超过failover_after的账号"""
+        now = time.monotonic()
+        healthy = []
+        for name, listener in self.members.items():
+            if listener.running:
+                self._down_since[name] = None
+            elif self._down_since.get(name) is None:
+                self._down_since[name] = now
+            down_since = self._down_since[name]
+            if down_since is None or now - down_since < self.failover_after:
+                healthy.append(name)
+        return healthy
+
+    def rebalance(self) -> bool:
+        """根据账号状态重新分配频道，分配有变化时返回True"""
+        accounts = self.healthy_accounts()
+        if not accounts:
+            # 所有账号都不可用时保持原有分配，等待任意账号恢复
+            return False
+        assignments = assign_channels(self.channel_ids, accounts)
+        for name in self.members:
+            assignments.setdefault(name, frozenset())
+        if assignments == self.assignments:
+            return False
+
+        first = not self.assignments
+        for name, channels in assignments.items():
+            if channels != self.assignments.get(name):
+                self.members[name].assign_channels(channels)
+            POOL_ASSIGNED_CHANNELS.set(len(channels), name)
+        self.assignments = assignments
+        if not first:
+            POOL_REBALANCES.inc()
+            self.logger.warning(f"重新分配频道，可用账号: {', '.join(accounts)}")
+        self.logger.info("频道分配: " + ", ".join(f"{name}={len(channels)}" for name, channels in assignments.items()))
+        return True
+
+    async def start(self) -> None:
+        """启动所有账号，定期检查账号状态并在需要时重新分配频道，直到stop()被调用"""
+        self._stopping = False
+        now = time.monotonic()
+        # 启动阶段视为刚断开，给每个账号failover_after秒的时间完成登录
+        self._down_since = {name: now for name in self.members}
+        self.assignments = {}
+        self.rebalance()
+
+        for name, listener in self.members.items():
+            supervisor = self.supervisors.get(name)
+            if supervisor is None:
+                supervisor = self.supervisors[name] = ListenerSupervisor(
+                    name,
+                    listener,
+                    backoff_base=SUPERVISOR_BACKOFF_BASE,
+                    backoff_max=SUPERVISOR_BACKOFF_MAX,
+                    stable_after=SUPERVISOR_STABLE_AFTER,
+                )
+            supervisor.start()
+
+        try:
+            while not self._stopping:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=CHECK_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                if self._stopping:
+                    break
+                self.rebalance()
+                self.running = any(listener.running for listener in self.members.values())
+        finally:
+            await self._stop_members()
+            self.running = False
+
+    async def stop(self) -> None:
+        """停止所有账号"""
+        self._stopping = True
+        self._wakeup.set()
+        await self._stop_members()
+        self.running = False
+
+    async def _stop_members(self) -> None:
+        await asyncio.gather(*(supervisor.stop() for supervisor in self.supervisors.values()),
+                             return_exceptions=True)
+        if self.cursors is not None:
+            self.cursors.save()
+
+    async def process_message(self, raw_message: Any) -> Optional[Message]:
+        """连接池不直接接收消息，消息由各账号的监听器处理"""
+        return None
+
+    def health(self) -> Dict[str, Any]:
+        """各账号的健康状态和负责的频道数量"""
+        return {
+            name: dict(supervisor.health(), channels=len(self.assignments.get(name, ())))
+            for name, supervisor in self.supervisors.items()
+        }
+
+
+def create_discord_listener() -> BaseListener:
+    """按配置创建Discord监听器：配置了多个账号时由连接池分配频道，所有账号的消息进入同一条处理链路"""
+    if len(DISCORD_TOKENS) > 1:
+        return DiscordListenerPool(DISCORD_TOKENS)
+    return DiscordListener(token=DISCORD_TOKENS[0] if DISCORD_TOKENS else None)
@@ -0,0 +1,182 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional, Union
+
+from models.message import Message
+from utils.exceptions import ConfigError
+from utils.logger import setup_logger, get_message_logger
+from utils.metrics import QUEUE_DEPTH, QUEUE_DROPPED, QUEUE_WAIT_SECONDS
+
+# 队列满时的处理策略
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DROP_NEWEST = "drop_newest"
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST)
+
+MessageConsumer = Callable[[Message], Union[None, Awaitable[None]]]
+
+
+class MessageDispatcher:
+    """
+    消息分发队列，位于监听器和消息处理器之间
+
+    监听器只负责把消息放入有界队列，由一组工作协程从队列中取出消息并调用处理器，
+    避免处理逻辑阻塞平台的网关事件循环
+    """
+
+    def __init__(self, consumer: MessageConsumer, maxsize: int = 10000, workers: int = 4,
+                 overflow_policy: str = OVERFLOW_BLOCK):
+        """
+        初始化分发队列
+
+        Args:
+            consumer: 处理消息的回调函数，可以是普通函数或协程函数
+            maxsize: 队列容量上限，小于等于0表示不限制
+            workers: 工作协程数量
+            overflow_policy: 队列满时的处理策略 (block、drop_oldest、drop_newest)
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ConfigError(f"未知的队列溢出策略: {overflow_policy}，可选值: {', '.join(OVERFLOW_POLICIES)}")
+        if workers < 1:
+            raise ConfigError(f"分发工作协程数量必须大于0: {workers}")
+
+        self.logger = setup_logger("MessageDispatcher")
+        # 逐条消息的日志（例如丢弃消息的警告），可按配置采样或限速
+        self.message_logger = get_message_logger("MessageDispatcher")
+        self.consumer = consumer
+        self.maxsize = maxsize
+        self.worker_count = workers
+        self.overflow_policy = overflow_policy
+
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+        self.running = False
+        # drop_oldest策略下已入队的消息被丢弃时调用
+        self.drop_callback: Optional[Callable[[Message], None]] = None
+
+        # 统计信息
+        self.enqueued = 0
+        self.dropped = 0
+        self.processed = 0
+
+    async def start(self) -> None:
+        """创建队列并启动工作协程"""
+        if self.running:
+            return
+
+        # 队列需要在事件循环内创建
+        # 队列元素为 (入队时间, 消息)，用于统计排队等待时间
+        self.queue = asyncio.Queue(maxsize=self.maxsize if self.maxsize > 0 else 0)
+        QUEUE_DEPTH.set_function(self.qsize)
+        self.workers = [
+            asyncio.create_task(self._worker(i), name=f"dispatch-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        self.running = True
+        self.logger.info(f"消息分发队列已启动 (容量: {self.maxsize}, 工作协程: {self.worker_count}, "
+                         f"溢出策略: {self.overflow_policy})")
+
+    def set_drop_callback(self, callback: Callable[[Message], None]) -> None:
+        """
+        设置已入队消息被丢弃时的回调，例如撤销去重记录
+
+        put返回False的消息由调用方自己处理，这里只通知drop_oldest策略下为新消息腾出位置而丢弃的旧消息
+
+        Args:
+            callback: 接收被丢弃消息的回调函数
+        """
+        self.drop_callback = callback
+
+    async def put(self, message: Message) -> bool:
+        """
+        将消息放入队列，供监听器调用
+
+        Args:
+            message: 统一的消息模型
+
+        Returns:
+            bool: 消息是否进入了队列
+        """
+        if not self.running:
+            self.message_logger.warning("分发队列未运行，丢弃消息: %s", message.id)
+            self.dropped += 1
+            QUEUE_DROPPED.inc("stopped")
+            return False
+
+        if self.overflow_policy == OVERFLOW_BLOCK:
+            await self.queue.put((time.perf_counter(), message))
+            self.enqueued += 1
+            return True
+
+        try:
+            self.queue.put_nowait((time.perf_counter(), message))
+        except asyncio.QueueFull:
+            if self.overflow_policy == OVERFLOW_DROP_NEWEST:
+                self.dropped += 1
+                QUEUE_DROPPED.inc(OVERFLOW_DROP_NEWEST)
+                self.message_logger.warning("分发队列已满，丢弃新消息: %s", message.id)
+                return False
+
+            # drop_oldest: 丢弃队首最旧的消息，为新消息腾出位置
+            try:
+                _, oldest = self.queue.get_nowait()
+                self.queue.task_done()
+                self.dropped += 1
+                QUEUE_DROPPED.inc(OVERFLOW_DROP_OLDEST)
+                self.message_logger.warning("分发队列已满，丢弃最旧消息: %s", oldest.id)
+                if self.drop_callback is not None:
+                    self.drop_callback(oldest)
+            except asyncio.QueueEmpty:
+                pass
+            self.queue.put_nowait((time.perf_counter(), message))
+
+        self.enqueued += 1
+        return True
+
+    def qsize(self) -> int:
+        """当前队列中等待处理的消息数量"""
+        return self.queue.qsize() if self.queue else 0
+
+    async def _worker(self, index: int) -> None:
+        """工作协程，持续从队列中取出消息并交给处理器"""
+        while True:
+            enqueued_at, message = await self.queue.get()
+            QUEUE_WAIT_SECONDS.observe(time.perf_counter() - enqueued_at)
+            try:
+                result = self.consumer(message)
+                if asyncio.iscoroutine(result):
+                    await result
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error("分发工作协程 %s 处理消息时发生错误: %s", index, e, exc_info=True)
+            finally:
+                self.queue.task_done()
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        停止分发队列，先停止接收新消息，再等待队列中的消息处理完毕
+
+        Args:
+            timeout: 等待队列排空的最长时间（秒），None表示一直等待
+        """
+        if not self.running:
+            return
+
+        self.running = False
+        pending = self.qsize()
+        if pending:
+            self.logger.info(f"正在等待分发队列排空，剩余 {pending} 条消息")
+
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"等待分发队列排空超时，丢弃剩余 {self.qsize()} 条消息")
+
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+        self.logger.info(f"消息分发队列已停止 (入队: {self.enqueued}, 处理: {self.processed}, 丢弃: {self.dropped})")
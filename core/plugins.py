@@ -0,0 +1,215 @@
+import importlib
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from config.runtime import RuntimeConfig, get_config_manager, get_runtime_config
+from utils.logger import setup_logger
+
+# 第三方平台通过这个入口点组注册插件，入口点指向一个PlatformPlugin对象，例如在插件包的pyproject.toml中:
+#     [project.entry-points."scraper_bot.platforms"]
+#     mastodon = "scraper_bot_mastodon.plugin:PLUGIN"
+ENTRY_POINT_GROUP = "scraper_bot.platforms"
+
+logger = setup_logger("PluginRegistry")
+
+
+def load_object(path: str) -> Any:
+    """
+    按 "模块:属性" 导入对象，属性可以是以点分隔的多级名称
+
+    Raises:
+        ImportError: 模块或属性不存在
+    """
+    module_name, _, attribute = path.partition(":")
+    target = importlib.import_module(module_name)
+    for name in attribute.split(".") if attribute else ():
+        try:
+            target = getattr(target, name)
+        except AttributeError as e:
+            raise ImportError(f"{module_name} 中没有 {attribute}") from e
+    return target
+
+
+class PlatformPlugin:
+    """
+    一个平台的监听器、消息处理器和策略
+
+    组件以 "模块:属性" 字符串声明，平台被启用、需要创建组件时才导入对应模块，
+    未启用的平台不会加载其依赖（例如discord.py和protobuf）
+    """
+
+    __slots__ = ("name", "listener", "handler", "strategies", "strategies_config")
+
+    def __init__(self, name: str, listener: str, handler: Optional[str] = None, strategies: Sequence[str] = (),
+                 strategies_config: Optional[str] = None):
+        """
+        初始化平台插件
+
+        Args:
+            name: 平台名称，与ENABLED_PLATFORMS中的名称一致
+            listener: 监听器类或工厂函数，调用时不带参数
+            handler: 平台消息处理器类，实例的handle_message注册到MessageHandler
+            strategies: 策略类，创建后通过处理器的add_strategy添加
+            strategies_config: 可热加载配置（RuntimeConfig）中保存策略列表的字段，设置后代替strategies，
+                配置变化时通过处理器的set_strategies整体替换策略
+        """
+        self.name = name
+        self.listener = listener
+        self.handler = handler
+        self.strategies = tuple(strategies)
+        self.strategies_config = strategies_config
+
+    def create_listener(self) -> Any:
+        """导入并创建监听器"""
+        return load_object(self.listener)()
+
+    def create_handler(self) -> Any:
+        """导入并创建平台消息处理器及其策略，没有声明处理器时返回None"""
+        if not self.handler:
+            return None
+        handler = load_object(self.handler)()
+        paths = self.strategy_paths(get_runtime_config())
+        strategies = self.load_strategies(paths)
+        for strategy in strategies.values():
+            handler.add_strategy(strategy)
+        if self.strategies_config:
+            if hasattr(handler, "set_strategies"):
+                get_config_manager().subscribe(_StrategyReloader(self, handler, strategies).prepare)
+            else:
+                logger.warning(f"{self.name} 处理器不支持set_strategies，策略不会随配置热加载")
+        return handler
+
+    def strategy_paths(self, config: RuntimeConfig) -> Sequence[str]:
+        """配置快照对应的策略列表"""
+        if self.strategies_config:
+            return getattr(config, self.strategies_config)
+        return self.strategies
+
+    def load_strategies(self, paths: Optional[Sequence[str]] = None,
+                        existing: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        导入并创建策略，无法导入的策略记录日志后跳过，不影响平台的其他组件
+
+        Args:
+            paths: 策略的 "模块:类名"，默认为strategies
+            existing: 已创建的策略，路径相同时直接复用，保留策略自身的状态
+
+        Returns:
+            Dict[str, Any]: 路径 -> 策略，保持paths中的顺序
+        """
+        strategies = {}
+        for path in self.strategies if paths is None else paths:
+            if existing and path in existing:
+                strategies[path] = existing[path]
+                continue
+            try:
+                strategies[path] = load_object(path)()
+            except ImportError as e:
+                logger.warning(f"{self.name} 策略 {path} 无法导入，已跳过: {e}")
+        return strategies
+
+
+class _StrategyReloader:
+    """配置热加载时在后台创建新的策略列表，提交时整体替换处理器的策略"""
+
+    def __init__(self, plugin: PlatformPlugin, handler: Any, strategies: Dict[str, Any]):
+        self.plugin = plugin
+        self.handler = handler
+        self.strategies = strategies
+
+    def prepare(self, config: RuntimeConfig, old: RuntimeConfig) -> Optional[Callable[[], None]]:
+        paths = self.plugin.strategy_paths(config)
+        if paths == self.plugin.strategy_paths(old):
+            return None
+        strategies = self.plugin.load_strategies(paths, existing=self.strategies)
+
+        def commit() -> None:
+            self.strategies = strategies
+            self.handler.set_strategies(list(strategies.values()))
+            logger.info(f"{self.plugin.name} 策略已更新到配置版本 {config.version}: "
+                        f"{', '.join(type(strategy).__name__ for strategy in strategies.values()) or '无'}")
+
+        return commit
+
+
+# 内置平台，只保存字符串，导入本模块不会导入任何平台的代码
+BUILTIN_PLUGINS = {
+    "discord": PlatformPlugin(
+        "discord",
+        listener="core.discord.pool:create_discord_listener",
+        handler="handlers.discord.handler:DiscordMessageHandler",
+        strategies_config="discord_strategies",
+    ),
+    "telegram": PlatformPlugin(
+        "telegram",
+        listener="core.telegram.listener:TelegramListener",
+        handler="handlers.telegram.handler:TelegramMessageHandler",
+    ),
+    "twitter": PlatformPlugin(
+        "twitter",
+        listener="core.twitter.listener:TwitterListener",
+        handler="handlers.twitter.handler:TwitterMessageHandler",
+    ),
+}
+
+
+class PluginRegistry:
+    """平台名称 -> 插件，内置平台之外的名称在第一次查找时才读取已安装包的入口点"""
+
+    def __init__(self, plugins: Optional[Dict[str, PlatformPlugin]] = None):
+        self._plugins: Dict[str, PlatformPlugin] = dict(BUILTIN_PLUGINS if plugins is None else plugins)
+        self._entry_points_loaded = False
+
+    def register(self, plugin: PlatformPlugin) -> None:
+        """注册或替换平台插件"""
+        self._plugins[plugin.name] = plugin
+
+    def get(self, name: str) -> Optional[PlatformPlugin]:
+        """查找平台插件，不存在时返回None"""
+        plugin = self._plugins.get(name)
+        if plugin is None and not self._entry_points_loaded:
+            self._load_entry_points()
+            plugin = self._plugins.get(name)
+        return plugin
+
+    def names(self) -> List[str]:
+        """所有已知的平台名称，包括入口点注册的平台"""
+        if not self._entry_points_loaded:
+            self._load_entry_points()
+        return sorted(self._plugins)
+
+    def _load_entry_points(self) -> None:
+        self._entry_points_loaded = True
+        # importlib.metadata需要扫描已安装的包，只在用到内置平台之外的名称时才导入
+        from importlib.metadata import entry_points
+
+        try:
+            found = entry_points(group=ENTRY_POINT_GROUP)
+        except TypeError:
+            # Python 3.8、3.9的entry_points不支持group参数
+            found = entry_points().get(ENTRY_POINT_GROUP, [])
+        for entry_point in found:
+            if entry_point.name in self._plugins:
+                continue
+            try:
+                plugin = entry_point.load()
+            except Exception as e:
+                logger.error(f"加载平台插件 {entry_point.name} ({entry_point.value}) 失败: {e}")
+                continue
+            if not isinstance(plugin, PlatformPlugin):
+                # 与导入失败一样跳过，第三方插件有误不影响启动
+                logger.error(f"加载平台插件 {entry_point.name} ({entry_point.value}) 失败: "
+                             f"应指向PlatformPlugin对象，实际为 {type(plugin).__name__}")
+                continue
+            self._plugins[entry_point.name] = plugin
+            logger.info(f"已发现平台插件: {entry_point.name} ({entry_point.value})")
+
+
+_registry: Optional[PluginRegistry] = None
+
+
+def get_plugin_registry() -> PluginRegistry:
+    """获取进程内共享的平台插件注册表"""
+    global _registry
+    if _registry is None:
+        _registry = PluginRegistry()
+    return _registry
@@ -0,0 +1,395 @@
+import asyncio
+import marshal
+import multiprocessing
+import os
+import random
+import signal
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, List, Optional
+
+from models.message import CompactMessage, Message
+from core.dispatcher import OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST, OVERFLOW_POLICIES
+from handlers.keyed_executor import message_key
+from handlers.message_handler import MessageHandler
+from utils.exceptions import ConfigError
+from utils.logger import setup_logger, get_message_logger
+from utils.metrics import QUEUE_DEPTH, QUEUE_DROPPED
+
+# 处理进程启动失败时重试的等待时间（秒），每次失败翻倍，直到上限
+RESTART_BACKOFF_BASE = 1.0
+RESTART_BACKOFF_MAX = 30.0
+
+# 管道中表示结束的空消息，处理进程收到后处理完剩余消息并退出
+_END_OF_STREAM = b""
+
+
+class _Shard:
+    """一个处理进程，以及主进程中发往它的有界发送缓冲"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.buffer: Deque[bytes] = deque()
+        self.process: Optional[multiprocessing.Process] = None
+        self.conn = None
+        self.sender: Optional[asyncio.Task] = None
+        # 缓冲中有新消息
+        self.wakeup = asyncio.Event()
+        # 缓冲有空位（block策略下等待）
+        self.not_full = asyncio.Event()
+        self.not_full.set()
+
+
+class ProcessDispatcher:
+    """
+    多进程分发器，接口与MessageDispatcher相同，可以直接替换
+
+    监听器在主进程中接入和去重，消息序列化为CompactMessage的二进制格式后按频道分片，
+    经管道发送给对应的处理进程，由处理进程中的MessageHandler执行处理器和策略:
+
+    - 每个分片在主进程中有一个有界发送缓冲，满时按溢出策略处理（与MessageDispatcher一致）
+    - 每个分片的发送协程把缓冲中的消息攒成一批写入管道，处理进程较慢时管道写满，发送线程阻塞，
+      缓冲随之积压，形成背压；写入在线程中进行，不阻塞主进程的事件循环
+    - 处理进程按顺序处理收到的消息，同一频道的消息保持先后顺序
+    - 停止时先发送完缓冲中的消息和结束标记，处理进程处理完剩余消息、关闭存储后退出；
+      处理进程忽略SIGINT/SIGTERM，由主进程统一协调退出，超时后强制结束
+    - 处理进程意外退出时自动重新启动，启动失败时按退避时间重试。写入失败的那一批消息计入丢弃统计；
+      此前已写入管道但处理进程还没来得及处理的消息同样会丢失，主进程无法得知数量，不计入丢弃统计
+    - 主进程收到SIGHUP后转发给处理进程，各进程分别热加载配置（见config/runtime.py）
+
+    处理进程中的指标、转发器和HTTP连接池都是进程内独立的，指标接口只反映主进程的接入情况
+    """
+
+    def __init__(self, handler_factory: Callable[[], MessageHandler], workers: int = 2, maxsize: int = 10000,
+                 overflow_policy: str = OVERFLOW_BLOCK, batch_size: int = 256):
+        """
+        初始化多进程分发器
+
+        Args:
+            handler_factory: 在处理进程中创建MessageHandler的函数，必须是模块级函数（可以被pickle）
+            workers: 处理进程数量
+            maxsize: 所有分片发送缓冲的总容量，小于等于0表示不限制
+            overflow_policy: 缓冲满时的处理策略 (block、drop_oldest、drop_newest)
+            batch_size: 一次写入管道的最大消息数量
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ConfigError(f"未知的队列溢出策略: {overflow_policy}，可选值: {', '.join(OVERFLOW_POLICIES)}")
+        if workers < 1:
+            raise ConfigError(f"处理进程数量必须大于0: {workers}")
+
+        self.logger = setup_logger("ProcessDispatcher")
+        # 逐条消息的日志（例如丢弃消息的警告），可按配置采样或限速
+        self.message_logger = get_message_logger("ProcessDispatcher")
+        self.handler_factory = handler_factory
+        self.worker_count = workers
+        self.shard_maxsize = max(1, maxsize // workers) if maxsize > 0 else 0
+        self.overflow_policy = overflow_policy
+        self.batch_size = max(1, batch_size)
+
+        # 使用spawn启动处理进程，不继承主进程的事件循环、日志线程和平台连接
+        self._context = multiprocessing.get_context("spawn")
+        self.shards: List[_Shard] = []
+        self._io_executor: Optional[ThreadPoolExecutor] = None
+        self._closing = False
+        self.running = False
+        # drop_oldest策略下已进入缓冲的消息被丢弃时调用
+        self.drop_callback: Optional[Callable[[Message], None]] = None
+
+        # 统计信息
+        self.enqueued = 0
+        self.dropped = 0
+        self.sent = 0
+        self.restarts = 0
+
+    async def start(self) -> None:
+        """启动处理进程和发送协程"""
+        if self.running:
+            return
+
+        self._closing = False
+        self._io_executor = ThreadPoolExecutor(max_workers=self.worker_count, thread_name_prefix="pipeline-io")
+        self.shards = [_Shard(i) for i in range(self.worker_count)]
+        loop = asyncio.get_running_loop()
+        # 启动进程需要导入处理器模块，耗时较长，放到线程中进行
+        await asyncio.gather(*(loop.run_in_executor(self._io_executor, self._spawn, shard) for shard in self.shards))
+        for shard in self.shards:
+            shard.sender = asyncio.create_task(self._sender(shard), name=f"pipeline-sender-{shard.index}")
+        QUEUE_DEPTH.set_function(self.qsize)
+        self.running = True
+        self.logger.info(f"多进程分发已启动 (处理进程: {self.worker_count}, 每个分片容量: {self.shard_maxsize}, "
+                         f"溢出策略: {self.overflow_policy})")
+
+    def _spawn(self, shard: _Shard) -> None:
+        reader, writer = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_worker_main,
+            args=(shard.index, reader, self.handler_factory),
+            name=f"pipeline-worker-{shard.index}",
+            daemon=True,
+        )
+        process.start()
+        # 主进程不持有读端，处理进程退出后写入会立即失败
+        reader.close()
+        shard.process = process
+        shard.conn = writer
+        self.logger.info(f"处理进程 {shard.index} 已启动 (pid: {process.pid})")
+
+    def reload_workers(self) -> None:
+        """通知所有处理进程重新加载可热加载的配置"""
+        if not hasattr(signal, "SIGHUP"):
+            return
+        for shard in self.shards:
+            process = shard.process
+            if process is not None and process.is_alive():
+                try:
+                    os.kill(process.pid, signal.SIGHUP)
+                except OSError as e:
+                    self.logger.warning(f"通知处理进程 {shard.index} 重新加载配置失败: {e}")
+
+    def shard_for(self, message: Message) -> _Shard:
+        return self.shards[zlib.crc32(message_key(message).encode("utf-8")) % len(self.shards)]
+
+    def set_drop_callback(self, callback: Callable[[Message], None]) -> None:
+        """
+        设置已进入缓冲的消息被丢弃时的回调，与MessageDispatcher.set_drop_callback相同
+
+        Args:
+            callback: 接收被丢弃消息的回调函数
+        """
+        self.drop_callback = callback
+
+    async def put(self, message: Message) -> bool:
+        """
+        将消息放入对应分片的发送缓冲，供监听器调用
+
+        Args:
+            message: 统一的消息模型
+
+        Returns:
+            bool: 消息是否进入了缓冲
+        """
+        if not self.running:
+            self.message_logger.warning("分发队列未运行，丢弃消息: %s", message.id)
+            self.dropped += 1
+            QUEUE_DROPPED.inc("stopped")
+            return False
+
+        shard = self.shard_for(message)
+        record = CompactMessage.from_message(message).to_bytes()
+
+        if self.shard_maxsize and len(shard.buffer) >= self.shard_maxsize:
+            if self.overflow_policy == OVERFLOW_BLOCK:
+                while len(shard.buffer) >= self.shard_maxsize and self.running:
+                    shard.not_full.clear()
+                    await shard.not_full.wait()
+                if not self.running:
+                    self.dropped += 1
+                    QUEUE_DROPPED.inc("stopped")
+                    return False
+            elif self.overflow_policy == OVERFLOW_DROP_NEWEST:
+                self.dropped += 1
+                QUEUE_DROPPED.inc(OVERFLOW_DROP_NEWEST)
+                self.message_logger.warning("分发队列已满，丢弃新消息: %s", message.id)
+                return False
+            else:
+                oldest = shard.buffer.popleft()
+                self.dropped += 1
+                QUEUE_DROPPED.inc(OVERFLOW_DROP_OLDEST)
+                self.message_logger.warning("分发队列已满，丢弃最旧消息")
+                if self.drop_callback is not None:
+                    self.drop_callback(CompactMessage.from_bytes(oldest))
+
+        shard.buffer.append(record)
+        shard.wakeup.set()
+        self.enqueued += 1
+        return True
+
+    def qsize(self) -> int:
+        """主进程中等待发送的消息数量"""
+        return sum(len(shard.buffer) for shard in self.shards)
+
+    async def _sender(self, shard: _Shard) -> None:
+        """把分片缓冲中的消息分批写入管道，停止时写入结束标记"""
+        loop = asyncio.get_running_loop()
+        while True:
+            if not shard.buffer:
+                if self._closing:
+                    break
+                shard.wakeup.clear()
+                await shard.wakeup.wait()
+                continue
+
+            # 上一批写入期间积压的消息合并成一批，负载越高批次越大
+            count = min(self.batch_size, len(shard.buffer))
+            batch = [shard.buffer.popleft() for _ in range(count)]
+            shard.not_full.set()
+            try:
+                await loop.run_in_executor(self._io_executor, shard.conn.send_bytes, marshal.dumps(batch))
+                self.sent += count
+            except (OSError, EOFError, ValueError) as e:
+                self.dropped += count
+                QUEUE_DROPPED.inc("worker_lost", amount=count)
+                self.logger.error(f"处理进程 {shard.index} 已退出 ({e})，丢弃 {count} 条消息并重新启动"
+                                  f"（已写入管道尚未处理的消息同样丢失）")
+                if not await self._restart(shard):
+                    # 停止过程中无法重新启动，缓冲中剩余的消息不再发送
+                    remaining = len(shard.buffer)
+                    shard.buffer.clear()
+                    shard.not_full.set()
+                    self.dropped += remaining
+                    QUEUE_DROPPED.inc("worker_lost", amount=remaining)
+                    self.logger.error(f"处理进程 {shard.index} 无法重新启动，丢弃剩余 {remaining} 条消息")
+                    return
+
+        try:
+            await loop.run_in_executor(self._io_executor, shard.conn.send_bytes, _END_OF_STREAM)
+        except (OSError, EOFError, ValueError):
+            pass
+
+    async def _restart(self, shard: _Shard) -> bool:
+        """
+        重新启动分片的处理进程，失败时按退避时间一直重试，直到成功或开始停止
+
+        Returns:
+            bool: 是否已重新启动
+        """
+        loop = asyncio.get_running_loop()
+        shard.conn.close()
+        if shard.process is not None:
+            await loop.run_in_executor(self._io_executor, shard.process.join, 1)
+        failures = 0
+        while True:
+            try:
+                await loop.run_in_executor(self._io_executor, self._spawn, shard)
+                self.restarts += 1
+                return True
+            except Exception as e:
+                # 进程数、文件描述符耗尽等，发送协程不能因此退出，否则这个分片的缓冲再也不会被发送
+                failures += 1
+                if self._closing:
+                    self.logger.error(f"启动处理进程 {shard.index} 失败: {e}", exc_info=True)
+                    return False
+                delay = min(RESTART_BACKOFF_MAX, RESTART_BACKOFF_BASE * (2 ** (failures - 1)))
+                delay = random.uniform(delay / 2, delay)
+                self.logger.error(f"启动处理进程 {shard.index} 失败 (第 {failures} 次): {e}，{delay:.1f} 秒后重试",
+                                  exc_info=failures == 1)
+                await asyncio.sleep(delay)
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        停止分发，发送完缓冲中的消息，等待处理进程处理完毕后退出
+
+        Args:
+            timeout: 等待的最长时间（秒），None表示一直等待
+        """
+        if not self.running:
+            return
+
+        self.running = False
+        self._closing = True
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        pending = self.qsize()
+        if pending:
+            self.logger.info(f"正在等待发送缓冲排空，剩余 {pending} 条消息")
+        for shard in self.shards:
+            shard.wakeup.set()
+            # 唤醒在block策略下等待的监听器
+            shard.not_full.set()
+
+        senders = [shard.sender for shard in self.shards if shard.sender is not None]
+        try:
+            await asyncio.wait_for(asyncio.gather(*senders), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"等待发送缓冲排空超时，丢弃剩余 {self.qsize()} 条消息")
+            for sender in senders:
+                sender.cancel()
+            await asyncio.gather(*senders, return_exceptions=True)
+
+        loop = asyncio.get_running_loop()
+        for shard in self.shards:
+            process = shard.process
+            if process is None:
+                continue
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            await loop.run_in_executor(self._io_executor, process.join, remaining)
+            if process.is_alive():
+                self.logger.warning(f"处理进程 {shard.index} 未在超时前退出，强制结束")
+                process.kill()
+                await loop.run_in_executor(self._io_executor, process.join, 5)
+            shard.conn.close()
+
+        self._io_executor.shutdown(wait=False)
+        self._io_executor = None
+        self.logger.info(f"多进程分发已停止 (入队: {self.enqueued}, 发送: {self.sent}, 丢弃: {self.dropped}, "
+                         f"进程重启: {self.restarts})")
+
+
+def _worker_main(index: int, conn, handler_factory: Callable[[], MessageHandler]) -> None:
+    """处理进程入口"""
+    # 终端的Ctrl+C和服务管理器的SIGTERM会发给整个进程组，由主进程协调退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    from utils.logger import shutdown_logging
+    try:
+        asyncio.run(_worker_loop(index, conn, handler_factory))
+    finally:
+        shutdown_logging()
+
+
+async def _worker_loop(index: int, conn, handler_factory: Callable[[], MessageHandler]) -> None:
+    from config.runtime import get_config_manager
+    from config.settings import DISPATCH_DRAIN_TIMEOUT, FORWARD_DRAIN_TIMEOUT, ENV_FILE, CONFIG_RELOAD_INTERVAL
+    from forwarding.forwarder import get_forwarder, close_forwarder
+    from handlers.executor import shutdown_executor
+    from storage.archive import close_archive
+    from storage.attachments import close_attachment_fetcher
+    from storage.factory import close_storage
+    from utils.http_client import close_http_client
+
+    logger = setup_logger(f"PipelineWorker-{index}")
+    handler = handler_factory()
+    await get_forwarder().start()
+
+    loop = asyncio.get_running_loop()
+    # 处理进程自己重新加载配置：主进程收到SIGHUP后转发给处理进程，配置文件变化时各自检测
+    config_manager = get_config_manager()
+    if hasattr(signal, "SIGHUP"):
+        loop.add_signal_handler(signal.SIGHUP, config_manager.reload_safely)
+    watcher = None
+    if ENV_FILE and CONFIG_RELOAD_INTERVAL > 0:
+        watcher = asyncio.create_task(config_manager.watch_file(CONFIG_RELOAD_INTERVAL))
+    processed = 0
+    # 阻塞读取管道放在单独的线程中，事件循环可以继续运行处理器中的协程
+    reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline-reader")
+    try:
+        while True:
+            try:
+                data = await loop.run_in_executor(reader, conn.recv_bytes)
+            except EOFError:
+                logger.warning("与主进程的管道已断开")
+                break
+            if data == _END_OF_STREAM:
+                break
+            for record in marshal.loads(data):
+                try:
+                    await handler.handle_message(CompactMessage.from_bytes(record))
+                except Exception as e:
+                    logger.error(f"处理消息时发生错误: {e}", exc_info=True)
+                processed += 1
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        reader.shutdown(wait=False)
+        conn.close()
+        # 不同频道的消息在处理器中并发处理，退出前等待已接收的消息处理完毕
+        await handler.close(timeout=DISPATCH_DRAIN_TIMEOUT)
+        shutdown_executor(wait=True)
+        await close_forwarder(timeout=FORWARD_DRAIN_TIMEOUT)
+        await close_attachment_fetcher()
+        await close_http_client()
+        close_storage()
+        close_archive()
+        logger.info(f"处理进程 {index} 已退出 (接收: {processed})")
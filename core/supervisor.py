@@ -0,0 +1,180 @@
+import asyncio
+import random
+import time
+from typing import Any, Dict, Optional
+
+from core.base_listener import BaseListener
+from utils.logger import setup_logger
+from utils.metrics import REGISTRY
+
+# 监听器健康状态
+STATE_STARTING = "starting"
+STATE_RUNNING = "running"
+STATE_BACKOFF = "backoff"
+STATE_STOPPED = "stopped"
+
+LISTENER_UP = REGISTRY.gauge("scraper_listener_up", "监听器是否处于运行状态", ["platform"])
+LISTENER_RESTARTS = REGISTRY.counter("scraper_listener_restarts_total", "监听器重启次数", ["platform"])
+
+
+class ListenerSupervisor:
+    """
+    监听器守护，负责启动单个监听器并在其退出或出错后无限重试
+
+    - 重试间隔按指数退避增长，有上限，并加入随机抖动，避免多个监听器同时重连
+    - 监听器连续运行超过stable_after秒后视为恢复正常，退避重新从base开始计算
+    - 每个监听器有独立的守护，重启一个监听器不会影响其他监听器
+
+    监听器的start()应当一直运行到连接断开或停止为止；平台客户端自身支持会话恢复时（例如Discord网关的RESUME），
+    短暂断线由客户端内部恢复，只有客户端放弃恢复后才会回到守护重新启动
+    """
+
+    def __init__(self, name: str, listener: BaseListener, backoff_base: float = 1.0, backoff_max: float = 300.0,
+                 stable_after: float = 60.0):
+        """
+        初始化守护
+
+        Args:
+            name: 监听器名称，通常是平台名称
+            listener: 被守护的监听器
+            backoff_base: 第一次重试的等待时间（秒）
+            backoff_max: 重试等待时间上限（秒）
+            stable_after: 连续运行多少秒后重置退避
+        """
+        self.name = name
+        self.listener = listener
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stable_after = stable_after
+        self.logger = setup_logger(f"ListenerSupervisor.{name}")
+
+        self.state = STATE_STOPPED
+        self.failures = 0
+        self.restarts = 0
+        self.last_error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.next_retry_at: Optional[float] = None
+
+        self._stopping = False
+        self._restart_requested = False
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        LISTENER_UP.set_function(lambda: 1 if self.listener.running else 0, name)
+
+    def backoff_delay(self) -> float:
+        """当前失败次数对应的等待时间，在[上限的一半, 上限]之间随机抖动"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(0, self.failures - 1)))
+        return random.uniform(delay / 2, delay)
+
+    def start(self) -> asyncio.Task:
+        """创建守护任务"""
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.create_task(self.run(), name=f"supervisor-{self.name}")
+        return self._task
+
+    async def run(self) -> None:
+        """守护循环，直到stop()被调用"""
+        while not self._stopping:
+            # 监听器连接成功后（listener.running为True）健康状态视为running
+            self.state = STATE_STARTING
+            self.started_at = time.monotonic()
+            self.logger.info(f"启动 {self.name} 监听器")
+            try:
+                await self.listener.start()
+                if self._stopping:
+                    break
+                if not self._restart_requested:
+                    self.last_error = "监听器退出"
+                    self.logger.warning(f"{self.name} 监听器已退出，准备重新启动")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self._stopping:
+                    break
+                self.last_error = f"{e.__class__.__name__}: {e}"
+                self.logger.error(f"{self.name} 监听器出错: {e}", exc_info=True)
+
+            await self._cleanup()
+            if self._stopping:
+                break
+
+            if self._restart_requested:
+                # 手动重启不等待
+                self._restart_requested = False
+                self.failures = 0
+                self.restarts += 1
+                LISTENER_RESTARTS.inc(self.name)
+                continue
+
+            # 运行足够久之后再断开，说明之前的问题已经恢复，从头计算退避
+            if time.monotonic() - self.started_at >= self.stable_after:
+                self.failures = 0
+            self.failures += 1
+
+            delay = self.backoff_delay()
+            self.state = STATE_BACKOFF
+            self.next_retry_at = time.monotonic() + delay
+            self.logger.info(f"{self.name} 监听器将在 {delay:.1f} 秒后重启 (连续失败 {self.failures} 次)")
+            self._wakeup.clear()
+            try:
+                # restart()会提前唤醒
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self.next_retry_at = None
+            self.restarts += 1
+            LISTENER_RESTARTS.inc(self.name)
+
+        self.state = STATE_STOPPED
+
+    async def _cleanup(self) -> None:
+        """监听器异常退出后释放其连接，下次start()重新建立"""
+        try:
+            await self.listener.stop()
+        except Exception as e:
+            self.logger.warning(f"清理 {self.name} 监听器时出错: {e}")
+
+    async def restart(self) -> None:
+        """立即重启监听器，重置退避，不影响其他监听器"""
+        self.logger.info(f"手动重启 {self.name} 监听器")
+        self.failures = 0
+        if self.state == STATE_BACKOFF:
+            self._wakeup.set()
+            return
+        # 停止当前连接，守护循环会在listener.start()返回后立即重新启动
+        self._restart_requested = True
+        await self.listener.stop()
+
+    async def stop(self) -> None:
+        """停止监听器和守护循环"""
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await self.listener.stop()
+        finally:
+            if self._task is not None:
+                try:
+                    await asyncio.wait_for(asyncio.shield(self._task), timeout=10)
+                except (asyncio.TimeoutError, asyncio.CancelledError):
+                    self._task.cancel()
+                except Exception:
+                    pass
+            self.state = STATE_STOPPED
+
+    def health(self) -> Dict[str, Any]:
+        """监听器健康状态"""
+        now = time.monotonic()
+        state = self.state
+        if state == STATE_STARTING and self.listener.running:
+            state = STATE_RUNNING
+        return {
+            "state": state,
+            "connected": self.listener.running,
+            "failures": self.failures,
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+            "uptime": round(now - self.started_at, 1) if state == STATE_RUNNING else 0,
+            "retry_in": round(self.next_retry_at - now, 1) if self.next_retry_at else None,
+        }
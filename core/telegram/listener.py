@@ -1,37 +1,331 @@
-from typing import Optional, Any
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional, Any, Callable, Dict, FrozenSet, List, Tuple, Union
 
+import aiohttp
+
+from config.runtime import RuntimeConfig, get_config_manager, get_runtime_config
+from config.settings import TELEGRAM_BOT_TOKEN, TELEGRAM_API_BASE, TELEGRAM_POLL_TIMEOUT, TELEGRAM_POLL_LIMIT, TELEGRAM_ALLOWED_UPDATES, TELEGRAM_OFFSET_FILE, COMPACT_MESSAGES
 from core.base_listener import BaseListener
-from models.message import Message
+from models.message import Message, CompactMessage
 from utils.exceptions import TelegramListenerError
+from utils.http_client import get_http_client
+from utils.logger import setup_logger
+from utils.metrics import REGISTRY
+
+TELEGRAM_POLLS = REGISTRY.counter("scraper_telegram_polls_total", "getUpdates请求次数", ["result"])
+TELEGRAM_UPDATES = REGISTRY.counter("scraper_telegram_updates_total", "getUpdates收到的更新数量")
+
+# 偏移量定期写入文件的间隔（秒），进程异常退出后最多重放这段时间的更新，由去重缓存丢弃
+SAVE_INTERVAL = 5.0
+# 连续失败多少次后放弃，由监听器守护按退避策略重新启动
+MAX_CONSECUTIVE_ERRORS = 5
+# 长轮询请求在服务端等待时间之外额外允许的网络耗时（秒）
+POLL_TIMEOUT_MARGIN = 15.0
+# 消息中带文件的字段，文件ID记录在元数据中
+FILE_FIELDS = ("photo", "document", "video", "audio", "voice", "animation", "sticker", "video_note")
+
+
+def _parse_ids(value: Optional[str]) -> FrozenSet[str]:
+    return frozenset(item.strip() for item in (value or "").split(",") if item.strip())
+
+
+class _RetryableError(Exception):
+    """可以重试的Bot API错误（限流、服务端错误）"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class OffsetStore:
+    """
+    保存下一次getUpdates使用的偏移量（最后处理的update_id + 1），重启后从这里继续
+
+    Bot API在收到更大的offset时才确认之前的更新，偏移量只在一批更新交给回调之后前移
+    """
+
+    def __init__(self, state_file: Optional[str] = None):
+        self.state_file = state_file
+        self.logger = setup_logger("TelegramOffsetStore")
+        self.offset: Optional[int] = None
+        self._dirty = False
+        self._saved_at = 0.0
+
+    def update(self, offset: int) -> None:
+        if self.offset is None or offset > self.offset:
+            self.offset = offset
+            self._dirty = True
+
+    def load(self) -> Optional[int]:
+        """从状态文件恢复偏移量"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return self.offset
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                self.update(int(json.load(f)["offset"]))
+            self._dirty = False
+            self.logger.info(f"已恢复Telegram更新偏移量: {self.offset}")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.warning(f"读取Telegram偏移量文件失败: {e}")
+        return self.offset
+
+    def save(self, force: bool = True) -> None:
+        """偏移量有变化时写入状态文件，force为False时按SAVE_INTERVAL限制写入频率"""
+        if not self.state_file or not self._dirty:
+            return
+        now = time.monotonic()
+        if not force and now - self._saved_at < SAVE_INTERVAL:
+            return
+
+        directory = os.path.dirname(self.state_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_file = f"{self.state_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({"offset": self.offset}, f)
+        os.replace(temp_file, self.state_file)
+        self._dirty = False
+        self._saved_at = now
 
 
 class TelegramListener(BaseListener):
     """
-    Telegram平台的消息监听器（占位实现）
+    Telegram平台的消息监听器
+
+    以机器人身份通过getUpdates长轮询接收消息：
+    - 每次请求最多取回limit条更新，逐条转换后交给回调（通常只是放入分发队列），整批处理完再前移偏移量
+    - 请求使用进程内共享的HTTP连接池，长轮询期间不占用事件循环
+    - 偏移量保存到文件，重启后不会重放已处理的更新
+    - 网络错误和服务端错误在监听器内部重试，token无效或轮询冲突时抛出异常，由监听器守护处理
+    - 会话和用户过滤规则随配置热加载替换，不中断长轮询
     """
-    
-    def __init__(self):
+
+    def __init__(self, token: Optional[str] = None, api_base: Optional[str] = None,
+                 offset_file: Optional[str] = TELEGRAM_OFFSET_FILE, poll_timeout: int = TELEGRAM_POLL_TIMEOUT,
+                 poll_limit: int = TELEGRAM_POLL_LIMIT):
+        """
+        初始化Telegram监听器
+
+        Args:
+            token: 机器人token，默认使用TELEGRAM_BOT_TOKEN
+            api_base: Bot API地址，默认使用TELEGRAM_API_BASE
+            offset_file: 偏移量文件，为空时不持久化
+            poll_timeout: 长轮询等待时间（秒）
+            poll_limit: 单次最多返回的更新数量
+        """
         super().__init__(platform_name="telegram")
-        self.logger.info("Telegram监听器初始化 - 占位实现")
-    
+        self.token = (token or TELEGRAM_BOT_TOKEN or "").strip()
+        if not self.token:
+            raise TelegramListenerError("Telegram机器人token未配置")
+        self.api_url = f"{(api_base or TELEGRAM_API_BASE).rstrip('/')}/bot{self.token}"
+        self.poll_timeout = poll_timeout
+        self.poll_limit = max(1, min(100, poll_limit))
+        self.allowed_updates = list(TELEGRAM_ALLOWED_UPDATES)
+
+        # (会话ID, 用户ID)，为空时不限制，热加载时整体替换
+        self.filters = self._build_filters(get_runtime_config())
+        get_config_manager().subscribe(self._prepare_filters)
+
+        self.offsets = OffsetStore(offset_file or None)
+        self.offsets.load()
+
+        self._stopping = False
+        self._poll: Optional[asyncio.Future] = None
+
+    async def _call(self, method: str, payload: Dict[str, Any], timeout: float) -> Any:
+        """
+        调用Bot API方法
+
+        Returns:
+            接口返回的result字段
+
+        Raises:
+            TelegramListenerError: token无效或轮询冲突等无法通过重试恢复的错误
+            _RetryableError: 可以重试的错误
+        """
+        client_timeout = aiohttp.ClientTimeout(total=timeout, sock_read=timeout)
+        async with get_http_client().post(f"{self.api_url}/{method}", json=payload, timeout=client_timeout) as response:
+            try:
+                data = await response.json(content_type=None)
+            except ValueError:
+                data = {}
+        if response.status == 200 and data.get("ok"):
+            return data.get("result")
+
+        description = data.get("description") or response.reason
+        if response.status in (401, 404):
+            raise TelegramListenerError(f"Telegram登录失败，请检查token: {description}")
+        if response.status == 409:
+            # 同一个机器人只能有一个getUpdates轮询，且不能同时设置webhook
+            raise TelegramListenerError(f"getUpdates冲突: {description}")
+        retry_after = (data.get("parameters") or {}).get("retry_after")
+        raise _RetryableError(f"{method} 返回 {response.status}: {description}", retry_after)
+
     async def start(self) -> None:
-        """启动Telegram监听器"""
-        self.logger.warning("Telegram监听器功能尚未实现")
-        raise TelegramListenerError("Telegram监听器功能尚未实现")
-    
+        """启动Telegram监听器，一直长轮询到stop()被调用"""
+        self._stopping = False
+        self.logger.info("正在启动Telegram监听器...")
+        try:
+            me = await self._call("getMe", {}, timeout=POLL_TIMEOUT_MARGIN)
+        except (_RetryableError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise TelegramListenerError(f"连接Telegram失败: {e}") from e
+        self.logger.info(f"已登录为 @{me.get('username')}，偏移量: {self.offsets.offset}")
+        self.running = True
+
+        errors = 0
+        try:
+            while not self._stopping:
+                try:
+                    updates = await self._poll_updates()
+                except (_RetryableError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if self._stopping:
+                        break
+                    errors += 1
+                    TELEGRAM_POLLS.inc("error")
+                    if errors >= MAX_CONSECUTIVE_ERRORS:
+                        raise TelegramListenerError(f"getUpdates连续失败 {errors} 次: {e}") from e
+                    delay = getattr(e, "retry_after", None) or min(2 ** errors, 30)
+                    self.logger.warning(f"getUpdates失败，{delay}秒后重试: {e}")
+                    await asyncio.sleep(delay)
+                    continue
+                if updates is None:
+                    break
+                errors = 0
+                TELEGRAM_POLLS.inc("ok" if updates else "empty")
+                if updates:
+                    await self._process_batch(updates)
+                self.offsets.save(force=False)
+        finally:
+            self.running = False
+            self.offsets.save()
+
+    async def _poll_updates(self) -> Optional[List[Dict[str, Any]]]:
+        """发起一次长轮询，stop()取消请求时返回None"""
+        payload = {
+            "offset": self.offsets.offset,
+            "limit": self.poll_limit,
+            "timeout": self.poll_timeout,
+            "allowed_updates": self.allowed_updates,
+        }
+        self._poll = asyncio.ensure_future(self._call("getUpdates", payload, self.poll_timeout + POLL_TIMEOUT_MARGIN))
+        try:
+            return await self._poll
+        except asyncio.CancelledError:
+            if self._stopping:
+                # 请求被取消时偏移量没有前移，未确认的更新下次启动时重新获取
+                return None
+            raise
+        finally:
+            self._poll = None
+
+    async def _process_batch(self, updates: List[Dict[str, Any]]) -> None:
+        """按顺序处理一批更新，整批交给回调之后再前移偏移量"""
+        TELEGRAM_UPDATES.inc(amount=len(updates))
+        for update in updates:
+            try:
+                await self._ingest(update)
+            except Exception as e:
+                self.logger.error("处理Telegram更新时发生错误: %s", e, exc_info=True)
+        self.offsets.update(updates[-1]["update_id"] + 1)
+
     async def stop(self) -> None:
-        """停止Telegram监听器"""
-        self.logger.warning("Telegram监听器功能尚未实现")
-    
-    async def process_message(self, raw_message: Any) -> Optional[Message]:
+        """停止Telegram监听器，取消正在等待的长轮询"""
+        self._stopping = True
+        if self._poll is not None and not self._poll.done():
+            self._poll.cancel()
+        self.offsets.save()
+        self.running = False
+
+    @staticmethod
+    def _build_filters(config: RuntimeConfig) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+        return _parse_ids(config.telegram_chat_id), _parse_ids(config.telegram_target_user_id)
+
+    def _prepare_filters(self, config: RuntimeConfig, old: RuntimeConfig) -> Optional[Callable[[], None]]:
+        """配置热加载: 会话或用户过滤规则有变化时，提交时替换"""
+        filters = self._build_filters(config)
+        if filters == self._build_filters(old):
+            return None
+
+        def commit() -> None:
+            self.filters = filters
+            self.logger.info(f"消息过滤规则已更新到配置版本 {config.version}")
+
+        return commit
+
+    def _accepts(self, message: Dict[str, Any]) -> bool:
+        chat_ids, user_ids = self.filters
+        if chat_ids and str(message["chat"]["id"]) not in chat_ids:
+            return False
+        if user_ids:
+            sender = message.get("from") or message.get("sender_chat") or {}
+            if str(sender.get("id")) not in user_ids:
+                return False
+        return True
+
+    async def process_message(self, raw_message: Any) -> Optional[Union[Message, CompactMessage]]:
         """
-        处理Telegram消息（占位实现）
-        
+        处理Telegram更新
+
         Args:
-            raw_message: Telegram消息对象
-            
+            raw_message: getUpdates返回的一条更新
+
         Returns:
-            Optional[Message]: 处理后的统一消息对象，未实现
+            Optional[Union[Message, CompactMessage]]: 处理后的统一消息对象，不是消息或不符合过滤规则时返回None
         """
-        self.logger.warning("Telegram消息处理功能尚未实现")
-        return None 
\ No newline at end of file
+        kind = next((key for key in ("message", "channel_post", "edited_message", "edited_channel_post")
+                     if key in raw_message), None)
+        if kind is None:
+            return None
+        message = raw_message[kind]
+        if not self._accepts(message):
+            return None
+
+        chat = message["chat"]
+        sender = message.get("from")
+        if sender:
+            author_id = str(sender["id"])
+            author_name = sender.get("username") or " ".join(
+                part for part in (sender.get("first_name"), sender.get("last_name")) if part)
+        else:
+            # 频道消息没有from，以频道作为作者
+            sender_chat = message.get("sender_chat") or chat
+            author_id = str(sender_chat["id"])
+            author_name = sender_chat.get("username") or sender_chat.get("title") or author_id
+
+        file_ids = []
+        for field in FILE_FIELDS:
+            value = message.get(field)
+            if isinstance(value, list):
+                # 图片有多种尺寸，取最大的一张
+                value = value[-1] if value else None
+            if value:
+                file_ids.append(value["file_id"])
+
+        chat_id = str(chat["id"])
+        # message_id只在会话内唯一；编辑后的消息带上编辑时间，不会被去重缓存当作重复消息
+        message_id = f"{chat_id}:{message['message_id']}"
+        if message.get("edit_date"):
+            message_id = f"{message_id}:{message['edit_date']}"
+        message_kwargs = dict(
+            id=message_id,
+            content=message.get("text") or message.get("caption") or "",
+            platform="telegram",
+            author_id=author_id,
+            author_name=author_name,
+            timestamp=datetime.fromtimestamp(message.get("edit_date") or message["date"], tz=timezone.utc),
+            metadata={
+                "channel_id": chat_id,
+                "chat_type": chat.get("type"),
+                "chat_title": chat.get("title"),
+                "update_id": raw_message["update_id"],
+                "edited": kind.startswith("edited_"),
+                "file_ids": file_ids,
+            },
+        )
+        if COMPACT_MESSAGES:
+            return CompactMessage(**message_kwargs)
+        return Message(raw_message=raw_message, **message_kwargs)
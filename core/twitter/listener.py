@@ -1,37 +1,342 @@
-from typing import Optional, Any
+import asyncio
+import time
+from datetime import datetime
+from typing import Optional, Any, Dict, List, Sequence, Set, Tuple, Union
 
+import aiohttp
+
+from config.settings import TWITTER_API_KEY, TWITTER_API_SECRET, TWITTER_BEARER_TOKEN, TWITTER_API_BASE, \
+    TWITTER_TARGET_USER_ID, TWITTER_REQUESTS_PER_WINDOW, TWITTER_RATE_WINDOW, TWITTER_MIN_INTERVAL, \
+    TWITTER_MAX_INTERVAL, TWITTER_POLL_CONCURRENCY, TWITTER_CURSOR_FILE, COMPACT_MESSAGES
 from core.base_listener import BaseListener
-from models.message import Message
+from core.twitter.scheduler import AccountCursorStore, AccountState, PollScheduler
+from models.message import Message, CompactMessage
 from utils.exceptions import TwitterListenerError
+from utils.http_client import get_http_client
+from utils.metrics import REGISTRY
+from utils.rate_limiter import TokenBucket
+
+TWITTER_REQUESTS = REGISTRY.counter("scraper_twitter_requests_total", "Twitter接口请求次数", ["result"])
+TWITTER_POLL_INTERVAL = REGISTRY.histogram("scraper_twitter_poll_interval_seconds", "各账号安排的轮询间隔",
+                                           buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800))
+
+# 单页最多返回的推文数量（接口上限100）
+PAGE_SIZE = 100
+# 一次轮询最多翻的页数，超过时放弃更旧的推文
+MAX_PAGES = 5
+# 没有游标的账号第一次轮询只记录最新推文ID作为起点，不处理历史推文
+INITIAL_PAGE_SIZE = 5
+# 请求失败后延迟重试的时间（秒）
+RETRY_DELAY = 30.0
+# 游标写入文件的间隔（秒）
+SAVE_INTERVAL = 30.0
+# 预算中为翻页和重试预留的比例
+BUDGET_HEADROOM = 0.9
+
+TWEET_PARAMS = {
+    "tweet.fields": "created_at,author_id,conversation_id,attachments",
+    "expansions": "author_id,attachments.media_keys",
+    "media.fields": "url,preview_image_url",
+    "user.fields": "username,name",
+}
+
+
+def _parse_ids(value: Optional[str]) -> List[str]:
+    return list(dict.fromkeys(item.strip() for item in (value or "").split(",") if item.strip()))
+
+
+class _RetryableError(Exception):
+    """可以重试的接口错误（限流、服务端错误、网络错误）"""
+
+    def __init__(self, message: str, delay: float = RETRY_DELAY):
+        super().__init__(message)
+        # 多久之后重试（秒）
+        self.delay = delay
 
 
 class TwitterListener(BaseListener):
     """
-    Twitter平台的消息监听器（占位实现）
+    Twitter平台的消息监听器
+
+    按since_id增量轮询各关注账号的推文（API v2 用户推文接口）:
+    - 所有账号共享一个请求配额，由令牌桶限制总请求速率，并遵守响应头中的剩余次数和重置时间
+    - 轮询间隔由PollScheduler按各账号的活跃程度分配，活跃账号更频繁，安静账号更少
+    - 多个账号的轮询并发进行，同一账号同时只有一个请求
+    - 各账号的since_id和活跃程度保存到文件，重启后继续
     """
-    
-    def __init__(self):
+
+    def __init__(self, user_ids: Optional[Sequence[str]] = None, bearer_token: Optional[str] = None,
+                 api_base: Optional[str] = None, cursor_file: Optional[str] = TWITTER_CURSOR_FILE,
+                 requests_per_window: int = TWITTER_REQUESTS_PER_WINDOW, window: float = TWITTER_RATE_WINDOW,
+                 min_interval: float = TWITTER_MIN_INTERVAL, max_interval: float = TWITTER_MAX_INTERVAL,
+                 concurrency: int = TWITTER_POLL_CONCURRENCY):
+        """
+        初始化Twitter监听器
+
+        Args:
+            user_ids: 关注的账号ID，默认使用TWITTER_TARGET_USER_ID
+            bearer_token: 应用的Bearer Token，默认使用TWITTER_BEARER_TOKEN，未设置时用API Key和Secret换取
+            api_base: 接口地址，默认使用TWITTER_API_BASE
+            cursor_file: 游标文件，为空时不持久化
+            requests_per_window: 每个窗口内所有账号共享的请求数
+            window: 配额窗口（秒）
+            min_interval: 单个账号的最短轮询间隔（秒）
+            max_interval: 单个账号的最长轮询间隔（秒）
+            concurrency: 同时进行的轮询请求数量
+        """
         super().__init__(platform_name="twitter")
-        self.logger.info("Twitter监听器初始化 - 占位实现")
-    
+        self.user_ids = list(user_ids) if user_ids is not None else _parse_ids(TWITTER_TARGET_USER_ID)
+        if not self.user_ids:
+            raise TwitterListenerError("未配置需要关注的Twitter账号 (TWITTER_TARGET_USER_ID)")
+        self.bearer_token = bearer_token or TWITTER_BEARER_TOKEN
+        if not self.bearer_token and not (TWITTER_API_KEY and TWITTER_API_SECRET):
+            raise TwitterListenerError("Twitter凭据未配置，需要TWITTER_BEARER_TOKEN或TWITTER_API_KEY和TWITTER_API_SECRET")
+        self.api_base = (api_base or TWITTER_API_BASE).rstrip('/')
+        self.concurrency = max(1, concurrency)
+
+        rate = requests_per_window / window if window > 0 else 0
+        # 突发上限不超过并发数，避免在窗口开始时一次用掉大量配额
+        self.budget = TokenBucket(rate, capacity=self.concurrency)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+        self.cursors = AccountCursorStore(cursor_file or None)
+        self.scheduler: Optional[PollScheduler] = None
+
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks: Set[asyncio.Task] = set()
+        self._fatal: Optional[BaseException] = None
+        self._saved_at = 0.0
+        self.logger.info(f"Twitter监听器: {len(self.user_ids)} 个账号，配额 {requests_per_window} 次/{window:.0f}秒")
+
+    def _create_scheduler(self) -> PollScheduler:
+        scheduler = PollScheduler(self.budget.rate * BUDGET_HEADROOM, self.min_interval, self.max_interval)
+        saved = self.cursors.load()
+        now = time.monotonic()
+        for index, user_id in enumerate(self.user_ids):
+            since_id, count, exposure = saved.get(user_id, (None, 0.0, 0.0))
+            # 启动时把第一次轮询均匀分散在一个最短间隔内
+            scheduler.add(AccountState(user_id, since_id, count, exposure),
+                          due=now + self.min_interval * index / len(self.user_ids))
+        return scheduler
+
+    async def _authenticate(self) -> None:
+        """没有Bearer Token时，用API Key和Secret换取应用令牌"""
+        if self.bearer_token:
+            return
+        auth = aiohttp.BasicAuth(TWITTER_API_KEY, TWITTER_API_SECRET)
+        async with get_http_client().post(f"{self.api_base}/oauth2/token", auth=auth,
+                                          data={"grant_type": "client_credentials"}) as response:
+            data = await response.json(content_type=None)
+        if response.status != 200 or "access_token" not in data:
+            raise TwitterListenerError(f"获取Twitter应用令牌失败: {response.status} {data}")
+        self.bearer_token = data["access_token"]
+
     async def start(self) -> None:
-        """启动Twitter监听器"""
-        self.logger.warning("Twitter监听器功能尚未实现")
-        raise TwitterListenerError("Twitter监听器功能尚未实现")
-    
+        """启动Twitter监听器，按调度轮询各账号直到stop()被调用"""
+        self._stopping = False
+        self._fatal = None
+        self.logger.info("正在启动Twitter监听器...")
+        try:
+            await self._authenticate()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            raise TwitterListenerError(f"连接Twitter失败: {e}") from e
+        self.scheduler = self._create_scheduler()
+        slots = asyncio.Semaphore(self.concurrency)
+        self.running = True
+
+        try:
+            while not self._stopping:
+                if self._fatal is not None:
+                    raise self._fatal
+                now = time.monotonic()
+                for state in self.scheduler.pop_due(now):
+                    # 先取得并发名额再消耗配额，请求发出前不会被挂起太久
+                    await slots.acquire()
+                    if self._stopping:
+                        slots.release()
+                        break
+                    await self.budget.acquire()
+                    task = asyncio.create_task(self._poll(state, slots))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+
+                if time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+                    self._save()
+
+                next_due = self.scheduler.next_due()
+                timeout = None if next_due is None else max(0.0, next_due - time.monotonic())
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self._cancel_polls()
+            self._save()
+            self.running = False
+
+    async def _poll(self, state: AccountState, slots: asyncio.Semaphore) -> None:
+        """轮询一个账号，结束后安排下一次轮询"""
+        try:
+            initial = not state.primed
+            tweets, includes = await self._fetch(state)
+            state.primed = True
+            if tweets:
+                newest = max(tweets, key=lambda tweet: int(tweet["id"]))
+                state.since_id = newest["id"]
+            if not initial:
+                # 接口从新到旧返回，按发布顺序交给回调
+                for tweet in sorted(tweets, key=lambda tweet: int(tweet["id"])):
+                    try:
+                        await self._ingest((tweet, includes, state.user_id))
+                    except Exception as e:
+                        self.logger.error("处理推文时发生错误: %s", e, exc_info=True)
+            interval = self.scheduler.record(state, 0 if initial else len(tweets), time.monotonic())
+            TWITTER_POLL_INTERVAL.observe(interval)
+        except TwitterListenerError as e:
+            self._fatal = e
+        except _RetryableError as e:
+            self.logger.warning(f"轮询账号 {state.user_id} 失败，{e.delay:.0f}秒后重试: {e}")
+            self.scheduler.reschedule(state, time.monotonic() + e.delay)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(f"轮询账号 {state.user_id} 时发生错误: {e}", exc_info=True)
+            self.scheduler.reschedule(state, time.monotonic() + RETRY_DELAY)
+        finally:
+            slots.release()
+            self._wakeup.set()
+
+    async def _fetch(self, state: AccountState) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        """
+        获取账号比since_id新的推文，新推文超过一页时继续翻页，每一页都消耗配额
+
+        Returns:
+            推文列表，以及按ID索引的关联用户和媒体 {"users": {...}, "media": {...}}
+        """
+        params = dict(TWEET_PARAMS)
+        params["max_results"] = str(PAGE_SIZE if state.primed else INITIAL_PAGE_SIZE)
+        if state.since_id is not None:
+            params["since_id"] = state.since_id
+
+        tweets: List[Dict[str, Any]] = []
+        includes: Dict[str, Dict[str, Any]] = {"users": {}, "media": {}}
+        for page in range(MAX_PAGES):
+            if page:
+                await self.budget.acquire()
+            data = await self._request(f"/2/users/{state.user_id}/tweets", params)
+            tweets.extend(data.get("data") or [])
+            for user in (data.get("includes") or {}).get("users", []):
+                includes["users"][user["id"]] = user
+            for media in (data.get("includes") or {}).get("media", []):
+                includes["media"][media["media_key"]] = media
+            next_token = (data.get("meta") or {}).get("next_token")
+            if not next_token or not state.primed:
+                break
+            params["pagination_token"] = next_token
+        else:
+            self.logger.warning(f"账号 {state.user_id} 新推文超过 {MAX_PAGES} 页，更早的推文已跳过")
+        return tweets, includes
+
+    async def _request(self, path: str, params: Dict[str, str]) -> Dict[str, Any]:
+        headers = {"Authorization": f"Bearer {self.bearer_token}"}
+        try:
+            async with get_http_client().get(f"{self.api_base}{path}", params=params, headers=headers) as response:
+                self._apply_rate_limit(response.headers, response.status)
+                try:
+                    data = await response.json(content_type=None)
+                except ValueError:
+                    data = {}
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            TWITTER_REQUESTS.inc("error")
+            raise _RetryableError(f"请求失败: {e}") from e
+
+        if response.status == 200:
+            TWITTER_REQUESTS.inc("ok")
+            return data
+        TWITTER_REQUESTS.inc(str(response.status))
+        if response.status in (401, 403):
+            raise TwitterListenerError(f"Twitter认证失败: {response.status} {data}")
+        if response.status == 404:
+            # 账号不存在或已注销，返回空结果，按安静账号处理
+            self.logger.warning(f"Twitter账号不存在: {path}")
+            return {}
+        if response.status == 429:
+            # 令牌桶已经按重置时间暂停，立即重新排队，等配额恢复后第一时间重试
+            raise _RetryableError(f"接口返回 429: {data}", delay=0)
+        raise _RetryableError(f"接口返回 {response.status}: {data}")
+
+    def _apply_rate_limit(self, headers: Any, status: int) -> None:
+        """配额用完或被限流时暂停所有账号的请求，直到窗口重置"""
+        remaining = headers.get("x-rate-limit-remaining")
+        reset = headers.get("x-rate-limit-reset")
+        if status != 429 and remaining != "0":
+            return
+        try:
+            wait = float(reset) - time.time() if reset else RETRY_DELAY
+        except ValueError:
+            wait = RETRY_DELAY
+        wait = max(1.0, wait)
+        self.budget.pause(wait)
+        self.logger.warning(f"Twitter配额已用完，暂停 {wait:.0f} 秒")
+
+    def _save(self) -> None:
+        if self.scheduler is not None:
+            self.cursors.save(self.scheduler.accounts.values())
+        self._saved_at = time.monotonic()
+
+    async def _cancel_polls(self) -> None:
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
     async def stop(self) -> None:
         """停止Twitter监听器"""
-        self.logger.warning("Twitter监听器功能尚未实现")
-    
-    async def process_message(self, raw_message: Any) -> Optional[Message]:
+        self._stopping = True
+        self._wakeup.set()
+        await self._cancel_polls()
+        self._save()
+        self.running = False
+
+    async def process_message(self, raw_message: Any) -> Optional[Union[Message, CompactMessage]]:
         """
-        处理Twitter消息（占位实现）
-        
+        处理推文
+
         Args:
-            raw_message: Twitter消息对象
-            
+            raw_message: (推文, 关联的用户和媒体, 关注的账号ID)
+
         Returns:
-            Optional[Message]: 处理后的统一消息对象，未实现
+            Optional[Union[Message, CompactMessage]]: 处理后的统一消息对象
         """
-        self.logger.warning("Twitter消息处理功能尚未实现")
-        return None 
\ No newline at end of file
+        tweet, includes, account_id = raw_message
+        author_id = tweet.get("author_id") or account_id
+        author = includes.get("users", {}).get(author_id, {})
+        media = includes.get("media", {})
+        attachments = []
+        for media_key in (tweet.get("attachments") or {}).get("media_keys", []):
+            item = media.get(media_key) or {}
+            url = item.get("url") or item.get("preview_image_url")
+            if url:
+                attachments.append(url)
+
+        created_at = tweet.get("created_at")
+        message_kwargs = dict(
+            id=tweet["id"],
+            content=tweet.get("text", ""),
+            platform="twitter",
+            author_id=author_id,
+            author_name=author.get("username") or author_id,
+            timestamp=datetime.fromisoformat(created_at.replace("Z", "+00:00")) if created_at else datetime.now(),
+            attachments=attachments,
+            metadata={
+                # 以关注的账号作为频道，同一账号的推文按发布顺序处理
+                "channel_id": account_id,
+                "conversation_id": tweet.get("conversation_id"),
+            },
+        )
+        if COMPACT_MESSAGES:
+            return CompactMessage(**message_kwargs)
+        return Message(raw_message=tweet, **message_kwargs)
@@ -0,0 +1,185 @@
+import heapq
+import json
+import math
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.logger import setup_logger
+
+# 推文速率估计的时间常数（秒），更早的观测按指数衰减，越小对账号变活跃的反应越快
+RATE_TIME_CONSTANT = 900.0
+# 先验的强度（秒）：观测时间较短的账号，速率估计向所有账号的平均速率收缩，避免几次空轮询就被判定为安静账号
+PRIOR_SECONDS = 60.0
+# 速率下限（条/秒），保证从未发推的账号也能分到少量轮询
+MIN_RATE = 1e-4
+
+
+class AccountState:
+    """一个被关注账号的轮询状态"""
+
+    __slots__ = ("user_id", "since_id", "primed", "count", "exposure", "rate", "last_poll", "next_due", "weight")
+
+    def __init__(self, user_id: str, since_id: Optional[str] = None, count: float = 0.0, exposure: float = 0.0):
+        self.user_id = user_id
+        # 已经收到的最新推文ID，下次只请求比它新的推文
+        self.since_id = since_id
+        # 是否已经确定了起点，之后发布的推文都要处理；账号没有推文时since_id仍为None
+        self.primed = since_id is not None
+        # 按时间衰减的推文数量和观测时间（秒）
+        self.count = count
+        self.exposure = exposure
+        # 估计的发推速率（条/秒）和分配轮询用的权重，由调度器计算
+        self.rate = 0.0
+        self.weight = 1.0
+        self.last_poll: Optional[float] = None
+        self.next_due = 0.0
+
+
+class AccountCursorStore:
+    """
+    保存每个账号的since_id和发推统计，重启后从游标继续，并保留账号活跃程度的估计
+
+    推文ID是雪花ID，数值越大推文越新，只保留最大值
+    """
+
+    def __init__(self, state_file: Optional[str] = None):
+        self.state_file = state_file
+        self.logger = setup_logger("TwitterCursorStore")
+
+    def load(self) -> Dict[str, Tuple[Optional[str], float, float]]:
+        """读取状态文件，返回 账号ID -> (since_id, 推文数量, 观测时间)"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            accounts = {user_id: (item.get("since_id"), float(item.get("count", 0.0)), float(item.get("exposure", 0.0)))
+                        for user_id, item in state.get("accounts", {}).items()}
+        except (OSError, ValueError, AttributeError) as e:
+            self.logger.warning(f"读取Twitter游标文件失败: {e}")
+            return {}
+        self.logger.info(f"已恢复 {len(accounts)} 个账号的游标")
+        return accounts
+
+    def save(self, accounts: Iterable[AccountState]) -> None:
+        if not self.state_file:
+            return
+        state = {"accounts": {account.user_id: {"since_id": account.since_id, "count": account.count,
+                                                "exposure": account.exposure}
+                              for account in accounts}}
+        directory = os.path.dirname(self.state_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_file = f"{self.state_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_file, self.state_file)
+
+
+class PollScheduler:
+    """
+    自适应轮询调度
+
+    所有账号共享每秒budget次的请求预算，预算按各账号估计发推速率的平方根分配：
+    轮询频率正比于sqrt(速率)时，在总请求数固定的情况下推文的平均发现延迟最小。
+    活跃账号的轮询间隔因此更短，安静账号更长，间隔限制在[min_interval, max_interval]之间。
+
+    发推速率 = (衰减后的推文数 + 平均速率 * PRIOR_SECONDS) / (衰减后的观测时间 + PRIOR_SECONDS)，
+    新账号从平均速率开始，观测越久越接近自己的真实速率，账号变活跃或变安静后间隔随之调整。
+    调度只决定各账号何时到期，请求的实际发放由共享的令牌桶限制。
+    """
+
+    def __init__(self, budget: float, min_interval: float, max_interval: float):
+        """
+        初始化调度器
+
+        Args:
+            budget: 所有账号每秒可以使用的请求数
+            min_interval: 单个账号的最短轮询间隔（秒）
+            max_interval: 单个账号的最长轮询间隔（秒）
+        """
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.accounts: Dict[str, AccountState] = {}
+        self._total_weight = 0.0
+        # (到期时间, 账号ID)，正在轮询的账号不在堆中
+        self._heap: List[Tuple[float, str]] = []
+
+    def add(self, state: AccountState, due: float = 0.0) -> None:
+        """加入账号，在due时刻第一次到期"""
+        self.accounts[state.user_id] = state
+        state.next_due = due
+        heapq.heappush(self._heap, (due, state.user_id))
+        self._refresh()
+
+    def _refresh(self) -> None:
+        """重新计算各账号的速率估计和权重，账号数量通常在数百以内，每次轮询后全量计算"""
+        count = sum(state.count for state in self.accounts.values())
+        exposure = sum(state.exposure for state in self.accounts.values())
+        mean = count / exposure if exposure > 0 else 0.0
+        total = 0.0
+        for state in self.accounts.values():
+            state.rate = (state.count + mean * PRIOR_SECONDS) / (state.exposure + PRIOR_SECONDS)
+            state.weight = math.sqrt(max(state.rate, MIN_RATE))
+            total += state.weight
+        self._total_weight = total
+
+    def interval(self, state: AccountState) -> float:
+        """账号当前的轮询间隔（秒）"""
+        if self.budget <= 0:
+            return self.min_interval
+        frequency = self.budget * state.weight / self._total_weight
+        return min(self.max_interval, max(self.min_interval, 1.0 / frequency))
+
+    def record(self, state: AccountState, new_items: int, now: float) -> float:
+        """
+        记录一次成功的轮询，更新发推统计并安排下一次轮询
+
+        Args:
+            state: 账号状态
+            new_items: 本次收到的新推文数量
+            now: 轮询完成的时间（time.monotonic()）
+
+        Returns:
+            float: 下一次轮询的间隔（秒）
+        """
+        if state.last_poll is not None:
+            elapsed = max(now - state.last_poll, 0.0)
+            decay = math.exp(-elapsed / RATE_TIME_CONSTANT)
+            state.count = state.count * decay + new_items
+            state.exposure = state.exposure * decay + elapsed
+            self._refresh()
+        state.last_poll = now
+        interval = self.interval(state)
+        self.reschedule(state, now + interval)
+        return interval
+
+    def reschedule(self, state: AccountState, due: float) -> None:
+        """安排账号在due时刻再次到期，例如请求失败后延迟重试"""
+        state.next_due = due
+        heapq.heappush(self._heap, (due, state.user_id))
+
+    def pop_due(self, now: float) -> List[AccountState]:
+        """取出所有已经到期的账号，按到期时间排序，取出的账号在record或reschedule之前不会再次到期"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, user_id = heapq.heappop(self._heap)
+            state = self.accounts.get(user_id)
+            if state is not None:
+                due.append(state)
+        return due
+
+    def next_due(self) -> Optional[float]:
+        """最早到期的时间，没有等待中的账号时返回None"""
+        return self._heap[0][0] if self._heap else None
+
+    def remove(self, user_id: str) -> None:
+        """移除账号，堆中残留的条目在到期时被忽略"""
+        if self.accounts.pop(user_id, None) is not None:
+            self._refresh()
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """各账号的发推速率估计和当前轮询间隔"""
+        return {user_id: {"rate": state.rate, "interval": self.interval(state)}
+                for user_id, state in self.accounts.items()}
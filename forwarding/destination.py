@@ -0,0 +1,122 @@
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.exceptions import ConfigError
+
+
+class Notification:
+    """待转发的一条通知"""
+
+    __slots__ = ("text", "priority", "created", "attempts")
+
+    def __init__(self, text: str, priority: bool = False):
+        self.text = text
+        self.priority = priority
+        # 发布时间，用于计算合并窗口和投递延迟
+        self.created = time.monotonic()
+        # 已经失败的发送次数
+        self.attempts = 0
+
+
+class Destination(ABC):
+    """
+    转发目标接口
+
+    目标只负责描述请求（地址和请求体）以及单次请求能容纳的文本长度，
+    排队、合并、限速和重试由Forwarder统一处理
+    """
+
+    # 单次请求文本的最大长度
+    max_chars: int = 2000
+
+    def __init__(self, name: str, rate: Optional[float] = None, burst: Optional[float] = None):
+        """
+        初始化转发目标
+
+        Args:
+            name: 目标名称，发布通知时使用
+            rate: 每秒最多发送的请求数，为None时使用Forwarder的默认值
+            burst: 允许的突发请求数，为None时使用Forwarder的默认值
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+
+    def render(self, notifications: List[Notification]) -> str:
+        """将多条通知合并为一段文本"""
+        return "\n".join(notification.text for notification in notifications)
+
+    @abstractmethod
+    def build_request(self, text: str) -> Tuple[str, Dict[str, Any]]:
+        """
+        构造发送请求
+
+        Args:
+            text: 合并后的文本
+
+        Returns:
+            Tuple[str, Dict[str, Any]]: 请求地址和JSON请求体
+        """
+        pass
+
+
+class WebhookDestination(Destination):
+    """通用webhook目标，以JSON POST发送，例如Discord webhook（content字段）或Slack webhook（text字段）"""
+
+    def __init__(self, name: str, url: str, field: str = "content", max_chars: int = 2000, **kwargs: Any):
+        super().__init__(name, **kwargs)
+        self.url = url
+        self.field = field
+        self.max_chars = max_chars
+
+    def build_request(self, text: str) -> Tuple[str, Dict[str, Any]]:
+        return self.url, {self.field: text}
+
+
+class TelegramDestination(Destination):
+    """Telegram Bot API的sendMessage"""
+
+    max_chars = 4096
+
+    def __init__(self, name: str, bot_token: str, chat_id: str, api_base: str = "https://api.telegram.org",
+                 **kwargs: Any):
+        super().__init__(name, **kwargs)
+        self.url = f"{api_base.rstrip('/')}/bot{bot_token}/sendMessage"
+        self.chat_id = chat_id
+
+    def build_request(self, text: str) -> Tuple[str, Dict[str, Any]]:
+        return self.url, {"chat_id": self.chat_id, "text": text, "disable_web_page_preview": True}
+
+
+def parse_destinations(spec: str, telegram_bot_token: Optional[str] = None,
+                       telegram_api_base: str = "https://api.telegram.org") -> List[Destination]:
+    """
+    解析转发目标配置
+
+    格式为逗号分隔的 名称=地址，地址为webhook URL，或 telegram:<chat_id>
+
+    Args:
+        spec: 目标配置
+        telegram_bot_token: Telegram目标使用的机器人令牌
+        telegram_api_base: Telegram Bot API地址
+    """
+    destinations: List[Destination] = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, target = item.partition("=")
+        name, target = name.strip(), target.strip()
+        if not sep or not name or not target:
+            raise ConfigError(f"转发目标格式错误: {item}，应为 名称=地址")
+        if target.startswith("telegram:"):
+            if not telegram_bot_token:
+                raise ConfigError(f"转发目标 {name} 需要设置TELEGRAM_BOT_TOKEN")
+            destinations.append(TelegramDestination(name, telegram_bot_token, target[len("telegram:"):],
+                                                    api_base=telegram_api_base))
+        elif target.startswith(("http://", "https://")):
+            destinations.append(WebhookDestination(name, target))
+        else:
+            raise ConfigError(f"不支持的转发地址: {target}")
+    return destinations
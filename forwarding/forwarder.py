@@ -0,0 +1,502 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Mapping, Optional, Set
+
+import aiohttp
+
+from config.runtime import RuntimeConfig, get_config_manager, get_runtime_config
+from config.settings import FORWARD_RATE, FORWARD_BURST, FORWARD_COALESCE_WINDOW, FORWARD_MAX_BATCH, \
+    FORWARD_QUEUE_SIZE, FORWARD_MAX_RETRIES, FORWARD_DRAIN_TIMEOUT, TELEGRAM_BOT_TOKEN, TELEGRAM_API_BASE
+from forwarding.destination import Destination, Notification, parse_destinations
+from utils.exceptions import ConfigError
+from utils.http_client import get_http_client
+from utils.logger import setup_logger, get_message_logger
+from utils.metrics import REGISTRY
+from utils.rate_limiter import TokenBucket
+
+FORWARD_PUBLISHED = REGISTRY.counter("scraper_forward_published_total", "发布的通知数量", ["destination"])
+FORWARD_DELIVERED = REGISTRY.counter("scraper_forward_delivered_total", "已送达的通知数量", ["destination"])
+FORWARD_DROPPED = REGISTRY.counter("scraper_forward_dropped_total", "丢弃的通知数量", ["destination", "reason"])
+FORWARD_REQUESTS = REGISTRY.counter("scraper_forward_requests_total", "转发请求数量", ["destination", "result"])
+FORWARD_QUEUE_DEPTH = REGISTRY.gauge("scraper_forward_queue_depth", "等待转发的通知数量", ["destination"])
+FORWARD_LATENCY = REGISTRY.histogram("scraper_forward_latency_seconds", "通知从发布到送达的延迟", ["destination"],
+                                     buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+
+# 服务端未给出等待时间时，限流或出错后的默认等待（秒）
+DEFAULT_RETRY_AFTER = 1.0
+# 出错重试的最长等待（秒）
+MAX_RETRY_DELAY = 30.0
+
+
+def parse_retry_after(headers: Mapping[str, str], body: bytes) -> float:
+    """
+    从429响应中解析需要等待的秒数
+
+    依次读取响应体中的retry_after（Discord）、parameters.retry_after（Telegram）和Retry-After响应头
+    """
+    try:
+        data = json.loads(body) if body else None
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        value = data.get("retry_after")
+        if value is None and isinstance(data.get("parameters"), dict):
+            value = data["parameters"].get("retry_after")
+        if isinstance(value, (int, float)):
+            return max(0.0, float(value))
+    try:
+        return max(0.0, float(headers.get("Retry-After", "")))
+    except ValueError:
+        return DEFAULT_RETRY_AFTER
+
+
+class DestinationQueue:
+    """
+    单个转发目标的发送队列
+
+    - 优先通知和普通通知分两条队列，优先通知总是先发送，并且不等待合并窗口
+    - 普通通知在合并窗口内攒批，多条通知合并为一次请求；限速等待期间到达的通知也会合并进下一次请求
+    - 令牌桶限制请求速率，收到429时按Retry-After暂停，响应头显示配额用尽时提前暂停
+    - 网络错误和5xx按指数退避重试，4xx（429除外）直接丢弃
+    """
+
+    def __init__(self, destination: Destination, rate: float, burst: float, coalesce_window: float,
+                 max_batch: int, queue_size: int, max_retries: int):
+        self.destination = destination
+        self.name = destination.name
+        self.limiter = TokenBucket(rate, burst)
+        self.coalesce_window = coalesce_window
+        self.max_batch = max(1, max_batch)
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.logger = setup_logger(f"DestinationQueue.{destination.name}")
+
+        self.high: Deque[Notification] = deque()
+        self.normal: Deque[Notification] = deque()
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+
+        # 统计信息
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.requests = 0
+        self.rate_limited = 0
+
+        FORWARD_QUEUE_DEPTH.set_function(self.__len__, self.name)
+
+    def __len__(self) -> int:
+        return len(self.high) + len(self.normal)
+
+    def put(self, notification: Notification) -> None:
+        """加入队列，队列满时丢弃最旧的普通通知"""
+        self.published += 1
+        FORWARD_PUBLISHED.inc(self.name)
+        if self.queue_size > 0 and len(self) >= self.queue_size:
+            if self.normal:
+                self.normal.popleft()
+            elif not notification.priority:
+                # 队列中全是优先通知，丢弃新的普通通知
+                self._drop(1, "overflow")
+                return
+            else:
+                self.high.popleft()
+            self._drop(1, "overflow")
+        (self.high if notification.priority else self.normal).append(notification)
+        self._wakeup.set()
+
+    def adopt(self, other: "DestinationQueue") -> None:
+        """接收另一个队列中尚未发送的通知（目标地址变化时从旧队列转入），保持原有顺序"""
+        self.high.extendleft(reversed(other.high))
+        self.normal.extendleft(reversed(other.normal))
+        other.high.clear()
+        other.normal.clear()
+        if self:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._task = asyncio.create_task(self.run(), name=f"forward-{self.name}")
+
+    async def stop(self, timeout: float) -> None:
+        """停止发送协程，最多等待timeout秒发送剩余的通知"""
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+            except asyncio.TimeoutError:
+                self._task.cancel()
+                await asyncio.gather(self._task, return_exceptions=True)
+        remaining = len(self)
+        if remaining:
+            self.high.clear()
+            self.normal.clear()
+            self._drop(remaining, "shutdown")
+            self.logger.warning(f"停止时仍有 {remaining} 条通知未发送到 {self.name}")
+
+    async def run(self) -> None:
+        while True:
+            if not self.high and not self.normal:
+                if self._closing:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            # 只有普通通知时等待合并窗口结束或攒满一批，停止时不再等待
+            if not self.high and not self._closing and len(self.normal) < self.max_batch:
+                wait = self.normal[0].created + self.coalesce_window - time.monotonic()
+                if wait > 0:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+            # 先取得令牌再取出通知，限速等待期间到达的通知可以合并进这次请求
+            await self.limiter.acquire()
+            batch = self._take_batch()
+            if batch:
+                try:
+                    await self._send(batch)
+                except asyncio.CancelledError:
+                    self._requeue(batch)
+                    raise
+
+    def _take_batch(self) -> List[Notification]:
+        """按优先级取出一批通知，合并后的文本不超过目标的长度上限"""
+        max_chars = self.destination.max_chars
+        batch: List[Notification] = []
+        length = 0
+        for lane in (self.high, self.normal):
+            while lane and len(batch) < self.max_batch:
+                notification = lane[0]
+                if not batch and len(notification.text) > max_chars:
+                    notification.text = notification.text[:max_chars - 1] + "…"
+                added = len(notification.text) + (1 if batch else 0)
+                if batch and length + added > max_chars:
+                    return batch
+                batch.append(lane.popleft())
+                length += added
+        return batch
+
+    def _requeue(self, batch: List[Notification]) -> None:
+        """放回队首，保持原有顺序"""
+        for notification in reversed(batch):
+            (self.high if notification.priority else self.normal).appendleft(notification)
+
+    def _drop(self, count: int, reason: str) -> None:
+        self.dropped += count
+        FORWARD_DROPPED.inc(self.name, reason, amount=count)
+
+    async def _send(self, batch: List[Notification]) -> None:
+        destination = self.destination
+        url, payload = destination.build_request(destination.render(batch))
+        self.requests += 1
+        try:
+            async with get_http_client().post(url, json=payload) as response:
+                status = response.status
+                headers = response.headers
+                body = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            FORWARD_REQUESTS.inc(self.name, "error")
+            self._retry(batch, f"{e.__class__.__name__}: {e}")
+            return
+
+        self._respect_rate_headers(headers)
+
+        if status == 429:
+            delay = parse_retry_after(headers, body)
+            self.rate_limited += 1
+            FORWARD_REQUESTS.inc(self.name, "rate_limited")
+            self.limiter.pause(delay)
+            # 被限流的请求没有送达，不计入重试次数
+            self._requeue(batch)
+            self.logger.warning(f"{self.name} 被限流，{delay:.2f} 秒后重试 ({len(batch)} 条通知)")
+            return
+        if status >= 500:
+            FORWARD_REQUESTS.inc(self.name, "error")
+            self._retry(batch, f"HTTP {status}")
+            return
+        if status >= 400:
+            FORWARD_REQUESTS.inc(self.name, "error")
+            self._drop(len(batch), "rejected")
+            self.logger.error(f"{self.name} 拒绝了请求 (HTTP {status})，丢弃 {len(batch)} 条通知: "
+                              f"{body[:200].decode('utf-8', 'replace')}")
+            return
+
+        FORWARD_REQUESTS.inc(self.name, "ok")
+        now = time.monotonic()
+        for notification in batch:
+            FORWARD_LATENCY.observe(now - notification.created, self.name)
+        self.delivered += len(batch)
+        FORWARD_DELIVERED.inc(self.name, amount=len(batch))
+
+    def _respect_rate_headers(self, headers: Mapping[str, str]) -> None:
+        """配额已用尽时按X-RateLimit-Reset-After提前暂停，避免下一次请求被429"""
+        if headers.get("X-RateLimit-Remaining") != "0":
+            return
+        try:
+            self.limiter.pause(float(headers.get("X-RateLimit-Reset-After", "")))
+        except ValueError:
+            pass
+
+    def _retry(self, batch: List[Notification], reason: str) -> None:
+        retry = []
+        for notification in batch:
+            notification.attempts += 1
+            if notification.attempts <= self.max_retries:
+                retry.append(notification)
+        expired = len(batch) - len(retry)
+        if expired:
+            self._drop(expired, "retries")
+            self.logger.error(f"发送到 {self.name} 失败 ({reason})，已达最大重试次数，丢弃 {expired} 条通知")
+        if retry:
+            attempts = max(notification.attempts for notification in retry)
+            delay = min(MAX_RETRY_DELAY, DEFAULT_RETRY_AFTER * (2 ** (attempts - 1)))
+            self.limiter.pause(delay)
+            self._requeue(retry)
+            self.logger.warning(f"发送到 {self.name} 失败 ({reason})，{delay:.1f} 秒后重试")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": len(self),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+        }
+
+
+class Forwarder:
+    """
+    通知转发器，策略通过它把告警发送到下游的聊天群组和webhook
+
+    每个目标有独立的发送队列，互不影响。publish()不会阻塞，可以在事件循环中调用，
+    也可以在执行器线程中调用（阻塞型策略），此时通知会被交回事件循环入队:
+
+        get_forwarder().publish("alerts", f"{message.author_name}: {message.content}")
+        get_forwarder().publish("alerts", "紧急通知", priority=True)
+
+    进程池中运行的策略无法访问主进程的转发器，需要转发的策略不应使用进程池执行器。
+    """
+
+    def __init__(self, destinations: Iterable[Destination] = (), rate: float = FORWARD_RATE,
+                 burst: float = FORWARD_BURST, coalesce_window: float = FORWARD_COALESCE_WINDOW,
+                 max_batch: int = FORWARD_MAX_BATCH, queue_size: int = FORWARD_QUEUE_SIZE,
+                 max_retries: int = FORWARD_MAX_RETRIES):
+        """
+        初始化转发器
+
+        Args:
+            destinations: 转发目标
+            rate: 每个目标每秒最多发送的请求数（目标未单独设置时），小于等于0表示不限速
+            burst: 每个目标允许的突发请求数（目标未单独设置时）
+            coalesce_window: 普通通知的合并窗口（秒）
+            max_batch: 单次请求最多合并的通知数量
+            queue_size: 每个目标最多排队的通知数量，小于等于0表示不限制
+            max_retries: 网络错误或服务端错误时的最大重试次数
+        """
+        self.rate = rate
+        self.burst = burst
+        self.coalesce_window = coalesce_window
+        self.max_batch = max_batch
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.logger = setup_logger("Forwarder")
+        # 逐条通知的日志，可按配置采样或限速
+        self.message_logger = get_message_logger("Forwarder")
+        self.queues: Dict[str, DestinationQueue] = {}
+        self.running = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 被替换或删除、正在发送剩余通知的队列
+        self._retiring: Set[asyncio.Task] = set()
+
+        for destination in destinations:
+            self.add_destination(destination)
+
+    @property
+    def destinations(self) -> List[str]:
+        return list(self.queues)
+
+    def add_destination(self, destination: Destination) -> None:
+        """添加转发目标，转发器运行中添加时立即启动其发送队列"""
+        if destination.name in self.queues:
+            raise ConfigError(f"转发目标重复: {destination.name}")
+        queue = self._create_queue(destination)
+        self.queues[destination.name] = queue
+        if self.running:
+            queue.start()
+        self.logger.info(f"已添加转发目标: {destination.name} ({destination.__class__.__name__})")
+
+    def _create_queue(self, destination: Destination) -> DestinationQueue:
+        return DestinationQueue(
+            destination,
+            rate=destination.rate if destination.rate is not None else self.rate,
+            burst=destination.burst if destination.burst is not None else self.burst,
+            coalesce_window=self.coalesce_window,
+            max_batch=self.max_batch,
+            queue_size=self.queue_size,
+            max_retries=self.max_retries,
+        )
+
+    def replace_destinations(self, destinations: Iterable[Destination], drain_timeout: float = 10.0) -> None:
+        """
+        整体替换转发目标，用于配置热加载，新的目标表建好后一次替换引用，publish()不需要加锁
+
+        - 名称和配置都不变的目标继续使用原来的发送队列
+        - 配置变化的目标创建新队列，原队列中尚未发送的通知转入新队列
+        - 删除的目标在后台最多等待drain_timeout秒发送完剩余的通知
+
+        Args:
+            destinations: 新的转发目标
+            drain_timeout: 删除的目标发送剩余通知的最长时间（秒）
+        """
+        destinations = list(destinations)
+        names = [destination.name for destination in destinations]
+        duplicated = {name for name in names if names.count(name) > 1}
+        if duplicated:
+            raise ConfigError(f"转发目标重复: {', '.join(sorted(duplicated))}")
+
+        queues: Dict[str, DestinationQueue] = {}
+        retired: List[DestinationQueue] = []
+        for destination in destinations:
+            current = self.queues.get(destination.name)
+            if current is not None and _same_destination(current.destination, destination):
+                queues[destination.name] = current
+                continue
+            queue = queues[destination.name] = self._create_queue(destination)
+            if current is not None:
+                queue.adopt(current)
+                retired.append(current)
+        retired.extend(queue for name, queue in self.queues.items() if name not in queues)
+
+        previous = self.queues
+        self.queues = queues
+        if self.running:
+            for queue in queues.values():
+                queue.start()
+            for queue in retired:
+                task = asyncio.create_task(queue.stop(drain_timeout), name=f"forward-retire-{queue.name}")
+                self._retiring.add(task)
+                task.add_done_callback(self._retiring.discard)
+
+        added = [name for name in queues if name not in previous]
+        removed = [name for name in previous if name not in queues]
+        changed = [queue.name for queue in retired if queue.name in queues]
+        self.logger.info(f"转发目标已更新: {', '.join(queues) or '无'} (新增: {', '.join(added) or '无'}，"
+                         f"删除: {', '.join(removed) or '无'}，变更: {', '.join(changed) or '无'})")
+
+    def publish(self, destination: str, text: str, priority: bool = False) -> bool:
+        """
+        发布一条通知，立即返回
+
+        Args:
+            destination: 目标名称
+            text: 通知文本
+            priority: 是否走优先通道
+
+        Returns:
+            bool: 目标是否存在
+        """
+        queue = self.queues.get(destination)
+        if queue is None:
+            self.message_logger.warning("未知的转发目标: %s", destination)
+            return False
+        self._call(queue.put, Notification(text, priority))
+        return True
+
+    def broadcast(self, text: str, priority: bool = False) -> int:
+        """发布到所有目标，返回目标数量"""
+        for queue in self.queues.values():
+            self._call(queue.put, Notification(text, priority))
+        return len(self.queues)
+
+    def _call(self, func: Callable[..., Any], *args: Any) -> None:
+        """在转发器所在的事件循环中执行，其他线程调用时交回事件循环"""
+        loop = self._loop
+        if loop is not None:
+            try:
+                running_loop = asyncio.get_running_loop()
+            except RuntimeError:
+                running_loop = None
+            if running_loop is not loop:
+                loop.call_soon_threadsafe(func, *args)
+                return
+        func(*args)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        for queue in self.queues.values():
+            queue.start()
+        self.running = True
+        self.logger.info(f"通知转发已启动 (目标: {', '.join(self.queues) or '无'})")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """停止转发，最多等待timeout秒发送剩余的通知"""
+        if not self.running:
+            return
+        await asyncio.gather(*(queue.stop(timeout) for queue in self.queues.values()), *self._retiring,
+                             return_exceptions=True)
+        self.running = False
+        self._loop = None
+        self.logger.info(f"通知转发已停止，统计: {self.stats()}")
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: queue.stats() for name, queue in self.queues.items()}
+
+
+def _same_destination(a: Destination, b: Destination) -> bool:
+    return type(a) is type(b) and vars(a) == vars(b)
+
+
+_forwarder: Optional[Forwarder] = None
+
+
+def create_forwarder() -> Forwarder:
+    """根据配置创建转发器"""
+    return Forwarder(parse_destinations(get_runtime_config().forward_destinations, TELEGRAM_BOT_TOKEN,
+                                        TELEGRAM_API_BASE))
+
+
+def _prepare_destinations(config: RuntimeConfig, old: RuntimeConfig) -> Optional[Callable[[], None]]:
+    """配置热加载: FORWARD_DESTINATIONS有变化时解析新的目标，提交时替换共享转发器的目标"""
+    if config.forward_destinations == old.forward_destinations:
+        return None
+    destinations = parse_destinations(config.forward_destinations, TELEGRAM_BOT_TOKEN, TELEGRAM_API_BASE)
+    names = [destination.name for destination in destinations]
+    if len(set(names)) != len(names):
+        raise ConfigError(f"转发目标重复: {', '.join(names)}")
+
+    def commit() -> None:
+        if _forwarder is not None:
+            _forwarder.replace_destinations(destinations, drain_timeout=FORWARD_DRAIN_TIMEOUT)
+
+    return commit
+
+
+def get_forwarder() -> Forwarder:
+    """获取进程内共享的转发器，首次调用时根据配置创建，转发目标随配置热加载更新"""
+    global _forwarder
+    if _forwarder is None:
+        _forwarder = create_forwarder()
+        get_config_manager().subscribe(_prepare_destinations)
+    return _forwarder
+
+
+async def close_forwarder(timeout: float = 10.0) -> None:
+    """停止共享的转发器，发送剩余的通知"""
+    global _forwarder
+    if _forwarder is not None:
+        get_config_manager().unsubscribe(_prepare_destinations)
+        await _forwarder.stop(timeout)
+        _forwarder = None
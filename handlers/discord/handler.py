@@ -1,12 +1,17 @@
 import re
-from typing import List
+import time
+from typing import List, Union
 from models.message import Message
-from handlers.base_handler import BaseMessageHandler
-from handlers.discord.strategies.base_strategy import DiscordMessageStrategy
-from handlers.discord.strategies.thunderbolt_strategy import ThunderboltMonitorStrategy
+from handlers.base_handler import AsyncBaseMessageHandler
+from handlers.discord.strategies.base_strategy import DiscordMessageStrategy, AsyncDiscordMessageStrategy
+from handlers.discord.strategies.strategy_index import StrategyIndex
+from handlers.executor import run_blocking
+from utils.metrics import STRATEGY_MATCHED, STRATEGY_SECONDS
 
+Strategy = Union[DiscordMessageStrategy, AsyncDiscordMessageStrategy]
 
-class DiscordMessageHandler(BaseMessageHandler):
+
+class DiscordMessageHandler(AsyncBaseMessageHandler):
     """Discord 消息处理器"""
 
     def __init__(self):
@@ -14,34 +19,57 @@ class DiscordMessageHandler(BaseMessageHandler):
         # Discord 特定的指令模式
         self.command_pattern = re.compile(r'^!(\w+)\s*(.*)')
 
-        # 初始化策略列表
-        self.strategies: List[DiscordMessageStrategy] = []
-        self._init_strategies()
-
-    def _init_strategies(self):
-        """初始化所有策略"""
-        # 添加 thunder 监听策略
-        monitor_strategy = ThunderboltMonitorStrategy()
-        self.strategies.append(monitor_strategy)
+        # 策略由平台插件按DISCORD_STRATEGIES配置导入后通过add_strategy添加，配置热加载时通过set_strategies替换，
+        # 见core/plugins.py
+        self.strategies: List[Strategy] = []
+        # 根据策略声明的匹配条件建立索引，每条消息只交给可能匹配的策略
+        self.strategy_index = StrategyIndex(self.strategies, self.command_pattern)
 
-        # todo 后续在这里可以新增不同的业务策略
-
-    def add_strategy(self, strategy: DiscordMessageStrategy):
+    def add_strategy(self, strategy: Strategy):
         """ 添加新策略 """
         self.strategies.append(strategy)
+        self.strategy_index = StrategyIndex(self.strategies, self.command_pattern)
         self.logger.info(f"添加了新的处理策略: {strategy.__class__.__name__}")
 
-    def handle_message(self, message: Message) -> None:
+    def set_strategies(self, strategies: List[Strategy]) -> None:
+        """整体替换策略，新索引建好后再替换引用，正在处理的消息继续使用旧索引"""
+        strategy_index = StrategyIndex(strategies, self.command_pattern)
+        self.strategies = list(strategies)
+        self.strategy_index = strategy_index
+
+    async def handle_message(self, message: Message) -> None:
         """处理 Discord 消息"""
-        self.logger.info(f"进入DiscordMessageHandler.handle_message方法，消息内容：{message.content[:30]}...")
-        super().handle_message(message)
-
-        # 使用策略模式处理消息
-        for strategy in self.strategies:
-            if strategy.can_handle(message):
-                self.logger.info(f"使用 {strategy.__class__.__name__} 处理消息")
-                success = strategy.process(message)
+        self.message_logger.info("进入DiscordMessageHandler.handle_message方法，消息内容：%s...", message.content[:30])
+        await super().handle_message(message)
+
+        # 使用策略模式处理消息，只遍历索引筛选出的候选策略
+        for strategy in self.strategy_index.candidates(message):
+            if await self._can_handle(strategy, message):
+                name = strategy.__class__.__name__
+                self.message_logger.info("使用 %s 处理消息", name)
+                STRATEGY_MATCHED.inc(name)
+                start = time.perf_counter()
+                try:
+                    success = await self._process(strategy, message)
+                finally:
+                    STRATEGY_SECONDS.observe(time.perf_counter() - start, name)
                 if success:
                     break  # 如果某个策略成功处理，则停止
 
-        self.logger.info("完成DiscordMessageHandler.handle_message处理")
+        self.message_logger.info("完成DiscordMessageHandler.handle_message处理")
+
+    @staticmethod
+    async def _can_handle(strategy: Strategy, message: Message) -> bool:
+        """判断策略能否处理消息，兼容同步和异步策略"""
+        if isinstance(strategy, AsyncDiscordMessageStrategy):
+            return await strategy.can_handle(message)
+        return strategy.can_handle(message)
+
+    @staticmethod
+    async def _process(strategy: Strategy, message: Message) -> bool:
+        """执行策略，异步策略直接await，阻塞型同步策略放到执行器中运行"""
+        if isinstance(strategy, AsyncDiscordMessageStrategy):
+            return await strategy.process(message)
+        if strategy.blocking:
+            return await run_blocking(strategy.process, message)
+        return strategy.process(message)
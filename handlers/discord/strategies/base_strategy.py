@@ -1,9 +1,33 @@
 from abc import ABC, abstractmethod
+from typing import FrozenSet, Tuple
 from models.message import Message
 
-class DiscordMessageStrategy(ABC):
+
+class StrategyCriteria:
+    """
+    策略的声明式匹配条件，DiscordMessageHandler据此建立索引，只对可能匹配的策略调用can_handle
+    
+    每个维度为空表示不限制；声明了多个维度时需要同时满足。
+    """
+    
+    # 频道ID（与Message.metadata["channel_id"]比较）
+    channel_ids: FrozenSet[str] = frozenset()
+    # 作者ID
+    author_ids: FrozenSet[str] = frozenset()
+    # 指令名称（不含"!"，不区分大小写），使用DiscordMessageHandler.command_pattern解析
+    commands: FrozenSet[str] = frozenset()
+    # 关键词（不区分大小写），消息内容包含任意一个即满足
+    keywords: Tuple[str, ...] = ()
+
+
+class DiscordMessageStrategy(StrategyCriteria, ABC):
     """Discord消息处理策略接口"""
     
+    # 是否为阻塞型策略，为True时process会被放到执行器（线程池/进程池）中运行
+    # 需要发起HTTP请求的策略优先使用utils.http_client.get_http_client()提供的共享连接池，而不是阻塞型请求
+    # 需要向下游发送告警的策略使用forwarding.forwarder.get_forwarder().publish()，由转发器负责合并和限速
+    blocking: bool = False
+    
     @abstractmethod
     def process(self, message: Message) -> bool:
         """
@@ -28,4 +52,34 @@ class DiscordMessageStrategy(ABC):
         Returns:
             bool: 是否能处理此消息
         """
-        pass 
\ No newline at end of file
+        pass
+
+
+class AsyncDiscordMessageStrategy(StrategyCriteria, ABC):
+    """异步Discord消息处理策略接口，需要进行网络请求等IO操作的策略应实现此接口"""
+    
+    @abstractmethod
+    async def process(self, message: Message) -> bool:
+        """
+        异步处理Discord消息
+        
+        Args:
+            message: 统一的消息模型
+            
+        Returns:
+            bool: 是否成功处理消息
+        """
+        pass
+    
+    @abstractmethod
+    async def can_handle(self, message: Message) -> bool:
+        """
+        异步判断该策略是否能处理此消息
+        
+        Args:
+            message: 统一的消息模型
+            
+        Returns:
+            bool: 是否能处理此消息
+        """
+        pass
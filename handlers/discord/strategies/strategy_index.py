@@ -0,0 +1,99 @@
+from typing import Dict, Iterator, List, Optional, Pattern, Sequence
+
+from handlers.pattern_matcher import AhoCorasick
+from models.message import Message
+
+
+class StrategyIndex:
+    """
+    策略索引，根据策略声明的频道、作者、指令和关键词条件，快速找出可能处理某条消息的策略
+
+    每个策略对应一个比特位，各维度分别查表得到满足条件的策略位掩码，再按位与得到候选策略，
+    关键词统一编译进一个Aho-Corasick自动机，每条消息只扫描一次。候选策略保持注册顺序。
+    """
+
+    def __init__(self, strategies: Sequence, command_pattern: Optional[Pattern] = None):
+        """
+        建立索引
+
+        Args:
+            strategies: 按优先级排列的策略列表
+            command_pattern: 解析指令名称的正则，第一个分组为指令名称
+        """
+        self.strategies = list(strategies)
+        self.command_pattern = command_pattern
+        self._all = (1 << len(self.strategies)) - 1
+
+        self._by_channel: Dict[str, int] = {}
+        self._by_author: Dict[str, int] = {}
+        self._by_command: Dict[str, int] = {}
+        # 未声明某维度条件的策略在该维度上视为全部满足
+        self._channel_wildcard = 0
+        self._author_wildcard = 0
+        self._command_wildcard = 0
+        self._keyword_wildcard = 0
+
+        keywords: List[str] = []
+        keyword_masks: List[int] = []
+        keyword_positions: Dict[str, int] = {}
+
+        for position, strategy in enumerate(self.strategies):
+            bit = 1 << position
+            self._channel_wildcard |= self._index(self._by_channel, getattr(strategy, "channel_ids", ()), bit)
+            self._author_wildcard |= self._index(self._by_author, getattr(strategy, "author_ids", ()), bit)
+            self._command_wildcard |= self._index(
+                self._by_command, [c.lower() for c in getattr(strategy, "commands", ())], bit)
+
+            strategy_keywords = [k.lower() for k in getattr(strategy, "keywords", ()) if k]
+            if not strategy_keywords:
+                self._keyword_wildcard |= bit
+            for keyword in strategy_keywords:
+                if keyword not in keyword_positions:
+                    keyword_positions[keyword] = len(keywords)
+                    keywords.append(keyword)
+                    keyword_masks.append(0)
+                keyword_masks[keyword_positions[keyword]] |= bit
+
+        self._keyword_masks = keyword_masks
+        self._automaton = AhoCorasick(keywords) if keywords else None
+
+    @staticmethod
+    def _index(table: Dict[str, int], values, bit: int) -> int:
+        """把策略位加入各个取值的位掩码，没有声明条件时返回该策略位作为通配"""
+        values = list(values)
+        if not values:
+            return bit
+        for value in values:
+            key = str(value)
+            table[key] = table.get(key, 0) | bit
+        return 0
+
+    def candidates(self, message: Message) -> Iterator:
+        """
+        按注册顺序返回可能处理该消息的策略
+
+        Args:
+            message: 统一的消息模型
+        """
+        mask = self._all
+        if self._by_channel:
+            mask &= self._channel_wildcard | self._by_channel.get(message.metadata.get("channel_id"), 0)
+        if mask and self._by_author:
+            mask &= self._author_wildcard | self._by_author.get(message.author_id, 0)
+        if mask and self._by_command:
+            command_mask = self._command_wildcard
+            match = self.command_pattern.match(message.content) if self.command_pattern else None
+            if match:
+                command_mask |= self._by_command.get(match.group(1).lower(), 0)
+            mask &= command_mask
+        # 只有候选策略中存在关键词条件时才扫描消息内容
+        if mask & ~self._keyword_wildcard and self._automaton is not None:
+            keyword_mask = self._keyword_wildcard
+            for index in self._automaton.find_indices(message.content):
+                keyword_mask |= self._keyword_masks[index]
+            mask &= keyword_mask
+
+        while mask:
+            lowest = mask & -mask
+            yield self.strategies[lowest.bit_length() - 1]
+            mask ^= lowest
@@ -0,0 +1,83 @@
+import asyncio
+import dataclasses
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from config.settings import HANDLER_EXECUTOR, HANDLER_EXECUTOR_WORKERS
+from models.message import Message
+from utils.exceptions import ConfigError
+from utils.logger import setup_logger
+
+logger = setup_logger("HandlerExecutor")
+
+T = TypeVar("T")
+
+EXECUTOR_THREAD = "thread"
+EXECUTOR_PROCESS = "process"
+
+_executor: Optional[Executor] = None
+
+
+def blocking(func: Callable[..., T]) -> Callable[..., T]:
+    """
+    将同步处理函数标记为阻塞型，MessageHandler会把它放到执行器中运行，避免阻塞事件循环
+
+    用法:
+        @blocking
+        def handle_message(self, message): ...
+    """
+    func.blocking = True
+    return func
+
+
+def is_blocking(func: Any) -> bool:
+    """判断处理函数是否被标记为阻塞型"""
+    return bool(getattr(func, "blocking", False))
+
+
+def get_executor() -> Executor:
+    """获取全局共享的执行器，首次调用时根据配置创建"""
+    global _executor
+    if _executor is None:
+        if HANDLER_EXECUTOR == EXECUTOR_THREAD:
+            _executor = ThreadPoolExecutor(max_workers=HANDLER_EXECUTOR_WORKERS, thread_name_prefix="handler")
+        elif HANDLER_EXECUTOR == EXECUTOR_PROCESS:
+            _executor = ProcessPoolExecutor(max_workers=HANDLER_EXECUTOR_WORKERS)
+        else:
+            raise ConfigError(f"未知的处理器执行器类型: {HANDLER_EXECUTOR}，可选值: thread、process")
+        logger.info(f"已创建 {HANDLER_EXECUTOR} 执行器，工作者数量: {HANDLER_EXECUTOR_WORKERS}")
+    return _executor
+
+
+def _prepare_message(message: Message) -> Message:
+    """
+    进程池中无法传递原始平台对象（不可序列化），只传递去掉raw_message的副本，
+    CompactMessage在序列化时本身就不包含原始消息对象
+    """
+    if HANDLER_EXECUTOR == EXECUTOR_PROCESS and isinstance(message, Message) and message.raw_message is not None:
+        return dataclasses.replace(message, raw_message=None)
+    return message
+
+
+async def run_blocking(func: Callable[[Message], T], message: Message) -> T:
+    """
+    在执行器中运行阻塞型处理函数
+
+    Args:
+        func: 同步处理函数，使用进程池时必须可以被pickle
+        message: 统一的消息模型
+
+    Returns:
+        处理函数的返回值
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), func, _prepare_message(message))
+
+
+def shutdown_executor(wait: bool = True) -> None:
+    """关闭全局执行器"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait)
+        _executor = None
+        logger.info("处理器执行器已关闭")
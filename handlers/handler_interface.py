@@ -12,4 +12,18 @@ class MessageHandlerInterface(ABC):
         Args:
             message: 统一的消息模型
         """
-        pass 
\ No newline at end of file
+        pass
+
+
+class AsyncMessageHandlerInterface(ABC):
+    """异步消息处理器接口，处理过程中涉及网络、磁盘等IO操作的处理器应实现此接口"""
+    
+    @abstractmethod
+    async def handle_message(self, message: Message) -> None:
+        """
+        异步处理消息
+        
+        Args:
+            message: 统一的消息模型
+        """
+        pass
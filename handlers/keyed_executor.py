@@ -0,0 +1,183 @@
+import asyncio
+import inspect
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from models.message import Message
+from utils.exceptions import ConfigError
+from utils.logger import setup_logger
+from utils.metrics import REGISTRY
+
+KEYED_PENDING = REGISTRY.gauge("scraper_handler_pending", "已接收但尚未处理完的消息数量")
+KEYED_KEY_DEPTH = REGISTRY.gauge("scraper_handler_key_depth", "各频道排队等待处理的消息数量，只包含有积压的频道",
+                                 ["key"])
+
+
+def message_key(message: Message) -> str:
+    """顺序键：同一频道（没有频道时同一作者）的消息按到达顺序处理"""
+    return f"{message.platform}:{message.metadata.get('channel_id') or message.author_id}"
+
+
+class KeyedExecutor:
+    """
+    按键保序的并发执行器
+
+    - 同一个键的任务按提交顺序逐个执行，前一个完成后才开始下一个
+    - 不同键的任务并发执行，同时执行的任务数量不超过concurrency
+    - 每次执行完一个任务后重新排队获取执行名额，热点键不会长期占用名额
+    - 已提交未完成的任务达到max_pending时，submit等待，向上游施加背压
+
+    事件循环内的同步原语在首次提交时创建
+    """
+
+    def __init__(self, concurrency: int = 8, max_pending: int = 10000, name: str = "KeyedExecutor"):
+        """
+        初始化执行器
+
+        Args:
+            concurrency: 同时执行的任务数量上限
+            max_pending: 已提交未完成的任务数量上限，小于等于0表示不限制
+            name: 日志名称
+        """
+        if concurrency < 1:
+            raise ConfigError(f"并发数量必须大于0: {concurrency}")
+        self.logger = setup_logger(name)
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+
+        # 键 -> 等待执行的任务，键的任务全部完成后删除
+        self.queues: Dict[str, Deque[Tuple[Callable[..., Any], Tuple[Any, ...]]]] = {}
+        # 键 -> 依次执行该键任务的协程
+        self.tasks: Dict[str, asyncio.Task] = {}
+
+        self._running: Optional[asyncio.Semaphore] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._idle: Optional[asyncio.Event] = None
+
+        # 统计信息
+        self.pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _ensure_primitives(self) -> None:
+        if self._running is None:
+            self._running = asyncio.Semaphore(self.concurrency)
+            self._slots = asyncio.Semaphore(self.max_pending) if self.max_pending > 0 else None
+            self._idle = asyncio.Event()
+            self._idle.set()
+            KEYED_PENDING.set_function(lambda: self.pending)
+
+    async def submit(self, key: str, func: Callable[..., Any], *args: Any) -> None:
+        """
+        提交任务，任务进入键的队列后立即返回，不等待执行完成
+
+        Args:
+            key: 顺序键
+            func: 普通函数或协程函数
+            args: 调用参数
+        """
+        self._ensure_primitives()
+        if self._slots is not None:
+            await self._slots.acquire()
+
+        queue = self.queues.get(key)
+        if queue is None:
+            queue = self.queues[key] = deque()
+        queue.append((func, args))
+        self.pending += 1
+        self.submitted += 1
+        self._idle.clear()
+        KEYED_KEY_DEPTH.set(len(queue), key)
+
+        if key not in self.tasks:
+            self.tasks[key] = asyncio.create_task(self._drain(key, queue))
+
+    async def _drain(self, key: str, queue: Deque[Tuple[Callable[..., Any], Tuple[Any, ...]]]) -> None:
+        """依次执行一个键的任务，队列清空后退出"""
+        try:
+            while queue:
+                async with self._running:
+                    func, args = queue.popleft()
+                    KEYED_KEY_DEPTH.set(len(queue), key)
+                    try:
+                        result = func(*args)
+                        if inspect.isawaitable(result):
+                            await result
+                        self.completed += 1
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        self.failed += 1
+                        self.logger.error("执行 %s 的任务时发生错误: %s", key, e, exc_info=True)
+                    finally:
+                        self._task_done()
+        finally:
+            # 检查队列和删除之间没有等待，submit不会在这里插入任务
+            del self.tasks[key]
+            if not queue:
+                del self.queues[key]
+                KEYED_KEY_DEPTH.remove(key)
+
+    def _task_done(self) -> None:
+        self.pending -= 1
+        if self._slots is not None:
+            self._slots.release()
+        if self.pending == 0:
+            self._idle.set()
+
+    def depth(self, key: str) -> int:
+        """键排队等待执行的任务数量（不含正在执行的任务）"""
+        queue = self.queues.get(key)
+        return len(queue) if queue else 0
+
+    def depths(self) -> Dict[str, int]:
+        """所有有未完成任务的键及其排队数量"""
+        return {key: len(queue) for key, queue in self.queues.items()}
+
+    def hot_keys(self, limit: int = 10) -> List[Tuple[str, int]]:
+        """排队数量最多的键"""
+        return sorted(self.depths().items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "active_keys": len(self.tasks),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    async def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待已提交的任务全部完成
+
+        Returns:
+            bool: 是否在超时前全部完成
+        """
+        if self._idle is None:
+            return True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def close(self, timeout: Optional[float] = None) -> None:
+        """等待已提交的任务完成，超时后取消剩余任务"""
+        if self.pending:
+            self.logger.info(f"正在等待 {self.pending} 条消息处理完毕，积压最多的频道: {self.hot_keys(3)}")
+        if not await self.join(timeout):
+            self.logger.warning(f"等待消息处理超时，放弃剩余 {self.pending} 条消息")
+            tasks = list(self.tasks.values())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for key in list(self.queues):
+                KEYED_KEY_DEPTH.remove(key)
+            self.queues.clear()
+            self.pending = 0
+            if self._idle is not None:
+                self._idle.set()
+        # 重新打开时在新的事件循环中创建同步原语
+        self._running = self._slots = self._idle = None
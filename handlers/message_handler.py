@@ -1,51 +1,155 @@
-from typing import Dict, List, Callable, Any
+import asyncio
+import inspect
+import time
+from typing import Dict, List, Callable, Any, Optional, Set
+from config.settings import HANDLER_CONCURRENCY, HANDLER_MAX_PENDING, ATTACHMENT_PREFETCH
 from models.message import Message
-from utils.logger import setup_logger
+from handlers.executor import is_blocking, run_blocking
+from handlers.keyed_executor import KeyedExecutor, message_key
+from utils.logger import setup_logger, get_message_logger
+from utils.metrics import HANDLER_SECONDS, HANDLER_ERRORS
 
 
 class MessageHandler:
     """
     消息处理器，负责处理从各平台接收到的消息
+
+    处理函数可以是普通函数、协程函数，或被标记为阻塞型的普通函数：
+    - 协程函数会被并发执行
+    - 阻塞型函数会被放到执行器（线程池/进程池）中运行
+    - 其他普通函数直接在事件循环中调用，应保证足够轻量
+
+    消息交给按频道保序的执行器：同一频道（没有频道时同一作者）的消息按到达顺序逐条处理，
+    不同频道并发处理，同时处理的消息数量不超过concurrency
     """
-    
-    def __init__(self):
+
+    def __init__(self, concurrency: int = HANDLER_CONCURRENCY, max_pending: int = HANDLER_MAX_PENDING):
+        """
+        初始化消息处理器
+
+        Args:
+            concurrency: 同时处理的消息数量上限，为0时由调用方直接处理，不保证同一频道的顺序
+            max_pending: 已接收但尚未处理完的消息数量上限，小于等于0表示不限制
+        """
         self.logger = setup_logger("MessageHandler")
-        self.global_handlers: List[Callable[[Message], None]] = []
-        self.platform_handlers: Dict[str, List[Callable[[Message], None]]] = {}
-    
-    def register_global_handler(self, handler: Callable[[Message], None]) -> None:
-        """注册全局消息处理器"""
+        # 逐条消息的日志，可按配置采样或限速
+        self.message_logger = get_message_logger("MessageHandler")
+        self.global_handlers: List[Callable[[Message], Any]] = []
+        self.platform_handlers: Dict[str, List[Callable[[Message], Any]]] = {}
+        # 注册时声明为阻塞型的处理函数
+        self.blocking_handlers: Set[Callable[[Message], Any]] = set()
+        # 处理函数的指标标签名称，注册时计算一次
+        self.handler_names: Dict[Callable[[Message], Any], str] = {}
+        self.executor: Optional[KeyedExecutor] = KeyedExecutor(
+            concurrency, max_pending, name="MessageHandler.executor") if concurrency > 0 else None
+        # 附件预取用到aiohttp，只在开启时导入
+        self.attachment_fetcher: Optional[Callable[[], Any]] = None
+        if ATTACHMENT_PREFETCH:
+            from storage.attachments import get_attachment_fetcher
+            self.attachment_fetcher = get_attachment_fetcher
+
+    def register_global_handler(self, handler: Callable[[Message], Any], blocking: bool = False) -> None:
+        """
+        注册全局消息处理器
+
+        Args:
+            handler: 消息处理函数
+            blocking: 是否为阻塞型处理函数
+        """
+        if blocking:
+            self.blocking_handlers.add(handler)
         self.global_handlers.append(handler)
-        self.logger.info(f"已注册全局消息处理器: {handler.__name__ if hasattr(handler, '__name__') else str(handler)}")
-    
-    def register_platform_handler(self, platform: str, handler: Callable[[Message], None]) -> None:
-        """注册特定平台的消息处理器"""
+        self.logger.info(f"已注册全局消息处理器: {self._handler_name(handler)}")
+
+    def register_platform_handler(self, platform: str, handler: Callable[[Message], Any], blocking: bool = False) -> None:
+        """
+        注册特定平台的消息处理器
+
+        Args:
+            platform: 平台名称
+            handler: 消息处理函数
+            blocking: 是否为阻塞型处理函数
+        """
         if platform not in self.platform_handlers:
             self.platform_handlers[platform] = []
-        
+
+        if blocking:
+            self.blocking_handlers.add(handler)
         self.platform_handlers[platform].append(handler)
-        self.logger.info(f"已注册 {platform} 平台消息处理器: {handler.__name__ if hasattr(handler, '__name__') else str(handler)}")
-    
-    def handle_message(self, message: Message) -> None:
-        """处理接收到的消息"""
+        self.logger.info(f"已注册 {platform} 平台消息处理器: {self._handler_name(handler)}")
+
+    def _handler_name(self, handler: Callable[[Message], Any]) -> str:
+        """返回处理函数的名称，用于日志和指标标签"""
+        name = self.handler_names.get(handler)
+        if name is None:
+            name = getattr(handler, '__qualname__', None) or getattr(handler, '__name__', None) or str(handler)
+            self.handler_names[handler] = name
+        return name
+
+    async def handle_message(self, message: Message) -> None:
+        """
+        接收消息，消息进入所在频道的队列后返回；未启用执行器时直接处理
+
+        队列中未处理完的消息达到上限时等待，向分发队列施加背压。
+        开启ATTACHMENT_PREFETCH时附件在入队前开始下载，处理器通过get_attachment_fetcher().fetch_all(message)取得本地文件
+        """
+        if self.attachment_fetcher is not None and message.attachments:
+            self.attachment_fetcher().prefetch(message)
+        if self.executor is None:
+            await self.process(message)
+            return
+        # 入队前不能有等待，保证同一频道的消息按调用顺序入队
+        await self.executor.submit(message_key(message), self.process, message)
+
+    async def process(self, message: Message) -> None:
+        """处理一条消息，所有处理器并发执行"""
         try:
             # 记录接收到的消息
-            self.logger.info(f"接收到来自 {message.platform} 的消息, ID: {message.id}, 作者: {message.author_name}")
-            
-            # 调用全局处理器
-            for handler in self.global_handlers:
-                try:
-                    handler(message)
-                except Exception as e:
-                    self.logger.error(f"全局处理器执行错误: {e}", exc_info=True)
-            
+            self.message_logger.info("接收到来自 %s 的消息, ID: %s, 作者: %s", message.platform, message.id,
+                                     message.author_name)
+
+            calls = [self._invoke(handler, message, "全局处理器") for handler in self.global_handlers]
+
             # 调用平台特定处理器
             if message.platform in self.platform_handlers:
-                for handler in self.platform_handlers[message.platform]:
-                    try:
-                        handler(message)
-                    except Exception as e:
-                        self.logger.error(f"{message.platform} 平台处理器执行错误: {e}", exc_info=True)
-        
+                scope = f"{message.platform} 平台处理器"
+                calls.extend(self._invoke(handler, message, scope)
+                             for handler in self.platform_handlers[message.platform])
+
+            await asyncio.gather(*calls)
+
+        except Exception as e:
+            self.logger.error("处理消息时发生错误: %s", e, exc_info=True)
+
+    async def _invoke(self, handler: Callable[[Message], Any], message: Message, scope: str) -> None:
+        """调用单个处理器，异常只记录日志，不影响其他处理器"""
+        name = self._handler_name(handler)
+        start = time.perf_counter()
+        try:
+            if handler in self.blocking_handlers or is_blocking(handler):
+                await run_blocking(handler, message)
+                return
+
+            result = handler(message)
+            if inspect.isawaitable(result):
+                await result
         except Exception as e:
-            self.logger.error(f"处理消息时发生错误: {e}", exc_info=True) 
\ No newline at end of file
+            HANDLER_ERRORS.inc(name)
+            self.logger.error("%s执行错误: %s", scope, e, exc_info=True)
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - start, name)
+
+    def queue_depths(self) -> Dict[str, int]:
+        """各频道排队等待处理的消息数量，只包含有积压的频道"""
+        return self.executor.depths() if self.executor is not None else {}
+
+    async def close(self, timeout: Optional[float] = None) -> None:
+        """
+        等待已接收的消息处理完毕
+
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待，超时后放弃剩余消息
+        """
+        if self.executor is not None:
+            await self.executor.close(timeout)
+            self.logger.info(f"消息处理器已停止: {self.executor.stats()}")
@@ -0,0 +1,339 @@
+import asyncio
+import json
+import os
+import re
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from config.settings import PATTERN_FILE
+from utils.exceptions import ConfigError
+from utils.logger import setup_logger
+
+
+class PatternSpec(NamedTuple):
+    """一条匹配规则"""
+    # 规则名称，命中结果中返回
+    name: str
+    # 字面量或正则表达式
+    pattern: str
+    # 是否为正则表达式
+    regex: bool = False
+    # 是否忽略大小写
+    ignore_case: bool = True
+
+
+class PatternHit(NamedTuple):
+    """一次命中"""
+    name: str
+    start: int
+    end: int
+    text: str
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick自动机，一次扫描找出文本中出现的所有字面量（允许重叠）
+    """
+
+    def __init__(self, literals: Sequence[str], ignore_case: bool = True):
+        """
+        构建自动机
+
+        Args:
+            literals: 字面量列表，命中结果中使用其下标
+            ignore_case: 是否忽略大小写
+        """
+        self.literals = list(literals)
+        self.ignore_case = ignore_case
+        # 每个状态的转移表、失败指针和输出（字面量下标）
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+
+        for index, literal in enumerate(self.literals):
+            if not literal:
+                continue
+            state = 0
+            for char in self._normalize(literal):
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._output[state] += (index,)
+
+        # 广度优先计算失败指针，并合并失败状态的输出
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def _normalize(self, text: str) -> str:
+        if not self.ignore_case:
+            return text
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            return lowered
+        # 个别字符小写后长度会变化，逐字符处理以保证命中位置与原文一致
+        return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """
+        逐个返回命中结果
+
+        Args:
+            text: 待扫描的文本
+
+        Returns:
+            Iterator[Tuple[int, int]]: (字面量下标, 结束位置)，结束位置不包含
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for position, char in enumerate(self._normalize(text)):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield index, position + 1
+
+    def find_indices(self, text: str) -> Set[int]:
+        """返回文本中出现的字面量下标集合"""
+        found: Set[int] = set()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in self._normalize(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class CompiledPatternSet:
+    """
+    编译后的规则集合，创建后不再修改，可以被多个协程或线程同时使用
+
+    - 字面量按是否忽略大小写分别编译进Aho-Corasick自动机，返回所有（包括重叠的）命中
+    - 正则表达式逐条扫描，每条规则的命中与单独调用finditer一致，不同规则之间的命中可以重叠；
+      不含分组的正则另外合并成一个大正则做预筛选，整段文本都没有命中时不再逐条扫描
+    """
+
+    def __init__(self, specs: Iterable[PatternSpec], version: int = 0):
+        self.specs: List[PatternSpec] = list(specs)
+        self.version = version
+
+        literal_groups: Dict[bool, List[int]] = {True: [], False: []}
+        # (正则, 规则下标)
+        self._regexes: List[Tuple[re.Pattern, int]] = []
+        for position, spec in enumerate(self.specs):
+            if spec.regex:
+                try:
+                    regex = re.compile(spec.pattern, re.IGNORECASE if spec.ignore_case else 0)
+                except re.error as e:
+                    raise ConfigError(f"规则 {spec.name} 的正则表达式无效: {spec.pattern} ({e})") from e
+                self._regexes.append((regex, position))
+            elif spec.pattern:
+                literal_groups[spec.ignore_case].append(position)
+
+        # (自动机, 自动机下标 -> 规则下标)
+        self._automata: List[Tuple[AhoCorasick, List[int]]] = []
+        for ignore_case, positions in literal_groups.items():
+            if positions:
+                automaton = AhoCorasick([self.specs[p].pattern for p in positions], ignore_case=ignore_case)
+                self._automata.append((automaton, positions))
+
+        # 预筛选: 合并正则在某个位置能匹配，当且仅当至少一条规则在这个位置能匹配，
+        # 所以没有命中时可以跳过逐条扫描，命中时各规则从第一个命中位置开始扫描即可。
+        # 含分组的正则合并后反向引用的编号会错位，这些规则不参与预筛选，每次都逐条扫描
+        self._prefilter: Optional[re.Pattern] = None
+        self._prefiltered: List[Tuple[re.Pattern, int]] = []
+        self._unfiltered: List[Tuple[re.Pattern, int]] = []
+        for regex, position in self._regexes:
+            (self._unfiltered if regex.groups else self._prefiltered).append((regex, position))
+        if self._prefiltered:
+            parts = []
+            for regex, position in self._prefiltered:
+                flags = "i" if self.specs[position].ignore_case else "-i"
+                parts.append(f"(?{flags}:{regex.pattern})")
+            try:
+                self._prefilter = re.compile("|".join(parts))
+            except re.error:
+                # 个别写法（例如全局标志）不能放进分组，退化为全部逐条扫描
+                self._unfiltered = self._regexes
+                self._prefiltered = []
+
+    def __len__(self) -> int:
+        return len(self.specs)
+
+    def scan(self, text: str) -> List[PatternHit]:
+        """
+        扫描文本，返回所有命中，按起始位置排序
+
+        Args:
+            text: 待扫描的文本
+        """
+        hits: List[PatternHit] = []
+        specs = self.specs
+        for automaton, positions in self._automata:
+            for index, end in automaton.iter_matches(text):
+                spec = specs[positions[index]]
+                start = end - len(spec.pattern)
+                hits.append(PatternHit(spec.name, start, end, text[start:end]))
+
+        regexes = self._unfiltered
+        start = 0
+        if self._prefilter is not None:
+            first = self._prefilter.search(text)
+            if first is not None:
+                regexes = self._regexes
+                start = first.start()
+        for regex, position in regexes:
+            # 开始位置之前的文本仍可被^、后向断言看到，结果与从头扫描相同
+            for match in regex.finditer(text, start if regex.groups == 0 else 0):
+                if match.start() != match.end():
+                    hits.append(PatternHit(specs[position].name, match.start(), match.end(), match.group()))
+
+        hits.sort(key=lambda hit: (hit.start, hit.end))
+        return hits
+
+    def matched_names(self, text: str) -> Set[str]:
+        """返回文本命中的规则名称集合"""
+        return {hit.name for hit in self.scan(text)}
+
+
+def load_pattern_file(path: str) -> List[PatternSpec]:
+    """
+    从文件加载规则
+
+    支持两种格式:
+    - .json: 列表，每项为 {"name": ..., "pattern": ..., "regex": false, "ignore_case": true}
+    - 其他: 每行一条规则，"#"开头为注释，"re:"开头为正则表达式，可用"名称=规则"指定名称
+
+    Args:
+        path: 规则文件路径
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(".json"):
+            return [PatternSpec(item.get("name") or item["pattern"], item["pattern"], item.get("regex", False),
+                                item.get("ignore_case", True)) for item in json.load(f)]
+
+        specs = []
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            regex = line.startswith("re:")
+            if regex:
+                line = line[3:]
+            # 只有"="前是普通单词时才视为"名称=规则"，规则本身也可能包含"="
+            name, sep, pattern = line.partition("=")
+            if not sep or not re.fullmatch(r"\w+", name):
+                name, pattern = line, line
+            specs.append(PatternSpec(name, pattern, regex))
+        return specs
+
+
+class PatternMatcher:
+    """
+    共享的多规则匹配引擎，供各个策略扫描消息内容
+
+    规则集合编译一次后以不可变对象的形式保存，reload时在后台编译新集合再整体替换引用，
+    正在进行的扫描继续使用旧集合，不需要加锁，也不会丢失消息。
+    """
+
+    def __init__(self, specs: Iterable[PatternSpec] = (), source_file: Optional[str] = None):
+        """
+        初始化匹配引擎
+
+        Args:
+            specs: 初始规则
+            source_file: 规则文件路径，设置后可通过reload_from_file或watch_file热加载
+        """
+        self.logger = setup_logger("PatternMatcher")
+        self.source_file = source_file
+        self._source_mtime: Optional[float] = None
+        if source_file and not specs:
+            specs = self._read_source()
+        self._compiled = CompiledPatternSet(specs, version=1)
+
+    @property
+    def compiled(self) -> CompiledPatternSet:
+        """当前使用的规则集合"""
+        return self._compiled
+
+    @property
+    def version(self) -> int:
+        return self._compiled.version
+
+    def scan(self, text: str) -> List[PatternHit]:
+        """扫描文本，返回所有命中"""
+        return self._compiled.scan(text)
+
+    def matched_names(self, text: str) -> Set[str]:
+        """返回文本命中的规则名称集合"""
+        return self._compiled.matched_names(text)
+
+    def reload(self, specs: Iterable[PatternSpec]) -> None:
+        """同步编译新规则并替换，编译失败时保留旧规则并抛出异常"""
+        compiled = CompiledPatternSet(specs, version=self._compiled.version + 1)
+        self._compiled = compiled
+        self.logger.info(f"规则已更新到版本 {compiled.version}，共 {len(compiled)} 条")
+
+    async def reload_async(self, specs: Iterable[PatternSpec]) -> None:
+        """在线程池中编译新规则再替换，避免大规则集编译时阻塞事件循环"""
+        specs = list(specs)
+        version = self._compiled.version + 1
+        loop = asyncio.get_running_loop()
+        compiled = await loop.run_in_executor(None, CompiledPatternSet, specs, version)
+        self._compiled = compiled
+        self.logger.info(f"规则已更新到版本 {compiled.version}，共 {len(compiled)} 条")
+
+    def _read_source(self) -> List[PatternSpec]:
+        self._source_mtime = os.path.getmtime(self.source_file)
+        return load_pattern_file(self.source_file)
+
+    async def reload_from_file(self) -> bool:
+        """
+        规则文件有变化时重新加载
+
+        Returns:
+            bool: 是否重新加载了规则
+        """
+        if not self.source_file:
+            return False
+        try:
+            mtime = os.path.getmtime(self.source_file)
+            if mtime == self._source_mtime:
+                return False
+            await self.reload_async(self._read_source())
+            return True
+        except Exception as e:
+            self.logger.error(f"重新加载规则文件 {self.source_file} 失败，继续使用旧规则: {e}", exc_info=True)
+            return False
+
+    async def watch_file(self, interval: float = 5.0) -> None:
+        """定期检查规则文件，有变化时自动重新加载，直到任务被取消"""
+        while True:
+            await asyncio.sleep(interval)
+            await self.reload_from_file()
+
+
+_shared_matcher: Optional[PatternMatcher] = None
+
+
+def get_pattern_matcher() -> PatternMatcher:
+    """获取进程内共享的匹配引擎，配置了PATTERN_FILE时从该文件加载规则"""
+    global _shared_matcher
+    if _shared_matcher is None:
+        _shared_matcher = PatternMatcher(source_file=PATTERN_FILE or None)
+    return _shared_matcher
@@ -10,6 +10,6 @@ class TelegramMessageHandler(BaseMessageHandler):
         super().__init__("Telegram")
     
     def handle_message(self, message: Message) -> None:
-        self.logger.info(f"处理 Telegram 消息: {message.content[:50]}...")
+        self.message_logger.info("处理 Telegram 消息: %s...", message.content[:50])
         super().handle_message(message)
         # Telegram 特定的处理逻辑 
\ No newline at end of file
@@ -9,6 +9,6 @@ class TwitterMessageHandler(BaseMessageHandler):
         super().__init__("Twitter")
     
     def handle_message(self, message: Message) -> None:
-        self.logger.info(f"处理 Twitter 消息: {message.content[:50]}...")
+        self.message_logger.info("处理 Twitter 消息: %s...", message.content[:50])
         super().handle_message(message)
         # Twitter 特定的处理逻辑 
\ No newline at end of file
@@ -3,19 +3,73 @@ import signal
 import sys
 from typing import Dict, List
 
-from config.settings import ENABLED_PLATFORMS
+from config.settings import ENABLED_PLATFORMS, DISPATCH_QUEUE_SIZE, DISPATCH_WORKERS, DISPATCH_OVERFLOW_POLICY, \
+    DISPATCH_DRAIN_TIMEOUT, DEDUP_ENABLED, DEDUP_TTL, DEDUP_MAX_ENTRIES, DEDUP_BLOOM_CAPACITY, \
+    DEDUP_BLOOM_ERROR_RATE, DEDUP_STATE_FILE, PATTERN_FILE, PATTERN_RELOAD_INTERVAL, METRICS_ENABLED, METRICS_HOST, \
+    METRICS_PORT, METRICS_LOG_INTERVAL, SUPERVISOR_BACKOFF_BASE, SUPERVISOR_BACKOFF_MAX, SUPERVISOR_STABLE_AFTER, \
+    FORWARD_DRAIN_TIMEOUT, PIPELINE_MODE, PIPELINE_WORKERS, PIPELINE_BATCH_SIZE, ARCHIVE_ENABLED, ENV_FILE, \
+    CONFIG_RELOAD_INTERVAL
+from config.runtime import get_config_manager
 from core.base_listener import BaseListener
-from core.discord.listener import DiscordListener
+from core.dedup import DedupCache
+from core.dispatcher import MessageDispatcher
+from core.plugins import get_plugin_registry
+from core.process_dispatcher import ProcessDispatcher
+from core.supervisor import ListenerSupervisor
+from forwarding.forwarder import get_forwarder, close_forwarder
 from handlers.message_handler import MessageHandler
+from handlers.executor import shutdown_executor
+from handlers.pattern_matcher import get_pattern_matcher
+from storage.archive import archive_message, close_archive
+from storage.attachments import close_attachment_fetcher
+from storage.factory import close_storage
 from models.message import Message
-from utils.logger import setup_logger
-from utils.exceptions import ScraperBotError
-from handlers.discord.handler import DiscordMessageHandler
-from handlers.twitter.handler import TwitterMessageHandler
-from handlers.telegram.handler import TelegramMessageHandler
+from utils.logger import setup_logger, get_message_logger, shutdown_logging
+from utils.exceptions import ScraperBotError, ConfigError
+from utils.http_client import close_http_client
+from utils.metrics import MetricsServer, log_metrics_periodically
 
 # 设置主日志记录器
 logger = setup_logger("main")
+# 逐条消息的日志，可按配置采样或限速
+message_logger = get_message_logger("main")
+
+# 运行模式
+MODE_SINGLE = "single"
+MODE_MULTIPROCESS = "multiprocess"
+
+
+def register_handlers(handler: MessageHandler) -> None:
+    """注册已启用平台的消息处理器，平台的处理器和策略在这里才被导入"""
+    registry = get_plugin_registry()
+    for platform in ENABLED_PLATFORMS:
+        plugin = registry.get(platform)
+        if plugin is None:
+            continue
+        try:
+            platform_handler = plugin.create_handler()
+        except Exception as e:
+            logger.error(f"创建 {platform} 消息处理器时出错: {e}", exc_info=True)
+            continue
+        if platform_handler is not None:
+            handler.register_platform_handler(platform, platform_handler.handle_message)
+
+    # 可以添加一个全局处理器用于记录或者其他共通操作
+    def global_message_logger(message: Message) -> None:
+        message_logger.info("消息接收: [%s] %s: %s...", message.platform, message.author_name, message.content[:30])
+
+    handler.register_global_handler(global_message_logger)
+
+    # 写入全文检索归档，只放入写入队列，由后台线程批量写入
+    if ARCHIVE_ENABLED:
+        handler.register_global_handler(archive_message)
+
+
+def build_message_handler() -> MessageHandler:
+    """创建注册好各平台处理器的消息处理器，多进程模式下由每个处理进程调用"""
+    handler = MessageHandler()
+    register_handlers(handler)
+    return handler
 
 
 class ScraperBot:
@@ -25,48 +79,66 @@ class ScraperBot:
 
     def __init__(self):
         self.listeners: Dict[str, BaseListener] = {}
+        # 每个监听器由独立的守护负责启动和重启
+        self.supervisors: Dict[str, ListenerSupervisor] = {}
         self.handler = MessageHandler()
+        if PIPELINE_MODE == MODE_MULTIPROCESS:
+            # 监听器在本进程接入，处理器在处理进程中运行，消息按频道分片
+            self.dispatcher = ProcessDispatcher(
+                build_message_handler,
+                workers=PIPELINE_WORKERS,
+                maxsize=DISPATCH_QUEUE_SIZE,
+                overflow_policy=DISPATCH_OVERFLOW_POLICY,
+                batch_size=PIPELINE_BATCH_SIZE,
+            )
+        elif PIPELINE_MODE == MODE_SINGLE:
+            # 监听器只负责入队，由分发队列的工作协程调用消息处理器
+            self.dispatcher = MessageDispatcher(
+                self.handler.handle_message,
+                maxsize=DISPATCH_QUEUE_SIZE,
+                workers=DISPATCH_WORKERS,
+                overflow_policy=DISPATCH_OVERFLOW_POLICY,
+            )
+        else:
+            raise ConfigError(f"未知的运行模式: {PIPELINE_MODE}，可选值: {MODE_SINGLE}、{MODE_MULTIPROCESS}")
+        # 所有监听器共享的去重缓存
+        self.dedup_cache = DedupCache(
+            ttl=DEDUP_TTL,
+            max_entries=DEDUP_MAX_ENTRIES,
+            bloom_capacity=DEDUP_BLOOM_CAPACITY,
+            bloom_error_rate=DEDUP_BLOOM_ERROR_RATE,
+            state_file=DEDUP_STATE_FILE or None,
+        ) if DEDUP_ENABLED else None
+        if self.dedup_cache is not None:
+            # 分发队列满时丢弃的旧消息撤销去重记录，重新投递时可以再次处理
+            dedup_cache = self.dedup_cache
+            self.dispatcher.set_drop_callback(lambda message: dedup_cache.forget(message.platform, message.id))
+        self.metrics_server = MetricsServer(host=METRICS_HOST, port=METRICS_PORT) if METRICS_ENABLED else None
         self.running = False
         self.tasks: List[asyncio.Task] = []
 
     def setup_handlers(self) -> None:
-        """设置消息处理器"""
-
-        # 创建平台特定的处理器
-        discord_handler = DiscordMessageHandler()
-        twitter_handler = TwitterMessageHandler()
-        telegram_handler = TelegramMessageHandler()
-
-        # 添加调试日志，确认使用的是哪个类
-        logger.info(f"使用的Discord处理器: {discord_handler.__class__.__module__}.{discord_handler.__class__.__name__}")
-
-        # 注册处理器
-        self.handler.register_platform_handler("discord", discord_handler.handle_message)
-        self.handler.register_platform_handler("twitter", twitter_handler.handle_message)
-        self.handler.register_platform_handler("telegram", telegram_handler.handle_message)
-
-        # 可以添加一个全局处理器用于记录或者其他共通操作
-        def global_message_logger(message: Message) -> None:
-            logger.info(f"消息接收: [{message.platform}] {message.author_name}: {message.content[:30]}...")
-
-        self.handler.register_global_handler(global_message_logger)
+        """设置消息处理器，多进程模式下处理器在处理进程中创建"""
+        if PIPELINE_MODE == MODE_MULTIPROCESS:
+            return
+        register_handlers(self.handler)
 
     def setup_listeners(self) -> None:
         """设置平台监听器"""
 
+        registry = get_plugin_registry()
         for platform in ENABLED_PLATFORMS:
+            plugin = registry.get(platform)
+            if plugin is None:
+                logger.warning(f"未知平台: {platform}，跳过")
+                continue
             try:
-                if platform == "discord":
-                    self.listeners[platform] = DiscordListener()
-                # 其他平台监听器在这里添加...
-
-                # 如果成功创建监听器，注册消息回调
-                if platform in self.listeners:
-                    self.listeners[platform].register_callback(self.handler.handle_message)
-                    logger.info(f"已设置 {platform} 监听器")
-                else:
-                    logger.warning(f"未知平台: {platform}，跳过")
-
+                listener = plugin.create_listener()
+                listener.register_callback(self.dispatcher.put)
+                if self.dedup_cache is not None:
+                    listener.set_dedup_cache(self.dedup_cache)
+                self.listeners[platform] = listener
+                logger.info(f"已设置 {platform} 监听器")
             except Exception as e:
                 logger.error(f"设置 {platform} 监听器时出错: {e}", exc_info=True)
 
@@ -82,21 +154,83 @@ class ScraperBot:
         self.setup_handlers()
         self.setup_listeners()
 
-        # 启动所有监听器
+        if self.dedup_cache is not None:
+            self.dedup_cache.load()
+
+        # 先启动分发队列，再启动监听器
+        await self.dispatcher.start()
+
+        if self.metrics_server is not None:
+            try:
+                await self.metrics_server.start()
+            except OSError as e:
+                logger.error(f"启动指标接口失败: {e}")
+                self.metrics_server = None
+        if METRICS_LOG_INTERVAL > 0:
+            self.tasks.append(asyncio.create_task(log_metrics_periodically(METRICS_LOG_INTERVAL)))
+
+        # 启动通知转发，策略通过get_forwarder()发布通知；没有转发目标时不占用资源，热加载添加目标后立即生效
+        await get_forwarder().start()
+
+        # 配置文件变化时热加载过滤规则、策略和转发目标
+        if ENV_FILE and CONFIG_RELOAD_INTERVAL > 0:
+            self.tasks.append(asyncio.create_task(get_config_manager().watch_file(CONFIG_RELOAD_INTERVAL)))
+
+        # 规则文件变化时热加载共享匹配引擎
+        if PATTERN_FILE:
+            self.tasks.append(asyncio.create_task(get_pattern_matcher().watch_file(PATTERN_RELOAD_INTERVAL)))
+
+        # 启动所有监听器，监听器退出或出错后由守护按退避策略重新启动
         for platform, listener in self.listeners.items():
-            task = asyncio.create_task(self._start_listener(platform, listener))
-            self.tasks.append(task)
+            supervisor = ListenerSupervisor(
+                platform,
+                listener,
+                backoff_base=SUPERVISOR_BACKOFF_BASE,
+                backoff_max=SUPERVISOR_BACKOFF_MAX,
+                stable_after=SUPERVISOR_STABLE_AFTER,
+            )
+            self.supervisors[platform] = supervisor
+            supervisor.start()
 
         self.running = True
         logger.info("刮刀机器人启动完成")
 
-    async def _start_listener(self, platform: str, listener: BaseListener) -> None:
-        """启动单个监听器的异步任务"""
-        try:
-            logger.info(f"启动 {platform} 监听器")
-            await listener.start()
-        except Exception as e:
-            logger.error(f"启动 {platform} 监听器时出错: {e}", exc_info=True)
+    async def restart_listener(self, platform: str) -> None:
+        """重启单个平台的监听器，不影响其他平台"""
+        supervisor = self.supervisors.get(platform)
+        if supervisor is None:
+            logger.warning(f"未找到 {platform} 监听器")
+            return
+        await supervisor.restart()
+
+    def reload_config(self) -> bool:
+        """
+        重新加载可热加载的配置（收到SIGHUP时调用），监听器不需要重新连接
+
+        多进程模式下同时通知各处理进程重新加载，处理进程中的策略和转发目标由它们自己切换
+
+        Returns:
+            bool: 本进程的配置是否有变化
+        """
+        logger.info("正在重新加载配置...")
+        changed = get_config_manager().reload_safely()
+        reload_workers = getattr(self.dispatcher, "reload_workers", None)
+        if reload_workers is not None:
+            reload_workers()
+        if not changed:
+            logger.info(f"配置没有变化，当前版本 {get_config_manager().version}")
+        return changed
+
+    def health(self) -> Dict[str, dict]:
+        """各平台监听器的健康状态"""
+        health = {}
+        for platform, supervisor in self.supervisors.items():
+            health[platform] = supervisor.health()
+            # 多账号连接池等提供health()的监听器附带各账号的状态
+            listener_health = getattr(self.listeners.get(platform), "health", None)
+            if listener_health is not None:
+                health[platform]["accounts"] = listener_health()
+        return health
 
     async def stop(self) -> None:
         """停止机器人"""
@@ -105,10 +239,10 @@ class ScraperBot:
 
         logger.info("正在停止刮刀机器人...")
 
-        # 停止所有监听器
-        for platform, listener in self.listeners.items():
+        # 停止所有监听器及其守护
+        for platform, supervisor in self.supervisors.items():
             try:
-                await listener.stop()
+                await supervisor.stop()
                 logger.info(f"已停止 {platform} 监听器")
             except Exception as e:
                 logger.error(f"停止 {platform} 监听器时出错: {e}", exc_info=True)
@@ -117,6 +251,34 @@ class ScraperBot:
         for task in self.tasks:
             task.cancel()
 
+        # 监听器停止后不再有新消息入队，等待队列中剩余的消息处理完毕
+        await self.dispatcher.stop(timeout=DISPATCH_DRAIN_TIMEOUT)
+        # 分发队列只等待消息进入处理器的频道队列，再等待处理器处理完毕
+        await self.handler.close(timeout=DISPATCH_DRAIN_TIMEOUT)
+
+        # 队列排空后关闭阻塞型处理器使用的执行器
+        shutdown_executor(wait=False)
+
+        # 发送队列中剩余的通知，需要在关闭HTTP连接池之前完成
+        await close_forwarder(timeout=FORWARD_DRAIN_TIMEOUT)
+
+        # 取消未完成的附件下载，删除残留的临时文件
+        await close_attachment_fetcher()
+
+        # 关闭策略和转发器共用的HTTP连接池
+        await close_http_client()
+
+        # 写入存储中尚未落盘的消息
+        close_storage()
+        close_archive()
+
+        if self.dedup_cache is not None:
+            logger.info(f"去重缓存统计: {self.dedup_cache.stats()}")
+            self.dedup_cache.save()
+
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+
         self.running = False
         logger.info("刮刀机器人已停止")
 
@@ -140,6 +302,9 @@ async def main() -> None:
     # 注册信号处理器
     for sig in (signal.SIGINT, signal.SIGTERM):
         loop.add_signal_handler(sig, signal_handler)
+    # SIGHUP重新加载配置 (./scraper-bot.sh reload)
+    if hasattr(signal, "SIGHUP"):
+        loop.add_signal_handler(signal.SIGHUP, bot.reload_config)
 
     try:
         # 启动机器人
@@ -167,3 +332,6 @@ if __name__ == "__main__":
     except Exception as e:
         logger.critical(f"程序崩溃: {e}", exc_info=True)
         sys.exit(1)
+    finally:
+        # 输出日志队列中剩余的日志
+        shutdown_logging()
@@ -1,6 +1,10 @@
+import marshal
+import sys
+import weakref
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import Optional, Dict, Any, List
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Optional, Dict, Any, List, Callable, Mapping, Sequence, Tuple, Union
 
 
 @dataclass
@@ -48,4 +52,203 @@ class Message:
             "timestamp": self.timestamp,
             "attachments": self.attachments,
             "metadata": self.metadata
-        } 
\ No newline at end of file
+        }
+    
+    def compact(self, raw_loader: Optional[Callable[[], Any]] = None) -> "CompactMessage":
+        """
+        转换为紧凑消息模型，不再持有原始消息对象
+        
+        Args:
+            raw_loader: 按需获取原始消息对象的函数
+        """
+        return CompactMessage(
+            id=self.id,
+            content=self.content,
+            platform=self.platform,
+            author_id=self.author_id,
+            author_name=self.author_name,
+            timestamp=self.timestamp,
+            attachments=self.attachments,
+            metadata=self.metadata,
+            raw_message=self.raw_message if raw_loader is None else None,
+            raw_loader=raw_loader,
+        )
+
+
+# 空元数据共享同一个只读对象，避免每条消息单独分配
+_EMPTY_METADATA: Mapping[str, Any] = MappingProxyType({})
+
+# 二进制序列化格式版本
+_BINARY_VERSION = 1
+
+
+def _timestamp_to_wire(timestamp: datetime) -> Tuple[float, bool]:
+    """将时间转换为 (Unix时间戳, 是否带时区)"""
+    return timestamp.timestamp(), timestamp.tzinfo is not None
+
+
+def _timestamp_from_wire(value: float, aware: bool) -> datetime:
+    return datetime.fromtimestamp(value, timezone.utc) if aware else datetime.fromtimestamp(value)
+
+
+def _rebuild_compact(data: bytes) -> "CompactMessage":
+    return CompactMessage.from_bytes(data)
+
+
+class CompactMessage:
+    """
+    紧凑的统一消息模型，字段与Message一致但内存占用更小
+    
+    - 使用__slots__，没有每个实例的__dict__，创建后不可修改字段
+    - 附件保存为元组，元数据保存为只读副本（空元数据共享同一个只读对象），平台名称被intern
+    - 不强引用原始消息对象：支持弱引用的对象保存弱引用，否则通过raw_loader按需获取
+      （例如从客户端的消息缓存中查找），避免原始对象及其关联的服务器、频道、成员对象常驻内存
+    - 提供to_dict和基于marshal的二进制序列化，序列化结果不包含原始消息对象
+    """
+    
+    __slots__ = ("id", "content", "platform", "author_id", "author_name", "timestamp", "attachments", "metadata",
+                 "_raw_ref", "_raw_loader")
+    
+    def __init__(self, id: str, content: str, platform: str, author_id: str, author_name: str,
+                 timestamp: Optional[datetime] = None, attachments: Sequence[str] = (),
+                 metadata: Optional[Mapping[str, Any]] = None, raw_message: Any = None,
+                 raw_loader: Optional[Callable[[], Any]] = None):
+        """
+        初始化紧凑消息
+        
+        Args:
+            id: 消息唯一标识符
+            content: 消息内容
+            platform: 消息来源平台
+            author_id: 发送者ID
+            author_name: 发送者名称
+            timestamp: 消息发送时间
+            attachments: 附件URL列表
+            metadata: 元数据
+            raw_message: 原始消息对象，只在支持弱引用时保存其弱引用
+            raw_loader: 按需获取原始消息对象的函数
+        """
+        setter = object.__setattr__
+        setter(self, "id", id)
+        setter(self, "content", content)
+        setter(self, "platform", sys.intern(platform))
+        setter(self, "author_id", author_id)
+        setter(self, "author_name", author_name)
+        setter(self, "timestamp", timestamp if timestamp is not None else datetime.now())
+        setter(self, "attachments", tuple(attachments))
+        # 复制一份只读视图，调用方之后修改传入的字典不会影响已创建的消息
+        setter(self, "metadata", MappingProxyType(dict(metadata)) if metadata else _EMPTY_METADATA)
+        
+        raw_ref = None
+        if raw_message is not None:
+            try:
+                raw_ref = weakref.ref(raw_message)
+            except TypeError:
+                # 不支持弱引用的对象不保存，只能通过raw_loader获取
+                pass
+        setter(self, "_raw_ref", raw_ref)
+        setter(self, "_raw_loader", raw_loader)
+    
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"CompactMessage是不可变对象，不能修改字段: {name}")
+    
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"CompactMessage是不可变对象，不能删除字段: {name}")
+    
+    @property
+    def raw_message(self) -> Any:
+        """原始消息对象，已被回收且无法重新获取时返回None"""
+        if self._raw_ref is not None:
+            raw = self._raw_ref()
+            if raw is not None:
+                return raw
+        if self._raw_loader is not None:
+            return self._raw_loader()
+        return None
+    
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, CompactMessage):
+            return NotImplemented
+        return self.to_tuple() == other.to_tuple()
+    
+    def __hash__(self) -> int:
+        return hash((self.platform, self.id))
+    
+    def __repr__(self) -> str:
+        return (f"CompactMessage(id={self.id!r}, platform={self.platform!r}, author_id={self.author_id!r}, "
+                f"content={self.content[:30]!r})")
+    
+    def __str__(self) -> str:
+        """返回消息的字符串表示"""
+        return f"[{self.platform}] {self.author_name}: {self.content}"
+    
+    def __reduce__(self):
+        # pickle时只传递二进制序列化结果，不包含原始消息对象
+        return _rebuild_compact, (self.to_bytes(),)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """将消息对象转换为字典，格式与Message.to_dict一致"""
+        return {
+            "id": self.id,
+            "content": self.content,
+            "platform": self.platform,
+            "author_id": self.author_id,
+            "author_name": self.author_name,
+            "timestamp": self.timestamp,
+            "attachments": list(self.attachments),
+            "metadata": dict(self.metadata),
+        }
+    
+    def to_tuple(self) -> Tuple[Any, ...]:
+        """返回所有字段组成的元组，用于比较和序列化"""
+        return (self.id, self.content, self.platform, self.author_id, self.author_name, self.timestamp,
+                self.attachments, dict(self.metadata))
+    
+    def to_bytes(self) -> bytes:
+        """
+        序列化为二进制，metadata中无法被marshal的值会被转换为字符串
+        """
+        timestamp, aware = _timestamp_to_wire(self.timestamp)
+        metadata = dict(self.metadata)
+        payload = (_BINARY_VERSION, self.id, self.content, self.platform, self.author_id, self.author_name,
+                   timestamp, aware, self.attachments, metadata)
+        try:
+            return marshal.dumps(payload)
+        except ValueError:
+            metadata = {key: value if _is_marshallable(value) else str(value) for key, value in metadata.items()}
+            return marshal.dumps(payload[:-1] + (metadata,))
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CompactMessage":
+        """从to_bytes的结果还原消息"""
+        payload = marshal.loads(data)
+        version = payload[0]
+        if version != _BINARY_VERSION:
+            raise ValueError(f"不支持的消息序列化版本: {version}")
+        _, message_id, content, platform, author_id, author_name, timestamp, aware, attachments, metadata = payload
+        return cls(
+            id=message_id,
+            content=content,
+            platform=platform,
+            author_id=author_id,
+            author_name=author_name,
+            timestamp=_timestamp_from_wire(timestamp, aware),
+            attachments=attachments,
+            metadata=metadata,
+        )
+    
+    @classmethod
+    def from_message(cls, message: Union[Message, "CompactMessage"],
+                     raw_loader: Optional[Callable[[], Any]] = None) -> "CompactMessage":
+        """从Message转换，已经是CompactMessage时直接返回"""
+        if isinstance(message, CompactMessage):
+            return message
+        return message.compact(raw_loader)
+
+
+def _is_marshallable(value: Any) -> bool:
+    try:
+        marshal.dumps(value)
+        return True
+    except ValueError:
+        return False
@@ -96,6 +96,18 @@ restart() {
     start
 }
 
+# 重新加载配置，不重启进程、不断开连接（只对可热加载的配置生效，见.env.example）
+reload() {
+    if ! is_running; then
+        echo -e "${YELLOW}警告: 刮刀机器人没有运行${NC}"
+        return
+    fi
+
+    pid=$(cat "${PID_FILE}")
+    kill -HUP "${pid}"
+    echo -e "${GREEN}已通知刮刀机器人重新加载配置 (PID: ${pid})，结果见日志${NC}"
+}
+
 # 查看状态
 status() {
     if is_running; then
@@ -137,11 +149,12 @@ follow_logs() {
 # 显示帮助信息
 usage() {
     echo "刮刀机器人管理脚本"
-    echo "用法: $0 {start|stop|restart|status|logs|follow|help}"
+    echo "用法: $0 {start|stop|restart|reload|status|logs|follow|help}"
     echo ""
     echo "  start      启动刮刀机器人"
     echo "  stop       停止刮刀机器人"
     echo "  restart    重启刮刀机器人"
+    echo "  reload     重新加载配置（不重启，只对可热加载的配置生效）"
     echo "  status     查看刮刀机器人运行状态"
     echo "  logs [n]   查看最后n行日志 (默认50行)"
     echo "  follow     实时查看日志"
@@ -159,6 +172,9 @@ case "$1" in
     restart)
         restart
         ;;
+    reload)
+        reload
+        ;;
     status)
         status
         ;;
@@ -0,0 +1,435 @@
+import gzip
+import json
+import math
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from config.settings import ARCHIVE_PATH, ARCHIVE_TOKENIZER, STORAGE_BATCH_SIZE, STORAGE_FLUSH_INTERVAL, \
+    STORAGE_FSYNC, STORAGE_FSYNC_INTERVAL, STORAGE_MAX_PENDING
+from models.message import Message
+from storage.batch_writer import BatchWriter, FSYNC_ALWAYS, FSYNC_NEVER
+from utils.exceptions import ConfigError, StorageError
+from utils.logger import setup_logger
+
+TOKENIZERS = {
+    "unicode61": "unicode61 remove_diacritics 2",
+    "trigram": "trigram",
+}
+
+# 消息表保存完整记录，全文索引只保存倒排表（external content），内容不重复存储
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    seq         INTEGER PRIMARY KEY,
+    platform    TEXT NOT NULL,
+    id          TEXT NOT NULL,
+    channel_id  TEXT,
+    author_id   TEXT,
+    author_name TEXT,
+    ts          REAL,
+    content     TEXT,
+    attachments TEXT,
+    metadata    TEXT,
+    UNIQUE (platform, id)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages (ts);
+CREATE INDEX IF NOT EXISTS idx_messages_platform_ts ON messages (platform, ts);
+CREATE INDEX IF NOT EXISTS idx_messages_channel_ts ON messages (channel_id, ts);
+CREATE INDEX IF NOT EXISTS idx_messages_author_ts ON messages (author_id, ts);
+CREATE INDEX IF NOT EXISTS idx_messages_author_name_ts ON messages (author_name, ts);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, author_name, content='messages', content_rowid='seq', tokenize='{tokenize}'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content, author_name) VALUES (new.seq, new.content, new.author_name);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content, author_name)
+    VALUES ('delete', old.seq, old.content, old.author_name);
+END;
+"""
+
+# 已存在的消息被忽略，不会触发索引
+_INSERT = """
+INSERT OR IGNORE INTO messages (platform, id, channel_id, author_id, author_name, ts, content, attachments, metadata)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# 在时间索引上逐条检查全文索引的单行开销，相对于遍历全文索引匹配结果的单行开销的倍数
+PROBE_COST_RATIO = 20
+
+_COLUMNS = ("platform", "id", "channel_id", "author_id", "author_name", "ts", "content", "attachments", "metadata")
+
+
+def open_archive(path: str, tokenizer: str = ARCHIVE_TOKENIZER) -> sqlite3.Connection:
+    """
+    打开归档数据库，不存在时创建表、索引和全文索引
+
+    Args:
+        path: 数据库文件路径
+        tokenizer: 全文索引的分词器，只在创建时生效
+    """
+    if tokenizer not in TOKENIZERS:
+        raise ConfigError(f"未知的分词器: {tokenizer}，可选值: {', '.join(TOKENIZERS)}")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # 多进程模式下每个处理进程各自写入，等待其他进程的写事务完成
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA.format(tokenize=TOKENIZERS[tokenizer]))
+    return conn
+
+
+def _to_epoch(value: Any) -> Optional[float]:
+    """消息时间转换为Unix时间戳，支持datetime、ISO格式字符串和数字"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return None
+
+
+def record_to_row(record: Dict[str, Any]) -> Tuple[Any, ...]:
+    """将message_to_record或已保存的JSON记录转换为归档表的一行"""
+    metadata = record.get("metadata") or {}
+    channel_id = metadata.get("channel_id")
+    return (
+        record.get("platform"),
+        str(record.get("id")),
+        str(channel_id) if channel_id is not None else None,
+        str(record["author_id"]) if record.get("author_id") is not None else None,
+        record.get("author_name"),
+        _to_epoch(record.get("timestamp")),
+        record.get("content") or "",
+        json.dumps(list(record.get("attachments") or []), ensure_ascii=False),
+        json.dumps(dict(metadata), ensure_ascii=False, default=str),
+    )
+
+
+class MessageArchive(BatchWriter):
+    """
+    带全文索引的消息归档
+
+    消息由处理器流水线调用save放入队列，后台线程按批写入SQLite，同一事务中通过触发器更新FTS5索引。
+    归档与STORAGE_BACKEND配置的存储相互独立，查询使用ArchiveReader
+    """
+
+    def __init__(self, path: str = ARCHIVE_PATH, tokenizer: str = ARCHIVE_TOKENIZER, **kwargs):
+        """
+        初始化归档
+
+        Args:
+            path: 数据库文件路径
+            tokenizer: 全文索引的分词器 (unicode61、trigram)
+            **kwargs: 传给BatchWriter的批量写入参数
+        """
+        if tokenizer not in TOKENIZERS:
+            raise ConfigError(f"未知的分词器: {tokenizer}，可选值: {', '.join(TOKENIZERS)}")
+        self.path = path
+        self.tokenizer = tokenizer
+        self._conn: Optional[sqlite3.Connection] = None
+        super().__init__("MessageArchive", **kwargs)
+
+    def _open(self) -> None:
+        self._conn = open_archive(self.path, self.tokenizer)
+        if self.fsync_policy == FSYNC_ALWAYS:
+            self._conn.execute("PRAGMA synchronous=FULL")
+        elif self.fsync_policy == FSYNC_NEVER:
+            self._conn.execute("PRAGMA synchronous=OFF")
+        else:
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        rows = [record_to_row(record) for record in batch]
+        with self._conn:
+            self._conn.executemany(_INSERT, rows)
+
+    def _sync(self) -> None:
+        self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def _close(self) -> None:
+        if self._conn:
+            # 合并全文索引的分段，之后的查询更快
+            self._conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')")
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+
+def quote_query(terms: Sequence[str]) -> str:
+    """把普通的搜索词转换为FTS5查询：每个词加引号作为短语，词之间为AND，避免标点被当作查询语法"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+class ArchiveReader:
+    """归档的只读查询接口，可以在写入进程运行时同时使用"""
+
+    def __init__(self, path: str = ARCHIVE_PATH):
+        if not os.path.exists(path):
+            raise StorageError(f"归档不存在: {path}")
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        # trigram分词器无法检索少于3个字符的词，这些词改为在内容上做LIKE匹配
+        row = self._conn.execute("SELECT sql FROM sqlite_master WHERE name = 'messages_fts'").fetchone()
+        self.min_term_length = 3 if row and "trigram" in row[0] else 1
+
+    def _split_terms(self, text: str) -> Tuple[List[str], List[str]]:
+        """把搜索文本拆分为 (全文索引检索的词, LIKE匹配的短词)"""
+        terms = text.split()
+        return ([term for term in terms if len(term) >= self.min_term_length],
+                [term for term in terms if len(term) < self.min_term_length])
+
+    def search(self, text: Optional[str] = None, platform: Optional[str] = None, channel_id: Optional[str] = None,
+               author: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+               limit: int = 50, raw_query: bool = False) -> List[Dict[str, Any]]:
+        """
+        查询消息，按时间从新到旧返回
+
+        Args:
+            text: 全文检索的文本，多个词之间为AND
+            platform: 平台名称
+            channel_id: 频道ID
+            author: 作者ID或作者名称
+            since: 起始时间（Unix时间戳，包含）
+            until: 结束时间（Unix时间戳，不包含）
+            limit: 最多返回的消息数量
+            raw_query: text是否直接作为FTS5查询语法使用（支持OR、NOT、前缀*等）
+
+        Returns:
+            List[Dict[str, Any]]: 消息记录，timestamp为Unix时间戳
+        """
+        sql, params = self._prepare(text, platform, channel_id, author, since, until, limit, raw_query)
+        return [self._row_to_record(row) for row in self._execute(sql, params)]
+
+    def explain(self, *args, **kwargs) -> List[str]:
+        """返回search使用的查询计划，参数与search相同，用于确认索引是否生效"""
+        sql, params = self._prepare(*args, **kwargs)
+        return [row[3] for row in self._execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+    def _prepare(self, text: Optional[str] = None, platform: Optional[str] = None, channel_id: Optional[str] = None,
+                 author: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+                 limit: int = 50, raw_query: bool = False) -> Tuple[str, List[Any]]:
+        """
+        选择查询方式并生成SQL
+
+        全文检索有两种执行方式：
+        - 取出全文索引的全部匹配结果，再按条件过滤、按时间排序，开销与匹配数量成正比，适合少见的词
+        - 沿时间索引从新到旧逐条检查是否匹配，凑够limit条即停止，开销约为 limit * 总数 / 匹配数量 次检查，适合常见的词
+        匹配数量超过 sqrt(limit * 总数 * PROBE_COST_RATIO) 时后者更快，计数到这个上限即停止，估计本身的开销有界
+        """
+        # 作者同时匹配ID和名称时需要合并两个索引的结果再排序，先确定是哪一列，查询可以沿单个索引按时间顺序进行
+        author_column = None
+        if author:
+            found = self._execute("SELECT 1 FROM messages WHERE author_id = ? LIMIT 1", (author,))
+            author_column = "author_id" if found else "author_name"
+
+        query: Optional[str] = None
+        short_terms: List[str] = []
+        if text and raw_query:
+            query = text
+        elif text:
+            terms, short_terms = self._split_terms(text)
+            query = quote_query(terms) or None
+
+        scan_by_time = False
+        if query:
+            total = self._execute("SELECT MAX(seq) FROM messages", ())[0][0] or 0
+            cap = int(math.sqrt(max(1, limit) * total * PROBE_COST_RATIO)) + 1
+            matches = self._execute("SELECT COUNT(*) FROM (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ? "
+                                    "LIMIT ?)", (query, cap))[0][0]
+            scan_by_time = matches >= cap
+        return self._build_query(query, short_terms, platform, channel_id, author, author_column, since, until, limit,
+                                 scan_by_time)
+
+    @staticmethod
+    def _build_query(query: Optional[str], short_terms: Sequence[str], platform: Optional[str],
+                     channel_id: Optional[str], author: Optional[str], author_column: Optional[str],
+                     since: Optional[float], until: Optional[float], limit: int,
+                     scan_by_time: bool) -> Tuple[str, List[Any]]:
+        conditions: List[str] = []
+        params: List[Any] = []
+        source = "messages m"
+        if query and scan_by_time:
+            # CROSS JOIN固定消息表为外层，按时间索引遍历，每行通过rowid检查全文索引
+            source = "messages m CROSS JOIN messages_fts f ON f.rowid = m.seq"
+            conditions.append("f.messages_fts MATCH ?")
+            params.append(query)
+        elif query:
+            conditions.append("m.seq IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)")
+            params.append(query)
+        for term in short_terms:
+            conditions.append("m.content LIKE ? ESCAPE '\\'")
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+
+        if platform:
+            conditions.append("m.platform = ?")
+            params.append(platform)
+        if channel_id:
+            conditions.append("m.channel_id = ?")
+            params.append(str(channel_id))
+        if author:
+            conditions.append(f"m.{author_column} = ?")
+            params.append(author)
+        if since is not None:
+            conditions.append("m.ts >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("m.ts < ?")
+            params.append(until)
+
+        sql = f"SELECT {', '.join('m.' + column for column in _COLUMNS)} FROM {source}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY m.ts DESC LIMIT ?"
+        params.append(max(1, limit))
+        return sql, params
+
+    def _execute(self, sql: str, params: Sequence[Any]) -> List[sqlite3.Row]:
+        try:
+            return self._conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            raise StorageError(f"查询失败: {e}") from e
+
+    @staticmethod
+    def _row_to_record(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "platform": row["platform"],
+            "channel_id": row["channel_id"],
+            "author_id": row["author_id"],
+            "author_name": row["author_name"],
+            "timestamp": row["ts"],
+            "content": row["content"],
+            "attachments": json.loads(row["attachments"] or "[]"),
+            "metadata": json.loads(row["metadata"] or "{}"),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """各平台的消息数量和时间范围"""
+        rows = self._conn.execute(
+            "SELECT platform, COUNT(*), MIN(ts), MAX(ts) FROM messages GROUP BY platform").fetchall()
+        return {row[0]: {"messages": row[1], "first": row[2], "last": row[3]} for row in rows}
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def iter_saved_records(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    读取已保存的消息，支持json存储的单条消息文件(.json)和jsonl存储的分段(.jsonl、.jsonl.gz)
+
+    Args:
+        paths: 文件或目录，目录会被递归遍历
+    """
+    logger = setup_logger("ArchiveImporter")
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        else:
+            files = [path]
+        for file in files:
+            try:
+                if file.endswith(".json"):
+                    with open(file, 'r', encoding='utf-8') as f:
+                        yield json.load(f)
+                elif file.endswith(".jsonl") or file.endswith(".jsonl.gz"):
+                    opener = gzip.open if file.endswith(".gz") else open
+                    invalid = 0
+                    with opener(file, 'rt', encoding='utf-8') as f:
+                        for line in f:
+                            if not line.strip():
+                                continue
+                            # 进程异常退出时分段的最后一行可能不完整，只跳过这一行
+                            try:
+                                yield json.loads(line)
+                            except ValueError:
+                                invalid += 1
+                    if invalid:
+                        logger.warning(f"{file} 中有 {invalid} 行无法解析，已跳过")
+            except (OSError, ValueError, EOFError) as e:
+                logger.warning(f"跳过无法读取的文件 {file}: {e}")
+
+
+def import_records(records: Iterable[Dict[str, Any]], path: str = ARCHIVE_PATH, tokenizer: str = ARCHIVE_TOKENIZER,
+                   batch_size: int = 10000) -> Tuple[int, int]:
+    """
+    一次性批量导入消息，已经存在的消息被跳过
+
+    Args:
+        records: 消息记录
+        path: 归档数据库文件路径
+        tokenizer: 全文索引的分词器，只在创建归档时生效
+        batch_size: 每个事务写入的消息数量
+
+    Returns:
+        Tuple[int, int]: (新导入的数量, 跳过的数量)
+    """
+    conn = open_archive(path, tokenizer)
+    # 导入可以重新执行，中途断电时丢失的只是最后的事务
+    conn.execute("PRAGMA synchronous=OFF")
+    imported = skipped = 0
+    batch: List[Tuple[Any, ...]] = []
+
+    def write() -> None:
+        nonlocal imported, skipped
+        with conn:
+            # rowcount不包含触发器写入全文索引的行，被忽略的重复消息也不计入
+            written = conn.executemany(_INSERT, batch).rowcount
+        imported += written
+        skipped += len(batch) - written
+        batch.clear()
+
+    try:
+        for record in records:
+            if not record.get("platform") or record.get("id") is None:
+                skipped += 1
+                continue
+            batch.append(record_to_row(record))
+            if len(batch) >= batch_size:
+                write()
+        if batch:
+            write()
+        conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')")
+        conn.commit()
+    finally:
+        conn.close()
+    return imported, skipped
+
+
+_archive: Optional[MessageArchive] = None
+
+
+def get_archive() -> MessageArchive:
+    """获取进程内共享的归档写入器，首次调用时创建"""
+    global _archive
+    if _archive is None:
+        _archive = MessageArchive(
+            batch_size=STORAGE_BATCH_SIZE,
+            flush_interval=STORAGE_FLUSH_INTERVAL,
+            fsync_policy=STORAGE_FSYNC,
+            fsync_interval=STORAGE_FSYNC_INTERVAL,
+            max_pending=STORAGE_MAX_PENDING,
+        )
+    return _archive
+
+
+async def archive_message(message: Message) -> None:
+    """全局处理器：把消息放入归档的写入队列，队列满时只有这个处理器等待，不阻塞事件循环"""
+    await get_archive().save_async(message)
+
+
+def close_archive() -> None:
+    """关闭共享的归档写入器，写入所有未落盘的消息"""
+    global _archive
+    if _archive is not None:
+        _archive.close()
+        _archive = None
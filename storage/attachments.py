@@ -0,0 +1,404 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence
+from urllib.parse import urlsplit, urlunsplit
+
+import aiohttp
+
+from config.settings import ATTACHMENT_CACHE_DIR, ATTACHMENT_CACHE_MAX_MB, ATTACHMENT_MAX_MB, \
+    ATTACHMENT_ALLOWED_TYPES, ATTACHMENT_CONCURRENCY
+from models.message import Message
+from utils.exceptions import AttachmentError
+from utils.http_client import get_http_client
+from utils.logger import setup_logger
+from utils.metrics import REGISTRY
+
+ATTACHMENT_FETCHES = REGISTRY.counter("scraper_attachment_fetches_total", "附件获取次数", ["result"])
+ATTACHMENT_BYTES = REGISTRY.counter("scraper_attachment_downloaded_bytes_total", "下载的附件字节数")
+ATTACHMENT_CACHE_BYTES = REGISTRY.gauge("scraper_attachment_cache_bytes", "附件缓存占用的字节数")
+
+# 从网络读取的块大小
+CHUNK_SIZE = 64 * 1024
+# 累积到这个大小后交给线程写入磁盘，减少线程切换
+WRITE_SIZE = 1024 * 1024
+# 内存中保留的 地址 -> 缓存文件 映射数量
+INDEX_SIZE = 10000
+# 两次读取之间的超时（秒），大文件不受总超时限制
+READ_TIMEOUT = 60.0
+# 临时文件超过这个时间（秒）没有写入时视为中断的下载，可以清理。正在下载的文件至少每READ_TIMEOUT写入一次
+STALE_TEMP_SECONDS = 3600.0
+# 地址中的查询参数只是签名或有效期、不影响内容的主机
+SIGNED_URL_HOSTS = ("cdn.discordapp.com", "media.discordapp.net")
+
+
+def url_key(url: str) -> str:
+    """缓存使用的地址，Discord CDN的签名参数每次不同，去掉后同一个附件只下载一次"""
+    parts = urlsplit(url)
+    if parts.hostname in SIGNED_URL_HOSTS:
+        return urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+    return url
+
+
+class CachedAttachment:
+    """已经下载到本地缓存的附件"""
+
+    __slots__ = ("url", "path", "sha256", "size", "content_type")
+
+    def __init__(self, url: str, path: str, sha256: str, size: int, content_type: str):
+        self.url = url
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+        self.content_type = content_type
+
+    def __repr__(self) -> str:
+        return f"CachedAttachment({self.sha256[:12]}, {self.size} bytes, {self.content_type})"
+
+
+class AttachmentCache:
+    """
+    按内容SHA-256寻址的磁盘缓存
+
+    文件保存为 base_dir/<哈希前两位>/<哈希>，内容相同的附件只保存一份。
+    总大小超过max_bytes时按最近使用时间淘汰，使用时间记录在文件的修改时间上，重启后顺序不变。
+    方法中有磁盘操作，在事件循环中应通过执行器调用；执行器中可能有多个线程同时调用，修改文件列表时加锁
+
+    多进程模式下各进程共用同一个目录，但容量上限按进程分别计算（实际占用最多为 进程数 × max_bytes），
+    一个进程淘汰的文件可能是另一个进程刚使用过的，使用前需要处理文件已不存在的情况。
+    临时文件写入各进程自己的 tmp/<pid> 目录，互不干扰
+    """
+
+    def __init__(self, base_dir: str, max_bytes: int):
+        self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        self.logger = setup_logger("AttachmentCache")
+        # 哈希 -> 文件大小，按最近使用排序（最旧的在前）
+        self.entries: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        self.evicted = 0
+        self.temp_dir = os.path.join(base_dir, "tmp", str(os.getpid()))
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """扫描缓存目录，恢复文件列表和使用顺序，清理中断的下载留下的临时文件"""
+        os.makedirs(self.temp_dir, exist_ok=True)
+        found = []
+        for entry in os.scandir(self.base_dir):
+            if not entry.is_dir():
+                continue
+            if entry.name == "tmp":
+                self._remove_stale_temp(entry.path)
+                continue
+            for item in os.scandir(entry.path):
+                try:
+                    stat = item.stat()
+                except FileNotFoundError:
+                    # 被其他进程淘汰
+                    continue
+                found.append((stat.st_mtime, item.name, stat.st_size))
+        found.sort()
+        self.entries = OrderedDict((name, size) for _, name, size in found)
+        self.total_bytes = sum(self.entries.values())
+        ATTACHMENT_CACHE_BYTES.set(self.total_bytes)
+        if found:
+            self.logger.info(f"附件缓存: {len(found)} 个文件，{self.total_bytes / 1024 / 1024:.1f} MB")
+
+    def _remove_stale_temp(self, temp_root: str) -> None:
+        """
+        删除长时间没有写入的临时文件
+
+        其他进程可能正在同一个tmp目录下下载，只按修改时间判断，不能全部删除
+        """
+        deadline = time.time() - STALE_TEMP_SECONDS
+        for dirpath, _, filenames in os.walk(temp_root, topdown=False):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    if os.path.getmtime(path) < deadline:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+            if dirpath not in (temp_root, self.temp_dir):
+                try:
+                    # 只删除空目录，其他进程正在使用的目录会删除失败
+                    os.rmdir(dirpath)
+                except OSError:
+                    pass
+
+    def path_for(self, sha256: str) -> str:
+        return os.path.join(self.base_dir, sha256[:2], sha256)
+
+    def temp_path(self) -> str:
+        return os.path.join(self.temp_dir, f"{uuid.uuid4().hex}.part")
+
+    def touch(self, sha256: str) -> bool:
+        """标记为最近使用，文件不在缓存中时返回False"""
+        with self._lock:
+            if sha256 not in self.entries:
+                return False
+            self.entries.move_to_end(sha256)
+            try:
+                os.utime(self.path_for(sha256))
+            except FileNotFoundError:
+                # 被外部删除
+                self.total_bytes -= self.entries.pop(sha256)
+                return False
+            return True
+
+    def commit(self, temp_path: str, sha256: str, size: int) -> str:
+        """把下载完成的临时文件移入缓存，内容已存在时丢弃临时文件，返回缓存文件路径"""
+        path = self.path_for(sha256)
+        if self.touch(sha256):
+            os.remove(temp_path)
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            os.replace(temp_path, path)
+            if sha256 in self.entries:
+                self.total_bytes -= self.entries.pop(sha256)
+            self.entries[sha256] = size
+            self.total_bytes += size
+            self._evict(keep=sha256)
+            ATTACHMENT_CACHE_BYTES.set(self.total_bytes)
+        return path
+
+    def _evict(self, keep: str) -> None:
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            sha256, size = next(iter(self.entries.items()))
+            if sha256 == keep:
+                break
+            del self.entries[sha256]
+            self.total_bytes -= size
+            self.evicted += 1
+            try:
+                os.remove(self.path_for(sha256))
+            except FileNotFoundError:
+                pass
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _write_chunk(file: BinaryIO, digest: Any, data: bytes) -> None:
+    """在线程中写入并计算哈希，hashlib处理大块数据时会释放GIL"""
+    digest.update(data)
+    file.write(data)
+
+
+class AttachmentFetcher:
+    """
+    附件下载阶段
+
+    - fetch(url)返回共享的Future，同一个附件同时只下载一次，已缓存的附件不再访问网络
+    - 消息进入处理器时调用prefetch(message)提前开始下载，处理器需要时再await，拿到本地文件路径
+    - 下载并发数受限，数据按块流式写入临时文件并同时计算SHA-256，不在内存中缓存整个文件
+    - 超过大小上限或内容类型不在允许列表中的附件不会下载
+    """
+
+    def __init__(self, cache_dir: str = ATTACHMENT_CACHE_DIR, max_cache_bytes: int = int(ATTACHMENT_CACHE_MAX_MB * 1024 * 1024),
+                 max_bytes: int = int(ATTACHMENT_MAX_MB * 1024 * 1024),
+                 allowed_types: Sequence[str] = tuple(ATTACHMENT_ALLOWED_TYPES),
+                 concurrency: int = ATTACHMENT_CONCURRENCY):
+        """
+        初始化附件下载器
+
+        Args:
+            cache_dir: 缓存目录
+            max_cache_bytes: 缓存容量上限（字节）
+            max_bytes: 单个附件的大小上限（字节）
+            allowed_types: 允许的内容类型前缀，为空时不限制
+            concurrency: 同时下载的附件数量
+        """
+        self.logger = setup_logger("AttachmentFetcher")
+        self.cache = AttachmentCache(cache_dir, max_cache_bytes)
+        self.cache.load()
+        self.max_bytes = max_bytes
+        self.allowed_types = tuple(allowed_types)
+        self.concurrency = max(1, concurrency)
+
+        # 地址 -> 已缓存的附件，按最近使用排序
+        self._index: "OrderedDict[str, CachedAttachment]" = OrderedDict()
+        # 地址 -> 正在下载的任务
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def fetch(self, url: str) -> "asyncio.Future[CachedAttachment]":
+        """
+        获取附件，返回可以await的Future，结果为CachedAttachment，失败时抛出AttachmentError
+
+        Args:
+            url: 附件地址
+        """
+        key = url_key(url)
+        task = self._inflight.get(key)
+        if task is not None:
+            return task
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        cached = self._index.get(key)
+        if cached is not None:
+            # 更新使用时间需要访问磁盘，与下载一样在任务中进行，期间同一地址的请求共享这个任务
+            task = asyncio.ensure_future(self._revalidate(url, key, cached))
+        else:
+            task = asyncio.ensure_future(self._download(url, key))
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finished(key, done))
+        return task
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if task.cancelled():
+            return
+        # 预取的结果可能没有人读取，这里取出异常，避免"Task exception was never retrieved"
+        error = task.exception()
+        if error is None:
+            self._index[key] = task.result()
+            self._index.move_to_end(key)
+            while len(self._index) > INDEX_SIZE:
+                self._index.popitem(last=False)
+
+    async def get(self, url: str) -> CachedAttachment:
+        """获取附件，失败时抛出AttachmentError"""
+        return await self.fetch(url)
+
+    def prefetch(self, message: Message) -> None:
+        """在后台开始下载消息的所有附件"""
+        for url in message.attachments:
+            self.fetch(url)
+
+    async def fetch_all(self, message: Message) -> List[Optional[CachedAttachment]]:
+        """
+        获取消息的所有附件，顺序与message.attachments一致，下载失败或被限制的附件为None
+
+        Args:
+            message: 统一的消息模型
+        """
+        results = await asyncio.gather(*(self.fetch(url) for url in message.attachments), return_exceptions=True)
+        attachments = []
+        for url, result in zip(message.attachments, results):
+            if isinstance(result, AttachmentError):
+                self.logger.warning(f"附件不可用: {url}: {result}")
+                attachments.append(None)
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                attachments.append(result)
+        return attachments
+
+    def _check_type(self, content_type: str) -> None:
+        if self.allowed_types and not content_type.startswith(self.allowed_types):
+            ATTACHMENT_FETCHES.inc("rejected")
+            raise AttachmentError(f"不允许的内容类型: {content_type}")
+
+    def _check_size(self, size: int) -> None:
+        if self.max_bytes > 0 and size > self.max_bytes:
+            ATTACHMENT_FETCHES.inc("rejected")
+            raise AttachmentError(f"附件超过大小上限 {self.max_bytes} 字节")
+
+    async def _revalidate(self, url: str, key: str, cached: CachedAttachment) -> CachedAttachment:
+        """在执行器中标记缓存文件为最近使用，文件已被淘汰或删除时重新下载"""
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(None, self.cache.touch, cached.sha256):
+            ATTACHMENT_FETCHES.inc("hit")
+            return cached
+        return await self._download(url, key)
+
+    async def _download(self, url: str, key: str) -> CachedAttachment:
+        loop = asyncio.get_running_loop()
+        async with self._slots:
+            timeout = aiohttp.ClientTimeout(total=None, sock_read=READ_TIMEOUT)
+            try:
+                async with get_http_client().get(url, timeout=timeout) as response:
+                    if response.status != 200:
+                        ATTACHMENT_FETCHES.inc("error")
+                        raise AttachmentError(f"下载失败: HTTP {response.status}")
+                    content_type = response.content_type or "application/octet-stream"
+                    self._check_type(content_type)
+                    # 服务端给出长度时在下载前拒绝，没有给出时边下载边检查
+                    if response.content_length is not None:
+                        self._check_size(response.content_length)
+                    temp_path = self.cache.temp_path()
+                    digest = hashlib.sha256()
+                    size = 0
+                    # 目录可能被清理，打开前重新创建
+                    await loop.run_in_executor(None, os.makedirs, self.cache.temp_dir, 0o777, True)
+                    file = await loop.run_in_executor(None, open, temp_path, "wb")
+                    try:
+                        buffer = bytearray()
+                        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                            size += len(chunk)
+                            self._check_size(size)
+                            buffer += chunk
+                            if len(buffer) >= WRITE_SIZE:
+                                await loop.run_in_executor(None, _write_chunk, file, digest, bytes(buffer))
+                                buffer.clear()
+                        if buffer:
+                            await loop.run_in_executor(None, _write_chunk, file, digest, bytes(buffer))
+                    except BaseException:
+                        await loop.run_in_executor(None, file.close)
+                        await loop.run_in_executor(None, _remove_quietly, temp_path)
+                        raise
+                    await loop.run_in_executor(None, file.close)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                ATTACHMENT_FETCHES.inc("error")
+                raise AttachmentError(f"下载失败: {e}") from e
+            except OSError as e:
+                # 磁盘已满、权限不足等，与网络错误一样只影响这一个附件
+                ATTACHMENT_FETCHES.inc("error")
+                raise AttachmentError(f"写入缓存失败: {e}") from e
+
+            sha256 = digest.hexdigest()
+            try:
+                path = await loop.run_in_executor(None, self.cache.commit, temp_path, sha256, size)
+            except OSError as e:
+                ATTACHMENT_FETCHES.inc("error")
+                await loop.run_in_executor(None, _remove_quietly, temp_path)
+                raise AttachmentError(f"写入缓存失败: {e}") from e
+        ATTACHMENT_FETCHES.inc("downloaded")
+        ATTACHMENT_BYTES.inc(amount=size)
+        return CachedAttachment(url, path, sha256, size, content_type)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "files": len(self.cache.entries),
+            "bytes": self.cache.total_bytes,
+            "evicted": self.cache.evicted,
+            "inflight": len(self._inflight),
+        }
+
+    async def close(self) -> None:
+        """取消正在进行的下载，未完成的临时文件被删除"""
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+_fetcher: Optional[AttachmentFetcher] = None
+
+
+def get_attachment_fetcher() -> AttachmentFetcher:
+    """获取进程内共享的附件下载器，首次调用时加载缓存目录"""
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = AttachmentFetcher()
+    return _fetcher
+
+
+async def close_attachment_fetcher() -> None:
+    """关闭共享的附件下载器"""
+    global _fetcher
+    if _fetcher is not None:
+        await _fetcher.close()
+        _fetcher.logger.info(f"附件缓存统计: {_fetcher.stats()}")
+        _fetcher = None
@@ -0,0 +1,43 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Dict
+
+from models.message import Message
+
+
+class MessageStorage(ABC):
+    """消息存储后端接口"""
+
+    @abstractmethod
+    def save(self, message: Message) -> None:
+        """
+        保存消息，可能阻塞调用线程（同步写入或写入队列已满），在事件循环中应使用save_async
+
+        Args:
+            message: 统一的消息模型
+        """
+        pass
+
+    async def save_async(self, message: Message) -> None:
+        """
+        在事件循环中保存消息，需要等待时只让调用方协程等待，不阻塞事件循环
+
+        默认在线程池中调用save，子类可以提供不占用线程的实现
+
+        Args:
+            message: 统一的消息模型
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.save, message)
+
+    def flush(self) -> None:
+        """将缓冲中的消息写入存储，默认无需操作"""
+        pass
+
+    def close(self) -> None:
+        """关闭存储，写入所有未落盘的消息并释放资源"""
+        pass
+
+
+def message_to_record(message: Message) -> Dict[str, Any]:
+    """将消息转换为可持久化的字典，不包含原始平台对象"""
+    return message.to_dict()
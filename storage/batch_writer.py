@@ -0,0 +1,267 @@
+import asyncio
+import queue
+import threading
+import time
+from abc import abstractmethod
+from typing import Any, Dict, List, Optional
+
+from models.message import Message
+from storage.base_storage import MessageStorage, message_to_record
+from utils.exceptions import ConfigError
+from utils.logger import setup_logger
+
+# fsync策略
+FSYNC_ALWAYS = "always"      # 每批写入后都fsync
+FSYNC_INTERVAL = "interval"  # 按固定时间间隔fsync
+FSYNC_NEVER = "never"        # 只flush到操作系统缓冲，由系统决定何时落盘
+FSYNC_POLICIES = (FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER)
+
+# save_async在写入队列满时重新尝试的间隔（秒）
+_FULL_RETRY_INTERVAL = 0.05
+
+# 后台线程控制指令
+_STOP = object()
+
+
+class _FlushRequest:
+    """flush请求，后台线程处理完之前的消息后设置事件"""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class BatchWriter(MessageStorage):
+    """
+    批量写入存储的基类
+
+    save只把消息放入内存队列，由后台线程按批次取出并写入，子类只需实现批量写入和落盘逻辑。
+    队列满时save阻塞调用线程，save_async只让调用方协程等待，在事件循环中应使用后者
+    """
+
+    def __init__(self, name: str, batch_size: int = 500, flush_interval: float = 1.0,
+                 fsync_policy: str = FSYNC_INTERVAL, fsync_interval: float = 1.0, max_pending: int = 100000):
+        """
+        初始化批量写入器
+
+        Args:
+            name: 写入器名称，用于日志和线程名
+            batch_size: 每批最多写入的消息数量
+            flush_interval: 队列空闲时后台线程的唤醒间隔（秒）
+            fsync_policy: fsync策略 (always、interval、never)
+            fsync_interval: fsync_policy为interval时的fsync间隔（秒）
+            max_pending: 内存队列中最多积压的消息数量
+        """
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ConfigError(f"未知的fsync策略: {fsync_policy}，可选值: {', '.join(FSYNC_POLICIES)}")
+
+        self.logger = setup_logger(name)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_pending)
+        self._last_sync = time.monotonic()
+        self._closed = False
+        # 后台线程打开存储失败时的异常，此后save的消息都会被丢弃
+        self._open_error: Optional[BaseException] = None
+        self.written = 0
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._run, name=f"{name}-writer", daemon=True)
+        self._thread.start()
+
+    def save(self, message: Message) -> None:
+        """将消息放入写入队列，队列满时阻塞调用线程"""
+        if self._closed:
+            self.logger.warning(f"存储已关闭，丢弃消息: {message.id}")
+            return
+        if not self._thread.is_alive():
+            self._drop(message)
+            return
+
+        record = message_to_record(message)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            # 磁盘写入跟不上时才会发生，此时阻塞调用方形成背压，避免无限占用内存
+            self.logger.warning("存储写入队列已满，等待后台线程写入")
+            if not self._put(record):
+                self._drop(message)
+
+    async def save_async(self, message: Message) -> None:
+        """
+        将消息放入写入队列，队列满时协程等待后重试，不阻塞事件循环，也不占用线程池
+
+        背压只作用于调用它的处理器（以及同一频道排在后面的消息），网关心跳和其他监听器不受影响
+        """
+        if self._closed:
+            self.logger.warning(f"存储已关闭，丢弃消息: {message.id}")
+            return
+
+        record = message_to_record(message)
+        warned = False
+        while self._thread.is_alive():
+            try:
+                self._queue.put_nowait(record)
+                return
+            except queue.Full:
+                if not warned:
+                    self.logger.warning("存储写入队列已满，等待后台线程写入")
+                    warned = True
+                await asyncio.sleep(_FULL_RETRY_INTERVAL)
+        self._drop(message)
+
+    def _put(self, item: Any) -> bool:
+        """
+        阻塞放入队列，后台线程已退出时不再等待
+
+        Returns:
+            bool: 是否已放入队列
+        """
+        while self._thread.is_alive():
+            try:
+                self._queue.put(item, timeout=self.flush_interval)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _drop(self, message: Message) -> None:
+        """后台线程已退出（打开存储失败或意外退出），丢弃消息，只在第一次丢弃时记录错误"""
+        self.dropped += 1
+        if self.dropped == 1:
+            reason = f"打开存储失败: {self._open_error}" if self._open_error else "后台写入线程已退出"
+            self.logger.error(f"{reason}，之后的消息将被丢弃: {message.id}")
+
+    def flush(self) -> None:
+        """等待队列中已有的消息全部写入"""
+        if self._closed or not self._thread.is_alive():
+            return
+        request = _FlushRequest()
+        if not self._put(request):
+            return
+        while not request.done.wait(self.flush_interval):
+            if not self._thread.is_alive():
+                return
+
+    def close(self) -> None:
+        """写入剩余消息并停止后台线程"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._put(_STOP):
+            self._thread.join()
+        if self._open_error is not None:
+            # 打开失败前已放入队列的消息同样没有写入
+            self.dropped += self._queue.qsize()
+            self.logger.warning(f"存储未能打开，共丢弃 {self.dropped} 条消息")
+        else:
+            self.logger.info(f"存储已关闭，共写入 {self.written} 条消息")
+
+    def _run(self) -> None:
+        """后台写入线程"""
+        try:
+            self._open()
+        except Exception as e:
+            self._open_error = e
+            self.logger.error(f"打开存储失败: {e}", exc_info=True)
+            return
+
+        stopping = False
+        while not stopping:
+            batch: List[Dict[str, Any]] = []
+            flush_requests: List[_FlushRequest] = []
+
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+
+            # 取出当前可用的消息组成一批，不额外等待
+            while item is not None:
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, _FlushRequest):
+                    flush_requests.append(item)
+                else:
+                    batch.append(item)
+
+                if stopping or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+
+            if batch:
+                self._write_safely(batch)
+
+            try:
+                self._sync_if_needed(force=bool(flush_requests) or stopping)
+                self._on_tick()
+            except Exception as e:
+                self.logger.error(f"存储维护操作失败: {e}", exc_info=True)
+
+            for request in flush_requests:
+                request.done.set()
+
+        # 停止前写入队列中剩余的消息
+        remaining = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, _FlushRequest):
+                item.done.set()
+            elif item is not _STOP:
+                remaining.append(item)
+        if remaining:
+            self._write_safely(remaining)
+
+        try:
+            self._close()
+        except Exception as e:
+            self.logger.error(f"关闭存储失败: {e}", exc_info=True)
+
+    def _write_safely(self, batch: List[Dict[str, Any]]) -> None:
+        """写入一批消息，失败时记录日志，不让后台线程退出"""
+        try:
+            self._write_batch(batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.logger.error(f"批量写入 {len(batch)} 条消息失败: {e}", exc_info=True)
+
+    def _sync_if_needed(self, force: bool = False) -> None:
+        """根据fsync策略决定是否落盘"""
+        if self.fsync_policy == FSYNC_NEVER:
+            return
+        now = time.monotonic()
+        if force or self.fsync_policy == FSYNC_ALWAYS or now - self._last_sync >= self.fsync_interval:
+            self._sync()
+            self._last_sync = now
+
+    @abstractmethod
+    def _open(self) -> None:
+        """在后台线程中打开存储资源"""
+        pass
+
+    @abstractmethod
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """在后台线程中写入一批消息"""
+        pass
+
+    @abstractmethod
+    def _sync(self) -> None:
+        """在后台线程中将已写入的数据落盘"""
+        pass
+
+    def _on_tick(self) -> None:
+        """后台线程每轮循环结束时调用，可用于按时间轮转等维护操作"""
+        pass
+
+    @abstractmethod
+    def _close(self) -> None:
+        """在后台线程中释放存储资源"""
+        pass
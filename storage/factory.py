@@ -0,0 +1,63 @@
+import os
+from typing import Optional
+
+from config.settings import STORAGE_BACKEND, STORAGE_DIR, STORAGE_BATCH_SIZE, STORAGE_FLUSH_INTERVAL, STORAGE_FSYNC, \
+    STORAGE_FSYNC_INTERVAL, STORAGE_MAX_PENDING, STORAGE_SEGMENT_MAX_BYTES, STORAGE_SEGMENT_MAX_AGE, \
+    STORAGE_COMPRESS, STORAGE_SQLITE_PATH
+from storage.base_storage import MessageStorage
+from utils.exceptions import ConfigError
+
+_storage: Optional[MessageStorage] = None
+
+
+def create_storage(backend: str = STORAGE_BACKEND) -> MessageStorage:
+    """
+    根据配置创建存储后端
+
+    Args:
+        backend: 存储后端类型 (jsonl、sqlite、json)
+
+    Returns:
+        MessageStorage: 存储后端实例
+    """
+    batch_options = dict(
+        batch_size=STORAGE_BATCH_SIZE,
+        flush_interval=STORAGE_FLUSH_INTERVAL,
+        fsync_policy=STORAGE_FSYNC,
+        fsync_interval=STORAGE_FSYNC_INTERVAL,
+        max_pending=STORAGE_MAX_PENDING,
+    )
+
+    if backend == "jsonl":
+        from storage.jsonl_storage import JsonlSegmentStorage
+        return JsonlSegmentStorage(
+            base_dir=STORAGE_DIR,
+            max_segment_bytes=STORAGE_SEGMENT_MAX_BYTES,
+            max_segment_age=STORAGE_SEGMENT_MAX_AGE,
+            compress=STORAGE_COMPRESS,
+            **batch_options,
+        )
+    if backend == "sqlite":
+        from storage.sqlite_storage import SqliteStorage
+        return SqliteStorage(path=STORAGE_SQLITE_PATH or os.path.join(STORAGE_DIR, "messages.db"), **batch_options)
+    if backend == "json":
+        from storage.json_storage import JsonFileStorage
+        return JsonFileStorage(base_dir=STORAGE_DIR)
+
+    raise ConfigError(f"未知的存储后端: {backend}，可选值: jsonl、sqlite、json")
+
+
+def get_storage() -> MessageStorage:
+    """获取进程内共享的存储后端，首次调用时创建"""
+    global _storage
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
+
+
+def close_storage() -> None:
+    """关闭共享的存储后端，写入所有未落盘的消息"""
+    global _storage
+    if _storage is not None:
+        _storage.close()
+        _storage = None
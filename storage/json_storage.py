@@ -0,0 +1,30 @@
+import json
+import os
+from datetime import datetime
+
+from models.message import Message
+from storage.base_storage import MessageStorage, message_to_record
+
+
+class JsonFileStorage(MessageStorage):
+    """
+    每条消息一个JSON文件的存储方式（旧版行为，同步写入）
+
+    文件路径为 {base_dir}/{platform}/{timestamp}-{id}.json，只适合消息量很小的场景
+    """
+
+    def __init__(self, base_dir: str = "data"):
+        self.base_dir = base_dir
+        self._created_dirs = set()
+
+    def save(self, message: Message) -> None:
+        """保存消息为单独的JSON文件"""
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        directory = os.path.join(self.base_dir, message.platform)
+        if directory not in self._created_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._created_dirs.add(directory)
+
+        filename = os.path.join(directory, f"{timestamp}-{message.id}.json")
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(message_to_record(message), f, ensure_ascii=False, indent=2, default=str)
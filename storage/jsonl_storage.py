@@ -0,0 +1,128 @@
+import gzip
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from storage.batch_writer import BatchWriter, FSYNC_NEVER
+
+
+class _Segment:
+    """一个正在写入的JSONL分段文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'ab')
+        self.size = self.file.tell()
+        self.opened_at = time.monotonic()
+
+    def write(self, data: str) -> None:
+        encoded = data.encode('utf-8')
+        self.file.write(encoded)
+        self.size += len(encoded)
+
+
+class JsonlSegmentStorage(BatchWriter):
+    """
+    追加写入的JSONL分段存储
+
+    每个平台一个当前分段 {base_dir}/{platform}/{时间}-{进程号}-{序号}.jsonl，每行一条消息。
+    分段超过大小上限或打开时间超过时间上限后关闭并开启新分段，关闭的分段可选压缩为.jsonl.gz
+    """
+
+    def __init__(self, base_dir: str = "data", max_segment_bytes: int = 64 * 1024 * 1024,
+                 max_segment_age: float = 3600, compress: bool = False, **kwargs):
+        """
+        初始化JSONL分段存储
+
+        Args:
+            base_dir: 数据根目录
+            max_segment_bytes: 单个分段的大小上限（字节）
+            max_segment_age: 单个分段的时间上限（秒）
+            compress: 是否压缩已关闭的分段
+            **kwargs: 传给BatchWriter的批量写入参数
+        """
+        self.base_dir = base_dir
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.compress = compress
+        self._segments: Dict[str, _Segment] = {}
+        self._sequence = 0
+        # 压缩在单独的线程中进行，不影响写入
+        self._compressor: Optional[ThreadPoolExecutor] = None
+        super().__init__("JsonlSegmentStorage", **kwargs)
+
+    def _open(self) -> None:
+        os.makedirs(self.base_dir, exist_ok=True)
+        if self.compress:
+            self._compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="segment-compress")
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        # 按平台分组，每个平台一次写入
+        lines: Dict[str, List[str]] = {}
+        for record in batch:
+            line = json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str)
+            lines.setdefault(record.get("platform") or "unknown", []).append(line)
+
+        for platform, platform_lines in lines.items():
+            segment = self._get_segment(platform)
+            segment.write("\n".join(platform_lines) + "\n")
+            segment.file.flush()
+            if segment.size >= self.max_segment_bytes:
+                self._rotate(platform)
+
+    def _sync(self) -> None:
+        for segment in self._segments.values():
+            segment.file.flush()
+            os.fsync(segment.file.fileno())
+
+    def _on_tick(self) -> None:
+        # 按时间轮转空闲的分段
+        now = time.monotonic()
+        for platform in [p for p, s in self._segments.items() if now - s.opened_at >= self.max_segment_age]:
+            self._rotate(platform)
+
+    def _close(self) -> None:
+        for platform in list(self._segments):
+            self._rotate(platform)
+        if self._compressor:
+            self._compressor.shutdown(wait=True)
+
+    def _get_segment(self, platform: str) -> _Segment:
+        """获取平台当前的分段，不存在时创建"""
+        segment = self._segments.get(platform)
+        if segment is None:
+            directory = os.path.join(self.base_dir, platform)
+            os.makedirs(directory, exist_ok=True)
+            self._sequence += 1
+            name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._sequence:06d}.jsonl"
+            segment = _Segment(os.path.join(directory, name))
+            self._segments[platform] = segment
+        return segment
+
+    def _rotate(self, platform: str) -> None:
+        """关闭平台当前的分段"""
+        segment = self._segments.pop(platform, None)
+        if segment is None:
+            return
+        segment.file.flush()
+        if self.fsync_policy != FSYNC_NEVER:
+            os.fsync(segment.file.fileno())
+        segment.file.close()
+
+        if segment.size == 0:
+            os.remove(segment.path)
+        elif self._compressor:
+            self._compressor.submit(self._compress_segment, segment.path)
+
+    def _compress_segment(self, path: str) -> None:
+        """压缩已关闭的分段，完成后删除原文件"""
+        try:
+            with open(path, 'rb') as src, gzip.open(path + ".gz", 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(path)
+        except Exception as e:
+            self.logger.error(f"压缩分段 {path} 失败: {e}", exc_info=True)
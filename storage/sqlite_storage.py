@@ -0,0 +1,88 @@
+import json
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from storage.batch_writer import BatchWriter, FSYNC_ALWAYS, FSYNC_NEVER
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS messages (
+    platform    TEXT NOT NULL,
+    id          TEXT NOT NULL,
+    content     TEXT,
+    author_id   TEXT,
+    author_name TEXT,
+    timestamp   TEXT,
+    attachments TEXT,
+    metadata    TEXT,
+    PRIMARY KEY (platform, id)
+)
+"""
+
+_INSERT = """
+INSERT OR IGNORE INTO messages (platform, id, content, author_id, author_name, timestamp, attachments, metadata)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+class SqliteStorage(BatchWriter):
+    """
+    SQLite存储，使用WAL模式并通过executemany批量写入
+
+    连接只在后台写入线程中创建和使用
+    """
+
+    def __init__(self, path: str = "data/messages.db", **kwargs):
+        """
+        初始化SQLite存储
+
+        Args:
+            path: 数据库文件路径
+            **kwargs: 传给BatchWriter的批量写入参数
+        """
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        super().__init__("SqliteStorage", **kwargs)
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # fsync策略映射到SQLite的同步级别
+        if self.fsync_policy == FSYNC_ALWAYS:
+            self._conn.execute("PRAGMA synchronous=FULL")
+        elif self.fsync_policy == FSYNC_NEVER:
+            self._conn.execute("PRAGMA synchronous=OFF")
+        else:
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_CREATE_TABLE)
+        self._conn.commit()
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        rows = [
+            (
+                record.get("platform"),
+                record.get("id"),
+                record.get("content"),
+                record.get("author_id"),
+                record.get("author_name"),
+                str(record.get("timestamp")),
+                json.dumps(record.get("attachments") or [], ensure_ascii=False),
+                json.dumps(record.get("metadata") or {}, ensure_ascii=False, default=str),
+            )
+            for record in batch
+        ]
+        with self._conn:
+            self._conn.executemany(_INSERT, rows)
+
+    def _sync(self) -> None:
+        # 同步级别已由PRAGMA synchronous控制，这里将WAL中的内容合并回主库
+        self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def _close(self) -> None:
+        if self._conn:
+            self._conn.close()
+            self._conn = None
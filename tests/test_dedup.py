@@ -0,0 +1,152 @@
+import asyncio
+import time
+
+import pytest
+
+from core.base_listener import BaseListener
+from core.dedup import BloomFilter, DedupCache
+from core.dispatcher import MessageDispatcher, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST
+from models.message import Message
+
+
+def make_message(index: int) -> Message:
+    return Message(id=str(index), content=f"message {index}", platform="discord", author_id="1",
+                   author_name="user", metadata={"channel_id": "1"})
+
+
+class PassthroughListener(BaseListener):
+    """直接交出统一消息的监听器"""
+
+    def __init__(self):
+        super().__init__(platform_name="discord")
+
+    async def start(self) -> None:
+        self.running = True
+
+    async def stop(self) -> None:
+        self.running = False
+
+    async def process_message(self, raw_message):
+        return raw_message
+
+
+@pytest.fixture(params=[0, 1000], ids=["lru", "bloom"])
+def cache(request) -> DedupCache:
+    return DedupCache(ttl=600, max_entries=100, bloom_capacity=request.param)
+
+
+def test_seen_marks_first_occurrence(cache):
+    assert cache.seen("discord", "1") is False
+    assert cache.seen("discord", "1") is True
+    assert cache.seen("telegram", "1") is False
+    assert cache.stats()["hits"] == 1
+
+
+def test_forget_allows_redelivery(cache):
+    assert cache.seen("discord", "1") is False
+    cache.forget("discord", "1")
+    assert cache.seen("discord", "1") is False
+    # 重新记录后再次视为重复
+    assert cache.seen("discord", "1") is True
+
+
+def test_forget_unknown_id_is_harmless(cache):
+    cache.forget("discord", "missing")
+    assert cache.seen("discord", "missing") is False
+    assert cache.seen("discord", "missing") is True
+
+
+def test_bloom_covers_ids_evicted_from_lru():
+    cache = DedupCache(ttl=600, max_entries=10, bloom_capacity=1000)
+    for index in range(50):
+        assert cache.seen("discord", str(index)) is False
+    assert len(cache) == 10
+    assert cache.seen("discord", "0") is True
+
+
+def test_forget_with_bloom_after_lru_eviction():
+    cache = DedupCache(ttl=600, max_entries=10, bloom_capacity=1000)
+    for index in range(50):
+        cache.seen("discord", str(index))
+    # 只剩布隆过滤器中还有记录
+    cache.forget("discord", "0")
+    assert cache.seen("discord", "0") is False
+    assert cache.seen("discord", "0") is True
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = DedupCache(ttl=10, max_entries=100)
+    assert cache.seen("discord", "1") is False
+    now[0] += 11
+    assert cache.seen("discord", "1") is False
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    keys = [f"discord:{index}" for index in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"telegram:{index}" in bloom for index in range(10000))
+    assert false_positives < 300
+
+
+@pytest.mark.parametrize("policy", [OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST])
+@pytest.mark.parametrize("bloom_capacity", [0, 1000], ids=["lru", "bloom"])
+def test_messages_dropped_by_dispatcher_are_not_duplicates(policy, bloom_capacity):
+    async def run():
+        processed = []
+        release = asyncio.Event()
+
+        async def consume(message: Message) -> None:
+            await release.wait()
+            processed.append(message.id)
+
+        cache = DedupCache(ttl=600, max_entries=100, bloom_capacity=bloom_capacity)
+        dispatcher = MessageDispatcher(consume, maxsize=2, workers=1, overflow_policy=policy)
+        dispatcher.set_drop_callback(lambda message: cache.forget(message.platform, message.id))
+        listener = PassthroughListener()
+        listener.register_callback(dispatcher.put)
+        listener.set_dedup_cache(cache)
+        messages = [make_message(index) for index in range(10)]
+
+        await dispatcher.start()
+        for message in messages:
+            await listener._ingest(message)
+        release.set()
+        await dispatcher.stop()
+        first = set(processed)
+        assert 0 < len(first) < len(messages)
+
+        # 重新投递全部消息：已处理的是重复，被丢弃的可以再次进入队列
+        processed.clear()
+        dispatcher = MessageDispatcher(consume, maxsize=100, workers=1, overflow_policy=policy)
+        listener.register_callback(dispatcher.put)
+        await dispatcher.start()
+        for message in messages:
+            await listener._ingest(message)
+        await dispatcher.stop()
+        assert set(processed) == {message.id for message in messages} - first
+
+    asyncio.run(run())
+
+
+def test_callback_error_forgets_message():
+    async def run():
+        cache = DedupCache(ttl=600, max_entries=100)
+        listener = PassthroughListener()
+        listener.set_dedup_cache(cache)
+
+        def failing(message: Message) -> None:
+            raise RuntimeError("boom")
+
+        listener.register_callback(failing)
+        await listener._ingest(make_message(1))
+        accepted = []
+        listener.register_callback(accepted.append)
+        await listener._ingest(make_message(1))
+        assert [message.id for message in accepted] == ["1"]
+
+    asyncio.run(run())
@@ -0,0 +1,121 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from core.dispatcher import (MessageDispatcher, OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST)
+from models.message import Message
+from utils.exceptions import ConfigError
+
+
+def make_message(index: int) -> Message:
+    return Message(id=str(index), content=f"message {index}", platform="discord", author_id="1",
+                   author_name="user", metadata={"channel_id": "1"})
+
+
+async def fill_while_blocked(policy: str, count: int, maxsize: int = 3):
+    """工作协程取走第一条消息后阻塞，其余消息填满队列"""
+    processed: List[str] = []
+    dropped: List[str] = []
+    release = asyncio.Event()
+
+    async def consume(message: Message) -> None:
+        await release.wait()
+        processed.append(message.id)
+
+    dispatcher = MessageDispatcher(consume, maxsize=maxsize, workers=1, overflow_policy=policy)
+    dispatcher.set_drop_callback(lambda message: dropped.append(message.id))
+    await dispatcher.start()
+
+    results = []
+    first = make_message(0)
+    results.append(await dispatcher.put(first))
+    # 让工作协程取走第一条消息
+    await asyncio.sleep(0)
+    for index in range(1, count):
+        results.append(await dispatcher.put(make_message(index)))
+    release.set()
+    await dispatcher.stop()
+    return dispatcher, results, processed, dropped
+
+
+def test_drop_newest_rejects_new_messages():
+    dispatcher, results, processed, dropped = asyncio.run(fill_while_blocked(OVERFLOW_DROP_NEWEST, 6))
+    assert results == [True, True, True, True, False, False]
+    assert processed == ["0", "1", "2", "3"]
+    assert dispatcher.dropped == 2
+    # put返回False的消息由调用方处理，不调用drop_callback
+    assert dropped == []
+
+
+def test_drop_oldest_evicts_queued_messages():
+    dispatcher, results, processed, dropped = asyncio.run(fill_while_blocked(OVERFLOW_DROP_OLDEST, 6))
+    assert all(results)
+    assert processed == ["0", "3", "4", "5"]
+    assert dropped == ["1", "2"]
+    assert dispatcher.dropped == 2
+
+
+def test_block_waits_for_space():
+    async def run():
+        processed: List[str] = []
+        release = asyncio.Event()
+
+        async def consume(message: Message) -> None:
+            await release.wait()
+            processed.append(message.id)
+
+        dispatcher = MessageDispatcher(consume, maxsize=2, workers=1, overflow_policy=OVERFLOW_BLOCK)
+        await dispatcher.start()
+        await dispatcher.put(make_message(0))
+        await asyncio.sleep(0)
+        await dispatcher.put(make_message(1))
+        await dispatcher.put(make_message(2))
+
+        blocked = asyncio.create_task(dispatcher.put(make_message(3)))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+
+        release.set()
+        assert await asyncio.wait_for(blocked, timeout=1) is True
+        await dispatcher.stop()
+        assert processed == ["0", "1", "2", "3"]
+        assert dispatcher.dropped == 0
+
+    asyncio.run(run())
+
+
+def test_put_after_stop_is_rejected():
+    async def run():
+        dispatcher = MessageDispatcher(lambda message: None, maxsize=2, workers=1)
+        await dispatcher.start()
+        await dispatcher.stop()
+        assert await dispatcher.put(make_message(0)) is False
+        assert dispatcher.dropped == 1
+
+    asyncio.run(run())
+
+
+def test_stop_drains_queue_and_survives_consumer_errors():
+    async def run():
+        processed: List[str] = []
+
+        def consume(message: Message) -> None:
+            if message.id == "2":
+                raise RuntimeError("boom")
+            processed.append(message.id)
+
+        dispatcher = MessageDispatcher(consume, maxsize=100, workers=3)
+        await dispatcher.start()
+        for index in range(10):
+            await dispatcher.put(make_message(index))
+        await dispatcher.stop()
+        assert sorted(processed, key=int) == [str(index) for index in range(10) if index != 2]
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("kwargs", [{"overflow_policy": "unknown"}, {"workers": 0}])
+def test_invalid_configuration(kwargs):
+    with pytest.raises(ConfigError):
+        MessageDispatcher(lambda message: None, **kwargs)
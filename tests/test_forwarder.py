@@ -0,0 +1,201 @@
+import asyncio
+import json
+from typing import Any, Dict, List, Sequence, Tuple
+
+import pytest
+from aiohttp import web
+
+import forwarding.forwarder as forwarder_module
+from forwarding.destination import Notification, WebhookDestination
+from forwarding.forwarder import DestinationQueue, parse_retry_after
+from utils.http_client import close_http_client
+
+
+class ScriptedReceiver:
+    """按预设的响应依次回复的webhook接收端，记录每次请求收到的文本"""
+
+    def __init__(self, responses: Sequence[Tuple[int, Dict[str, Any]]] = ()):
+        self.responses = list(responses)
+        self.requests: List[str] = []
+        self._runner = None
+        self.url = ""
+
+    async def __aenter__(self) -> "ScriptedReceiver":
+        app = web.Application()
+        app.router.add_post("/hook", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}/hook"
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await close_http_client()
+        await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requests.append((await request.json())["content"])
+        status, body = self.responses.pop(0) if self.responses else (204, {})
+        if status == 204:
+            return web.Response(status=204)
+        return web.json_response(body, status=status)
+
+
+def make_queue(url: str = "http://127.0.0.1:9/hook", coalesce_window: float = 0.05, max_batch: int = 50,
+               queue_size: int = 100, max_retries: int = 3, max_chars: int = 2000) -> DestinationQueue:
+    destination = WebhookDestination("test", url, max_chars=max_chars)
+    return DestinationQueue(destination, rate=1000, burst=1000, coalesce_window=coalesce_window,
+                            max_batch=max_batch, queue_size=queue_size, max_retries=max_retries)
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(forwarder_module, "DEFAULT_RETRY_AFTER", 0.01)
+    monkeypatch.setattr("utils.http_client.OPEN_PROXY", False)
+
+
+async def wait_until(condition, timeout: float = 2.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("等待超时")
+        await asyncio.sleep(0.005)
+
+
+def test_notifications_within_window_are_coalesced():
+    async def run():
+        async with ScriptedReceiver() as receiver:
+            queue = make_queue(receiver.url, coalesce_window=0.1)
+            queue.start()
+            for index in range(5):
+                queue.put(Notification(f"alert {index}"))
+            await wait_until(lambda: queue.delivered == 5)
+            await queue.stop(timeout=1)
+        assert receiver.requests == ["\n".join(f"alert {index}" for index in range(5))]
+        assert queue.requests == 1
+
+    asyncio.run(run())
+
+
+def test_priority_skips_window_and_goes_first():
+    async def run():
+        async with ScriptedReceiver() as receiver:
+            queue = make_queue(receiver.url, coalesce_window=5.0)
+            queue.start()
+            queue.put(Notification("normal"))
+            queue.put(Notification("urgent", priority=True))
+            # 合并窗口为5秒，优先通知到达后立即发送，并带上已排队的普通通知
+            await wait_until(lambda: queue.delivered == 2, timeout=1.0)
+            await queue.stop(timeout=1)
+        assert receiver.requests == ["urgent\nnormal"]
+
+    asyncio.run(run())
+
+
+def test_batches_respect_max_chars_and_max_batch():
+    queue = make_queue(max_chars=12, max_batch=3)
+    for text in ("aaaa", "bbbb", "cccc", "dd", "e", "f"):
+        queue.put(Notification(text))
+    batches = []
+    while len(queue):
+        batches.append([notification.text for notification in queue._take_batch()])
+    assert batches == [["aaaa", "bbbb"], ["cccc", "dd", "e"], ["f"]]
+
+
+def test_overlong_notification_is_truncated():
+    queue = make_queue(max_chars=5)
+    queue.put(Notification("0123456789"))
+    assert [notification.text for notification in queue._take_batch()] == ["0123…"]
+
+
+def test_overflow_drops_oldest_normal_notification():
+    queue = make_queue(queue_size=2)
+    queue.put(Notification("old"))
+    queue.put(Notification("urgent", priority=True))
+    queue.put(Notification("new"))
+    assert [n.text for n in queue.high] == ["urgent"]
+    assert [n.text for n in queue.normal] == ["new"]
+    assert queue.dropped == 1
+
+
+def test_server_errors_are_retried_until_delivered():
+    async def run():
+        async with ScriptedReceiver([(500, {}), (503, {})]) as receiver:
+            queue = make_queue(receiver.url, coalesce_window=0)
+            queue.start()
+            queue.put(Notification("alert"))
+            await wait_until(lambda: queue.delivered == 1)
+            await queue.stop(timeout=1)
+        assert receiver.requests == ["alert"] * 3
+        assert queue.dropped == 0
+
+    asyncio.run(run())
+
+
+def test_retries_exhausted_drops_notification():
+    async def run():
+        async with ScriptedReceiver([(500, {})] * 3) as receiver:
+            queue = make_queue(receiver.url, coalesce_window=0, max_retries=2)
+            queue.start()
+            queue.put(Notification("alert"))
+            await wait_until(lambda: queue.dropped == 1)
+            await queue.stop(timeout=1)
+        assert len(receiver.requests) == 3
+        assert queue.delivered == 0
+
+    asyncio.run(run())
+
+
+def test_rate_limited_requests_do_not_count_as_retries():
+    async def run():
+        responses = [(429, {"retry_after": 0.01})] * 3
+        async with ScriptedReceiver(responses) as receiver:
+            queue = make_queue(receiver.url, coalesce_window=0, max_retries=1)
+            queue.start()
+            queue.put(Notification("alert"))
+            await wait_until(lambda: queue.delivered == 1)
+            await queue.stop(timeout=1)
+        assert len(receiver.requests) == 4
+        assert queue.rate_limited == 3
+        assert queue.dropped == 0
+
+    asyncio.run(run())
+
+
+def test_client_errors_are_dropped_without_retry():
+    async def run():
+        async with ScriptedReceiver([(400, {"message": "bad"})]) as receiver:
+            queue = make_queue(receiver.url, coalesce_window=0)
+            queue.start()
+            queue.put(Notification("alert"))
+            await wait_until(lambda: queue.dropped == 1)
+            await queue.stop(timeout=1)
+        assert receiver.requests == ["alert"]
+
+    asyncio.run(run())
+
+
+def test_adopt_keeps_order():
+    old = make_queue()
+    new = make_queue()
+    old.put(Notification("first"))
+    old.put(Notification("second"))
+    new.put(Notification("third"))
+    new.adopt(old)
+    assert [n.text for n in new.normal] == ["first", "second", "third"]
+    assert len(old) == 0
+
+
+@pytest.mark.parametrize("headers, body, expected", [
+    ({}, json.dumps({"retry_after": 1.5}).encode(), 1.5),
+    ({}, json.dumps({"parameters": {"retry_after": 3}}).encode(), 3.0),
+    ({"Retry-After": "2"}, b"", 2.0),
+    # None表示回退到默认等待时间
+    ({}, b"not json", None),
+])
+def test_parse_retry_after(headers, body, expected):
+    if expected is None:
+        expected = forwarder_module.DEFAULT_RETRY_AFTER
+    assert parse_retry_after(headers, body) == expected
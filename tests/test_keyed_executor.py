@@ -0,0 +1,129 @@
+import asyncio
+import random
+from typing import Dict, List
+
+import pytest
+
+from handlers.keyed_executor import KeyedExecutor, message_key
+from models.message import Message
+from utils.exceptions import ConfigError
+
+
+def test_same_key_runs_in_submission_order():
+    async def run():
+        rng = random.Random(3)
+        executor = KeyedExecutor(concurrency=4, max_pending=0)
+        seen: Dict[str, List[int]] = {}
+        active: Dict[str, int] = {}
+
+        async def task(key: str, index: int) -> None:
+            active[key] = active.get(key, 0) + 1
+            # 同一个键不会同时执行两个任务
+            assert active[key] == 1
+            await asyncio.sleep(rng.random() / 1000)
+            seen.setdefault(key, []).append(index)
+            active[key] -= 1
+
+        submitted: Dict[str, List[int]] = {}
+        for index in range(300):
+            key = f"channel{rng.randrange(5)}"
+            submitted.setdefault(key, []).append(index)
+            await executor.submit(key, task, key, index)
+        assert await executor.join(timeout=5)
+        assert seen == submitted
+        assert executor.stats()["completed"] == 300
+        assert executor.queues == {} and executor.tasks == {}
+
+    asyncio.run(run())
+
+
+def test_different_keys_run_concurrently_up_to_limit():
+    async def run():
+        executor = KeyedExecutor(concurrency=3, max_pending=0)
+        running = 0
+        peak = 0
+        release = asyncio.Event()
+
+        async def task() -> None:
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await release.wait()
+            running -= 1
+
+        for index in range(10):
+            await executor.submit(f"key{index}", task)
+        await asyncio.sleep(0.01)
+        assert peak == 3
+        release.set()
+        assert await executor.join(timeout=1)
+
+    asyncio.run(run())
+
+
+def test_failed_task_does_not_stop_its_key():
+    async def run():
+        executor = KeyedExecutor(concurrency=2, max_pending=0)
+        done: List[int] = []
+
+        def task(index: int) -> None:
+            if index == 1:
+                raise RuntimeError("boom")
+            done.append(index)
+
+        for index in range(4):
+            await executor.submit("key", task, index)
+        assert await executor.join(timeout=1)
+        assert done == [0, 2, 3]
+        assert executor.failed == 1
+
+    asyncio.run(run())
+
+
+def test_submit_waits_when_max_pending_reached():
+    async def run():
+        executor = KeyedExecutor(concurrency=1, max_pending=2)
+        release = asyncio.Event()
+
+        async def task() -> None:
+            await release.wait()
+
+        await executor.submit("a", task)
+        await executor.submit("b", task)
+        blocked = asyncio.create_task(executor.submit("c", task))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        release.set()
+        await asyncio.wait_for(blocked, timeout=1)
+        assert await executor.join(timeout=1)
+
+    asyncio.run(run())
+
+
+def test_close_timeout_cancels_remaining_tasks():
+    async def run():
+        executor = KeyedExecutor(concurrency=1, max_pending=0)
+
+        async def forever() -> None:
+            await asyncio.Event().wait()
+
+        for index in range(3):
+            await executor.submit("key", forever)
+        await executor.close(timeout=0.01)
+        assert executor.pending == 0
+        assert executor.queues == {} and executor.tasks == {}
+
+    asyncio.run(run())
+
+
+def test_message_key_falls_back_to_author():
+    with_channel = Message(id="1", content="", platform="discord", author_id="7", author_name="u",
+                           metadata={"channel_id": "42"})
+    without_channel = Message(id="2", content="", platform="twitter", author_id="7", author_name="u")
+    assert message_key(with_channel) == "discord:42"
+    assert message_key(without_channel) == "twitter:7"
+
+
+def test_invalid_concurrency():
+    with pytest.raises(ConfigError):
+        KeyedExecutor(concurrency=0)
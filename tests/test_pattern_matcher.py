@@ -0,0 +1,98 @@
+import random
+import re
+import string
+from typing import List, Set
+
+import pytest
+
+from handlers.pattern_matcher import CompiledPatternSet, PatternSpec
+from utils.exceptions import ConfigError
+
+
+def naive_names(specs: List[PatternSpec], text: str) -> Set[str]:
+    """逐条规则匹配，作为对照"""
+    names = set()
+    for spec in specs:
+        if spec.regex:
+            regex = re.compile(spec.pattern, re.IGNORECASE if spec.ignore_case else 0)
+            if any(match.end() > match.start() for match in regex.finditer(text)):
+                names.add(spec.name)
+        elif spec.pattern:
+            if spec.ignore_case:
+                found = spec.pattern.lower() in text.lower()
+            else:
+                found = spec.pattern in text
+            if found:
+                names.add(spec.name)
+    return names
+
+
+def test_overlapping_regexes_all_reported():
+    specs = [
+        PatternSpec("addr", r"0x[0-9a-f]{4}", regex=True),
+        PatternSpec("hex", r"[0-9a-f]{4}", regex=True),
+        PatternSpec("tok", "pepe"),
+    ]
+    assert CompiledPatternSet(specs).matched_names("buy pepe at 0xabcd now") == {"addr", "hex", "tok"}
+
+
+def test_regex_prefix_of_another_regex():
+    specs = [PatternSpec("a", "foo", regex=True), PatternSpec("b", "foobar", regex=True)]
+    assert CompiledPatternSet(specs).matched_names("foobar") == {"a", "b"}
+
+
+def test_overlapping_literals():
+    specs = [PatternSpec("he", "he"), PatternSpec("she", "she"), PatternSpec("hers", "hers")]
+    hits = CompiledPatternSet(specs).scan("ushers")
+    assert [(hit.name, hit.start, hit.end) for hit in hits] == [("she", 1, 4), ("he", 2, 4), ("hers", 2, 6)]
+
+
+def test_scan_matches_each_regex_finditer():
+    specs = [PatternSpec("word", r"\w+", regex=True), PatternSpec("pair", r"\w\w", regex=True)]
+    text = "abc de"
+    hits = CompiledPatternSet(specs).scan(text)
+    expected = [("word", m.start(), m.end()) for m in re.finditer(r"\w+", text)]
+    expected += [("pair", m.start(), m.end()) for m in re.finditer(r"\w\w", text)]
+    assert sorted((hit.name, hit.start, hit.end) for hit in hits) == sorted(expected)
+
+
+def test_backreferences_and_anchors():
+    specs = [
+        PatternSpec("double", r"(\w)\1", regex=True),
+        PatternSpec("start", r"^zz", regex=True),
+        PatternSpec("global_flag", r"(?i)QQ", regex=True),
+    ]
+    compiled = CompiledPatternSet(specs)
+    assert compiled.matched_names("zz xy qq") == {"start", "double", "global_flag"}
+    assert compiled.matched_names("azz") == {"double"}
+
+
+def test_case_sensitivity():
+    specs = [
+        PatternSpec("lit", "Moon", ignore_case=False),
+        PatternSpec("re", r"moon\d", regex=True, ignore_case=False),
+    ]
+    compiled = CompiledPatternSet(specs)
+    assert compiled.matched_names("MOON moon1") == {"re"}
+    assert compiled.matched_names("Moon MOON1") == {"lit"}
+
+
+def test_invalid_regex_raises_config_error():
+    with pytest.raises(ConfigError):
+        CompiledPatternSet([PatternSpec("bad", "(", regex=True)])
+
+
+def test_random_rules_agree_with_naive_matcher():
+    rng = random.Random(7)
+    alphabet = "abcx01"
+
+    def word(low: int, high: int) -> str:
+        return "".join(rng.choice(alphabet) for _ in range(rng.randint(low, high)))
+
+    specs = [PatternSpec(f"lit{i}", word(1, 4), ignore_case=rng.random() < 0.5) for i in range(30)]
+    specs += [PatternSpec(f"re{i}", rf"{word(1, 2)}[{alphabet}]{{{rng.randint(1, 3)}}}", regex=True,
+                          ignore_case=rng.random() < 0.5) for i in range(15)]
+    compiled = CompiledPatternSet(specs)
+    for _ in range(300):
+        text = "".join(rng.choice(alphabet + alphabet.upper() + string.whitespace[:1]) for _ in range(30))
+        assert compiled.matched_names(text) == naive_names(specs, text), text
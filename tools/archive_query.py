@@ -0,0 +1,206 @@
+"""
+全文检索归档的命令行工具（在项目根目录下运行）
+
+查询，时间可以是ISO格式或相对时间（30m、12h、7d）:
+    python -m tools.archive_query search "airdrop" --author alice --since 7d
+    python -m tools.archive_query search "claim OR mint" --raw --platform discord --channel 123456 --json
+
+把已保存的消息（json存储的单条文件、jsonl存储的分段，包括.jsonl.gz）一次性导入归档，可以重复执行:
+    python -m tools.archive_query import data/discord data/telegram
+
+查看各平台的消息数量:
+    python -m tools.archive_query stats
+
+用合成数据测量导入速度和查询耗时:
+    python -m tools.archive_query bench --count 1000000
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional
+
+from config.settings import ARCHIVE_PATH, ARCHIVE_TOKENIZER
+from storage.archive import ArchiveReader, import_records, iter_saved_records, TOKENIZERS
+from utils.exceptions import StorageError
+
+_RELATIVE_TIME = re.compile(r"^(\d+(?:\.\d+)?)([smhd])$")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """把ISO格式时间或相对时间（如7d表示7天前）转换为Unix时间戳"""
+    if not value:
+        return None
+    match = _RELATIVE_TIME.match(value)
+    if match:
+        return time.time() - float(match.group(1)) * _UNITS[match.group(2)]
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无法识别的时间: {value}")
+
+
+def _format(record: Dict[str, Any]) -> str:
+    when = datetime.fromtimestamp(record["timestamp"]).strftime("%Y-%m-%d %H:%M:%S") if record["timestamp"] else "-"
+    content = " ".join((record["content"] or "").split())
+    return f"{when} [{record['platform']}#{record['channel_id'] or '-'}] {record['author_name']}: {content}"
+
+
+def _search(args: argparse.Namespace) -> int:
+    reader = ArchiveReader(args.db)
+    try:
+        options = dict(text=args.text, platform=args.platform, channel_id=args.channel, author=args.author,
+                       since=args.since, until=args.until, limit=args.limit, raw_query=args.raw)
+        start = time.perf_counter()
+        records = reader.search(**options)
+        elapsed = time.perf_counter() - start
+        if args.explain:
+            for line in reader.explain(**options):
+                print(f"plan: {line}", file=sys.stderr)
+    finally:
+        reader.close()
+
+    for record in records:
+        print(json.dumps(record, ensure_ascii=False) if args.json else _format(record))
+    print(f"{len(records)} 条结果，耗时 {elapsed * 1000:.1f} ms", file=sys.stderr)
+    return 0
+
+
+def _import(args: argparse.Namespace) -> int:
+    start = time.perf_counter()
+    imported, skipped = import_records(iter_saved_records(args.paths), path=args.db, tokenizer=args.tokenizer)
+    elapsed = time.perf_counter() - start
+    print(f"导入: {imported}  跳过(已存在或无效): {skipped}  耗时: {elapsed:.1f}s")
+    return 0
+
+
+def _stats(args: argparse.Namespace) -> int:
+    reader = ArchiveReader(args.db)
+    try:
+        for platform, item in reader.stats().items():
+            first = datetime.fromtimestamp(item["first"]).isoformat(" ", "seconds") if item["first"] else "-"
+            last = datetime.fromtimestamp(item["last"]).isoformat(" ", "seconds") if item["last"] else "-"
+            print(f"{platform}: {item['messages']} 条消息，{first} ~ {last}")
+    finally:
+        reader.close()
+    return 0
+
+
+_WORDS = ["airdrop", "mint", "claim", "whitelist", "token", "launch", "giveaway", "snapshot", "bridge", "stake",
+          "wallet", "presale", "update", "announcement", "roadmap", "partnership", "listing", "burn", "vote", "raffle"]
+_FILLER = ["the", "a", "is", "now", "for", "all", "our", "new", "today", "soon", "check", "join", "get", "your",
+           "and", "with", "this", "week", "live", "open"]
+
+
+def _synthetic_records(count: int, seed: int = 7) -> Iterator[Dict[str, Any]]:
+    """合成消息：关键词和作者按Zipf分布，时间均匀分布在最近90天"""
+    rng = random.Random(seed)
+    now = time.time()
+    platforms = ["discord", "telegram", "twitter"]
+    word_weights = [1 / (rank + 1) for rank in range(len(_WORDS))]
+    for index in range(count):
+        words = rng.choices(_FILLER, k=8) + rng.choices(_WORDS, weights=word_weights, k=2) + [f"tag{rng.randrange(50000)}"]
+        rng.shuffle(words)
+        author = int(rng.paretovariate(1.2)) % 5000
+        yield {
+            "id": str(index),
+            "platform": platforms[index % 3],
+            "content": " ".join(words),
+            "author_id": str(author),
+            "author_name": f"user{author}",
+            "timestamp": now - rng.random() * 90 * 86400,
+            "attachments": [],
+            "metadata": {"channel_id": str(rng.randrange(200))},
+        }
+
+
+def _bench(args: argparse.Namespace) -> int:
+    path = args.reuse or os.path.join(tempfile.mkdtemp(prefix="archive-bench-"), "archive.db")
+    if not args.reuse:
+        start = time.perf_counter()
+        imported, _ = import_records(_synthetic_records(args.count), path=path, tokenizer=args.tokenizer)
+        elapsed = time.perf_counter() - start
+        print(f"导入 {imported} 条合成消息，耗时 {elapsed:.1f}s ({imported / elapsed:.0f} 条/秒)，"
+              f"数据库 {os.path.getsize(path) / 1024 / 1024:.0f} MB")
+
+    week = time.time() - 7 * 86400
+    queries = {
+        "常见词": dict(text="airdrop"),
+        "少见词": dict(text="raffle"),
+        "唯一标签": dict(text="tag12345"),
+        "两个词AND": dict(text="mint whitelist"),
+        "词+作者+最近7天": dict(text="airdrop", author="user3", since=week),
+        "词+频道": dict(text="claim", channel_id="42"),
+        "作者+最近7天": dict(author="user3", since=week),
+        "平台+最近7天": dict(platform="telegram", since=week),
+        "频道": dict(channel_id="7"),
+    }
+    reader = ArchiveReader(path)
+    try:
+        for name, options in queries.items():
+            timings = []
+            for _ in range(args.repeat):
+                query_start = time.perf_counter()
+                results = reader.search(limit=50, **options)
+                timings.append((time.perf_counter() - query_start) * 1000)
+            print(f"{name:<14} 结果 {len(results):>3}  中位数 {statistics.median(timings):7.2f} ms  "
+                  f"最大 {max(timings):7.2f} ms")
+            if args.explain:
+                for line in reader.explain(limit=50, **options):
+                    print(f"    plan: {line}")
+    finally:
+        reader.close()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="全文检索归档的查询和导入工具")
+    parser.add_argument("--db", default=ARCHIVE_PATH, help="归档数据库文件路径")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="查询消息")
+    search.add_argument("text", nargs="?", help="全文检索的文本，多个词之间为AND")
+    search.add_argument("--raw", action="store_true", help="text直接作为FTS5查询语法（OR、NOT、前缀*、NEAR）")
+    search.add_argument("--platform")
+    search.add_argument("--channel", help="频道ID")
+    search.add_argument("--author", help="作者ID或作者名称")
+    search.add_argument("--since", type=parse_time, help="起始时间，ISO格式或相对时间（如7d、12h）")
+    search.add_argument("--until", type=parse_time, help="结束时间，ISO格式或相对时间")
+    search.add_argument("--limit", type=int, default=50)
+    search.add_argument("--json", action="store_true", help="每行输出一条JSON记录")
+    search.add_argument("--explain", action="store_true", help="输出查询计划")
+    search.set_defaults(handler=_search)
+
+    importer = commands.add_parser("import", help="导入已保存的消息文件或目录")
+    importer.add_argument("paths", nargs="+")
+    importer.add_argument("--tokenizer", choices=list(TOKENIZERS), default=ARCHIVE_TOKENIZER)
+    importer.set_defaults(handler=_import)
+
+    stats = commands.add_parser("stats", help="各平台的消息数量和时间范围")
+    stats.set_defaults(handler=_stats)
+
+    bench = commands.add_parser("bench", help="用合成数据测量导入速度和查询耗时")
+    bench.add_argument("--count", type=int, default=200000)
+    bench.add_argument("--repeat", type=int, default=20)
+    bench.add_argument("--tokenizer", choices=list(TOKENIZERS), default=ARCHIVE_TOKENIZER)
+    bench.add_argument("--explain", action="store_true")
+    bench.add_argument("--reuse", help="使用之前生成的归档文件，跳过导入")
+    bench.set_defaults(handler=_bench)
+
+    args = parser.parse_args()
+    try:
+        return args.handler(args)
+    except StorageError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
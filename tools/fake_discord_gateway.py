@@ -0,0 +1,486 @@
+"""
+本地Discord网关和REST替身服务，用于负载、重连和慢消费者测试
+
+实现了客户端登录和收消息所需的最小协议:
+    - REST: GET /api/v9/users/@me、GET /api/v9/gateway、GET /api/v9/channels/{id}/messages（历史消息），
+            其他接口返回空对象
+    - 网关: HELLO、IDENTIFY -> READY/READY_SUPPLEMENTAL、HEARTBEAT/ACK、RESUME -> 补发 + RESUMED、
+            INVALID_SESSION，支持zlib-stream压缩
+    - MESSAGE_CREATE 按指定速率推送给所有会话，会话断开期间的事件会缓存，RESUME时补发
+    - 可注入定期断线和固定网络延迟，也可以只写入频道历史而不推送，模拟离线期间的消息
+    - 可以吊销指定token（登录返回401、IDENTIFY以4004关闭），模拟多账号中的某个账号失效
+
+启动替身服务（在项目根目录下运行）:
+    python -m tools.fake_discord_gateway --port 8765 --rate 2000 --count 100000 --disconnect-every 15
+
+让机器人连接替身服务，在.env中设置:
+    DISCORD_TOKEN=fake-token
+    DISCORD_API_BASE=http://127.0.0.1:8765/api/v9
+    DISCORD_GATEWAY_URL=ws://127.0.0.1:8765/gateway
+    OPEN_PROXY=False
+
+端到端测量接入能力（同一进程内启动替身服务和DiscordListener）:
+    python -m tools.fake_discord_gateway --bench --rate 5000 --count 50000 --disconnect-every 3 --latency 0.02
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+import uuid
+import zlib
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from aiohttp import WSMsgType, web
+
+# 网关操作码
+OP_DISPATCH = 0
+OP_HEARTBEAT = 1
+OP_IDENTIFY = 2
+OP_RESUME = 6
+OP_RECONNECT = 7
+OP_INVALID_SESSION = 9
+OP_HELLO = 10
+OP_HEARTBEAT_ACK = 11
+
+# 可恢复的关闭码，客户端收到后会尝试RESUME
+CLOSE_UNKNOWN_ERROR = 4000
+# 认证失败，客户端不会重连
+CLOSE_AUTHENTICATION_FAILED = 4004
+
+_snowflake_counter = itertools.count()
+
+
+def snowflake() -> str:
+    """生成与Discord格式一致的雪花ID"""
+    discord_epoch_ms = int(time.time() * 1000) - 1420070400000
+    return str((discord_epoch_ms << 22) | (next(_snowflake_counter) & 0x3FFFFF))
+
+
+class FakeSession:
+    """一个网关会话，连接断开后保留，供RESUME补发事件"""
+
+    def __init__(self, session_id: str, user: Dict[str, Any], buffer_size: int, token: Optional[str] = None):
+        self.session_id = session_id
+        self.token = token
+        self.user = user
+        self.sequence = 0
+        # 最近发送过的事件，(序号, 事件)
+        self.history: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=buffer_size)
+        self.connection: Optional["FakeConnection"] = None
+
+    def next_event(self, event: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        self.sequence += 1
+        payload = {"op": OP_DISPATCH, "t": event, "s": self.sequence, "d": data}
+        self.history.append((self.sequence, payload))
+        return payload
+
+
+class FakeConnection:
+    """一条websocket连接，负责压缩、注入延迟和按顺序发送"""
+
+    def __init__(self, ws: web.WebSocketResponse, compress: bool, latency: float):
+        self.ws = ws
+        self.latency = latency
+        self._compressor = zlib.compressobj() if compress else None
+        self._outbox: "asyncio.Queue[Tuple[float, Dict[str, Any]]]" = asyncio.Queue()
+        self._sender = asyncio.create_task(self._send_loop())
+
+    def send(self, payload: Dict[str, Any]) -> None:
+        """按 当前时间+延迟 排队发送，不阻塞调用方"""
+        self._outbox.put_nowait((time.monotonic() + self.latency, payload))
+
+    async def _send_loop(self) -> None:
+        try:
+            while True:
+                due, payload = await self._outbox.get()
+                delay = due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                data = json.dumps(payload, separators=(",", ":"))
+                if self._compressor is not None:
+                    await self.ws.send_bytes(self._compressor.compress(data.encode("utf-8")) +
+                                             self._compressor.flush(zlib.Z_SYNC_FLUSH))
+                else:
+                    await self.ws.send_str(data)
+        except (ConnectionError, RuntimeError, asyncio.CancelledError):
+            pass
+
+    async def close(self, code: int = CLOSE_UNKNOWN_ERROR) -> None:
+        self._sender.cancel()
+        await self.ws.close(code=code)
+
+
+class FakeDiscordGateway:
+    """
+    Discord网关和REST替身服务
+
+    Args:
+        host: 监听地址
+        port: 监听端口
+        latency: 每个下行事件的固定延迟（秒）
+        heartbeat_interval: HELLO中下发的心跳间隔（毫秒）
+        buffer_size: 每个会话保留用于RESUME补发的事件数量
+        channels: 推送消息使用的频道数量
+        guild_id: 推送消息所属的服务器ID
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, latency: float = 0.0,
+                 heartbeat_interval: int = 41250, buffer_size: int = 100000, channels: int = 10,
+                 guild_id: str = "900000000000000001"):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.heartbeat_interval = heartbeat_interval
+        self.buffer_size = buffer_size
+        self.channel_ids = [str(1000000000000000000 + i) for i in range(channels)]
+        self.guild_id = guild_id
+        self.sessions: Dict[str, FakeSession] = {}
+        # 被吊销的token，登录和IDENTIFY都会失败，用于模拟账号失效
+        self.revoked_tokens: Set[str] = set()
+        # 各频道的历史消息，供历史消息接口查询
+        self.channel_history: Dict[str, Deque[Dict[str, Any]]] = {}
+        self.user = {"id": "800000000000000001", "username": "fake-user", "discriminator": "0",
+                     "global_name": "Fake User", "avatar": None, "bot": False, "verified": True,
+                     "email": None, "flags": 0, "premium_type": 0, "mfa_enabled": False}
+
+        # 统计信息
+        self.published = 0
+        self.identifies = 0
+        self.resumes = 0
+        self.disconnects = 0
+        self.history_requests = 0
+
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def api_base(self) -> str:
+        return f"http://{self.host}:{self.port}/api/v9"
+
+    @property
+    def gateway_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/gateway"
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/gateway", self._handle_gateway)
+        app.router.add_get("/api/v9/users/@me", self._handle_me)
+        app.router.add_get("/api/v9/gateway", self._handle_gateway_url)
+        app.router.add_get("/api/v9/channels/{channel_id}/messages", self._handle_history)
+        app.router.add_route("*", "/{tail:.*}", self._handle_other)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self) -> None:
+        for session in self.sessions.values():
+            if session.connection is not None:
+                await session.connection.close(code=1000)
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # REST
+
+    @staticmethod
+    def _json(data: Any) -> web.Response:
+        # discord.py-self只在Content-Type恰好为application/json时解析响应体，不能带charset
+        return web.Response(body=json.dumps(data).encode("utf-8"), headers={"Content-Type": "application/json"})
+
+    async def _handle_me(self, request: web.Request) -> web.Response:
+        if request.headers.get("Authorization") in self.revoked_tokens:
+            return web.Response(status=401, body=b'{"message": "401: Unauthorized", "code": 0}',
+                                headers={"Content-Type": "application/json"})
+        return self._json(self.user)
+
+    async def _handle_gateway_url(self, request: web.Request) -> web.Response:
+        return self._json({"url": self.gateway_url})
+
+    async def _handle_history(self, request: web.Request) -> web.Response:
+        """与Discord一致：返回after之后（或before之前）最近的limit条消息，按从新到旧排列"""
+        self.history_requests += 1
+        history = self.channel_history.get(request.match_info["channel_id"], ())
+        limit = min(100, int(request.query.get("limit", 50)))
+        if "after" in request.query:
+            after = int(request.query["after"])
+            messages = [m for m in history if int(m["id"]) > after][:limit]
+        else:
+            before = int(request.query.get("before", 1 << 63))
+            messages = [m for m in history if int(m["id"]) < before][-limit:]
+        return self._json(list(reversed(messages)))
+
+    async def _handle_other(self, request: web.Request) -> web.Response:
+        return self._json({})
+
+    # 网关
+
+    async def _handle_gateway(self, request: web.Request) -> web.WebSocketResponse:
+        # 客户端在请求头中声明了permessage-deflate但实际并未启用，服务端不能协商压缩
+        ws = web.WebSocketResponse(max_msg_size=0, compress=False)
+        await ws.prepare(request)
+        connection = FakeConnection(ws, request.query.get("compress") == "zlib-stream", self.latency)
+        connection.send({"op": OP_HELLO, "d": {"heartbeat_interval": self.heartbeat_interval}})
+        session: Optional[FakeSession] = None
+
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                payload = json.loads(msg.data)
+                op, data = payload.get("op"), payload.get("d")
+
+                if op == OP_HEARTBEAT:
+                    connection.send({"op": OP_HEARTBEAT_ACK})
+                elif op == OP_IDENTIFY:
+                    token = (data or {}).get("token")
+                    if token in self.revoked_tokens:
+                        await connection.close(code=CLOSE_AUTHENTICATION_FAILED)
+                        break
+                    session = self._identify(connection, token)
+                elif op == OP_RESUME:
+                    session = self._resume(connection, data or {})
+        finally:
+            if session is not None and session.connection is connection:
+                session.connection = None
+            await connection.close(code=1000)
+        return ws
+
+    def _identify(self, connection: FakeConnection, token: Optional[str] = None) -> FakeSession:
+        self.identifies += 1
+        session = FakeSession(uuid.uuid4().hex, self.user, self.buffer_size, token)
+        self.sessions[session.session_id] = session
+        session.connection = connection
+        connection.send(session.next_event("READY", {
+            "v": 9,
+            "user": self.user,
+            "users": [],
+            "guilds": [],
+            "private_channels": [],
+            "relationships": [],
+            "session_id": session.session_id,
+            "resume_gateway_url": self.gateway_url,
+            "session_type": "normal",
+        }))
+        connection.send(session.next_event("READY_SUPPLEMENTAL", {
+            "guilds": [],
+            "merged_members": [],
+            "merged_presences": {"guilds": [], "friends": []},
+            "lazy_private_channels": [],
+        }))
+        return session
+
+    def _resume(self, connection: FakeConnection, data: Dict[str, Any]) -> Optional[FakeSession]:
+        session = self.sessions.get(data.get("session_id"))
+        last_sequence = data.get("seq") or 0
+        oldest = session.history[0][0] if session and session.history else 0
+        if session is None or (last_sequence + 1 < oldest):
+            # 会话不存在或需要补发的事件已被淘汰，要求客户端重新IDENTIFY
+            connection.send({"op": OP_INVALID_SESSION, "d": False})
+            return None
+
+        self.resumes += 1
+        session.connection = connection
+        for sequence, payload in session.history:
+            if sequence > last_sequence:
+                connection.send(payload)
+        connection.send(session.next_event("RESUMED", {}))
+        return session
+
+    def message_payload(self, index: int) -> Dict[str, Any]:
+        """构造一条MESSAGE_CREATE事件数据"""
+        author_id = str(700000000000000000 + index % 500)
+        return {
+            "id": snowflake(),
+            "channel_id": self.channel_ids[index % len(self.channel_ids)],
+            "guild_id": self.guild_id,
+            "author": {"id": author_id, "username": f"user{index % 500}", "discriminator": "0",
+                       "global_name": None, "avatar": None},
+            "content": f"fake message {index}",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": [],
+            "pinned": False,
+            "type": 0,
+            "flags": 0,
+        }
+
+    def publish(self, data: Dict[str, Any], deliver: bool = True) -> None:
+        """
+        向所有会话推送一条MESSAGE_CREATE，断开的会话只记录，等待RESUME补发
+
+        Args:
+            data: 消息数据
+            deliver: 为False时只写入频道历史，不推送给任何会话，模拟离线期间发送的消息
+        """
+        self.published += 1
+        history = self.channel_history.get(data["channel_id"])
+        if history is None:
+            history = self.channel_history[data["channel_id"]] = deque(maxlen=self.buffer_size)
+        history.append(data)
+        if not deliver:
+            return
+        for session in self.sessions.values():
+            payload = session.next_event("MESSAGE_CREATE", data)
+            if session.connection is not None:
+                session.connection.send(payload)
+
+    async def publish_messages(self, count: int, rate: float) -> None:
+        """
+        按速率推送count条消息，rate为0时不限速
+
+        每10毫秒发送一批，保证高速率下的调度开销可控
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        sent = 0
+        while sent < count:
+            if rate > 0:
+                target = min(count, int((loop.time() - start) * rate) + 1)
+            else:
+                target = min(count, sent + 1000)
+            while sent < target:
+                self.publish(self.message_payload(sent))
+                sent += 1
+            await asyncio.sleep(0.01 if rate > 0 else 0)
+
+    async def disconnect_all(self, code: int = CLOSE_UNKNOWN_ERROR) -> None:
+        """断开所有连接，默认使用可恢复的关闭码，客户端会尝试RESUME"""
+        for session in list(self.sessions.values()):
+            connection = session.connection
+            if connection is not None:
+                session.connection = None
+                self.disconnects += 1
+                await connection.close(code=code)
+
+    async def revoke_token(self, token: str) -> None:
+        """吊销token并断开使用它的会话，客户端之后无法再登录，直到restore_token"""
+        self.revoked_tokens.add(token)
+        for session_id, session in list(self.sessions.items()):
+            if session.token == token:
+                del self.sessions[session_id]
+                if session.connection is not None:
+                    connection, session.connection = session.connection, None
+                    self.disconnects += 1
+                    await connection.close(code=CLOSE_AUTHENTICATION_FAILED)
+
+    def restore_token(self, token: str) -> None:
+        self.revoked_tokens.discard(token)
+
+    async def disconnect_periodically(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.disconnect_all()
+
+    def stats(self) -> Dict[str, int]:
+        return {"published": self.published, "identifies": self.identifies, "resumes": self.resumes,
+                "disconnects": self.disconnects, "sessions": len(self.sessions),
+                "history_requests": self.history_requests}
+
+
+async def _run_server(args: argparse.Namespace) -> None:
+    gateway = FakeDiscordGateway(args.host, args.port, latency=args.latency, channels=args.channels)
+    await gateway.start()
+    print(f"替身服务已启动: REST {gateway.api_base}  网关 {gateway.gateway_url}")
+
+    tasks = []
+    if args.disconnect_every > 0:
+        tasks.append(asyncio.create_task(gateway.disconnect_periodically(args.disconnect_every)))
+    try:
+        # 等待第一个客户端完成IDENTIFY后再开始推送
+        while not gateway.sessions:
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(args.warmup)
+        await gateway.publish_messages(args.count, args.rate)
+        print(f"推送完成: {gateway.stats()}")
+        await asyncio.Event().wait()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await gateway.stop()
+
+
+async def _run_bench(args: argparse.Namespace) -> int:
+    """在同一进程内启动替身服务和DiscordListener，测量端到端接入能力和断线恢复"""
+    gateway = FakeDiscordGateway(args.host, args.port, latency=args.latency, channels=args.channels)
+    await gateway.start()
+
+    # 设置需要在导入监听器之前完成
+    os.environ.setdefault("DISCORD_TOKEN", "fake-token")
+    os.environ["OPEN_PROXY"] = "False"
+    os.environ["DISCORD_API_BASE"] = gateway.api_base
+    os.environ["DISCORD_GATEWAY_URL"] = gateway.gateway_url
+    from core.discord.listener import DiscordListener
+
+    received: List[float] = []
+    ids = set()
+    listener = DiscordListener()
+
+    async def on_message(message) -> None:
+        ids.add(message.id)
+        received.append(time.perf_counter())
+
+    listener.register_callback(on_message)
+    listener_task = asyncio.create_task(listener.start())
+
+    tasks = []
+    try:
+        while not listener.running:
+            await asyncio.sleep(0.05)
+        if args.disconnect_every > 0:
+            tasks.append(asyncio.create_task(gateway.disconnect_periodically(args.disconnect_every)))
+
+        start = time.perf_counter()
+        await gateway.publish_messages(args.count, args.rate)
+        deadline = time.monotonic() + args.timeout
+        while len(ids) < args.count and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        elapsed = (received[-1] if received else time.perf_counter()) - start
+    finally:
+        for task in tasks:
+            task.cancel()
+        await listener.stop()
+        listener_task.cancel()
+        await asyncio.gather(listener_task, return_exceptions=True)
+        await gateway.stop()
+
+    missing = args.count - len(ids)
+    print(f"推送: {args.count}  收到: {len(received)}  去重后: {len(ids)}  缺失: {missing}  "
+          f"耗时: {elapsed:.2f}s  接入速率: {len(ids) / elapsed if elapsed > 0 else 0:.0f} 条/秒")
+    print(f"替身服务统计: {gateway.stats()}")
+    return 1 if missing else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="本地Discord网关和REST替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=float, default=1000, help="推送速率（条/秒），0表示不限速")
+    parser.add_argument("--count", type=int, default=10000, help="推送消息数量")
+    parser.add_argument("--channels", type=int, default=10, help="消息分布的频道数量")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个下行事件的固定延迟（秒）")
+    parser.add_argument("--disconnect-every", type=float, default=0, help="每隔多少秒断开所有连接，0表示不断开")
+    parser.add_argument("--warmup", type=float, default=1.0, help="客户端连接后等待多少秒再开始推送")
+    parser.add_argument("--bench", action="store_true", help="在同一进程内启动DiscordListener测量接入能力")
+    parser.add_argument("--timeout", type=float, default=30, help="--bench模式下等待消息全部到达的最长时间")
+    args = parser.parse_args()
+
+    try:
+        if args.bench:
+            return asyncio.run(_run_bench(args))
+        asyncio.run(_run_server(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+"""
+本地Telegram Bot API替身服务，用于长轮询接入的吞吐、重启和错误恢复测试
+
+实现了监听器需要的最小接口:
+    - POST /bot{token}/getMe: token不正确时返回401
+    - POST /bot{token}/getUpdates: 支持offset确认、limit、timeout长轮询；新的轮询会让仍在等待的旧轮询返回409，
+      与Bot API一致
+    - 可以每隔N次getUpdates返回一次502，测试监听器的重试
+
+启动替身服务（在项目根目录下运行）:
+    python -m tools.fake_telegram_api --port 8767 --rate 2000 --count 100000
+
+让机器人连接替身服务，在.env中设置:
+    ENABLED_PLATFORMS=telegram
+    TELEGRAM_BOT_TOKEN=fake-token
+    TELEGRAM_API_BASE=http://127.0.0.1:8767
+    OPEN_PROXY=False
+
+端到端测量接入能力（同一进程内启动替身服务和TelegramListener，可定期重启监听器验证偏移量持久化）:
+    python -m tools.fake_telegram_api --bench --rate 0 --count 50000 --restart-every 2 --error-every 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+DEFAULT_TOKEN = "fake-token"
+
+
+class FakeTelegramApi:
+    """保存未确认的更新，按Bot API的语义响应getUpdates"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8767, token: str = DEFAULT_TOKEN, chats: int = 10,
+                 latency: float = 0.0, error_every: int = 0):
+        """
+        初始化替身服务
+
+        Args:
+            host: 监听地址
+            port: 监听端口
+            token: 有效的机器人token
+            chats: 消息分布的会话数量
+            latency: 每个请求的固定延迟（秒）
+            error_every: 每隔多少次getUpdates返回一次502，0表示不注入错误
+        """
+        self.host = host
+        self.port = port
+        self.token = token
+        self.chats = chats
+        self.latency = latency
+        self.error_every = error_every
+
+        # 尚未被确认的更新，按update_id递增
+        self.updates: List[Dict[str, Any]] = []
+        self.next_update_id = 1000
+        self._new_updates = asyncio.Event()
+        # 每次getUpdates递增，等待中的旧轮询发现不是最新的请求后返回409
+        self._poll_generation = 0
+        self._runner = None
+
+        # 统计信息
+        self.published = 0
+        self.polls = 0
+        self.delivered = 0
+        self.errors = 0
+        self.conflicts = 0
+
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/getMe", self._get_me)
+        self.app.router.add_post("/bot{token}/getUpdates", self._get_updates)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @staticmethod
+    def _error(status: int, description: str, retry_after: Optional[int] = None) -> web.Response:
+        body: Dict[str, Any] = {"ok": False, "error_code": status, "description": description}
+        if retry_after is not None:
+            body["parameters"] = {"retry_after": retry_after}
+        return web.json_response(body, status=status)
+
+    async def _read(self, request: web.Request) -> Optional[Dict[str, Any]]:
+        """检查token并读取请求参数，token不正确时返回None"""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if request.match_info["token"] != self.token:
+            return None
+        if request.can_read_body:
+            return await request.json()
+        return dict(request.query)
+
+    async def _get_me(self, request: web.Request) -> web.Response:
+        if await self._read(request) is None:
+            return self._error(401, "Unauthorized")
+        return web.json_response({"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "Fake",
+                                                         "username": "fake_bot"}})
+
+    async def _get_updates(self, request: web.Request) -> web.Response:
+        params = await self._read(request)
+        if params is None:
+            return self._error(401, "Unauthorized")
+        self.polls += 1
+        self._poll_generation += 1
+        generation = self._poll_generation
+        if self.error_every and self.polls % self.error_every == 0:
+            self.errors += 1
+            return self._error(502, "Bad Gateway")
+
+        offset = params.get("offset")
+        if offset is not None:
+            # 确认offset之前的更新，之后不再返回
+            offset = int(offset)
+            index = 0
+            while index < len(self.updates) and self.updates[index]["update_id"] < offset:
+                index += 1
+            del self.updates[:index]
+        limit = max(1, min(100, int(params.get("limit") or 100)))
+        deadline = time.monotonic() + float(params.get("timeout") or 0)
+
+        while not self.updates:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if generation != self._poll_generation:
+                self.conflicts += 1
+                return self._error(409, "Conflict: terminated by other getUpdates request")
+
+        result = self.updates[:limit]
+        self.delivered += len(result)
+        return web.json_response({"ok": True, "result": result})
+
+    def update_payload(self, index: int) -> Dict[str, Any]:
+        chat_id = -1001000000000 - index % self.chats
+        return {
+            "update_id": self.next_update_id,
+            "message": {
+                "message_id": index + 1,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "supergroup", "title": f"chat-{index % self.chats}"},
+                "from": {"id": 100 + index % 500, "is_bot": False, "first_name": "User",
+                         "username": f"user{index % 500}"},
+                "text": f"load test message {index}",
+            },
+        }
+
+    def publish(self, index: int) -> None:
+        self.updates.append(self.update_payload(index))
+        self.next_update_id += 1
+        self.published += 1
+        self._new_updates.set()
+
+    async def publish_messages(self, count: int, rate: float) -> None:
+        """按速率产生count条消息，rate为0时不限速"""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        sent = 0
+        while sent < count:
+            if rate > 0:
+                target = min(count, int((loop.time() - start) * rate) + 1)
+            else:
+                target = min(count, sent + 1000)
+            while sent < target:
+                self.publish(sent)
+                sent += 1
+            await asyncio.sleep(0.01 if rate > 0 else 0)
+
+    def stats(self) -> Dict[str, int]:
+        return {"published": self.published, "pending": len(self.updates), "polls": self.polls,
+                "delivered": self.delivered, "errors": self.errors, "conflicts": self.conflicts}
+
+
+async def _run_server(args: argparse.Namespace) -> None:
+    api = FakeTelegramApi(args.host, args.port, chats=args.chats, latency=args.latency,
+                          error_every=args.error_every)
+    await api.start()
+    print(f"替身服务已启动: {api.base_url}/bot{api.token}/getUpdates")
+    try:
+        # 等待第一次getUpdates后再开始产生消息
+        while not api.polls:
+            await asyncio.sleep(0.1)
+        await api.publish_messages(args.count, args.rate)
+        print(f"消息产生完成: {api.stats()}")
+        await asyncio.Event().wait()
+    finally:
+        await api.stop()
+
+
+async def _run_bench(args: argparse.Namespace) -> int:
+    """在同一进程内启动替身服务和TelegramListener，测量端到端接入能力和重启后的偏移量恢复"""
+    api = FakeTelegramApi(args.host, args.port, chats=args.chats, latency=args.latency,
+                          error_every=args.error_every)
+    await api.start()
+
+    # 设置需要在导入监听器之前完成
+    os.environ["OPEN_PROXY"] = "False"
+    from core.telegram.listener import TelegramListener
+
+    received: List[float] = []
+    ids = set()
+
+    async def on_message(message) -> None:
+        ids.add(message.id)
+        received.append(time.perf_counter())
+
+    offset_file = os.path.join(tempfile.mkdtemp(prefix="fake-telegram-"), "offset.json")
+
+    def create_listener() -> TelegramListener:
+        listener = TelegramListener(token=api.token, api_base=api.base_url, offset_file=offset_file,
+                                    poll_timeout=args.poll_timeout)
+        listener.register_callback(on_message)
+        return listener
+
+    listener = create_listener()
+    listener_task = asyncio.create_task(listener.start())
+    restarts = 0
+
+    async def restart_periodically() -> None:
+        nonlocal listener, listener_task, restarts
+        while True:
+            await asyncio.sleep(args.restart_every)
+            await listener.stop()
+            await asyncio.gather(listener_task, return_exceptions=True)
+            # 新的监听器从偏移量文件恢复
+            listener = create_listener()
+            listener_task = asyncio.create_task(listener.start())
+            restarts += 1
+
+    tasks = []
+    try:
+        while not listener.running:
+            await asyncio.sleep(0.05)
+        if args.restart_every > 0:
+            tasks.append(asyncio.create_task(restart_periodically()))
+
+        start = time.perf_counter()
+        await api.publish_messages(args.count, args.rate)
+        deadline = time.monotonic() + args.timeout
+        while len(ids) < args.count and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        elapsed = (received[-1] if received else time.perf_counter()) - start
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await listener.stop()
+        await asyncio.gather(listener_task, return_exceptions=True)
+        from utils.http_client import close_http_client
+        await close_http_client()
+        await api.stop()
+
+    missing = args.count - len(ids)
+    print(f"产生: {args.count}  收到: {len(received)}  去重后: {len(ids)}  重复: {len(received) - len(ids)}  "
+          f"缺失: {missing}  重启: {restarts}  耗时: {elapsed:.2f}s  "
+          f"接入速率: {len(ids) / elapsed if elapsed > 0 else 0:.0f} 条/秒")
+    print(f"替身服务统计: {api.stats()}")
+    return 1 if missing else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="本地Telegram Bot API替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--rate", type=float, default=1000, help="产生消息的速率（条/秒），0表示不限速")
+    parser.add_argument("--count", type=int, default=10000, help="产生的消息数量")
+    parser.add_argument("--chats", type=int, default=10, help="消息分布的会话数量")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的固定延迟（秒）")
+    parser.add_argument("--error-every", type=int, default=0, help="每隔多少次getUpdates返回一次502，0表示不注入错误")
+    parser.add_argument("--bench", action="store_true", help="在同一进程内启动TelegramListener测量接入能力")
+    parser.add_argument("--poll-timeout", type=int, default=5, help="--bench模式下监听器的长轮询等待时间（秒）")
+    parser.add_argument("--restart-every", type=float, default=0, help="--bench模式下每隔多少秒重启监听器，0表示不重启")
+    parser.add_argument("--timeout", type=float, default=30, help="--bench模式下等待消息全部到达的最长时间")
+    args = parser.parse_args()
+
+    try:
+        if args.bench:
+            return asyncio.run(_run_bench(args))
+        asyncio.run(_run_server(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
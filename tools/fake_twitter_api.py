@@ -0,0 +1,324 @@
+"""
+本地Twitter API v2替身服务，用于测试多账号轮询的发现延迟和配额使用
+
+实现了监听器需要的最小接口:
+    - POST /oauth2/token: 用API Key和Secret（Basic认证）换取应用令牌
+    - GET /2/users/{id}/tweets: 支持since_id、max_results、pagination_token，从新到旧返回，
+      所有账号共享一个固定窗口配额，返回x-rate-limit-*响应头，超出时返回429
+    - 各账号按泊松过程发推，速率服从Zipf分布（少数账号很活跃，多数账号很安静），可以在中途反转活跃程度
+
+启动替身服务（在项目根目录下运行）:
+    python -m tools.fake_twitter_api --port 8769 --accounts 50 --tweet-rate 5
+
+让机器人连接替身服务，在.env中设置:
+    ENABLED_PLATFORMS=twitter
+    TWITTER_BEARER_TOKEN=fake-token
+    TWITTER_API_BASE=http://127.0.0.1:8769
+    TWITTER_TARGET_USER_ID=1000,1001,...
+    OPEN_PROXY=False
+
+端到端测量发现延迟（同一进程内启动替身服务和TwitterListener，对比按活跃程度分配和平均分配轮询）:
+    python -m tools.fake_twitter_api --bench --accounts 50 --budget 5 --duration 60 --compare
+"""
+import argparse
+import asyncio
+import base64
+import heapq
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from aiohttp import web
+
+DEFAULT_TOKEN = "fake-token"
+FIRST_USER_ID = 1000
+
+
+class FakeTwitterApi:
+    """保存各账号的推文，按API v2的语义分页返回，并模拟应用级配额"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8769, accounts: int = 50, limit: int = 300,
+                 window: float = 60.0, latency: float = 0.0, token: str = DEFAULT_TOKEN,
+                 api_key: str = "fake-key", api_secret: str = "fake-secret"):
+        """
+        初始化替身服务
+
+        Args:
+            host: 监听地址
+            port: 监听端口
+            accounts: 账号数量，账号ID从1000开始
+            limit: 每个窗口内所有账号共享的请求数，0表示不限流
+            window: 配额窗口（秒）
+            latency: 每个请求的固定延迟（秒）
+            token: 有效的Bearer Token
+            api_key: 换取令牌使用的API Key
+            api_secret: 换取令牌使用的API Secret
+        """
+        self.host = host
+        self.port = port
+        self.limit = limit
+        self.window = window
+        self.latency = latency
+        self.token = token
+        self.credentials = base64.b64encode(f"{api_key}:{api_secret}".encode()).decode()
+
+        self.user_ids = [str(FIRST_USER_ID + index) for index in range(accounts)]
+        # 账号 -> 推文（从旧到新）
+        self.tweets: Dict[str, List[Dict[str, Any]]] = {user_id: [] for user_id in self.user_ids}
+        # 推文ID -> 发布时间（time.monotonic()），用于计算发现延迟
+        self.created: Dict[str, float] = {}
+        self._ids = itertools.count(1_700_000_000_000_000_000)
+        self._window_reset = 0.0
+        self._window_used = 0
+        self._runner = None
+
+        # 统计信息
+        self.requests = 0
+        self.rejected = 0
+        # 至少被请求过一次的账号
+        self.polled: Set[str] = set()
+
+        self.app = web.Application()
+        self.app.router.add_post("/oauth2/token", self._token)
+        self.app.router.add_get("/2/users/{user_id}/tweets", self._user_tweets)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _token(self, request: web.Request) -> web.Response:
+        if request.headers.get("Authorization") != f"Basic {self.credentials}":
+            return web.json_response({"errors": [{"code": 99, "message": "Unable to verify your credentials"}]},
+                                     status=403)
+        return web.json_response({"token_type": "bearer", "access_token": self.token})
+
+    def _rate_limit_headers(self) -> Dict[str, str]:
+        return {
+            "x-rate-limit-limit": str(self.limit),
+            "x-rate-limit-remaining": str(max(0, self.limit - self._window_used)),
+            # 与真实接口一致，重置时间为Unix时间戳
+            "x-rate-limit-reset": str(int(time.time() + max(0.0, self._window_reset - time.monotonic())) + 1),
+        }
+
+    async def _user_tweets(self, request: web.Request) -> web.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if request.headers.get("Authorization") != f"Bearer {self.token}":
+            return web.json_response({"title": "Unauthorized", "status": 401}, status=401)
+
+        now = time.monotonic()
+        if now >= self._window_reset:
+            self._window_reset = now + self.window
+            self._window_used = 0
+        if self.limit and self._window_used >= self.limit:
+            self.rejected += 1
+            return web.json_response({"title": "Too Many Requests", "status": 429}, status=429,
+                                     headers=self._rate_limit_headers())
+        self._window_used += 1
+        self.requests += 1
+
+        user_id = request.match_info["user_id"]
+        tweets = self.tweets.get(user_id)
+        if tweets is None:
+            return web.json_response({"errors": [{"title": "Not Found Error"}]}, status=404,
+                                     headers=self._rate_limit_headers())
+        self.polled.add(user_id)
+
+        since_id = int(request.query.get("since_id", 0))
+        max_results = max(1, min(100, int(request.query.get("max_results", 10))))
+        skip = int(request.query.get("pagination_token", 0))
+        # 从新到旧
+        newer = [tweet for tweet in reversed(tweets) if int(tweet["id"]) > since_id]
+        page = newer[skip:skip + max_results]
+        meta: Dict[str, Any] = {"result_count": len(page)}
+        if page:
+            meta["newest_id"] = page[0]["id"]
+            meta["oldest_id"] = page[-1]["id"]
+        if skip + max_results < len(newer):
+            meta["next_token"] = str(skip + max_results)
+        body: Dict[str, Any] = {"meta": meta}
+        if page:
+            body["data"] = page
+            body["includes"] = {"users": [{"id": user_id, "username": f"user{user_id}", "name": f"User {user_id}"}]}
+        return web.json_response(body, headers=self._rate_limit_headers())
+
+    def publish(self, user_id: str) -> None:
+        tweet_id = str(next(self._ids))
+        self.tweets[user_id].append({
+            "id": tweet_id,
+            "text": f"tweet {tweet_id} from {user_id}",
+            "author_id": user_id,
+            "conversation_id": tweet_id,
+            "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        })
+        self.created[tweet_id] = time.monotonic()
+
+    async def publish_tweets(self, total_rate: float, duration: float, zipf: float = 1.2, seed: int = 1,
+                             shift_at: Optional[float] = None) -> None:
+        """
+        按泊松过程发推，持续duration秒
+
+        Args:
+            total_rate: 所有账号合计的发推速率（条/秒）
+            duration: 持续时间（秒）
+            zipf: Zipf分布的指数，越大活跃程度越集中
+            seed: 随机种子，相同种子产生相同的发推序列
+            shift_at: 在第几秒反转账号的活跃程度（最安静的账号变成最活跃），None表示不反转
+        """
+        rng = random.Random(seed)
+        weights = [1.0 / (rank + 1) ** zipf for rank in range(len(self.user_ids))]
+        scale = total_rate / sum(weights)
+        rates = {user_id: weight * scale for user_id, weight in zip(self.user_ids, weights)}
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        # (下一条推文的相对时间, 账号)
+        heap = [(rng.expovariate(rate), user_id) for user_id, rate in rates.items()]
+        heapq.heapify(heap)
+        shifted = False
+        while heap:
+            at, user_id = heapq.heappop(heap)
+            if at >= duration:
+                continue
+            if shift_at is not None and not shifted and at >= shift_at:
+                shifted = True
+                rates = dict(zip(self.user_ids, reversed(list(rates.values()))))
+            delay = start + at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.publish(user_id)
+            heapq.heappush(heap, (at + rng.expovariate(rates[user_id]), user_id))
+
+    def stats(self) -> Dict[str, int]:
+        return {"tweets": len(self.created), "requests": self.requests, "rejected": self.rejected}
+
+
+async def _run_server(args: argparse.Namespace) -> None:
+    api = FakeTwitterApi(args.host, args.port, accounts=args.accounts, limit=int(args.budget * args.window),
+                         window=args.window, latency=args.latency)
+    await api.start()
+    print(f"替身服务已启动: {api.base_url}  账号: {api.user_ids[0]}..{api.user_ids[-1]}")
+    try:
+        await api.publish_tweets(args.tweet_rate, args.duration, zipf=args.zipf, seed=args.seed,
+                                 shift_at=args.duration / 2 if args.shift else None)
+        print(f"发推完成: {api.stats()}")
+        await asyncio.Event().wait()
+    finally:
+        await api.stop()
+
+
+async def _bench_once(args: argparse.Namespace, adaptive: bool) -> Dict[str, Any]:
+    from core.twitter.listener import TwitterListener
+
+    api = FakeTwitterApi(args.host, args.port, accounts=args.accounts, limit=int(args.budget * args.window),
+                         window=args.window, latency=args.latency)
+    await api.start()
+
+    # 平均分配时每个账号的轮询间隔都是 账号数 / 预算
+    even_interval = args.accounts / args.budget
+    listener = TwitterListener(
+        user_ids=api.user_ids,
+        bearer_token=api.token,
+        api_base=api.base_url,
+        cursor_file="",
+        requests_per_window=int(args.budget * args.window),
+        window=args.window,
+        min_interval=args.min_interval if adaptive else even_interval,
+        max_interval=args.max_interval if adaptive else even_interval,
+    )
+    latencies: Dict[str, float] = {}
+
+    async def on_message(message) -> None:
+        latencies.setdefault(message.id, time.monotonic() - api.created[message.id])
+
+    listener.register_callback(on_message)
+    listener_task = asyncio.create_task(listener.start())
+    try:
+        # 所有账号完成第一次轮询（只记录游标）后再开始发推
+        deadline = time.monotonic() + args.timeout
+        while len(api.polled) < args.accounts and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        await api.publish_tweets(args.tweet_rate, args.duration, zipf=args.zipf, seed=args.seed,
+                                 shift_at=args.duration / 2 if args.shift else None)
+        deadline = time.monotonic() + args.timeout
+        while len(latencies) < len(api.created) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+    finally:
+        await listener.stop()
+        await asyncio.gather(listener_task, return_exceptions=True)
+        from utils.http_client import close_http_client
+        await close_http_client()
+        await api.stop()
+
+    values = sorted(latencies.values())
+    return {
+        "mode": "自适应" if adaptive else "平均分配",
+        "tweets": len(api.created),
+        "received": len(values),
+        "mean": statistics.mean(values) if values else 0.0,
+        "p50": values[len(values) // 2] if values else 0.0,
+        "p95": values[int(len(values) * 0.95)] if values else 0.0,
+        "requests": api.requests,
+        "rejected": api.rejected,
+    }
+
+
+async def _run_bench(args: argparse.Namespace) -> int:
+    """在同一进程内启动替身服务和TwitterListener，测量推文的发现延迟"""
+    os.environ["OPEN_PROXY"] = "False"
+    results = [await _bench_once(args, adaptive=True)]
+    if args.compare:
+        results.append(await _bench_once(args, adaptive=False))
+    for result in results:
+        print(f"[{result['mode']}] 推文: {result['tweets']}  收到: {result['received']}  "
+              f"延迟 平均: {result['mean']:.2f}s  p50: {result['p50']:.2f}s  p95: {result['p95']:.2f}s  "
+              f"请求: {result['requests']}  429: {result['rejected']}")
+    return 0 if results[0]["received"] == results[0]["tweets"] else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="本地Twitter API v2替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8769)
+    parser.add_argument("--accounts", type=int, default=50, help="账号数量")
+    parser.add_argument("--tweet-rate", type=float, default=5, help="所有账号合计的发推速率（条/秒）")
+    parser.add_argument("--zipf", type=float, default=1.2, help="账号活跃程度的Zipf指数")
+    parser.add_argument("--shift", action="store_true", help="在中途反转账号的活跃程度")
+    parser.add_argument("--duration", type=float, default=60, help="发推持续时间（秒）")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    parser.add_argument("--budget", type=float, default=5, help="所有账号共享的请求配额（次/秒）")
+    parser.add_argument("--window", type=float, default=60, help="配额窗口（秒）")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的固定延迟（秒）")
+    parser.add_argument("--bench", action="store_true", help="在同一进程内启动TwitterListener测量发现延迟")
+    parser.add_argument("--min-interval", type=float, default=1, help="--bench模式下单个账号的最短轮询间隔（秒）")
+    parser.add_argument("--max-interval", type=float, default=60, help="--bench模式下单个账号的最长轮询间隔（秒）")
+    parser.add_argument("--compare", action="store_true", help="同时测量平均分配轮询作为对比")
+    parser.add_argument("--timeout", type=float, default=90, help="--bench模式下等待推文全部收到的最长时间")
+    args = parser.parse_args()
+
+    try:
+        if args.bench:
+            return asyncio.run(_run_bench(args))
+        asyncio.run(_run_server(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
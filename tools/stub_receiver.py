@@ -0,0 +1,253 @@
+"""
+本地通知接收替身服务，用于测试通知转发的合并、限流和优先通道
+
+实现了两类接口，并按固定窗口模拟服务端限流（超出时返回429和retry_after）:
+    - POST /webhook/{name}: Discord风格的webhook，返回204和X-RateLimit-*响应头
+    - POST /bot{token}/sendMessage: Telegram风格的sendMessage
+    - GET /stats: 各接口收到的请求、通知行数和429次数
+
+启动替身服务（在项目根目录下运行）:
+    python -m tools.stub_receiver --port 8766 --limit 5 --window 2
+
+让机器人转发到替身服务，在.env中设置:
+    FORWARD_DESTINATIONS=alerts=http://127.0.0.1:8766/webhook/alerts
+    OPEN_PROXY=False
+
+端到端测量转发效果（同一进程内启动替身服务和Forwarder，对比不合并时的表现）:
+    python -m tools.stub_receiver --bench --count 500 --priority-every 50
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Any, Dict, List
+
+from aiohttp import web
+
+
+class _Window:
+    """固定窗口限流"""
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self.reset_at = 0.0
+        self.used = 0
+
+    def hit(self) -> float:
+        """记录一次请求，返回需要等待的秒数，0表示允许"""
+        now = time.monotonic()
+        if now >= self.reset_at:
+            self.reset_at = now + self.window
+            self.used = 0
+        if self.limit > 0 and self.used >= self.limit:
+            return self.reset_at - now
+        self.used += 1
+        return 0.0
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(0, self.limit - self.used)),
+            "X-RateLimit-Reset-After": f"{max(0.0, self.reset_at - time.monotonic()):.3f}",
+        }
+
+
+class StubReceiver:
+    """记录收到的通知，并按配置限流"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8766, limit: int = 5, window: float = 2.0,
+                 latency: float = 0.0):
+        """
+        初始化替身服务
+
+        Args:
+            host: 监听地址
+            port: 监听端口
+            limit: 每个接口在一个窗口内允许的请求数，0表示不限流
+            window: 限流窗口（秒）
+            latency: 每个请求的固定处理延迟（秒）
+        """
+        self.host = host
+        self.port = port
+        self.limit = limit
+        self.window = window
+        self.latency = latency
+        self.windows: Dict[str, _Window] = {}
+        # 接口 -> 收到的请求体
+        self.received: Dict[str, List[Dict[str, Any]]] = {}
+        self.rejected: Dict[str, int] = {}
+        # 通知行 -> 首次收到的时间，用于测量延迟
+        self.arrived: Dict[str, float] = {}
+        self._runner = None
+
+        self.app = web.Application()
+        self.app.router.add_post("/webhook/{name}", self._webhook)
+        self.app.router.add_post("/bot{token}/sendMessage", self._telegram)
+        self.app.router.add_get("/stats", self._stats)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def lines(self, key: str) -> List[str]:
+        """接口收到的所有通知行"""
+        result = []
+        for payload in self.received.get(key, []):
+            text = payload.get("content") or payload.get("text") or ""
+            result.extend(text.split("\n"))
+        return result
+
+    async def _accept(self, key: str, request: web.Request):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = _Window(self.limit, self.window)
+        retry_after = window.hit()
+        if retry_after > 0:
+            self.rejected[key] = self.rejected.get(key, 0) + 1
+            return None, retry_after, window
+        payload = await request.json()
+        self.received.setdefault(key, []).append(payload)
+        now = time.monotonic()
+        for line in (payload.get("content") or payload.get("text") or "").split("\n"):
+            self.arrived.setdefault(line, now)
+        return True, 0.0, window
+
+    async def _webhook(self, request: web.Request) -> web.Response:
+        accepted, retry_after, window = await self._accept(f"webhook/{request.match_info['name']}", request)
+        if not accepted:
+            body = {"message": "You are being rate limited.", "retry_after": round(retry_after, 3), "global": False}
+            return web.Response(status=429, text=json.dumps(body), content_type="application/json",
+                                headers={"Retry-After": str(int(retry_after) + 1), **window.headers()})
+        return web.Response(status=204, headers=window.headers())
+
+    async def _telegram(self, request: web.Request) -> web.Response:
+        accepted, retry_after, _ = await self._accept(f"telegram/{request.match_info['token']}", request)
+        if not accepted:
+            wait = int(retry_after) + 1
+            body = {"ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {wait}",
+                    "parameters": {"retry_after": wait}}
+            return web.json_response(body, status=429)
+        return web.json_response({"ok": True, "result": {"message_id": len(self.received)}})
+
+    async def _stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {key: {"requests": len(payloads), "lines": len(self.lines(key)), "rejected": self.rejected.get(key, 0)}
+                for key, payloads in self.received.items()}
+
+
+async def _run_server(args: argparse.Namespace) -> None:
+    receiver = StubReceiver(args.host, args.port, limit=args.limit, window=args.window, latency=args.latency)
+    await receiver.start()
+    print(f"替身服务已启动: webhook {receiver.base_url}/webhook/<name>  telegram {receiver.base_url}/bot<token>/sendMessage")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await receiver.stop()
+
+
+async def _bench_once(args: argparse.Namespace, coalesce: bool) -> Dict[str, Any]:
+    from forwarding.destination import WebhookDestination
+    from forwarding.forwarder import Forwarder, FORWARD_LATENCY
+
+    receiver = StubReceiver(args.host, args.port, limit=args.limit, window=args.window, latency=args.latency)
+    await receiver.start()
+    name = "bench-coalesce" if coalesce else "bench-single"
+    forwarder = Forwarder(
+        [WebhookDestination(name, f"{receiver.base_url}/webhook/{name}")],
+        rate=args.limit / args.window if args.limit else 0,
+        burst=max(1, args.limit),
+        coalesce_window=args.coalesce_window if coalesce else 0,
+        max_batch=args.max_batch if coalesce else 1,
+        queue_size=0,
+    )
+    await forwarder.start()
+    published: Dict[str, float] = {}
+    try:
+        start = time.monotonic()
+        for i in range(args.count):
+            priority = args.priority_every > 0 and i % args.priority_every == 0
+            text = f"priority-{i}" if priority else f"notification-{i}"
+            published[text] = time.monotonic()
+            forwarder.publish(name, text, priority=priority)
+            if args.burst_interval:
+                await asyncio.sleep(args.burst_interval)
+        deadline = time.monotonic() + args.timeout
+        while time.monotonic() < deadline and not all(text in receiver.arrived for text in published):
+            await asyncio.sleep(0.05)
+        elapsed = time.monotonic() - start
+        stats = forwarder.stats()[name]
+    finally:
+        await forwarder.stop(timeout=1)
+        await receiver.stop()
+
+    latency = {text: receiver.arrived[text] - published_at for text, published_at in published.items()
+               if text in receiver.arrived}
+    priority_latency = [value for text, value in latency.items() if text.startswith("priority-")]
+    return {
+        "mode": "合并" if coalesce else "逐条",
+        "delivered": len(latency),
+        "requests": stats["requests"],
+        "rate_limited": stats["rate_limited"],
+        "elapsed": elapsed,
+        "p50": FORWARD_LATENCY.quantile(0.5, name),
+        "p99": FORWARD_LATENCY.quantile(0.99, name),
+        "priority_max": max(priority_latency) if priority_latency else 0.0,
+    }
+
+
+async def _run_bench(args: argparse.Namespace) -> int:
+    """在同一进程内启动替身服务和Forwarder，对比合并和逐条发送"""
+    results = [await _bench_once(args, coalesce=True)]
+    if args.compare:
+        results.append(await _bench_once(args, coalesce=False))
+    for result in results:
+        print(f"[{result['mode']}] 通知: {args.count}  送达: {result['delivered']}  请求: {result['requests']}  "
+              f"429: {result['rate_limited']}  耗时: {result['elapsed']:.2f}s  "
+              f"延迟p50: {result['p50']}s  p99: {result['p99']}s  优先通知最大延迟: {result['priority_max']:.2f}s")
+    return 0 if results[0]["delivered"] == args.count else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="本地通知接收替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--limit", type=int, default=5, help="每个接口在一个窗口内允许的请求数，0表示不限流")
+    parser.add_argument("--window", type=float, default=2.0, help="限流窗口（秒）")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的固定处理延迟（秒）")
+    parser.add_argument("--bench", action="store_true", help="在同一进程内启动Forwarder测量转发效果")
+    parser.add_argument("--count", type=int, default=500, help="--bench模式下发布的通知数量")
+    parser.add_argument("--priority-every", type=int, default=50, help="每隔多少条发布一条优先通知，0表示不发布")
+    parser.add_argument("--burst-interval", type=float, default=0.0, help="两条通知之间的间隔（秒），0表示一次性发布")
+    parser.add_argument("--coalesce-window", type=float, default=0.5, help="合并窗口（秒）")
+    parser.add_argument("--max-batch", type=int, default=20, help="单次请求最多合并的通知数量")
+    parser.add_argument("--compare", action="store_true", help="同时测量逐条发送（不合并）作为对比")
+    parser.add_argument("--timeout", type=float, default=60, help="--bench模式下等待通知全部送达的最长时间")
+    args = parser.parse_args()
+
+    try:
+        if args.bench:
+            return asyncio.run(_run_bench(args))
+        asyncio.run(_run_server(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
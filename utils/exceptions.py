@@ -30,4 +30,14 @@ class TelegramListenerError(ListenerError):
 
 class MessageHandlerError(ScraperBotError):
     """消息处理器异常"""
-    pass 
\ No newline at end of file
+    pass
+
+
+class StorageError(ScraperBotError):
+    """消息存储异常"""
+    pass
+
+
+class AttachmentError(ScraperBotError):
+    """附件下载异常"""
+    pass
@@ -0,0 +1,219 @@
+import ssl
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+
+from config.settings import OPEN_PROXY, HTTP_PROXY, HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_KEEPALIVE_TIMEOUT, \
+    HTTP_DNS_CACHE_TTL, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_TOTAL_TIMEOUT, HTTP_VERIFY_SSL
+from utils.logger import setup_logger
+from utils.metrics import REGISTRY
+
+HTTP_REQUESTS = REGISTRY.counter("scraper_http_requests_total", "出站HTTP请求数量", ["pool"])
+HTTP_CONNECTIONS = REGISTRY.counter("scraper_http_connections_total", "新建的出站HTTP连接数量", ["pool"])
+HTTP_REUSED = REGISTRY.counter("scraper_http_connections_reused_total", "复用已有连接的出站HTTP请求数量", ["pool"])
+HTTP_ERRORS = REGISTRY.counter("scraper_http_errors_total", "出站HTTP请求异常数量", ["pool"])
+
+
+class ConnectionStats:
+    """通过aiohttp的TraceConfig统计请求数和连接复用情况"""
+
+    def __init__(self, pool: str):
+        self.pool = pool
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.errors = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_request_exception.append(self._on_request_exception)
+        trace.on_connection_create_end.append(self._on_connection_create_end)
+        trace.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        trace.on_dns_cache_hit.append(self._on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(self._on_dns_cache_miss)
+        return trace
+
+    async def _on_request_start(self, session, context, params) -> None:
+        self.requests += 1
+        HTTP_REQUESTS.inc(self.pool)
+
+    async def _on_request_exception(self, session, context, params) -> None:
+        self.errors += 1
+        HTTP_ERRORS.inc(self.pool)
+
+    async def _on_connection_create_end(self, session, context, params) -> None:
+        self.new_connections += 1
+        HTTP_CONNECTIONS.inc(self.pool)
+
+    async def _on_connection_reuseconn(self, session, context, params) -> None:
+        self.reused_connections += 1
+        HTTP_REUSED.inc(self.pool)
+
+    async def _on_dns_cache_hit(self, session, context, params) -> None:
+        self.dns_cache_hits += 1
+
+    async def _on_dns_cache_miss(self, session, context, params) -> None:
+        self.dns_cache_misses += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        connections = self.new_connections + self.reused_connections
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "reuse_ratio": round(self.reused_connections / connections, 3) if connections else 0.0,
+            "errors": self.errors,
+            "dns_cache_hits": self.dns_cache_hits,
+            "dns_cache_misses": self.dns_cache_misses,
+        }
+
+
+class HttpClientService:
+    """
+    进程内共享的异步HTTP客户端
+
+    每种代理设置（直连或某个代理地址）对应一个调优过的连接池和ClientSession，策略和转发器通过它发起请求，
+    复用连接、DNS缓存和超时配置，不需要各自创建会话或使用同步的requests。
+    """
+
+    def __init__(self, limit: int = HTTP_POOL_LIMIT, limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+                 keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT, dns_cache_ttl: int = HTTP_DNS_CACHE_TTL,
+                 connect_timeout: float = HTTP_CONNECT_TIMEOUT, read_timeout: float = HTTP_READ_TIMEOUT,
+                 total_timeout: float = HTTP_TOTAL_TIMEOUT, verify_ssl: bool = HTTP_VERIFY_SSL):
+        """
+        初始化HTTP客户端服务
+
+        Args:
+            limit: 每个连接池的最大连接数，0表示不限制
+            limit_per_host: 每个主机的最大连接数，0表示不限制
+            keepalive_timeout: 空闲连接保留时间（秒）
+            dns_cache_ttl: DNS缓存时间（秒）
+            connect_timeout: 建立连接超时（秒）
+            read_timeout: 两次读取之间的超时（秒）
+            total_timeout: 单个请求的总超时（秒）
+            verify_ssl: 是否校验证书
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout or None, sock_connect=connect_timeout or None,
+                                             sock_read=read_timeout or None)
+        self.verify_ssl = verify_ssl
+        self.logger = setup_logger("HttpClientService")
+
+        # 代理地址（直连为None） -> (会话, 统计)
+        self._sessions: Dict[Optional[str], Tuple[aiohttp.ClientSession, ConnectionStats]] = {}
+        self._extra_stats: Dict[str, ConnectionStats] = {}
+
+    @staticmethod
+    def default_proxy() -> Optional[str]:
+        """配置中的代理地址，未开启代理时为None"""
+        return HTTP_PROXY if OPEN_PROXY and HTTP_PROXY else None
+
+    def _ssl(self) -> Any:
+        if self.verify_ssl:
+            return True
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+        return ssl_context
+
+    def create_connector(self) -> aiohttp.TCPConnector:
+        """创建一个使用相同调优参数的连接池，需要在事件循环中调用"""
+        return aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+            ssl=self._ssl(),
+        )
+
+    def trace_config(self, pool: str) -> aiohttp.TraceConfig:
+        """
+        为不由本服务创建会话的客户端（例如discord.py）提供统计用的TraceConfig，统计结果一并出现在stats()中
+
+        Args:
+            pool: 统计名称
+        """
+        stats = self._extra_stats.get(pool)
+        if stats is None:
+            stats = self._extra_stats[pool] = ConnectionStats(pool)
+        return stats.trace_config()
+
+    def session(self, proxy: Any = ...) -> aiohttp.ClientSession:
+        """
+        返回指定代理设置对应的共享会话，不要关闭返回的会话
+
+        Args:
+            proxy: 代理地址，None表示直连，不传时使用配置中的代理设置
+        """
+        if proxy is ...:
+            proxy = self.default_proxy()
+        entry = self._sessions.get(proxy)
+        if entry is None or entry[0].closed:
+            pool = proxy or "direct"
+            stats = entry[1] if entry else ConnectionStats(pool)
+            session = aiohttp.ClientSession(
+                connector=self.create_connector(),
+                timeout=self.timeout,
+                trace_configs=[stats.trace_config()],
+                proxy=proxy,
+            )
+            entry = self._sessions[proxy] = (session, stats)
+            self.logger.info(f"已创建HTTP连接池: {pool} (上限: {self.limit}, 每主机: {self.limit_per_host})")
+        return entry[0]
+
+    def request(self, method: str, url: str, proxy: Any = ..., **kwargs: Any):
+        """
+        发起请求，用法与aiohttp.ClientSession.request相同:
+
+            async with get_http_client().request("POST", url, json=payload) as response:
+                ...
+        """
+        return self.session(proxy).request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs: Any):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各连接池的请求数和连接复用情况"""
+        result = {stats.pool: stats.as_dict() for _, stats in self._sessions.values()}
+        result.update({pool: stats.as_dict() for pool, stats in self._extra_stats.items()})
+        return result
+
+    async def close(self) -> None:
+        """关闭所有会话和连接池"""
+        for session, _ in self._sessions.values():
+            if not session.closed:
+                await session.close()
+        self._sessions.clear()
+
+
+_http_client: Optional[HttpClientService] = None
+
+
+def get_http_client() -> HttpClientService:
+    """获取进程内共享的HTTP客户端服务"""
+    global _http_client
+    if _http_client is None:
+        _http_client = HttpClientService()
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """关闭共享的HTTP客户端服务"""
+    global _http_client
+    if _http_client is not None:
+        logger = _http_client.logger
+        stats = _http_client.stats()
+        await _http_client.close()
+        _http_client = None
+        if stats:
+            logger.info(f"HTTP连接统计: {stats}")
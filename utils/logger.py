@@ -1,46 +1,238 @@
+import atexit
+import json
 import logging
+import multiprocessing
+import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
-from config.settings import LOG_LEVEL, LOG_FORMAT, LOG_FILE
+import threading
+import time
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from typing import Dict, Optional
+from config.settings import LOG_LEVEL, LOG_FORMAT, LOG_FILE, LOG_JSON, LOG_QUEUE_SIZE, LOG_SAMPLING, LOG_RATE_LIMIT
+
+# 所有logger共享一个队列，只有后台线程会写控制台和文件
+_log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_listener: Optional[QueueListener] = None
+_listener_lock = threading.Lock()
+# 停止时等待队列腾出位置放入结束标记的最长时间（秒）
+_STOP_TIMEOUT = 5.0
+
+
+class JsonFormatter(logging.Formatter):
+    """将日志记录格式化为一行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class _BackgroundQueueHandler(QueueHandler):
+    """
+    将日志记录放入队列的处理器
+
+    与标准QueueHandler不同，这里不在调用方线程中格式化消息，%参数的拼接和异常堆栈的格式化
+    都由后台线程完成；队列满时直接丢弃，不阻塞调用方。
+    """
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _BackgroundQueueHandler.dropped += 1
+
+
+class _BackgroundQueueListener(QueueListener):
+    """
+    从有界队列中取出日志并写入处理器的后台线程
+
+    标准QueueListener停止时用put_nowait放入结束标记，队列满时会抛出queue.Full，
+    剩余的日志也不会输出；这里等待后台线程腾出位置，超时后放弃等待
+    """
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel, timeout=_STOP_TIMEOUT)
+
+    def stop(self) -> None:
+        try:
+            self.enqueue_sentinel()
+        except queue.Full:
+            # 后台线程卡在处理器中（例如磁盘无响应），不再等待它退出
+            sys.stderr.write(f"日志队列已满且 {_STOP_TIMEOUT:.0f} 秒内没有空位，剩余日志未输出\n")
+        else:
+            self._thread.join()
+        self._thread = None
+
+
+class SamplingFilter(logging.Filter):
+    """按比例采样INFO及以下级别的日志，WARNING及以上级别全部保留"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        # 每interval条保留一条
+        self.interval = max(1, round(1 / rate)) if rate > 0 else 0
+        self._count = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if not self.interval:
+            return False
+        self._count += 1
+        return (self._count - 1) % self.interval == 0
+
+
+class RateLimitFilter(logging.Filter):
+    """令牌桶限速，每秒最多输出rate条ERROR以下级别的日志，被丢弃的条数会附加在下一条日志后"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self._tokens = rate
+        self._last = time.monotonic()
+        self._suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+        if self._tokens < 1:
+            self._suppressed += 1
+            return False
+        self._tokens -= 1
+        if self._suppressed:
+            record.msg = f"{record.msg} (已限流省略 {self._suppressed} 条)"
+            self._suppressed = 0
+        return True
+
+
+def _parse_logger_options(value: str) -> Dict[str, float]:
+    """解析 名称=数值,名称=数值 格式的配置"""
+    options = {}
+    for item in value.split(','):
+        name, sep, number = item.strip().partition('=')
+        if sep:
+            options[name.strip()] = float(number)
+    return options
+
+
+_sampling_rates = _parse_logger_options(LOG_SAMPLING)
+_rate_limits = _parse_logger_options(LOG_RATE_LIMIT)
+
+
+def process_log_file() -> str:
+    """
+    当前进程写入的日志文件
+
+    子进程（多进程模式的处理进程、进程池执行器）各自写入 LOG_FILE 加进程名后缀的文件，
+    例如 scraper-bot.pipeline-worker-0.log，避免多个进程同时写入和轮转同一个文件
+    """
+    if multiprocessing.parent_process() is None:
+        return LOG_FILE
+    root, ext = os.path.splitext(LOG_FILE)
+    return f"{root}.{multiprocessing.current_process().name}{ext}"
+
+
+def _start_listener(level: int) -> None:
+    """创建控制台和文件处理器，启动后台写日志的线程"""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return
+
+        formatter = JsonFormatter() if LOG_JSON else logging.Formatter(LOG_FORMAT)
+
+        # 创建控制台处理器
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(level)
+        console_handler.setFormatter(formatter)
+
+        # 创建文件处理器 (轮转日志)，每个进程只轮转自己的文件
+        file_handler = RotatingFileHandler(
+            process_log_file(),
+            maxBytes=10*1024*1024,  # 10MB
+            backupCount=5
+        )
+        file_handler.setLevel(level)
+        file_handler.setFormatter(formatter)
+
+        _listener = _BackgroundQueueListener(_log_queue, console_handler, file_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
 
 def setup_logger(name):
     """
     设置并返回一个配置好的logger实例
-    
+
+    logger只把日志记录放入队列，由后台线程统一写入控制台和文件
+
     Args:
         name: logger的名称，通常是模块名
-        
+
     Returns:
         logging.Logger: 配置好的logger实例
     """
     logger = logging.getLogger(name)
-    
+
     # 设置日志级别
     level = getattr(logging, LOG_LEVEL.upper(), logging.INFO)
     logger.setLevel(level)
-    
+
     # 如果已经有处理器则不添加
     if logger.handlers:
         return logger
-    
-    # 创建控制台处理器
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(level)
-    console_formatter = logging.Formatter(LOG_FORMAT)
-    console_handler.setFormatter(console_formatter)
-    
-    # 创建文件处理器 (轮转日志)
-    file_handler = RotatingFileHandler(
-        LOG_FILE, 
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5
-    )
-    file_handler.setLevel(level)
-    file_formatter = logging.Formatter(LOG_FORMAT)
-    file_handler.setFormatter(file_formatter)
-    
-    # 添加处理器到logger
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-    
-    return logger 
\ No newline at end of file
+
+    _start_listener(level)
+    logger.addHandler(_BackgroundQueueHandler(_log_queue))
+
+    return logger
+
+
+def get_message_logger(name):
+    """
+    返回用于逐条消息日志的子logger
+
+    子logger的日志会交给setup_logger(name)的处理器输出，并根据LOG_SAMPLING、LOG_RATE_LIMIT中
+    为name配置的采样比例和限速进行过滤，避免高负载时每条消息的日志拖慢处理
+
+    Args:
+        name: 父logger的名称
+
+    Returns:
+        logging.Logger: 子logger实例
+    """
+    setup_logger(name)
+    logger = logging.getLogger(f"{name}.message")
+    if not logger.filters:
+        if name in _sampling_rates:
+            logger.addFilter(SamplingFilter(_sampling_rates[name]))
+        if name in _rate_limits:
+            logger.addFilter(RateLimitFilter(_rate_limits[name]))
+    return logger
+
+
+def shutdown_logging() -> None:
+    """停止后台日志线程，输出队列中剩余的日志"""
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+    if _BackgroundQueueHandler.dropped:
+        sys.stderr.write(f"日志队列已满，共丢弃 {_BackgroundQueueHandler.dropped} 条日志\n")
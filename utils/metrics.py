@@ -0,0 +1,286 @@
+import asyncio
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils.logger import setup_logger
+
+logger = setup_logger("Metrics")
+
+# 默认的耗时分桶（秒），覆盖100微秒到10秒
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    """只增不减的计数器，按标签值分别计数"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        values = self.values
+        values[labelvalues] = values.get(labelvalues, 0) + amount
+
+    def total(self) -> float:
+        return sum(self.values.values())
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+                for labels, value in self.values.items()]
+
+
+class Gauge:
+    """瞬时值，可以直接设置，也可以在采集时通过回调函数读取"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.callbacks: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        self.values[labelvalues] = value
+
+    def set_function(self, callback: Callable[[], float], *labelvalues: str) -> None:
+        self.callbacks[labelvalues] = callback
+
+    def remove(self, *labelvalues: str) -> None:
+        """删除一组标签的值，用于标签随运行状态出现和消失的指标"""
+        self.values.pop(labelvalues, None)
+        self.callbacks.pop(labelvalues, None)
+
+    def collect(self) -> Dict[Tuple[str, ...], float]:
+        values = dict(self.values)
+        for labels, callback in self.callbacks.items():
+            try:
+                values[labels] = callback()
+            except Exception:
+                continue
+        return values
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+                for labels, value in self.collect().items()]
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, bucket_count: int):
+        # 最后一个桶对应+Inf
+        self.counts = [0] * (bucket_count + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """分桶直方图，记录耗时分布，可估算分位数"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Tuple[str, ...], _HistogramSeries] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        series = self.series.get(labelvalues)
+        if series is None:
+            series = self.series[labelvalues] = _HistogramSeries(len(self.buckets))
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+
+    def time(self, *labelvalues: str) -> "_Timer":
+        """用作上下文管理器，记录代码块的耗时"""
+        return _Timer(self, labelvalues)
+
+    def quantile(self, q: float, *labelvalues: str) -> float:
+        """根据分桶估算分位数，返回所在桶的上界"""
+        series = self.series.get(labelvalues)
+        if not series or not series.count:
+            return 0.0
+        target = q * series.count
+        cumulative = 0
+        for index, count in enumerate(series.counts):
+            cumulative += count
+            if cumulative >= target:
+                return self.buckets[index] if index < len(self.buckets) else math.inf
+        return math.inf
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            bucket_labels = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {series.count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series.sum}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series.count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labelvalues", "start")
+
+    def __init__(self, histogram: Histogram, labelvalues: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, *self.labelvalues)
+
+
+class MetricsRegistry:
+    """指标注册表，负责输出Prometheus文本格式和日志快照"""
+
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, description, labelnames))
+
+    def gauge(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, description, labelnames))
+
+    def histogram(self, name: str, description: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, description, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            return self.metrics[metric.name]
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """输出Prometheus文本格式"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> str:
+        """输出一行适合写入日志的摘要：计数器总数、瞬时值和直方图的次数、p50、p99"""
+        parts = []
+        for metric in self.metrics.values():
+            if isinstance(metric, Counter):
+                parts.append(f"{metric.name}={metric.total():g}")
+            elif isinstance(metric, Gauge):
+                for labels, value in metric.collect().items():
+                    parts.append(f"{metric.name}{_format_labels(metric.labelnames, labels)}={value:g}")
+            elif isinstance(metric, Histogram):
+                for labels, series in metric.series.items():
+                    name = f"{metric.name}{_format_labels(metric.labelnames, labels)}"
+                    parts.append(f"{name}[n={series.count} p50={metric.quantile(0.5, *labels):g}s "
+                                 f"p99={metric.quantile(0.99, *labels):g}s]")
+        return " ".join(parts)
+
+
+REGISTRY = MetricsRegistry()
+
+# 监听器
+MESSAGES_SEEN = REGISTRY.counter("scraper_messages_seen_total", "监听器收到的原始消息数量", ["platform"])
+MESSAGES_FILTERED = REGISTRY.counter("scraper_messages_filtered_total", "被过滤规则丢弃的消息数量", ["platform"])
+MESSAGES_DUPLICATE = REGISTRY.counter("scraper_messages_duplicate_total", "被去重丢弃的消息数量", ["platform"])
+MESSAGES_DISPATCHED = REGISTRY.counter("scraper_messages_dispatched_total", "分发队列接受的消息数量",
+                                       ["platform", "channel"])
+PROCESS_MESSAGE_SECONDS = REGISTRY.histogram("scraper_process_message_seconds", "process_message耗时", ["platform"])
+
+# 分发队列
+QUEUE_DEPTH = REGISTRY.gauge("scraper_dispatch_queue_depth", "分发队列中等待处理的消息数量")
+QUEUE_DROPPED = REGISTRY.counter("scraper_dispatch_dropped_total", "分发队列溢出丢弃的消息数量", ["reason"])
+QUEUE_WAIT_SECONDS = REGISTRY.histogram("scraper_dispatch_queue_wait_seconds", "消息在分发队列中的等待时间")
+
+# 处理器和策略
+HANDLER_SECONDS = REGISTRY.histogram("scraper_handler_seconds", "各消息处理器的执行耗时", ["handler"])
+HANDLER_ERRORS = REGISTRY.counter("scraper_handler_errors_total", "消息处理器执行出错的次数", ["handler"])
+STRATEGY_MATCHED = REGISTRY.counter("scraper_strategy_matched_total", "策略命中并执行的次数", ["strategy"])
+STRATEGY_SECONDS = REGISTRY.histogram("scraper_strategy_seconds", "各策略的执行耗时", ["strategy"])
+
+
+class MetricsServer:
+    """
+    本地HTTP指标接口，GET /metrics 返回Prometheus文本格式
+
+    只实现了最基本的HTTP/1.0响应，不依赖额外的Web框架
+    """
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, host: str = "127.0.0.1", port: int = 9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"指标接口已启动: http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # 读完请求头
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/metrics", "/"):
+                status, body = "200 OK", self.registry.render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"not found\n"
+
+            writer.write(f"HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def log_metrics_periodically(interval: float, registry: MetricsRegistry = REGISTRY) -> None:
+    """定期把指标摘要写入日志，直到任务被取消"""
+    while True:
+        await asyncio.sleep(interval)
+        logger.info(f"指标快照: {registry.snapshot()}")
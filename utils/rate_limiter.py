@@ -0,0 +1,70 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    异步令牌桶，限制一段时间内的请求数量
+
+    令牌按rate每秒补充，最多累积capacity个；acquire在令牌不足时等待，不会忙等。
+    可以在多个协程之间共享，用于控制对同一个接口的总请求速率。
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数，小于等于0表示不限速
+            capacity: 令牌上限（允许的突发数量），默认等于rate且至少为1
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+        # 被暂停到的时间点，例如服务端要求的Retry-After
+        self._paused_until = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """尝试立即取得令牌，不等待"""
+        if time.monotonic() < self._paused_until:
+            return False
+        if self.rate <= 0:
+            return True
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """取得令牌，不足时等待"""
+        if self.rate <= 0 and time.monotonic() >= self._paused_until:
+            return
+        # 加锁保证等待的协程按先后顺序取得令牌
+        async with self._lock:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                    continue
+                # 不限速时也要遵守暂停
+                if self.rate <= 0:
+                    return
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """在接下来的seconds秒内不发放令牌，用于遵守服务端返回的Retry-After"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0